@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# Script to archive the logs of jobs that finished long ago
+
+import logging
+import os
+from configparser import ConfigParser
+
+from lib.execution_engine2.db.MongoUtil import MongoUtil
+from lib.execution_engine2.utils.SlackUtils import SlackClient
+from lib.execution_engine2.utils.log_archiver import JobLogArchiver
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+config = ConfigParser()
+config.read(os.environ["KB_DEPLOYMENT_CONFIG"])
+ee2_config = dict(config.items("execution_engine2"))
+ee2_endpoint = ee2_config.get("ee2-url")
+slack_client = SlackClient(
+    ee2_config.get("slack-token"),
+    channel="#ee_notifications",
+    debug=True,
+    endpoint=ee2_endpoint,
+)
+
+ARCHIVE_AFTER_DAYS = float(ee2_config.get("log-archive-after-days") or 30)
+BATCH_SIZE = 100
+# bounds each run, the rest of a backlog is archived in later runs
+MAX_BATCHES = 50
+
+
+def archive():
+    mongo_util = MongoUtil(ee2_config)
+    if mongo_util.log_archive_store is None:
+        print("No log-archive-store is configured, not archiving job logs")
+        return
+    archiver = JobLogArchiver(
+        mongo_util=mongo_util,
+        store=mongo_util.log_archive_store,
+        logger=logger,
+        archive_after_seconds=int(ARCHIVE_AFTER_DAYS * 24 * 60 * 60),
+        batch_size=BATCH_SIZE,
+    )
+    archived = archiver.archive_all(max_batches=MAX_BATCHES)
+    print(f"Archived the logs of {archived} finished jobs")
+
+
+if __name__ == "__main__":
+    try:
+        archive()
+    except Exception as e:
+        slack_client.ee2_reaper_failure(endpoint=ee2_endpoint, e=e)
+        raise e
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# Script to record the condor resource usage of recently finished jobs
+
+import logging
+import os
+from configparser import ConfigParser
+
+from lib.execution_engine2.db.MongoUtil import MongoUtil
+from lib.execution_engine2.utils.Condor import Condor
+from lib.execution_engine2.utils.SlackUtils import SlackClient
+from lib.execution_engine2.utils.resource_collector import ResourceUsageCollector
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+config = ConfigParser()
+config.read(os.environ["KB_DEPLOYMENT_CONFIG"])
+ee2_config = dict(config.items("execution_engine2"))
+ee2_endpoint = ee2_config.get("ee2-url")
+slack_client = SlackClient(
+    ee2_config.get("slack-token"),
+    channel="#ee_notifications",
+    debug=True,
+    endpoint=ee2_endpoint,
+)
+
+LOOKBACK_HOURS = 48
+SETTLE_MINUTES = 1
+BATCH_SIZE = 500
+
+
+def collect():
+    collector = ResourceUsageCollector(
+        condor=Condor(ee2_config),
+        mongo_util=MongoUtil(ee2_config),
+        logger=logger,
+        lookback_seconds=LOOKBACK_HOURS * 60 * 60,
+        settle_seconds=SETTLE_MINUTES * 60,
+        batch_size=BATCH_SIZE,
+    )
+    updated = collector.collect_all()
+    print(f"Recorded condor resource usage for {updated} finished jobs")
+
+
+if __name__ == "__main__":
+    try:
+        collect()
+    except Exception as e:
+        slack_client.ee2_reaper_failure(endpoint=ee2_endpoint, e=e)
+        raise e
@@ -5,7 +5,6 @@ import logging
 import os
 from configparser import ConfigParser
 from datetime import datetime, timedelta, timezone
-from time import sleep
 
 import pymongo
 from bson import ObjectId
@@ -45,42 +44,55 @@ ee2_jobs_collection = ee2_db.get_collection(
 CREATED_MINUTES_AGO = 5
 QUEUE_THRESHOLD_DAYS = 14
 RUNNING_THRESHOLD_DAYS = 8
+# The number of jobs canceled with each call to ee2
+CANCEL_CHUNK_SIZE = 500
 
 
-def cancel(record):
-    job_id = str(record["_id"])
-    scheduler_id = record.get("scheduler_id")
-    cjp = {
-        "as_admin": True,
-        "job_id": job_id,
-        "terminated_code": TerminatedCode.terminated_by_automation.value,
+def find_job_ids(query):
+    """Get the ids of the jobs matching the query, without fetching the job documents"""
+    return [str(record["_id"]) for record in ee2_jobs_collection.find(query, ["_id"])]
+
+
+def cancel(job_ids, description):
+    """
+    Cancel the jobs in chunks and return a summary of the sweep for slack.
+    A chunk that fails is logged and the rest of the chunks are still canceled.
+    """
+    canceled = 0
+    failed = 0
+    for start in range(0, len(job_ids), CANCEL_CHUNK_SIZE):
+        end = start + CANCEL_CHUNK_SIZE
+        chunk = job_ids[start:end]
+        print(f"About to cancel {len(chunk)} ee2 jobs stuck in {description}")
+        try:
+            results = ee2.cancel_jobs(
+                params={
+                    "job_ids": chunk,
+                    "terminated_code": TerminatedCode.terminated_by_automation.value,
+                }
+            )
+        except Exception:
+            logger.exception(f"Couldn't cancel jobs {chunk}")
+            failed += len(chunk)
+            continue
+        canceled += sum(1 for result in results if result["canceled"])
+    return {
+        "description": description,
+        "found": len(job_ids),
+        "canceled": canceled,
+        "failed": failed,
     }
-    print("About to cancel ee2 job", cjp)
-    ee2.cancel_job(params=cjp)
-    slack_client.cancel_job_message(
-        job_id=job_id,
-        scheduler_id=scheduler_id,
-        termination_code=TerminatedCode.terminated_by_automation.value,
-    )
-    # Avoid rate limit of 1 msg per second
-    sleep(1)
 
 
 def cancel_jobs_stuck_in_state(threshold_days, state):
     before_days = (datetime.today() - timedelta(days=threshold_days + 1)).timestamp()
-    print({"status": state, state: {"$lt": before_days}})
-    stuck_jobs = ee2_jobs_collection.find(
-        {"status": state, state: {"$lt": before_days}}
-    )
+    query = {"status": state, state: {"$lt": before_days}}
+    print(query)
+    job_ids = find_job_ids(query)
     print(
-        f"Found {stuck_jobs.count()} jobs that were stuck in the {state} state over {threshold_days} days"
+        f"Found {len(job_ids)} jobs that were stuck in the {state} state over {threshold_days} days"
     )
-    for record in stuck_jobs:
-        queued_time = record[state]
-        now = datetime.now(timezone.utc).timestamp()
-        elapsed = now - queued_time
-        print(f"{state} days=", elapsed / 86000)
-        cancel(record)
+    return cancel(job_ids, f"{state} for over {threshold_days} days")
 
 
 def cancel_jobs_stuck_in_running():
@@ -90,7 +102,7 @@ def cancel_jobs_stuck_in_running():
     ee2.update_job_status({'job_id': '601af2afeeb773acaf9de80d', 'as_admin': True, 'status': 'queued'})
     :return:
     """
-    cancel_jobs_stuck_in_state(
+    return cancel_jobs_stuck_in_state(
         threshold_days=RUNNING_THRESHOLD_DAYS, state=Status.running.value
     )
 
@@ -102,7 +114,7 @@ def cancel_jobs_stuck_in_queue():
     ee2.update_job_status({'job_id': '601af2afeeb773acaf9de80d', 'as_admin': True, 'status': 'running'})
     :return:
     """
-    cancel_jobs_stuck_in_state(
+    return cancel_jobs_stuck_in_state(
         threshold_days=QUEUE_THRESHOLD_DAYS, state=Status.queued.value
     )
 
@@ -115,14 +127,15 @@ def cancel_created():
     five_mins_ago = ObjectId.from_datetime(
         datetime.now(timezone.utc) - timedelta(minutes=CREATED_MINUTES_AGO)
     )
-    stuck_jobs = ee2_jobs_collection.find(
+    job_ids = find_job_ids(
         {"status": "created", "_id": {"$lt": five_mins_ago}, "batch_job": {"$ne": True}}
     )
     print(
-        f"Found {stuck_jobs.count()} jobs that were stuck in the {Status.created.value} state for over 5 mins"
+        f"Found {len(job_ids)} jobs that were stuck in the {Status.created.value} state for over 5 mins"
+    )
+    return cancel(
+        job_ids, f"{Status.created.value} for over {CREATED_MINUTES_AGO} minutes"
     )
-    for record in stuck_jobs:
-        cancel(record)
 
 
 def clean_retried_jobs():
@@ -131,10 +144,12 @@ def clean_retried_jobs():
 
 
 def purge():
-    cancel_jobs_stuck_in_queue()
+    sweeps = [cancel_jobs_stuck_in_queue()]
     # Use this after an outage
-    # cancel_jobs_stuck_in_running()
-    cancel_created()
+    # sweeps.append(cancel_jobs_stuck_in_running())
+    sweeps.append(cancel_created())
+    # One message per run rather than one per job, to stay under the slack rate limit
+    slack_client.purge_summary_message(sweeps)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# Script to record a resource usage sample for all running jobs
+
+import logging
+import os
+from configparser import ConfigParser
+
+from lib.execution_engine2.db.MongoUtil import MongoUtil
+from lib.execution_engine2.utils.Condor import Condor
+from lib.execution_engine2.utils.SlackUtils import SlackClient
+from lib.execution_engine2.utils.resource_collector import RunningJobResourceSampler
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+config = ConfigParser()
+config.read(os.environ["KB_DEPLOYMENT_CONFIG"])
+ee2_config = dict(config.items("execution_engine2"))
+ee2_endpoint = ee2_config.get("ee2-url")
+slack_client = SlackClient(
+    ee2_config.get("slack-token"),
+    channel="#ee_notifications",
+    debug=True,
+    endpoint=ee2_endpoint,
+)
+
+# Samples are taken every 10 minutes by cron, so this keeps about a week of samples,
+# which is the longest a job may run
+MAX_SAMPLES = 1008
+
+
+def sample():
+    sampler = RunningJobResourceSampler(
+        condor=Condor(ee2_config),
+        mongo_util=MongoUtil(ee2_config),
+        logger=logger,
+        max_samples=MAX_SAMPLES,
+    )
+    updated = sampler.sample()
+    print(f"Recorded resource usage samples for {updated} running jobs")
+
+
+if __name__ == "__main__":
+    try:
+        sample()
+    except Exception as e:
+        slack_client.ee2_reaper_failure(endpoint=ee2_endpoint, e=e)
+        raise e
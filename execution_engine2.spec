@@ -16,12 +16,30 @@
         /* A job id. */
         typedef string job_id;
 
+        /*
+            Calls made by this server process to the HTCondor schedd of one kind, e.g. submit.
+            count - the number of calls.
+            errors - the number of calls that failed.
+            p50_ms, p95_ms, p99_ms, max_ms - latency percentiles of the recent calls, in
+                milliseconds.
+        */
+        typedef structure {
+            int count;
+            int errors;
+            float p50_ms;
+            float p95_ms;
+            float p99_ms;
+            float max_ms;
+        } ScheddCallStats;
+
         /*
             A structure representing the Execution Engine status
             git_commit - the Git hash of the version of the module.
             version - the semantic version for the module.
             service - the name of the service.
             server_time - the current server timestamp since epoch
+            schedd - the calls this server process made to the HTCondor schedd by kind of call:
+                connect, submit, query, history or act.
 
             # TODO - add some or all of the following
             reboot_mode - if 1, then in the process of rebooting
@@ -35,6 +53,7 @@
             string version;
             string service;
             float server_time;
+            mapping<string, ScheddCallStats> schedd;
         } Status;
 
         /*
@@ -415,11 +434,15 @@
         /*
             exclude_fields: exclude certain fields to return. default None.
             exclude_fields strings can be one of fields defined in execution_engine2.db.models.models.Job
+            return_resource_usage: check_job and check_job_batch only. whether to return the
+            resource_usage time series and resource_usage_peaks sampled while the job was running.
+            default false. The other endpoints never return them.
         */
         typedef structure {
             job_id job_id;
             list<string> exclude_fields;
             boolean as_admin;
+            boolean return_resource_usage;
         } CheckJobParams;
 
     /*
@@ -455,6 +478,11 @@
 
         #TODO, add these to the structure?
         condor_job_ads - dict - condor related job information
+        resource_usage - dict - cpu, memory (MB), disk (MB) and timestamp lists sampled while the
+            job was running. Only returned by check_job and check_job_batch when requested
+        resource_usage_peaks - dict - job_peak_cpu_usage, job_peak_memory_usage_mb and
+            job_peak_disk_usage_mb. Only returned by check_job and check_job_batch when
+            requested
 
         retry_count - int - generated field based on length of retry_ids
         retry_ids - list - list of jobs that are retried based off of this job
@@ -585,6 +613,36 @@
         */
         funcdef cancel_job(CancelJobParams params) returns () authentication required;
 
+        /*
+            job_ids - the ids of the jobs to cancel.
+            terminated_code - the reason the jobs were canceled. See CancelJobParams.
+                Default terminated_by_user 0.
+            @optional terminated_code
+        */
+        typedef structure {
+            list<job_id> job_ids;
+            int terminated_code;
+        } CancelJobsParams;
+
+        /*
+            job_id - the id of the job.
+            status - the status of the job before the call, or null if there is no such job.
+            canceled - whether the job was canceled by this call. False if the job had already
+                finished.
+        */
+        typedef structure {
+            job_id job_id;
+            string status;
+            boolean canceled;
+        } CancelJobResult;
+
+        /*
+            Cancel many jobs at once (Admin function). Returns one result per job id, in order.
+            The children of canceled batch jobs are canceled as well.
+        */
+        funcdef cancel_jobs(CancelJobsParams params) returns (list<CancelJobResult> results)
+            authentication required;
+
         /*
             job_id - id of job running method
             finished - indicates whether job is done (including error/cancel cases) or not
@@ -730,6 +788,121 @@
         */
         funcdef handle_held_job(string cluster_id) returns (HeldJob) authentication required;
 
+        /*
+            cluster_id - the condor cluster id of the held job.
+            job_id - the id of the job with the cluster id, or null if there is no such job.
+            status - the status of the job, or null if there is no such job.
+            finished - whether the job was marked as an error by this call. False if the job had
+                already finished.
+        */
+        typedef structure {
+            string cluster_id;
+            job_id job_id;
+            string status;
+            boolean finished;
+        } HeldJobResult;
+
+        /*
+            Handle many held CONDOR jobs at once (Admin function). Returns one result per
+            cluster id, in order. You probably never want to run this, only the reaper should
+            run it.
+        */
+        funcdef handle_held_jobs(list<string> cluster_ids) returns (list<HeldJobResult> results)
+            authentication required;
+
+        /*
+            start_time - Filter based on job creation time. See CheckJobsDateRangeParams for
+                the accepted formats.
+            end_time - Filter based on job creation time.
+            methods - Only report on jobs running these methods, in module.method format.
+                Default all methods.
+            min_jobs - The minimum number of jobs with usage data for a method and client group
+                before client group settings are suggested. Default 10.
+            @optional methods
+            @optional min_jobs
+        */
+        typedef structure {
+            float start_time;
+            float end_time;
+            list<string> methods;
+            int min_jobs;
+        } ResourceUsageReportParams;
+
+        /*
+            Nearest rank percentiles of a resource across the jobs for a method.
+            @optional p50 p90 p95 p99 max
+        */
+        typedef structure {
+            float p50;
+            float p90;
+            float p95;
+            float p99;
+            float max;
+        } ResourcePercentiles;
+
+        /*
+            requested - percentiles of the resource requested by the jobs. null if unknown.
+            used - percentiles of the resource used by the jobs, the larger of the final condor
+                job ads and the peaks sampled while the jobs were running. null if unknown.
+        */
+        typedef structure {
+            ResourcePercentiles requested;
+            ResourcePercentiles used;
+        } ResourceUsage;
+
+        /*
+            Resources that were requested but not used, multiplied by the job run time and
+            summed over the jobs.
+        */
+        typedef structure {
+            float cpu_hours;
+            float memory_gb_hours;
+            float disk_gb_hours;
+        } ResourceWaste;
+
+        /*
+            method - the method, in module.method format.
+            client_group - the client group the jobs ran in.
+            job_count - the number of completed or errored jobs with condor job ads.
+            jobs_with_usage - the number of those jobs with recorded memory usage.
+            cpu - requested versus used cpus.
+            memory_mb - requested versus used memory in MB.
+            disk_gb - requested versus used disk in GB.
+            waste - the over-allocation of resources.
+            suggested_client_groups - suggested catalog client group settings, in the catalog's
+                CSV format, sized from the 99th percentile of the used resources plus headroom.
+                null if there are too few jobs, or the client group or usage is unknown.
+        */
+        typedef structure {
+            string method;
+            string client_group;
+            int job_count;
+            int jobs_with_usage;
+            ResourceUsage cpu;
+            ResourceUsage memory_mb;
+            ResourceUsage disk_gb;
+            ResourceWaste waste;
+            list<string> suggested_client_groups;
+        } MethodResourceUsage;
+
+        /*
+            start_time - the start of the creation time range in seconds since the epoch.
+            end_time - the end of the creation time range in seconds since the epoch.
+            methods - per method and client group usage, most wasted cpu hours first.
+        */
+        typedef structure {
+            float start_time;
+            float end_time;
+            list<MethodResourceUsage> methods;
+        } ResourceUsageReport;
+
+        /*
+            Report the resources requested versus used by finished jobs, per method, and
+            suggest catalog client group settings (Admin function).
+        */
+        funcdef get_resource_usage_report(ResourceUsageReportParams params)
+            returns (ResourceUsageReport report) authentication required;
+
         /*
             Check if current user has ee2 admin rights.
         */
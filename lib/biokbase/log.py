@@ -73,6 +73,7 @@ import platform as _platform
 import inspect as _inspect
 import os as _os
 import getpass as _getpass
+import sys as _sys
 import warnings as _warnings
 from configparser import ConfigParser as _ConfigParser
 import time
@@ -154,7 +155,9 @@ class log(object):
             raise ValueError("Subsystem must be supplied")
 
         self.user = _getpass.getuser()
-        self.parentfile = _os.path.abspath(_inspect.getfile(_inspect.stack()[1][0]))
+        # the caller's frame. inspect.stack() would read the source of every frame on the
+        # stack and touch every loaded module, loading any lazily imported ones
+        self.parentfile = _os.path.abspath(_inspect.getfile(_sys._getframe(1)))
         self.ip_address = ip_address
         self.authuser = authuser
         self.module = module
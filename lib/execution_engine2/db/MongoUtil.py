@@ -1,15 +1,33 @@
+import heapq
+import itertools
 import logging
 import subprocess
 import time
 import traceback
 from contextlib import contextmanager
-from typing import Dict, List, NamedTuple
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 from bson.objectid import ObjectId
 from mongoengine import connect, connection
-from pymongo import MongoClient
-from pymongo.errors import ServerSelectionTimeoutError
+from pymongo import MongoClient, ReturnDocument, UpdateOne, WriteConcern
+from pymongo.errors import (
+    BulkWriteError,
+    DuplicateKeyError,
+    ServerSelectionTimeoutError,
+)
 
-from execution_engine2.db.models.models import JobLog, Job, Status, TerminatedCode
+from execution_engine2.db import log_archive, log_encoding
+from execution_engine2.db.log_buffer import LogAppendBuffer
+from execution_engine2.db.models.job_view import JobView
+from execution_engine2.db.models.models import (
+    JobLog,
+    Job,
+    Status,
+    TerminatedCode,
+    valid_errorcode,
+    valid_termination_code,
+)
+from execution_engine2.db.mongo_profiler import MongoProfiler
 from execution_engine2.exceptions import (
     RecordNotFoundException,
     InvalidStatusTransitionException,
@@ -23,7 +41,22 @@ class JobIdPair(NamedTuple):
     scheduler_id: str
 
 
+class FinishedJob(NamedTuple):
+    job_id: str
+    finished: float
+
+
 class MongoUtil:
+    _FINISHED_STATES = [
+        Status.completed.value,
+        Status.error.value,
+        Status.terminated.value,
+    ]
+    # log lines fetched per round trip when streaming a log
+    _LOG_LINE_BATCH_SIZE = 1000
+    # attempts to add a line to many logs when other lines are added concurrently
+    _LOG_LINE_ATTEMPTS = 3
+
     def __init__(self, config: Dict):
         self.config = config
         self.mongo_host = config["mongo-host"]
@@ -35,10 +68,40 @@ class MongoUtil:
         self.mongo_authmechanism = config["mongo-authmechanism"]
         self._col_jobs = config["mongo-jobs-collection"]
         self._col_logs = config["mongo-logs-collection"]
+        self._col_checkpoints = config.get(
+            "mongo-checkpoints-collection", "ee2_checkpoints"
+        )
+        self._log_encoding = config.get("mongo-log-encoding") or log_encoding.RAW
+        if self._log_encoding not in log_encoding.ENCODINGS:
+            raise ValueError(f"Unsupported mongo-log-encoding {self._log_encoding}")
         self._start_local_service()
         self.logger = logging.getLogger("ee2")
+        self.profiler = None
+        if parse_bool(config.get("mongo-profiler", "true")):
+            self.profiler = MongoProfiler(
+                self.logger,
+                slow_ms=float(config.get("mongo-slow-op-ms", 200)),
+                explain_interval_seconds=float(
+                    config.get("mongo-explain-interval-seconds", 600)
+                ),
+                reply_sample_interval=int(
+                    config.get("mongo-reply-size-sample-interval", 100)
+                ),
+            )
+        self.log_buffer = LogAppendBuffer(
+            self._commit_job_logs,
+            window_seconds=float(config.get("mongo-log-group-commit-ms", 0)) / 1000,
+        )
         self.pymongoc = self._get_pymongo_client()
         self.me_connection = self._get_mongoengine_client()
+        self.log_archive_store = log_archive.get_log_archive_store(
+            config, self.pymongoc[self.mongo_database]
+        )
+        if self.profiler:
+            self.profiler.client = self.pymongoc
+
+    def _event_listeners(self) -> List:
+        return [self.profiler] if self.profiler else []
 
     def _get_pymongo_client(self):
         return MongoClient(
@@ -49,6 +112,7 @@ class MongoUtil:
             authSource=self.mongo_database,
             authMechanism=self.mongo_authmechanism,
             retryWrites=self.retry_rewrites,
+            event_listeners=self._event_listeners(),
         )
 
     def _get_mongoengine_client(self) -> connection:
@@ -61,6 +125,7 @@ class MongoUtil:
             authentication_source=self.mongo_database,
             authentication_mechanism=self.mongo_authmechanism,
             retryWrites=self.retry_rewrites,
+            event_listeners=self._event_listeners(),
         )
         # This MongoDB deployment does not support retryable writes
 
@@ -158,7 +223,10 @@ class MongoUtil:
 
     def get_workspace_jobs(self, workspace_id):
         with self.mongo_engine_connection():
-            job_ids = [str(job.id) for job in Job.objects(wsid=workspace_id)]
+            job_ids = [
+                str(job["_id"])
+                for job in Job.objects(wsid=workspace_id).only("id").as_pymongo()
+            ]
             return job_ids
 
     def get_job_log_pymongo(self, job_id: str = None):
@@ -181,6 +249,122 @@ class MongoUtil:
 
         return job_log
 
+    def get_job_log_summary(self, job_id: str) -> Dict:
+        """
+        Get a job log's stored line count and the number of lines it contains, without reading
+        the lines. Works the same for archived logs.
+
+        :return: a dict with the stored_line_count and count keys.
+        """
+        job_log_col = self.pymongoc[self.mongo_database][self._col_logs]
+        try:
+            summary = list(
+                job_log_col.aggregate(
+                    [
+                        {"$match": {"_id": ObjectId(job_id)}},
+                        {
+                            "$project": {
+                                "stored_line_count": 1,
+                                "count": {
+                                    "$ifNull": [
+                                        "$archived.count",
+                                        {
+                                            "$add": [
+                                                {"$size": {"$ifNull": ["$lines", []]}},
+                                                {"$sum": "$chunks.n"},
+                                            ]
+                                        },
+                                    ]
+                                },
+                            }
+                        },
+                    ]
+                )
+            )
+        except Exception as e:
+            error_msg = "Unable to find job\n"
+            error_msg += "ERROR -- {}:\n{}".format(
+                e, "".join(traceback.format_exception(None, e, e.__traceback__))
+            )
+            raise ValueError(error_msg)
+
+        if not summary:
+            raise RecordNotFoundException(
+                "Cannot find job log with id: {}".format(job_id)
+            )
+        return summary[0]
+
+    def iter_job_log_lines(
+        self, job_id: str, skip_lines: int = None, limit: int = None
+    ) -> Iterator[Dict]:
+        """
+        Iterate over a job log's lines, fetching them from the database in batches. Lines
+        stored in compact chunks are decoded, skipping the chunks before the requested lines.
+        The lines of archived logs are read from the log archive store.
+
+        :param job_id: the job ID.
+        :param skip_lines: skip lines with a line position up to and including this value.
+        :param limit: the maximum number of lines to return.
+        """
+        job_log_col = self.pymongoc[self.mongo_database][self._col_logs]
+        skip_lines = int(skip_lines) if skip_lines else None
+        limit = int(limit) if limit else None
+        pipeline = [
+            {"$match": {"_id": ObjectId(job_id)}},
+            {"$unwind": "$lines"},
+            {"$replaceRoot": {"newRoot": "$lines"}},
+        ]
+        if skip_lines is not None:
+            pipeline.append({"$match": {"linepos": {"$gt": skip_lines}}})
+        if limit:
+            pipeline.append({"$limit": limit})
+        lines = job_log_col.aggregate(pipeline, batchSize=self._LOG_LINE_BATCH_SIZE)
+        chunk_lines = self._iter_job_log_chunk_lines(job_log_col, job_id, skip_lines)
+        # a log holds both if the encoding was changed while the job was running
+        merged = heapq.merge(lines, chunk_lines, key=lambda line: line["linepos"])
+        return itertools.islice(merged, limit) if limit else merged
+
+    def _iter_job_log_chunk_lines(
+        self, job_log_col, job_id: str, skip_lines: Optional[int]
+    ) -> Iterator[Dict]:
+        last_skipped = -1 if skip_lines is None else skip_lines
+        pipeline = [
+            {"$match": {"_id": ObjectId(job_id)}},
+            {
+                "$project": {
+                    "archived": 1,
+                    "chunks": {
+                        "$filter": {
+                            "input": {"$ifNull": ["$chunks", []]},
+                            "as": "chunk",
+                            # chunks with lines after the skipped lines
+                            "cond": {
+                                "$gt": [
+                                    {"$add": ["$$chunk.start", "$$chunk.n"]},
+                                    last_skipped + 1,
+                                ]
+                            },
+                        }
+                    },
+                }
+            },
+        ]
+        for job_log in job_log_col.aggregate(pipeline):
+            if job_log.get("archived"):
+                data = self._get_log_archive(job_log["archived"])
+                yield from log_archive.iter_archive_lines(data, skip_lines)
+            for chunk in job_log["chunks"]:
+                yield from log_encoding.iter_chunk_lines(chunk, skip_lines)
+
+    def _get_log_archive(self, archived: Dict) -> bytes:
+        store = self.log_archive_store
+        if store is None or store.name != archived["store"]:
+            raise ValueError(
+                f"The log is archived in the {archived['store']} log archive store, "
+                + "which isn't configured"
+            )
+        return store.get(archived["key"])
+
     def get_job_log(self, job_id: str = None) -> JobLog:
         if job_id is None:
             raise ValueError("Please provide a job id")
@@ -253,6 +437,42 @@ class MongoUtil:
 
         return jobs
 
+    def get_job_views(
+        self, job_ids=None, exclude_fields=None, sort_id_ascending=None
+    ) -> List[JobView]:
+        """
+        Get read only views of jobs, without loading them into Job Documents.
+        Takes the same arguments as get_jobs.
+        """
+        if not (job_ids and isinstance(job_ids, list)):
+            raise ValueError("Please provide a non empty list of job ids")
+        if exclude_fields and not isinstance(exclude_fields, list):
+            raise ValueError("Please input a list type exclude_fields")
+
+        try:
+            object_ids = [ObjectId(job_id) for job_id in job_ids]
+        except Exception:
+            raise ValueError(
+                "Unable to find job:\nError:\n{}".format(traceback.format_exc())
+            )
+        projection = {field: 0 for field in exclude_fields} if exclude_fields else None
+        if sort_id_ascending is None:
+            sort_id_ascending = True
+        sort_id_indicator = 1 if sort_id_ascending else -1
+
+        ee2_jobs_col = self.pymongoc[self.mongo_database][self._col_jobs]
+        jobs = [
+            JobView.from_mongo(doc)
+            for doc in ee2_jobs_col.find({"_id": {"$in": object_ids}}, projection).sort(
+                "_id", sort_id_indicator
+            )
+        ]
+        if not jobs:
+            raise RecordNotFoundException(
+                "Cannot find job with ids: {}".format(job_ids)
+            )
+        return jobs
+
     @staticmethod
     def check_if_already_finished(job_status):
         if job_status in [
@@ -319,38 +539,268 @@ class MongoUtil:
 
         return True
 
-    def finish_job_with_error(self, job_id, error_message, error_code, error):
+    def cancel_jobs(self, job_ids: List[str], terminated_code: int) -> List[Dict]:
+        """
+        Cancel many unfinished jobs with one update. Jobs that are already completed, errored
+        or terminated are left alone.
+        :param job_ids: The jobs to cancel
+        :param terminated_code: The reason the jobs were canceled
+        :return: The post-images of the job records that were canceled by this call
+        """
+        if not job_ids:
+            return []
+        valid_termination_code(terminated_code)
+        now = time.time()
+        ids = [ObjectId(job_id) for job_id in job_ids]
+        ee2_jobs_col = self.pymongoc[self.mongo_database][self._col_jobs]
+        ee2_jobs_col.update_many(
+            {"_id": {"$in": ids}, "status": {"$nin": self._FINISHED_STATES}},
+            {
+                "$set": {
+                    "terminated_code": terminated_code,
+                    "status": Status.terminated.value,
+                    "finished": now,
+                    "updated": now,
+                }
+            },
+        )
+        # The finished time identifies the jobs canceled by this update rather than by a
+        # concurrent call
+        return list(
+            ee2_jobs_col.find(
+                {
+                    "_id": {"$in": ids},
+                    "status": Status.terminated.value,
+                    "finished": now,
+                },
+                projection=["scheduler_id", "child_jobs"],
+            )
+        )
+
+    def _finish_job(self, job_id: str, set_op: Dict) -> Dict:
+        """
+        Move an unfinished job to a finished state with a single conditional update.
+        The update only applies if the job is not already completed, errored or terminated,
+        so concurrent finish calls cannot both succeed.
+        :param job_id: The job to finish
+        :param set_op: The fields to set on the job, in addition to the timestamps
+        :return: The post-image of the job record
+        """
+        now = time.time()
+        set_op = dict(set_op, finished=now, updated=now)
+        ee2_jobs_col = self.pymongoc[self.mongo_database][self._col_jobs]
+        job_record = ee2_jobs_col.find_one_and_update(
+            {"_id": ObjectId(job_id), "status": {"$nin": self._FINISHED_STATES}},
+            {"$set": set_op},
+            return_document=ReturnDocument.AFTER,
+        )
+        if job_record is None:
+            raise InvalidStatusTransitionException(
+                f"Cannot finish job {job_id}, it does not exist or is already finished"
+            )
+        return job_record
+
+    def finish_job_with_error(self, job_id, error_message, error_code, error) -> Dict:
         """
-        #TODO Should we check for a valid state transition here also?
         :param error:
         :param job_id:
         :param error_message:
         :param error_code:
-        :return:
+        :return: The post-image of the finished job record
         """
-        with self.mongo_engine_connection():
-            j = self.get_job(job_id)
-            j.error_code = error_code
-            j.errormsg = error_message
-            j.error = error
-            j.status = Status.error.value
-            j.finished = time.time()
-            j.save()
+        if error_code is not None:
+            valid_errorcode(error_code)
+        return self._finish_job(
+            job_id,
+            {
+                "error_code": error_code,
+                "errormsg": error_message,
+                "error": error,
+                "status": Status.error.value,
+            },
+        )
 
-    def finish_job_with_success(self, job_id, job_output):
+    def finish_job_with_success(self, job_id, job_output) -> Dict:
         """
-        #TODO Should we check for a valid state transition here also?
         :param job_id:
         :param job_output:
-        :param job:
-        :return:
+        :return: The post-image of the finished job record
         """
-        with self.mongo_engine_connection():
-            j = self.get_job(job_id)
-            j.job_output = job_output
-            j.status = Status.completed.value
-            j.finished = time.time()
-            j.save()
+        return self._finish_job(
+            job_id, {"job_output": job_output, "status": Status.completed.value}
+        )
+
+    def get_jobs_by_scheduler_ids(
+        self, scheduler_ids: List[str], projection: List[str]
+    ) -> List[Dict]:
+        """
+        Get the jobs with the given scheduler ids with one indexed query
+        :param scheduler_ids: The scheduler (condor cluster) ids of the jobs
+        :param projection: The fields to return in addition to the id and scheduler id
+        :return: The job records. Scheduler ids without a job are omitted
+        """
+        if not scheduler_ids:
+            return []
+        ee2_jobs_col = self.pymongoc[self.mongo_database][self._col_jobs]
+        return list(
+            ee2_jobs_col.find(
+                {"scheduler_id": {"$in": scheduler_ids}},
+                projection=["scheduler_id"] + projection,
+            )
+        )
+
+    def get_job_records(self, job_ids: List[str], projection: List[str]) -> List[Dict]:
+        """
+        Get many job records with one query, without building Job documents
+        :param job_ids: The ids of the jobs
+        :param projection: The fields to return in addition to the id
+        :return: The job records. Ids without a job are omitted
+        """
+        if not job_ids:
+            return []
+        ee2_jobs_col = self.pymongoc[self.mongo_database][self._col_jobs]
+        return list(
+            ee2_jobs_col.find(
+                {"_id": {"$in": [ObjectId(job_id) for job_id in job_ids]}},
+                projection=projection,
+            )
+        )
+
+    def finish_jobs_with_error(
+        self, job_ids: List[str], error_message, error_code, error
+    ) -> List[Dict]:
+        """
+        Move many unfinished jobs to the error state with one update. Jobs that are already
+        completed, errored or terminated are left alone.
+        :param job_ids: The jobs to finish
+        :param error_message: The error message for the jobs
+        :param error_code: The error code for the jobs
+        :param error: The error for the jobs
+        :return: The post-images of the job records that were finished by this call
+        """
+        if not job_ids:
+            return []
+        if error_code is not None:
+            valid_errorcode(error_code)
+        now = time.time()
+        ids = [ObjectId(job_id) for job_id in job_ids]
+        ee2_jobs_col = self.pymongoc[self.mongo_database][self._col_jobs]
+        ee2_jobs_col.update_many(
+            {"_id": {"$in": ids}, "status": {"$nin": self._FINISHED_STATES}},
+            {
+                "$set": {
+                    "error_code": error_code,
+                    "errormsg": error_message,
+                    "error": error,
+                    "status": Status.error.value,
+                    "finished": now,
+                    "updated": now,
+                }
+            },
+        )
+        # The finished time identifies the jobs finished by this update rather than by a
+        # concurrent call
+        return list(
+            ee2_jobs_col.find(
+                {"_id": {"$in": ids}, "status": Status.error.value, "finished": now}
+            )
+        )
+
+    def add_job_log_line(self, job_ids: List[str], line: str, is_error: bool) -> int:
+        """
+        Append the same line to the logs of many jobs with one read and one bulk write,
+        creating the logs that don't exist yet. Logs that other lines were added to
+        concurrently are retried a few times, and the jobs whose logs still didn't get the
+        line are logged.
+        :param job_ids: The jobs to add the line to
+        :param line: The log line
+        :param is_error: Whether the line is an error
+        :return: The number of logs the line was added to
+        """
+        if not job_ids:
+            return 0
+        now = time.time()
+        pending = [ObjectId(job_id) for job_id in job_ids]
+        job_log_col = self.pymongoc[self.mongo_database][self._col_logs]
+        added = 0
+        for _ in range(self._LOG_LINE_ATTEMPTS):
+            requests, pending = self._job_log_line_requests(
+                job_log_col, pending, line, is_error, now
+            )
+            if not requests:
+                break
+            try:
+                result = job_log_col.bulk_write(requests, ordered=False).bulk_api_result
+            except BulkWriteError as e:
+                result = e.details
+            written = result["nModified"] + result["nUpserted"]
+            added += written
+            if written == len(pending):
+                pending = []
+                break
+            # The line's timestamp marks the logs it was added to
+            done = {
+                log["_id"]
+                for log in job_log_col.find(
+                    {
+                        "_id": {"$in": pending},
+                        "lines": {"$elemMatch": {"line": line, "ts": now}},
+                    },
+                    projection=["_id"],
+                )
+            }
+            pending = [job_id for job_id in pending if job_id not in done]
+        if pending:
+            self.logger.error(
+                "Could not add log line to the logs of jobs "
+                + f"{[str(job_id) for job_id in pending]}"
+            )
+        return added
+
+    def _job_log_line_requests(
+        self, job_log_col, ids: List[ObjectId], line: str, is_error: bool, now: float
+    ) -> Tuple[List[UpdateOne], List[ObjectId]]:
+        line_counts = {}
+        archived = []
+        for log in job_log_col.find(
+            {"_id": {"$in": ids}}, projection=["stored_line_count", "archived"]
+        ):
+            if log.get("archived"):
+                archived.append(log["_id"])
+            else:
+                line_counts[log["_id"]] = log.get("stored_line_count", 0)
+        if archived:
+            self.logger.error(
+                "Could not add log line to the archived logs of jobs "
+                + f"{[str(job_id) for job_id in archived]}"
+            )
+        ids = [job_id for job_id in ids if job_id not in archived]
+        requests = []
+        for job_id in ids:
+            count = line_counts.get(job_id, 0)
+            log_line = {"line": line, "linepos": count, "error": is_error, "ts": now}
+            # Only write if no other lines were added since the read, to keep the line
+            # positions consistent. A log created concurrently fails with a duplicate key.
+            log_filter = {"_id": job_id, "archived": None}
+            if job_id in line_counts:
+                log_filter["stored_line_count"] = count
+            else:
+                log_filter["stored_line_count"] = {"$exists": False}
+            requests.append(
+                UpdateOne(
+                    log_filter,
+                    {
+                        "$push": {"lines": log_line},
+                        "$set": {
+                            "original_line_count": count + 1,
+                            "stored_line_count": count + 1,
+                            "updated": now,
+                        },
+                    },
+                    upsert=job_id not in line_counts,
+                )
+            )
+        return requests, ids
 
     def get_job_batch_name(self, cluster_id):
         """
@@ -358,7 +808,6 @@ class MongoUtil:
         :param cluster_id: The condor ID
         :return:  The JobBatchName / EE2 Record ID
         """
-        # TODO Create an index on this field?
         with self.mongo_engine_connection():
             j = Job.objects(scheduler_id=cluster_id)
             if len(j) == 0:
@@ -373,10 +822,214 @@ class MongoUtil:
         :return:
         """
         self.logger.debug(f"About to add {resources} to {job_id}")
-        with self.mongo_engine_connection():
-            j = Job.objects.with_id(job_id)  # type: Job
-            j.condor_job_ads = resources
-            j.save()
+        ee2_jobs_col = self.pymongoc[self.mongo_database][self._col_jobs]
+        ee2_jobs_col.update_one(
+            {"_id": ObjectId(job_id)},
+            {"$set": {"condor_job_ads": resources, "updated": time.time()}},
+        )
+
+    def get_finished_jobs_without_resources(
+        self,
+        finished_after: float,
+        finished_before: float,
+        limit: int,
+        start_after: Optional[FinishedJob] = None,
+    ) -> List[FinishedJob]:
+        """
+        Get jobs that ran on a worker, finished in the given time window, and don't have their
+        condor resource usage recorded yet.
+        :param finished_after: Only return jobs finished after this epoch timestamp
+        :param finished_before: Only return jobs finished before this epoch timestamp
+        :param limit: The maximum number of jobs to return
+        :param start_after: Only return jobs after this one, the last job of the previous
+            page. Jobs whose usage couldn't be recorded are returned again by later queries,
+            so paging is needed to get past them.
+        :return: A list of jobs, oldest finished first
+        """
+        ee2_jobs_col = self.pymongoc[self.mongo_database][self._col_jobs]
+        query = {
+            "finished": {"$gt": finished_after, "$lt": finished_before},
+            "running": {"$ne": None},
+            "condor_job_ads": None,
+        }
+        if start_after:
+            query["$or"] = [
+                {"finished": {"$gt": start_after.finished}},
+                {
+                    "finished": start_after.finished,
+                    "_id": {"$gt": ObjectId(start_after.job_id)},
+                },
+            ]
+        cursor = (
+            ee2_jobs_col.find(query, projection={"_id": 1, "finished": 1})
+            .sort([("finished", 1), ("_id", 1)])
+            .limit(limit)
+        )
+        return [FinishedJob(str(rec["_id"]), rec["finished"]) for rec in cursor]
+
+    def update_jobs_resources(self, resources: Dict[str, Dict]) -> int:
+        """
+        Save the resources used by many jobs in one bulk write
+        :param resources: A mapping of job id to the resources used by the job, as reported
+            by condor
+        :return: The number of job records that were modified
+        """
+        if not resources:
+            return 0
+        now = time.time()
+        ee2_jobs_col = self.pymongoc[self.mongo_database][self._col_jobs]
+        result = ee2_jobs_col.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": ObjectId(job_id)},
+                    {"$set": {"condor_job_ads": job_resources, "updated": now}},
+                )
+                for job_id, job_resources in resources.items()
+            ],
+            ordered=False,
+        )
+        return result.modified_count
+
+    def append_jobs_resource_usage(
+        self, usage: Dict[str, Dict], timestamp: float, max_samples: int
+    ) -> int:
+        """
+        Append one resource usage sample to the time series of many running jobs in one bulk
+        write, and raise the recorded peaks where the sample exceeds them.
+        Jobs that are no longer running are left untouched.
+        :param usage: A mapping of job id to a dict with the cpu, memory and disk usage
+        :param timestamp: The time the sample was taken
+        :param max_samples: Only the most recent max_samples samples are kept for each job
+        :return: The number of job records that were modified
+        """
+        if not usage:
+            return 0
+        ee2_jobs_col = self.pymongoc[self.mongo_database][self._col_jobs]
+        requests = []
+        for job_id, sample in usage.items():
+            values = {
+                "cpu": sample["cpu"],
+                "memory": sample["memory"],
+                "disk": sample["disk"],
+                "timestamp": timestamp,
+            }
+            push = {
+                f"resource_usage.{key}": {"$each": [value], "$slice": -max_samples}
+                for key, value in values.items()
+            }
+            peaks = {
+                "resource_usage_peaks.job_peak_cpu_usage": sample["cpu"],
+                "resource_usage_peaks.job_peak_memory_usage_mb": sample["memory"],
+                "resource_usage_peaks.job_peak_disk_usage_mb": sample["disk"],
+            }
+            requests.append(
+                UpdateOne(
+                    {"_id": ObjectId(job_id), "status": Status.running.value},
+                    {"$push": push, "$max": peaks},
+                )
+            )
+        result = ee2_jobs_col.bulk_write(requests, ordered=False)
+        return result.modified_count
+
+    def get_resource_usage_by_method(
+        self, start_id: ObjectId, stop_id: ObjectId, methods: List[str] = None
+    ) -> Iterator[Dict]:
+        """
+        Aggregate the requested and used resources of jobs that ran to completion or failed,
+        grouped by method and client group.
+        Used resources are the larger of the final condor job ads and the sampled peaks.
+        The jobs are streamed sorted by group rather than grouped in the database, since a
+        group's jobs can exceed the maximum document size, and one group is held in memory
+        at a time.
+        :param start_id: Only include jobs with ids (and so creation times) after this id
+        :param stop_id: Only include jobs with ids (and so creation times) before this id
+        :param methods: Only include jobs running these methods. Default all methods
+        :return: An iterator of dicts with the keys
+            method - the method the jobs ran
+            client_group - the client group the jobs ran in
+            jobs - a list of dicts, one per job, with the keys cpu_requested, cpu_used,
+                memory_requested (MB), memory_used (MB), disk_requested (GB),
+                disk_used (GB) and runtime_hours. Keys are missing where the job record
+                doesn't have the information.
+        """
+        match = {
+            "_id": {"$gt": start_id, "$lt": stop_id},
+            "status": {"$in": [Status.completed.value, Status.error.value]},
+            "condor_job_ads": {"$ne": None},
+        }
+        if methods:
+            match["job_input.method"] = {"$in": methods}
+        reqs = "$job_input.requirements"
+        ads = "$condor_job_ads"
+        peaks = "$resource_usage_peaks"
+        job = {
+            "cpu_requested": f"{reqs}.cpu",
+            "memory_requested": f"{reqs}.memory",
+            "disk_requested": f"{reqs}.disk",
+            # condor reports memory and disk in KiB
+            "cpu_used": {"$max": [f"{ads}.CpusUsage", f"{peaks}.job_peak_cpu_usage"]},
+            "memory_used": {
+                "$max": [
+                    {"$divide": [f"{ads}.ResidentSetSize_RAW", 1024]},
+                    f"{peaks}.job_peak_memory_usage_mb",
+                ]
+            },
+            "disk_used": {
+                "$max": [
+                    {"$divide": [f"{ads}.DiskUsage_RAW", 1024 * 1024]},
+                    {"$divide": [f"{peaks}.job_peak_disk_usage_mb", 1024]},
+                ]
+            },
+            "runtime_hours": {
+                "$divide": [{"$subtract": ["$finished", "$running"]}, 3600]
+            },
+        }
+        pipeline = [
+            {"$match": match},
+            {
+                "$project": {
+                    "_id": 0,
+                    "method": "$job_input.method",
+                    "client_group": f"{reqs}.clientgroup",
+                    "job": job,
+                }
+            },
+            {"$sort": {"method": 1, "client_group": 1}},
+        ]
+        ee2_jobs_col = self.pymongoc[self.mongo_database][self._col_jobs]
+        rows = ee2_jobs_col.aggregate(pipeline, allowDiskUse=True)
+        for (method, client_group), group in itertools.groupby(
+            rows, key=lambda row: (row.get("method"), row.get("client_group"))
+        ):
+            yield {
+                "method": method,
+                "client_group": client_group,
+                "jobs": [row["job"] for row in group],
+            }
+
+    def get_checkpoint(self, name: str) -> Optional[Dict]:
+        """
+        Get the saved progress of a periodic or long running process
+        :param name: The name of the process
+        :return: The checkpoint saved by the process, or None if it hasn't saved one
+        """
+        checkpoints_col = self.pymongoc[self.mongo_database][self._col_checkpoints]
+        checkpoint = checkpoints_col.find_one({"_id": name})
+        if checkpoint is not None:
+            del checkpoint["_id"]
+        return checkpoint
+
+    def save_checkpoint(self, name: str, checkpoint: Dict):
+        """
+        Save the progress of a periodic or long running process, replacing any previous
+        checkpoint
+        :param name: The name of the process
+        :param checkpoint: The progress of the process
+        """
+        checkpoints_col = self.pymongoc[self.mongo_database][self._col_checkpoints]
+        checkpoints_col.replace_one(
+            {"_id": name}, dict(checkpoint, updated=time.time()), upsert=True
+        )
 
     def update_job_status(self, job_id, status, msg=None, error_message=None):
         """
@@ -466,27 +1119,151 @@ class MongoUtil:
         inserted = Job.objects.insert(doc_or_docs=jobs_to_insert, load_bulk=False)
         return inserted
 
-    def _push_job_logs(self, log_lines: JobLog, job_id: str, record_count: int):
-        """append a list of job logs, and update the record count"""
-
-        update_filter = {"_id": ObjectId(job_id)}
-        push_op = {"lines": {"$each": log_lines}}
+    def append_job_logs(self, job_id: str, log_lines: List[Dict]) -> int:
+        """
+        Add lines to a job's log, creating the log if it doesn't exist. Appends to the same job
+        made at about the same time by this process are written in one update.
 
-        set_op = {
-            "original_line_count": record_count,
-            "stored_line_count": record_count,
-            "updated": time.time(),
-        }
-        update = {"$push": push_op, "$set": set_op}
-        job_col = self.pymongoc[self.mongo_database][self._col_logs]
-        try:
-            job_col.update_one(update_filter, update, upsert=False)
-        except Exception as e:
-            error_msg = "Cannot update doc\n ERROR -- {}:\n{}".format(
-                e, "".join(traceback.format_exception(None, e, e.__traceback__))
+        :param job_id: the job ID.
+        :param log_lines: the lines in their stored format. Their line positions are set as
+            they're written.
+        :return: the stored line count after the lines were added.
+        """
+        return self.log_buffer.append(job_id, log_lines)
+
+    def _commit_job_logs(self, job_id: str, batches: List[List[Dict]]) -> List[int]:
+        # Other processes may append to the same log, so the update only applies if the stored
+        # line count is still the one the line positions were numbered from, and otherwise
+        # the lines are renumbered and the update retried. The write is journaled before the
+        # callers are told it succeeded.
+        job_log_col = self.pymongoc[self.mongo_database][self._col_logs].with_options(
+            write_concern=WriteConcern(j=True)
+        )
+        log_id = ObjectId(job_id)
+        lines = [line for batch in batches for line in batch]
+        chunk = None
+        if self._log_encoding == log_encoding.COMPACT and lines:
+            chunk = log_encoding.encode_chunk(lines, 0)
+        while True:
+            job_log = job_log_col.find_one(
+                {"_id": log_id}, {"stored_line_count": 1, "archived": 1}
             )
-            raise ValueError(error_msg)
+            if job_log and job_log.get("archived"):
+                raise ValueError(f"The log for job {job_id} is archived")
+            stored = job_log.get("stored_line_count") if job_log else None
+            start = stored or 0
+            for linepos, line in enumerate(lines, start):
+                line["linepos"] = linepos
+            record_count = start + len(lines)
+            if chunk:
+                chunk["start"] = start
+                new_lines = {"chunks": [chunk]}
+            else:
+                new_lines = {"lines": lines}
+            if job_log is None:
+                try:
+                    job_log_col.insert_one(
+                        {
+                            "_id": log_id,
+                            "updated": time.time(),
+                            "original_line_count": record_count,
+                            "stored_line_count": record_count,
+                            **new_lines,
+                        }
+                    )
+                    break
+                except DuplicateKeyError:
+                    continue
+            result = job_log_col.update_one(
+                {"_id": log_id, "stored_line_count": stored, "archived": None},
+                {
+                    "$push": {k: {"$each": v} for k, v in new_lines.items()},
+                    "$set": {
+                        "original_line_count": record_count,
+                        "stored_line_count": record_count,
+                        "updated": time.time(),
+                    },
+                },
+            )
+            if result.matched_count:
+                break
+        counts = []
+        for batch in batches:
+            start += len(batch)
+            counts.append(start)
+        return counts
+
+    def create_log_archive_index(self):
+        """
+        Create the index used to find logs to archive, if it doesn't exist.
+        """
+        job_log_col = self.pymongoc[self.mongo_database][self._col_logs]
+        job_log_col.create_index([("archived", 1), ("_id", 1)])
+
+    def get_job_logs_to_archive(
+        self, finished_before: float, limit: int, after_id: Optional[str] = None
+    ) -> List[str]:
+        """
+        Get the ids of jobs that finished before the given time and whose logs aren't archived.
+        :param finished_before: Only return jobs finished before this epoch timestamp
+        :param limit: The maximum number of job ids to return
+        :param after_id: Only return jobs after this one, the last job of the previous page.
+            Logs that failed to archive are returned again by later queries, so paging is
+            needed to get past them.
+        :return: A list of job ids, oldest created first
+        """
+        job_log_col = self.pymongoc[self.mongo_database][self._col_logs]
+        created_before = ObjectId.from_datetime(
+            datetime.fromtimestamp(finished_before, timezone.utc)
+        )
+        id_filter = {"$lt": created_before}
+        if after_id:
+            id_filter["$gt"] = ObjectId(after_id)
+        cursor = job_log_col.aggregate(
+            [
+                # a job is created before it finishes, and the log ID is the job ID
+                {"$match": {"archived": None, "_id": id_filter}},
+                {"$sort": {"_id": 1}},
+                {"$project": {"_id": 1}},
+                {
+                    "$lookup": {
+                        "from": self._col_jobs,
+                        "localField": "_id",
+                        "foreignField": "_id",
+                        "as": "job",
+                    }
+                },
+                {"$match": {"job.finished": {"$lt": finished_before}}},
+                {"$limit": limit},
+                {"$project": {"_id": 1}},
+            ]
+        )
+        return [str(rec["_id"]) for rec in cursor]
 
-        slc = job_col.find_one({"_id": ObjectId(job_id)}).get("stored_line_count")
+    def set_job_log_archived(
+        self, job_id: str, stored_line_count: Optional[int], archived: Dict
+    ) -> bool:
+        """
+        Replace a job log's lines with a record of where the log is archived.
 
-        return slc
+        :param job_id: the job ID.
+        :param stored_line_count: the stored line count of the archived log. The log isn't
+            changed if lines were added since it was read.
+        :param archived: where the log is archived, see execution_engine2.db.log_archive.
+        :return: True if the log was updated.
+        """
+        job_log_col = self.pymongoc[self.mongo_database][self._col_logs].with_options(
+            write_concern=WriteConcern(j=True)
+        )
+        result = job_log_col.update_one(
+            {
+                "_id": ObjectId(job_id),
+                "stored_line_count": stored_line_count,
+                "archived": None,
+            },
+            {
+                "$set": {"archived": archived, "updated": time.time()},
+                "$unset": {"lines": "", "chunks": ""},
+            },
+        )
+        return bool(result.modified_count)
@@ -0,0 +1,234 @@
+"""
+Archival storage for the logs of long finished jobs.
+
+Logs are only read occasionally once their job has finished, but stay in ee2_logs, and so in
+the database's working set, forever. The ArchiveJobLogs cron job moves the logs of jobs that
+finished more than log-archive-after-days ago to a LogArchiveStore, and replaces the log in
+ee2_logs with a stub that records where the archive is:
+
+    archived    store   the name of the store
+                key     the key of the archive in the store
+                count   the number of lines in the log
+                size    the size of the archive in bytes
+                time    when the log was archived
+
+Reads of an archived log are served from the store, so view_job_logs works the same either
+way. An archive is a BSON document with the log's line counts and its lines in compact chunks
+(see execution_engine2.db.log_encoding) of up to ARCHIVE_CHUNK_LINES lines, so a window of
+lines can be read without decoding the whole log.
+
+The store is set with log-archive-store:
+
+    mongo                   GridFS files in the mongo-log-archive-collection bucket
+    file                    files in log-archive-directory
+    package.module:Class    a custom LogArchiveStore, created with the ee2 config
+"""
+
+import heapq
+import importlib
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, Optional, Tuple
+
+import bson
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+
+from execution_engine2.db import log_encoding
+from execution_engine2.exceptions import RecordNotFoundException
+
+# log-archive-store values
+MONGO = "mongo"
+FILE = "file"
+
+ARCHIVE_CHUNK_LINES = 10000
+_DEFAULT_BUCKET = "ee2_log_archive"
+_KEY_REGEX = re.compile(r"[\w.-]+")
+
+
+class LogArchiveStore(ABC):
+    """
+    Stores archived job logs. Implementations must be thread safe.
+    """
+
+    # Saved in the log stub, so archives are only read from the store that wrote them
+    name: str = None
+
+    @abstractmethod
+    def put(self, key: str, data: bytes):
+        """
+        Save an archive, replacing any archive with the same key.
+
+        :param key: the key of the archive, a job ID.
+        :param data: the archive.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """
+        Get an archive.
+
+        :param key: the key of the archive.
+        :return: the archive.
+        :raises RecordNotFoundException: if there's no archive with the key.
+        """
+        raise NotImplementedError()
+
+
+class GridFSLogArchiveStore(LogArchiveStore):
+    """
+    Stores archives as GridFS files in the ee2 database.
+    """
+
+    name = MONGO
+
+    def __init__(self, database, bucket_name: str = _DEFAULT_BUCKET):
+        """
+        :param database: the pymongo database.
+        :param bucket_name: the name of the GridFS bucket.
+        """
+        self._bucket = GridFSBucket(database, bucket_name=bucket_name)
+
+    def put(self, key: str, data: bytes):
+        try:
+            self._bucket.delete(key)
+        except NoFile:
+            pass
+        self._bucket.upload_from_stream_with_id(key, key, data)
+
+    def get(self, key: str) -> bytes:
+        try:
+            return self._bucket.open_download_stream(key).read()
+        except NoFile:
+            raise RecordNotFoundException(f"Cannot find log archive {key}")
+
+
+class FileLogArchiveStore(LogArchiveStore):
+    """
+    Stores archives as files in a local directory, e.g. a mounted volume.
+    """
+
+    name = FILE
+
+    def __init__(self, directory: str):
+        """
+        :param directory: the directory. It's created if it doesn't exist.
+        """
+        if not directory:
+            raise ValueError("directory is required")
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        if not _KEY_REGEX.fullmatch(key):
+            raise ValueError(f"Illegal log archive key {key}")
+        # job IDs start with their creation time, so jobs created around the same time
+        # share a subdirectory
+        return os.path.join(self.directory, key[:4], key + ".bson")
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first so readers never see a partial archive
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise RecordNotFoundException(f"Cannot find log archive {key}")
+
+
+def get_log_archive_store(config: Dict, database) -> Optional[LogArchiveStore]:
+    """
+    Create the log archive store set in the ee2 config.
+
+    :param config: the ee2 config.
+    :param database: the pymongo database, for the mongo store.
+    :return: the store, or None if log-archive-store isn't set.
+    """
+    store = config.get("log-archive-store")
+    if not store:
+        return None
+    if store == MONGO:
+        return GridFSLogArchiveStore(
+            database, config.get("mongo-log-archive-collection") or _DEFAULT_BUCKET
+        )
+    if store == FILE:
+        directory = config.get("log-archive-directory")
+        if not directory:
+            raise ValueError("log-archive-directory is required for the file store")
+        return FileLogArchiveStore(directory)
+    if ":" in store:
+        module, class_name = store.split(":", 1)
+        return getattr(importlib.import_module(module), class_name)(config)
+    raise ValueError(f"Unsupported log-archive-store {store}")
+
+
+def _iter_log_lines(job_log: Dict) -> Iterator[Dict]:
+    chunk_lines = (
+        line
+        for chunk in job_log.get("chunks") or []
+        for line in log_encoding.iter_chunk_lines(chunk)
+    )
+    return heapq.merge(
+        job_log.get("lines") or [], chunk_lines, key=lambda line: line["linepos"]
+    )
+
+
+def encode_archive(job_log: Dict, codec: Optional[str] = None) -> Tuple[bytes, int]:
+    """
+    Encode a job log as an archive.
+
+    :param job_log: the log, as stored in ee2_logs, in either encoding.
+    :param codec: the compression codec, by default the best one available.
+    :return: the archive and the number of lines in it.
+    """
+    chunks = []
+    batch = []
+    for line in _iter_log_lines(job_log):
+        # the positions in a chunk must be consecutive
+        if batch and (
+            len(batch) == ARCHIVE_CHUNK_LINES
+            or line["linepos"] != batch[-1]["linepos"] + 1
+        ):
+            chunks.append(log_encoding.encode_chunk(batch, batch[0]["linepos"], codec))
+            batch = []
+        batch.append(line)
+    if batch:
+        chunks.append(log_encoding.encode_chunk(batch, batch[0]["linepos"], codec))
+    count = sum(chunk["n"] for chunk in chunks)
+    data = bson.encode(
+        {
+            "original_line_count": job_log.get("original_line_count"),
+            "stored_line_count": job_log.get("stored_line_count"),
+            "count": count,
+            "chunks": chunks,
+        }
+    )
+    return data, count
+
+
+def iter_archive_lines(data: bytes, skip_lines: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Decode the lines in an archive, in the format they're stored in ee2_logs.
+
+    :param data: the archive.
+    :param skip_lines: skip lines with a position up to and including this value.
+    """
+    last_skipped = -1 if skip_lines is None else skip_lines
+    for chunk in bson.decode(data)["chunks"]:
+        if chunk["start"] + chunk["n"] > last_skipped + 1:
+            yield from log_encoding.iter_chunk_lines(chunk, skip_lines)
@@ -0,0 +1,79 @@
+"""
+Groups job log appends into fewer database writes.
+
+JobRunners add their logs in many small batches. The first append to a job waits a few
+milliseconds for other appends to the same job in this process, then writes all their lines in
+one update. Every caller gets the stored line count after its own lines, and only returns once
+the write that includes them has completed.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List
+
+# Writes batches of log lines to a job's log, in order, and returns the stored line count after
+# each batch
+CommitFunction = Callable[[str, List[List[Dict]]], List[int]]
+
+
+class _Group:
+    __slots__ = ["batches", "done", "counts", "error"]
+
+    def __init__(self):
+        self.batches = []
+        self.done = threading.Event()
+        self.counts = None
+        self.error = None
+
+
+class LogAppendBuffer:
+    """
+    Groups concurrent log appends for the same job into one write.
+    """
+
+    def __init__(self, commit: CommitFunction, window_seconds: float):
+        """
+        :param commit: the function that writes the log lines.
+        :param window_seconds: how long the first append to a job waits for others before
+            writing. 0 writes every append separately.
+        """
+        if window_seconds < 0:
+            raise ValueError("window_seconds must be at least 0")
+        self._commit = commit
+        self._window = window_seconds
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def append(self, job_id: str, log_lines: List[Dict]) -> int:
+        """
+        Add lines to a job's log.
+
+        :param job_id: the job ID.
+        :param log_lines: the lines, in the format they're stored in.
+        :return: the stored line count after the lines were added.
+        """
+        if not self._window:
+            return self._commit(job_id, [log_lines])[0]
+        with self._lock:
+            group = self._pending.get(job_id)
+            leader = group is None
+            if leader:
+                group = self._pending[job_id] = _Group()
+            index = len(group.batches)
+            group.batches.append(log_lines)
+        if leader:
+            time.sleep(self._window)
+            with self._lock:
+                # appends from here on start a new group
+                del self._pending[job_id]
+            try:
+                group.counts = self._commit(job_id, group.batches)
+            except Exception as e:
+                group.error = e
+            finally:
+                group.done.set()
+        else:
+            group.done.wait()
+        if group.error is not None:
+            raise group.error
+        return group.counts[index]
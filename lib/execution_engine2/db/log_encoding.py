@@ -0,0 +1,147 @@
+"""
+Compact storage for job log lines.
+
+Log lines are stored in ee2_logs as one subdocument per line, so for short lines the field
+names take up much of the space, and the repetitive output of most tools isn't compressed.
+In the compact encoding each group of appended lines is stored as a chunk, with the line
+positions implied by the first position and the columns packed and compressed together:
+
+    start   the position of the first line
+    n       the number of lines
+    codec   zlib or zstd
+    errors  the offsets in the chunk of the error lines, which are rare
+    data    the compressed line lengths in bytes, as little endian uint32s, then the
+            timestamps in milliseconds as little endian int64 deltas from the previous
+            line's, then the UTF-8 line text
+
+Timestamps are kept to the millisecond, the precision get_job_logs returns. zstd is used if
+the zstandard package is installed, zlib otherwise.
+"""
+
+import sys
+import zlib
+from array import array
+from typing import Dict, Iterator, List, Optional
+
+from bson import Binary
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+# Log encodings
+RAW = "raw"
+COMPACT = "compact"
+ENCODINGS = (RAW, COMPACT)
+
+# Chunk compression codecs
+ZLIB = "zlib"
+ZSTD = "zstd"
+
+_ZLIB_LEVEL = 6
+_ZSTD_LEVEL = 3
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def default_codec() -> str:
+    """
+    The best compression codec available, zstd if zstandard is installed or zlib.
+    """
+    return ZSTD if zstandard is not None else ZLIB
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == ZLIB:
+        return zlib.compress(data, _ZLIB_LEVEL)
+    if codec == ZSTD:
+        if zstandard is None:
+            raise ValueError("zstandard is not installed")
+        return zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Unsupported log chunk codec {codec}")
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == ZLIB:
+        return zlib.decompress(data)
+    if codec == ZSTD:
+        if zstandard is None:
+            raise ValueError("zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unsupported log chunk codec {codec}")
+
+
+def _to_bytes(values: array) -> bytes:
+    if not _LITTLE_ENDIAN:  # pragma: no cover - depends on the platform
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode: str, data) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if not _LITTLE_ENDIAN:  # pragma: no cover - depends on the platform
+        values.byteswap()
+    return values
+
+
+def encode_chunk(lines: List[Dict], start: int, codec: Optional[str] = None) -> Dict:
+    """
+    Encode log lines as a chunk.
+
+    :param lines: the lines, in the format they're stored in ee2_logs, in order.
+    :param start: the position of the first line.
+    :param codec: the compression codec, by default the best one available.
+    :return: the chunk, ready to be stored.
+    """
+    codec = codec or default_codec()
+    text = [line["line"].encode("utf-8") for line in lines]
+    lengths = array("I", [len(t) for t in text])
+    deltas = array("q")
+    previous = 0
+    for line in lines:
+        ts = int(line.get("ts", 0) * 1000)
+        deltas.append(ts - previous)
+        previous = ts
+    data = _to_bytes(lengths) + _to_bytes(deltas) + b"".join(text)
+    return {
+        "start": start,
+        "n": len(lines),
+        "codec": codec,
+        "errors": [i for i, line in enumerate(lines) if line.get("error")],
+        "data": Binary(_compress(data, codec)),
+    }
+
+
+def iter_chunk_lines(chunk: Dict, skip_lines: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Decode the lines in a chunk, in the format they're stored in ee2_logs.
+
+    :param chunk: the chunk.
+    :param skip_lines: skip lines with a position up to and including this value.
+    """
+    n = chunk["n"]
+    data = memoryview(_decompress(chunk["data"], chunk["codec"]))
+    lengths_end, deltas_end = 4 * n, 12 * n
+    lengths = _from_bytes("I", data[:lengths_end])
+    deltas = _from_bytes("q", data[lengths_end:deltas_end])
+    text = data[deltas_end:]
+    errors = set(chunk["errors"])
+    start = chunk["start"]
+    first = 0
+    if skip_lines is not None:
+        first = min(max(skip_lines - start + 1, 0), n)
+    offset = sum(lengths[:first])
+    ts = sum(deltas[:first])
+    for i in range(first, n):
+        end = offset + lengths[i]
+        ts += deltas[i]
+        yield {
+            "line": str(text[offset:end], "utf-8"),
+            "linepos": start + i,
+            "error": i in errors,
+            # the middle of the millisecond, so converting back to milliseconds is exact
+            "ts": (ts + 0.5) / 1000,
+        }
+        offset = end
@@ -0,0 +1,122 @@
+"""
+A lightweight, read only representation of a job record for the endpoints that only read jobs.
+
+Loading a job through the Job Document converts and validates every field and builds the
+embedded documents, only for the read endpoints to turn it straight back into a dict. A JobView
+is built directly from the pymongo document, with the same defaults the Job Document fills in,
+and with the timestamps in milliseconds and the retry count derived once.
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from bson import ObjectId
+from mongoengine import EmbeddedDocumentField
+
+from execution_engine2.db.models.models import Job
+
+# The sampled resource usage of a job. Only returned when requested, as the time series
+# can be large, so the read endpoints leave them out of the query
+RESOURCE_USAGE_FIELDS = ["resource_usage", "resource_usage_peaks"]
+# Fields left out of date range job states
+_HIDDEN_RANGE_FIELDS = ["retry_saved_toggle"]
+# Timestamps converted from seconds to milliseconds if set
+_OPTIONAL_TIMES = ["estimating", "queued", "running", "finished"]
+
+
+def _schema(document_class) -> List[Tuple[str, Any, Optional[list]]]:
+    # the database name, default and embedded document schema of each field, in order
+    ret = []
+    for name in document_class._fields_ordered:
+        field = document_class._fields[name]
+        embedded = None
+        if isinstance(field, EmbeddedDocumentField):
+            embedded = _schema(field.document_type)
+        ret.append((field.db_field, field.default, embedded))
+    return ret
+
+
+_JOB_SCHEMA = _schema(Job)
+
+
+def _normalize(doc: Dict[str, Any], schema) -> Dict[str, Any]:
+    # The same as loading the document into a mongoengine Document and calling to_mongo:
+    # undeclared fields are dropped, defaults filled in and None values left out
+    ret = {}
+    for name, default, embedded in schema:
+        value = doc.get(name)
+        if value is None:
+            if default is None:
+                continue
+            value = default() if callable(default) else default
+            if value is None:
+                continue
+        if embedded is not None and isinstance(value, dict):
+            value = _normalize(value, embedded)
+        ret[name] = value
+    return ret
+
+
+class JobView(NamedTuple):
+    """
+    A read only job record.
+    """
+
+    id: ObjectId
+    user: str
+    authstrat: str
+    wsid: Optional[int]
+    batch_id: Optional[str]
+    retry_count: int
+    # the job record fields, except for the id, as the Job Document would store them
+    record: Dict[str, Any]
+    # the creation, update and any other set timestamps, in milliseconds
+    times: Dict[str, int]
+
+    @classmethod
+    def from_mongo(cls, doc: Dict[str, Any]) -> "JobView":
+        """
+        Create a view from a job document as returned by pymongo.
+        """
+        record = _normalize(doc, _JOB_SCHEMA)
+        job_id = record.pop("_id")
+        times = {
+            "created": int(job_id.generation_time.timestamp() * 1000),
+            "updated": int(record["updated"] * 1000),
+        }
+        for key in _OPTIONAL_TIMES:
+            if record.get(key):
+                times[key] = int(record[key] * 1000)
+        return cls(
+            id=job_id,
+            user=record.get("user"),
+            authstrat=record.get("authstrat"),
+            wsid=record.get("wsid"),
+            batch_id=record.get("batch_id"),
+            retry_count=len(record.get("retry_ids", [])),
+            record=record,
+            times=times,
+        )
+
+    def to_job_state(self) -> Dict[str, Any]:
+        """
+        The job state as returned by check_job and check_jobs.
+        """
+        state = dict(self.record)
+        state["retry_count"] = self.retry_count
+        state["job_id"] = str(self.id)
+        state["batch_id"] = self.batch_id
+        state.update(self.times)
+        return state
+
+    def to_range_state(self) -> Dict[str, Any]:
+        """
+        The job state as returned by check_jobs_date_range_for_user and _for_all.
+        """
+        job_id = str(self.id)
+        state = {"_id": job_id}
+        state.update(self.record)
+        for key in _HIDDEN_RANGE_FIELDS:
+            state.pop(key, None)
+        state["job_id"] = job_id
+        state.update(self.times)
+        return state
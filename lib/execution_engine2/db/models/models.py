@@ -92,6 +92,10 @@ class JobLog(Document):
     original_line_count = IntField()
     stored_line_count = IntField()
     lines = ListField()
+    # lines stored in the compact encoding, see execution_engine2.db.log_encoding
+    chunks = ListField()
+    # where the log is archived, see execution_engine2.db.log_archive
+    archived = DynamicField()
 
     meta = {"collection": "ee2_logs"}
 
@@ -121,6 +125,7 @@ class CondorResourceUsage(EmbeddedDocument):
 
     cpu = ListField()
     memory = ListField()
+    disk = ListField()
     timestamp = ListField()
 
     # Maybe remove this if we always want to make timestamp required
@@ -262,8 +267,11 @@ class JobInputAttributes(Document):
     job_input_filesizes = EmbeddedDocumentListField(JobInputFile)
 
 
-class JobUsageAttributes(Document):
-    # TODO USE THIS
+class JobUsageAttributes(EmbeddedDocument):
+    """
+    Peak resource usage of a job, as sampled from condor while the job is running
+    """
+
     job_peak_cpu_usage = FloatField(default=0)
     job_peak_memory_usage_mb = IntField(default=0)
     job_peak_disk_usage_mb = IntField(default=0)
@@ -322,6 +330,9 @@ class Job(Document):
     job_input = EmbeddedDocumentField(JobInput, required=True)
     job_output = DynamicField()
     condor_job_ads = DynamicField()
+    # Periodically sampled usage of a running job, capped to the most recent samples
+    resource_usage = EmbeddedDocumentField(CondorResourceUsage)
+    resource_usage_peaks = EmbeddedDocumentField(JobUsageAttributes)
     # this is the ID of the coordinating job created as part of run_job_batch. Only child jobs
     # in a "true" batch job maintained by EE2 should have this field. Coordinating jobs will
     # be updated with the child ID in child_jobs, unlike "fake" batch jobs that are created
@@ -336,7 +347,17 @@ class Job(Document):
         default=False
     )  # Marked true when all retry steps have completed
 
-    meta = {"collection": "ee2_jobs"}
+    # scheduler_id is indexed to look up held jobs by their condor cluster ids, and
+    # status + queued to find jobs stuck in the queue without scanning the collection
+    meta = {
+        "collection": "ee2_jobs",
+        "indexes": [
+            "scheduler_id",
+            ("status", "queued"),
+            # finished jobs without resource usage are found and paged in this order
+            ("finished", "_id"),
+        ],
+    }
 
     def save(self, *args, **kwargs):
         self.updated = time.time()
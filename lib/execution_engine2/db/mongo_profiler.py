@@ -0,0 +1,330 @@
+"""
+Profiles the commands ee2 sends to MongoDB.
+
+MongoProfiler is a pymongo CommandListener. For each kind of command, keyed by the ee2 RPC
+method that caused it, the command name and the collection, it records the number of commands,
+failures, the latency, the number of documents returned and the size of the replies. Encoding
+a reply to find its size costs about as much as the driver decoding it, so only a sample of
+the replies is measured and the total size is estimated from the sample.
+
+Commands slower than a threshold are logged with the shape of their filter, i.e. the field
+names and operators with the values replaced by their types, so no user data is logged. For
+queries that can be explained, the query plan of a sample of the slow commands is looked up in
+the background and logged as well.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging import Logger
+from typing import Any, Dict, Optional, Tuple
+
+import bson
+from pymongo import monitoring
+
+from execution_engine2.utils import tracing
+from execution_engine2.utils.metrics import MONGO, record_dependency
+from execution_engine2.utils.rpc_context import current_rpc_method
+
+# Commands that can be explained, and where their filter is
+_FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "delete": "deletes",
+    "update": "updates",
+    "aggregate": "pipeline",
+}
+# Fields the driver adds to commands, which explain doesn't accept
+_DRIVER_FIELDS = {"lsid", "txnNumber", "$db", "$clusterTime", "$readPreference"}
+# Commands that are never recorded, including the explains the profiler runs itself
+_IGNORED_COMMANDS = {
+    "explain",
+    "hello",
+    "isMaster",
+    "ismaster",
+    "ping",
+    "saslStart",
+    "saslContinue",
+    "endSessions",
+    "killCursors",
+}
+# The maximum number of started commands remembered while waiting for them to finish
+_MAX_IN_FLIGHT = 10000
+
+
+class _CommandStats:
+    __slots__ = ["count", "failures", "total_ms", "max_ms", "docs", "sized", "bytes"]
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.docs = 0
+        # the number and total size of the replies that were measured
+        self.sized = 0
+        self.bytes = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        replies = self.count - self.failures
+        return {
+            "count": self.count,
+            "failures": self.failures,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "max_ms": round(self.max_ms, 3),
+            "docs_returned": self.docs,
+            "reply_bytes": round(self.bytes * replies / self.sized)
+            if self.sized
+            else 0,
+        }
+
+
+def filter_shape(value: Any) -> Any:
+    """
+    Replace the values in a query filter with their type names, keeping the field names and
+    operators. Lists are reduced to the shape of their first element.
+    """
+    if isinstance(value, dict):
+        return {k: filter_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [filter_shape(value[0])] if value else []
+    return type(value).__name__
+
+
+def _command_filter(command_name: str, command: Dict) -> Any:
+    field = _FILTER_FIELDS.get(command_name)
+    value = command.get(field) if field else None
+    if command_name in ("update", "delete") and value:
+        # the filter of the first statement in the batch
+        value = value[0].get("q")
+    elif command_name == "aggregate" and value:
+        value = next((stage["$match"] for stage in value if "$match" in stage), None)
+    return value
+
+
+def _docs_returned(command_name: str, reply: Dict) -> int:
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if command_name in ("count", "findAndModify", "distinct"):
+        return 1
+    # writes report the number of documents affected
+    return reply.get("n", 0)
+
+
+def _plan_summary(plan: Dict) -> str:
+    """
+    Summarize a query plan as its stages and indexes, e.g. FETCH <- IXSCAN(status_1).
+    """
+    stage = plan.get("stage", "?")
+    if plan.get("indexName"):
+        stage += f"({plan['indexName']})"
+    children = plan.get("inputStages") or (
+        [plan["inputStage"]] if "inputStage" in plan else []
+    )
+    if not children:
+        return stage
+    inner = ", ".join(_plan_summary(c) for c in children)
+    return f"{stage} <- {inner}" if len(children) == 1 else f"{stage} <- [{inner}]"
+
+
+class MongoProfiler(monitoring.CommandListener):
+    """
+    Records statistics for, and logs slow, MongoDB commands. Thread safe.
+    """
+
+    def __init__(
+        self,
+        logger: Logger,
+        slow_ms: float = 200,
+        explain_interval_seconds: float = 600,
+        reply_sample_interval: int = 100,
+        clock=time.monotonic,
+    ):
+        """
+        :param logger: the logger for slow commands.
+        :param slow_ms: commands that take at least this long are logged.
+        :param explain_interval_seconds: explain at most one slow command with a particular
+            filter shape per interval. 0 to never explain commands.
+        :param reply_sample_interval: measure the size of the first and then every nth reply
+            for each kind of command. The replies of slow commands are always measured.
+        :param clock: a monotonic clock, in seconds.
+        """
+        if reply_sample_interval < 1:
+            raise ValueError("reply_sample_interval must be at least 1")
+        self._logger = logger
+        self.slow_ms = slow_ms
+        self.explain_interval_seconds = explain_interval_seconds
+        self.reply_sample_interval = reply_sample_interval
+        self._clock = clock
+        # Set once the client the profiler listens to exists, to run explains with
+        self.client = None
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str, str], _CommandStats] = {}
+        self._in_flight: Dict[Tuple, Tuple[Optional[str], Dict, str]] = {}
+        self._explained: Dict[str, float] = {}
+        self._explainer = None
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if event.command_name in _IGNORED_COMMANDS:
+            return
+        key = (event.connection_id, event.request_id)
+        with self._lock:
+            if len(self._in_flight) >= _MAX_IN_FLIGHT:
+                # some commands never finished, e.g. the connection was closed
+                self._in_flight.clear()
+            self._in_flight[key] = (
+                current_rpc_method(),
+                event.command,
+                event.database_name,
+            )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event, event.reply)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finished(event, None)
+
+    def _finished(self, event, reply: Optional[Dict]):
+        with self._lock:
+            started = self._in_flight.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        method, command, database = started
+        command_name = event.command_name
+        collection = command.get(command_name)
+        if not isinstance(collection, str):
+            collection = None
+        duration_ms = event.duration_micros / 1000
+        record_dependency(MONGO, duration_ms / 1000)
+        tracing.record_span(
+            f"{MONGO}.{command_name}", duration_ms / 1000, collection=collection
+        )
+        docs = _docs_returned(command_name, reply) if reply is not None else 0
+        key = (method or "none", command_name, collection or "none")
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _CommandStats()
+            stats.count += 1
+            stats.failures += reply is None
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            stats.docs += docs
+            replies = stats.count - stats.failures
+        sample = reply is not None and (replies - 1) % self.reply_sample_interval == 0
+        slow = duration_ms >= self.slow_ms
+        nbytes = 0
+        if reply is not None and (sample or slow):
+            nbytes = len(bson.encode(reply))
+        if sample:
+            with self._lock:
+                stats.sized += 1
+                stats.bytes += nbytes
+        if slow:
+            self._slow(
+                method,
+                command_name,
+                collection,
+                database,
+                command,
+                duration_ms,
+                docs,
+                nbytes,
+                reply is None,
+            )
+
+    def _slow(
+        self,
+        method: Optional[str],
+        command_name: str,
+        collection: Optional[str],
+        database: str,
+        command: Dict,
+        duration_ms: float,
+        docs: int,
+        nbytes: int,
+        failed: bool,
+    ):
+        shape = str(filter_shape(_command_filter(command_name, command)))
+        self._logger.warning(
+            f"Slow mongo {command_name} on {collection} took {duration_ms:.1f}ms "
+            + f"(rpc method {method}, {docs} docs, {nbytes} bytes"
+            + (", failed" if failed else "")
+            + f"), filter shape {shape}"
+        )
+        if self._should_explain(command_name, collection, shape):
+            explain_command = {
+                k: v for k, v in command.items() if k not in _DRIVER_FIELDS
+            }
+            self._get_explainer().submit(
+                self._explain,
+                command_name,
+                collection,
+                database,
+                explain_command,
+                shape,
+            )
+
+    def _should_explain(self, command_name: str, collection: str, shape: str) -> bool:
+        if (
+            not self.explain_interval_seconds
+            or self.client is None
+            or command_name not in _FILTER_FIELDS
+        ):
+            return False
+        key = f"{collection}.{command_name} {shape}"
+        now = self._clock()
+        with self._lock:
+            last = self._explained.get(key)
+            if last is not None and now - last < self.explain_interval_seconds:
+                return False
+            self._explained[key] = now
+        return True
+
+    def _get_explainer(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._explainer is None:
+                # one thread, so explaining never competes much with real work
+                self._explainer = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="mongo-explain"
+                )
+            return self._explainer
+
+    def _explain(
+        self,
+        command_name: str,
+        collection: str,
+        database: str,
+        command: Dict,
+        shape: str,
+    ):
+        try:
+            result = self.client[database].command(
+                {"explain": command, "verbosity": "queryPlanner"}
+            )
+            planner = result.get("queryPlanner", {})
+            plan = _plan_summary(planner.get("winningPlan", {}))
+        except Exception as e:
+            self._logger.warning(
+                f"Couldn't explain slow mongo {command_name} on {collection}: {e}"
+            )
+            return
+        self._logger.warning(
+            f"Query plan for slow mongo {command_name} on {collection} with filter shape "
+            + f"{shape}: {plan}"
+        )
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the statistics for each kind of command.
+
+        :return: a mapping of <rpc method>.<command>.<collection> to a dict with the keys
+            count, failures, mean_ms, max_ms, docs_returned and reply_bytes, which is estimated
+            from a sample of the replies. The rpc method is none for commands run outside of
+            an RPC call.
+        """
+        with self._lock:
+            return {".".join(key): s.to_dict() for key, s in self._stats.items()}
@@ -65,8 +65,9 @@ class execution_engine2:
         # move these into GFC? Since they're only generated once it doesn't seem necessary
         configpath = os.environ["KB_DEPLOYMENT_CONFIG"]
         override = os.environ.get("OVERRIDE_CLIENT_GROUP")
+        # the clients are created when first used, so the server starts quickly
         with open(configpath) as cf:
-            self.clients = get_client_set(config, cf, override)
+            self.clients = get_client_set(config, cf, override, lazy=True)
         # END_CONSTRUCTOR
         pass
 
@@ -150,7 +151,9 @@ class execution_engine2:
            Execution Engine status git_commit - the Git hash of the version
            of the module. version - the semantic version for the module.
            service - the name of the service. server_time - the current
-           server timestamp since epoch # TODO - add some or all of the
+           server timestamp since epoch schedd - the calls this server
+           process made to the HTCondor schedd by kind of call: connect,
+           submit, query, history or act. # TODO - add some or all of the
            following reboot_mode - if 1, then in the process of rebooting
            stopping_mode - if 1, then in the process of stopping
            running_tasks_total - number of total running jobs
@@ -158,7 +161,15 @@ class execution_engine2:
            jobs for that user tasks_in_queue - number of jobs in the queue
            that are not running) -> structure: parameter "git_commit" of
            String, parameter "version" of String, parameter "service" of
-           String, parameter "server_time" of Double
+           String, parameter "server_time" of Double, parameter "schedd" of
+           mapping from String to type "ScheddCallStats" (Calls made by this
+           server process to the HTCondor schedd of one kind, e.g. submit.
+           count - the number of calls. errors - the number of calls that
+           failed. p50_ms, p95_ms, p99_ms, max_ms - latency percentiles of
+           the recent calls, in milliseconds.) -> structure: parameter
+           "count" of Long, parameter "errors" of Long, parameter "p50_ms" of
+           Double, parameter "p95_ms" of Double, parameter "p99_ms" of
+           Double, parameter "max_ms" of Double
         """
         # ctx is the context object
         # return variables are: returnVal
@@ -168,6 +179,7 @@ class execution_engine2:
             "git_commit": self.GIT_COMMIT_HASH,
             "version": self.VERSION,
             "service": self.SERVICE_NAME,
+            "schedd": self.clients.scheduler.get_stats(),
         }
 
         # END status
@@ -811,7 +823,8 @@ class execution_engine2:
             job_id=params["job_id"],
             skip_lines=params.get("skip_lines", params.get("offset", None)),
             limit=params.get("limit", None),
-            as_admin=params.get('as_admin')
+            as_admin=params.get('as_admin'),
+            stream=ctx.get("stream_responses", False),
         )
         # END get_job_logs
 
@@ -889,10 +902,14 @@ class execution_engine2:
         :param params: instance of type "CheckJobParams" (exclude_fields:
            exclude certain fields to return. default None. exclude_fields
            strings can be one of fields defined in
-           execution_engine2.db.models.models.Job) -> structure: parameter
-           "job_id" of type "job_id" (A job id.), parameter "exclude_fields"
-           of list of String, parameter "as_admin" of type "boolean" (@range
-           [0,1])
+           execution_engine2.db.models.models.Job return_resource_usage:
+           check_job and check_job_batch only. whether to return the
+           resource_usage time series and resource_usage_peaks sampled while
+           the job was running. default false. The other endpoints never
+           return them.) -> structure: parameter "job_id" of type "job_id"
+           (A job id.), parameter "exclude_fields" of list of String,
+           parameter "as_admin" of type "boolean" (@range [0,1]), parameter
+           "return_resource_usage" of type "boolean" (@range [0,1])
         :returns: instance of type "JobState" (job_id - string - id of the
            job user - string - user who started the job wsid - int - optional
            id of the workspace where the job is bound authstrat - string -
@@ -1025,7 +1042,8 @@ class execution_engine2:
         )
         job_state = mr.check_job(
             params["job_id"], exclude_fields=params.get("exclude_fields", None),
-            as_admin=params.get('as_admin')
+            as_admin=params.get('as_admin'),
+            return_resource_usage=params.get('return_resource_usage', False)
         )
         # END check_job
 
@@ -1043,10 +1061,14 @@ class execution_engine2:
         :param params: instance of type "CheckJobParams" (exclude_fields:
            exclude certain fields to return. default None. exclude_fields
            strings can be one of fields defined in
-           execution_engine2.db.models.models.Job) -> structure: parameter
-           "job_id" of type "job_id" (A job id.), parameter "exclude_fields"
-           of list of String, parameter "as_admin" of type "boolean" (@range
-           [0,1])
+           execution_engine2.db.models.models.Job return_resource_usage:
+           check_job and check_job_batch only. whether to return the
+           resource_usage time series and resource_usage_peaks sampled while
+           the job was running. default false. The other endpoints never
+           return them.) -> structure: parameter "job_id" of type "job_id"
+           (A job id.), parameter "exclude_fields" of list of String,
+           parameter "as_admin" of type "boolean" (@range [0,1]), parameter
+           "return_resource_usage" of type "boolean" (@range [0,1])
         :returns: instance of type "CheckJobBatchResults" (batch_jobstate -
            state of the coordinating job for the batch child_jobstates -
            states of child jobs IDEA: ADD aggregate_states - count of all
@@ -1304,7 +1326,8 @@ class execution_engine2:
         )
         returnVal = mr.check_job_batch(
             batch_id=params["job_id"], exclude_fields=params.get("exclude_fields", None),
-            as_admin=params.get('as_admin')
+            as_admin=params.get('as_admin'),
+            return_resource_usage=params.get('return_resource_usage', False)
         )
         # END check_job_batch
 
@@ -1659,6 +1682,45 @@ class execution_engine2:
         # END cancel_job
         pass
 
+    def cancel_jobs(self, ctx, params):
+        """
+        Cancel many jobs at once (Admin function). Returns one result per job id, in order.
+        The children of canceled batch jobs are canceled as well.
+        :param params: instance of type "CancelJobsParams" (job_ids - the ids
+           of the jobs to cancel. terminated_code - the reason the jobs were
+           canceled. See CancelJobParams. Default terminated_by_user 0.
+           @optional terminated_code) -> structure: parameter "job_ids" of
+           list of type "job_id" (A job id.), parameter "terminated_code" of
+           Long
+        :returns: instance of list of type "CancelJobResult" (job_id - the id
+           of the job. status - the status of the job before the call, or
+           null if there is no such job. canceled - whether the job was
+           canceled by this call. False if the job had already finished.) ->
+           structure: parameter "job_id" of type "job_id" (A job id.),
+           parameter "status" of String, parameter "canceled" of type
+           "boolean" (@range [0,1])
+        """
+        # ctx is the context object
+        # return variables are: results
+        # BEGIN cancel_jobs
+        mr = SDKMethodRunner(
+            user_clients=self.gen_cfg.get_user_clients(ctx),
+            clients=self.clients,
+        )
+        results = mr.cancel_jobs(
+            job_ids=params.get("job_ids"),
+            terminated_code=params.get("terminated_code"),
+        )
+        # END cancel_jobs
+
+        # At some point might do deeper type checking...
+        if not isinstance(results, list):
+            raise ValueError('Method cancel_jobs ' +
+                             'return value results ' +
+                             'is not type list as required.')
+        # return the results
+        return [results]
+
     def check_job_canceled(self, ctx, params):
         """
         Check whether a job has been canceled. This method is lightweight compared to check_job.
@@ -1931,7 +1993,8 @@ class execution_engine2:
             user=params.get("user"),
             offset=params.get("offset"),
             ascending=params.get("ascending"),
-            as_admin=params.get('as_admin')
+            as_admin=params.get('as_admin'),
+            stream=ctx.get("stream_responses", False),
         )
         # END check_jobs_date_range_for_user
 
@@ -2148,6 +2211,7 @@ class execution_engine2:
             ascending=params.get("ascending"),
             as_admin=params.get('as_admin'),
             user="ALL",
+            stream=ctx.get("stream_responses", False),
         )
         # END check_jobs_date_range_for_all
 
@@ -2184,6 +2248,104 @@ class execution_engine2:
         # return the results
         return [returnVal]
 
+    def handle_held_jobs(self, ctx, cluster_ids):
+        """
+        Handle many held CONDOR jobs at once (Admin function). Returns one result per
+        cluster id, in order. You probably never want to run this, only the reaper should
+        run it.
+        :param cluster_ids: instance of list of String
+        :returns: instance of list of type "HeldJobResult" (cluster_id - the
+           condor cluster id of the held job. job_id - the id of the job with
+           the cluster id, or null if there is no such job. status - the
+           status of the job, or null if there is no such job. finished -
+           whether the job was marked as an error by this call. False if the
+           job had already finished.) -> structure: parameter "cluster_id" of
+           String, parameter "job_id" of type "job_id" (A job id.), parameter
+           "status" of String, parameter "finished" of type "boolean" (@range
+           [0,1])
+        """
+        # ctx is the context object
+        # return variables are: results
+        # BEGIN handle_held_jobs
+        mr = SDKMethodRunner(
+            user_clients=self.gen_cfg.get_user_clients(ctx),
+            clients=self.clients,
+        )
+        results = mr.handle_held_jobs(cluster_ids=cluster_ids)
+        # END handle_held_jobs
+
+        # At some point might do deeper type checking...
+        if not isinstance(results, list):
+            raise ValueError('Method handle_held_jobs ' +
+                             'return value results ' +
+                             'is not type list as required.')
+        # return the results
+        return [results]
+
+    def get_resource_usage_report(self, ctx, params):
+        """
+        Report the resources requested versus used by finished jobs, per method, and
+        suggest catalog client group settings (Admin function).
+        :param params: instance of type "ResourceUsageReportParams"
+           (start_time - Filter based on job creation time. See
+           CheckJobsDateRangeParams for the accepted formats. end_time -
+           Filter based on job creation time. methods - Only report on jobs
+           running these methods, in module.method format. Default all
+           methods. min_jobs - The minimum number of jobs with usage data for
+           a method and client group before client group settings are
+           suggested. Default 10.) -> structure: parameter "start_time" of
+           Double, parameter "end_time" of Double, parameter "methods" of
+           list of String, parameter "min_jobs" of Long
+        :returns: instance of type "ResourceUsageReport" (start_time - the
+           start of the creation time range in seconds since the epoch.
+           end_time - the end of the creation time range in seconds since the
+           epoch. methods - per method and client group usage, most wasted
+           cpu hours first.) -> structure: parameter "start_time" of Double,
+           parameter "end_time" of Double, parameter "methods" of list of
+           type "MethodResourceUsage" (method - the method, in module.method
+           format. client_group - the client group the jobs ran in. job_count
+           - the number of completed or errored jobs with condor job ads.
+           jobs_with_usage - the number of those jobs with recorded memory
+           usage. cpu - requested versus used cpus. memory_mb - requested
+           versus used memory in MB. disk_gb - requested versus used disk in
+           GB. waste - the over-allocation of resources.
+           suggested_client_groups - suggested catalog client group settings,
+           in the catalog's CSV format, sized from the 99th percentile of the
+           used resources plus headroom. null if there are too few jobs, or
+           the client group or usage is unknown.) -> structure: parameter
+           "method" of String, parameter "client_group" of String, parameter
+           "job_count" of Long, parameter "jobs_with_usage" of Long,
+           parameter "cpu" of type "ResourceUsage", parameter "memory_mb" of
+           type "ResourceUsage", parameter "disk_gb" of type "ResourceUsage",
+           parameter "waste" of type "ResourceWaste" (Resources that were
+           requested but not used, multiplied by the job run time and summed
+           over the jobs.) -> structure: parameter "cpu_hours" of Double,
+           parameter "memory_gb_hours" of Double, parameter "disk_gb_hours"
+           of Double, parameter "suggested_client_groups" of list of String
+        """
+        # ctx is the context object
+        # return variables are: report
+        # BEGIN get_resource_usage_report
+        mr = SDKMethodRunner(
+            user_clients=self.gen_cfg.get_user_clients(ctx),
+            clients=self.clients,
+        )
+        report = mr.get_resource_usage_report(
+            start_time=params.get("start_time"),
+            end_time=params.get("end_time"),
+            methods=params.get("methods"),
+            min_jobs=params.get("min_jobs"),
+        )
+        # END get_resource_usage_report
+
+        # At some point might do deeper type checking...
+        if not isinstance(report, dict):
+            raise ValueError('Method get_resource_usage_report ' +
+                             'return value report ' +
+                             'is not type dict as required.')
+        # return the results
+        return [report]
+
     def is_admin(self, ctx):
         """
         Check if current user has ee2 admin rights.
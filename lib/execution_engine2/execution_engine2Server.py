@@ -1,11 +1,16 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import contextvars
 import datetime
+import gc
 import json
 import os
 import random as _random
 import sys
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from getopt import getopt, GetoptError
 from multiprocessing import Process
 from os import environ
@@ -36,6 +41,19 @@ except ImportError:
 DEPLOY = "KB_DEPLOYMENT_CONFIG"
 SERVICE = "KB_SERVICE_NAME"
 AUTH = "auth-service-url"
+METRICS_PATH = "/metrics"
+PRELOAD = "PRELOAD"
+# Modules and clients loaded before forking workers in preload mode
+_PRELOAD_MODULES = ["htcondor", "confluent_kafka", "slack"]
+_PRELOAD_CLIENTS = [
+    "auth",
+    "auth_admin",
+    "catalog",
+    "catalog_no_auth",
+    "requirements_resolver",
+]
+# The method name JSON-RPC batch requests are recorded under in the metrics
+BATCH_METHOD = "batch"
 
 # Note that the error fields do not match the 2.0 JSONRPC spec
 
@@ -64,36 +82,34 @@ config = get_config()
 from execution_engine2.execution_engine2Impl import (
     execution_engine2,
 )  # noqa @IgnorePep8
+from execution_engine2.utils.metrics import (
+    AUTH as _AUTH_DEPENDENCY,
+    CONTENT_TYPE as _METRICS_CONTENT_TYPE,
+    Metrics,
+    timed_client,
+    track_dependencies,
+)  # noqa @IgnorePep8
+from execution_engine2.utils import tracing  # noqa @IgnorePep8
+from execution_engine2.utils.compression import ResponseCompressor  # noqa @IgnorePep8
+from execution_engine2.utils.json_codec import (
+    JSONObjectEncoder,
+    get_codec,
+)  # noqa @IgnorePep8
+from execution_engine2.utils.json_stream import (
+    has_stream,
+    iter_encode,
+)  # noqa @IgnorePep8
+from execution_engine2.utils.lazy_import import lazy_import, load  # noqa @IgnorePep8
+from execution_engine2.utils.rpc_context import rpc_method  # noqa @IgnorePep8
 
 impl_execution_engine2 = execution_engine2(config)
 
 
-class JSONObjectEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, set):
-            return list(obj)
-        if isinstance(obj, frozenset):
-            return list(obj)
-        if hasattr(obj, "toJSONable"):
-            return obj.toJSONable()
-        return json.JSONEncoder.default(self, obj)
+# Encodes and decodes request and response bodies
+_codec = get_codec(config.get("json-codec") if config else None)
 
 
 class JSONRPCServiceCustom(JSONRPCService):
-    def call(self, ctx, jsondata):
-        """
-        Calls jsonrpc service's method and returns its return value in a JSON
-        string or None if there is none.
-
-        Arguments:
-        jsondata -- remote method call in jsonrpc format
-        """
-        result = self.call_py(ctx, jsondata)
-        if result is not None:
-            return json.dumps(result, cls=JSONObjectEncoder)
-
-        return None
-
     def _call_method(self, ctx, request):
         """Calls given method with given params and returns it value."""
         method = self.method_data[request["method"]]["method"]
@@ -327,6 +343,76 @@ def getIPAddress(environ):
     return environ.get("REMOTE_ADDR")
 
 
+# Methods that only read state, so they can run concurrently with each other in a batch
+_CONCURRENT_METHODS = frozenset(
+    "execution_engine2." + m
+    for m in [
+        "ver",
+        "status",
+        "list_config",
+        "get_client_groups",
+        "is_admin",
+        "get_admin_permission",
+        "check_job",
+        "check_job_batch",
+        "check_jobs",
+        "check_job_canceled",
+        "check_workspace_jobs",
+        "check_jobs_date_range_for_user",
+        "check_jobs_date_range_for_all",
+        "get_job_status",
+        "get_job_params",
+        "get_job_logs",
+        "get_resource_usage_report",
+    ]
+)
+
+
+def _is_concurrent(req):
+    return isinstance(req, dict) and req.get("method") in _CONCURRENT_METHODS
+
+
+def _join_batch(responses):
+    """
+    Join the encoded responses of a batch into a JSON array, in chunks if any of the
+    responses are streamed.
+    """
+    if all(isinstance(r, bytes) for r in responses):
+        return b"[" + b",".join(responses) + b"]"
+    return _iter_join_batch(responses)
+
+
+def _iter_join_batch(responses):
+    yield b"["
+    for i, response in enumerate(responses):
+        if i:
+            yield b","
+        if isinstance(response, bytes):
+            yield response
+        else:
+            yield from response
+    yield b"]"
+
+
+def _run_stream(chunks, context, done):
+    """
+    Yield the chunks of a streamed response, producing each in the context of the request it
+    answers, then call done with the number of bytes written.
+    """
+    chunks = iter(chunks)
+    size = 0
+    try:
+        while True:
+            try:
+                chunk = context.run(next, chunks)
+            except StopIteration:
+                break
+            size += len(chunk)
+            yield chunk
+    finally:
+        done(size)
+
+
 class Application(object):
     # Wrap the wsgi handler in a class definition so that we can
     # do some initialization and avoid regenerating stuff over
@@ -504,6 +590,12 @@ class Application(object):
             types=[dict],
         )
         self.method_authentication["execution_engine2.cancel_job"] = "required"  # noqa
+        self.rpc_service.add(
+            impl_execution_engine2.cancel_jobs,
+            name="execution_engine2.cancel_jobs",
+            types=[dict],
+        )
+        self.method_authentication["execution_engine2.cancel_jobs"] = "required"  # noqa
         self.rpc_service.add(
             impl_execution_engine2.check_job_canceled,
             name="execution_engine2.check_job_canceled",
@@ -544,6 +636,22 @@ class Application(object):
         self.method_authentication[
             "execution_engine2.handle_held_job"
         ] = "required"  # noqa
+        self.rpc_service.add(
+            impl_execution_engine2.handle_held_jobs,
+            name="execution_engine2.handle_held_jobs",
+            types=[list],
+        )
+        self.method_authentication[
+            "execution_engine2.handle_held_jobs"
+        ] = "required"  # noqa
+        self.rpc_service.add(
+            impl_execution_engine2.get_resource_usage_report,
+            name="execution_engine2.get_resource_usage_report",
+            types=[dict],
+        )
+        self.method_authentication[
+            "execution_engine2.get_resource_usage_report"
+        ] = "required"  # noqa
         self.rpc_service.add(
             impl_execution_engine2.is_admin, name="execution_engine2.is_admin", types=[]
         )
@@ -565,12 +673,84 @@ class Application(object):
             "execution_engine2.get_client_groups"
         ] = "none"  # noqa
         authurl = config.get(AUTH) if config else None
-        self.auth_client = _KBaseAuth(authurl)
+        self.auth_client = timed_client(_KBaseAuth(authurl), _AUTH_DEPENDENCY)
+        cfg = config or {}
+        tracing.configure(cfg)
+        self.metrics = Metrics(
+            cfg.get("metrics-directory") or None,
+            flush_seconds=float(cfg.get("metrics-flush-seconds", 10)),
+        )
+        self.compressor = ResponseCompressor(
+            min_bytes=int(cfg.get("response-compression-min-bytes") or 1024),
+            level=int(cfg.get("response-compression-level") or 6),
+        )
+        self.stream_responses = (
+            str(cfg.get("stream-responses", "true")).strip().lower() == "true"
+        )
+        self.batch_max_calls = int(cfg.get("batch-max-calls") or 50)
+        self.batch_executor = ThreadPoolExecutor(
+            max_workers=int(cfg.get("batch-max-workers") or 4),
+            thread_name_prefix="ee2-batch",
+        )
 
     def __call__(self, environ, start_response):
+        if environ.get("PATH_INFO") == METRICS_PATH:
+            return self.serve_metrics(start_response)
+        start = time.perf_counter()
+        status = []
+
+        def _start_response(status_, headers):
+            status.append(status_)
+            return start_response(status_, headers)
+
         # Context object, equivalent to the perl impl CallContext
         ctx = MethodContext(self.userlog)
+        with track_dependencies() as dependencies:
+            response = self._call(environ, _start_response, ctx)
+            request_context = contextvars.copy_context()
+        method = "{}.{}".format(ctx.get("module"), ctx.get("method"))
+        if ctx.get("batch_size"):
+            label = BATCH_METHOD
+        elif method in self.rpc_service.method_data:
+            label = ctx["method"]
+        else:
+            return response
+        try:
+            request_size = int(environ.get("CONTENT_LENGTH", 0))
+        except ValueError:
+            request_size = 0
+
+        def observe(response_size):
+            self.metrics.observe_request(
+                label,
+                time.perf_counter() - start,
+                request_size,
+                response_size,
+                status[0] != "200 OK",
+                dependencies,
+            )
+
+        if isinstance(response, list):
+            observe(sum(len(r) for r in response))
+            return response
+        # streamed, so the request is done when the last chunk has been written
+        return _run_stream(response, request_context, observe)
+
+    def serve_metrics(self, start_response):
+        body = self.metrics.render().encode("utf8")
+        start_response(
+            "200 OK",
+            [
+                ("content-type", _METRICS_CONTENT_TYPE),
+                ("content-length", str(len(body))),
+            ],
+        )
+        return [body]
+
+    def _call(self, environ, start_response, ctx):
         ctx["client_ip"] = getIPAddress(environ)
+        # whether methods may return large results as streams
+        ctx["stream_responses"] = self.stream_responses
         status = "500 Internal Server Error"
 
         try:
@@ -584,7 +764,7 @@ class Application(object):
         else:
             request_body = environ["wsgi.input"].read(body_size)
             try:
-                req = json.loads(request_body)
+                req = _codec.loads(request_body)
             except ValueError as ve:
                 err = {
                     "error": {
@@ -595,76 +775,22 @@ class Application(object):
                 }
                 rpc_result = self.process_error(err, ctx, {"version": "1.1"})
             else:
-                ctx["module"], ctx["method"] = req["method"].split(".")
-                ctx["call_id"] = req["id"]
-                ctx["rpc_context"] = {
-                    "call_stack": [{"time": self.now_in_utc(), "method": req["method"]}]
-                }
-                prov_action = {
-                    "service": ctx["module"],
-                    "method": ctx["method"],
-                    "method_params": req["params"],
-                }
-                ctx["provenance"] = [prov_action]
-                try:
-                    token = environ.get("HTTP_AUTHORIZATION")
-                    # parse out the method being requested and check if it
-                    # has an authentication requirement
-                    method_name = req["method"]
-                    auth_req = self.method_authentication.get(method_name, "none")
-                    if auth_req != "none":
-                        if token is None and auth_req == "required":
-                            err = JSONServerError()
-                            err.data = (
-                                "Authentication required for "
-                                + "execution_engine2 "
-                                + "but no authentication header was passed"
-                            )
-                            raise err
-                        elif token is None and auth_req == "optional":
-                            pass
-                        else:
-                            try:
-                                user = self.auth_client.get_user(token)
-                                ctx["user_id"] = user
-                                ctx["authenticated"] = 1
-                                ctx["token"] = token
-                            except Exception as e:
-                                if auth_req == "required":
-                                    err = JSONServerError()
-                                    err.data = "Token validation failed: %s" % e
-                                    raise err
-                    if environ.get("HTTP_X_FORWARDED_FOR"):
-                        self.log(
-                            log.INFO,
-                            ctx,
-                            "X-Forwarded-For: " + environ.get("HTTP_X_FORWARDED_FOR"),
-                        )
-                    self.log(log.INFO, ctx, "start method")
-                    rpc_result = self.rpc_service.call(ctx, req)
-                    self.log(log.INFO, ctx, "end method")
-                    status = "200 OK"
-                except JSONRPCError as jre:
-                    err = {
-                        "error": {
-                            "code": jre.code,
-                            "name": jre.message,
-                            "message": jre.data,
-                        }
-                    }
-                    trace = jre.trace if hasattr(jre, "trace") else None
-                    rpc_result = self.process_error(err, ctx, req, trace)
-                except Exception:
-                    err = {
-                        "error": {
-                            "code": 0,
-                            "name": "Unexpected Server Error",
-                            "message": "An unexpected server error " + "occurred",
-                        }
-                    }
-                    rpc_result = self.process_error(
-                        err, ctx, req, traceback.format_exc()
+                token = environ.get("HTTP_AUTHORIZATION")
+                if environ.get("HTTP_X_FORWARDED_FOR"):
+                    self.log(
+                        log.INFO,
+                        ctx,
+                        "X-Forwarded-For: " + environ.get("HTTP_X_FORWARDED_FOR"),
+                    )
+                if isinstance(req, list):
+                    rpc_result, ok = self._call_batch(ctx, req, token)
+                else:
+                    self._fill_context(ctx, req)
+                    rpc_result, ok = self._dispatch(
+                        ctx, req, token, lambda: self.auth_client.get_user(token)
                     )
+                if ok:
+                    status = "200 OK"
 
         # print('Request method was %s\n' % environ['REQUEST_METHOD'])
         # print('Environment dictionary is:\n%s\n' % pprint.pformat(environ))
@@ -675,7 +801,8 @@ class Application(object):
         if rpc_result:
             response_body = rpc_result
         else:
-            response_body = ""
+            response_body = b""
+        streamed = not isinstance(response_body, bytes)
 
         response_headers = [
             ("Access-Control-Allow-Origin", "*"),
@@ -684,12 +811,205 @@ class Application(object):
                 environ.get("HTTP_ACCESS_CONTROL_REQUEST_HEADERS", "authorization"),
             ),
             ("content-type", "application/json"),
-            ("content-length", str(len(response_body))),
+            ("Vary", "Accept-Encoding"),
         ]
+        coding = self.compressor.choose(
+            environ.get("HTTP_ACCEPT_ENCODING"),
+            None if streamed else len(response_body),
+        )
+        if streamed:
+            # no content-length, so the WSGI server sends the body chunked
+            response_body = self._log_stream_errors(response_body, ctx)
+            if coding:
+                response_body = self.compressor.compress_stream(response_body, coding)
+                response_headers.append(("content-encoding", coding))
+            start_response(status, response_headers)
+            return response_body
+        if coding:
+            response_body = self.compressor.compress(response_body, coding)
+            response_headers.append(("content-encoding", coding))
+        response_headers.append(("content-length", str(len(response_body))))
         start_response(status, response_headers)
-        return [response_body.encode("utf8")]
+        return [response_body]
+
+    def _fill_context(self, ctx, req):
+        ctx["module"], ctx["method"] = req["method"].split(".")
+        # notifications have no id
+        ctx["call_id"] = req.get("id")
+        ctx["rpc_context"] = {
+            "call_stack": [{"time": self.now_in_utc(), "method": req["method"]}]
+        }
+        prov_action = {
+            "service": ctx["module"],
+            "method": ctx["method"],
+            "method_params": req.get("params"),
+        }
+        ctx["provenance"] = [prov_action]
 
-    def process_error(self, error, context, request, trace=None):
+    def _authenticate(self, ctx, method_name, token, get_user):
+        """
+        Check the token if the method has an authentication requirement, and add the user to
+        the context.
+
+        :param get_user: returns the user for the token.
+        """
+        auth_req = self.method_authentication.get(method_name, "none")
+        if auth_req != "none":
+            if token is None and auth_req == "required":
+                err = JSONServerError()
+                err.data = (
+                    "Authentication required for "
+                    + "execution_engine2 "
+                    + "but no authentication header was passed"
+                )
+                raise err
+            elif token is None and auth_req == "optional":
+                pass
+            else:
+                try:
+                    user = get_user()
+                    ctx["user_id"] = user
+                    ctx["authenticated"] = 1
+                    ctx["token"] = token
+                except Exception as e:
+                    if auth_req == "required":
+                        err = JSONServerError()
+                        err.data = "Token validation failed: %s" % e
+                        raise err
+
+    def _dispatch(self, ctx, req, token, get_user):
+        """
+        Authenticate and run a call.
+
+        :return: the encoded response, or None for a notification, and whether the call
+            succeeded.
+        """
+        try:
+            self._authenticate(ctx, req["method"], token, get_user)
+            self.log(log.INFO, ctx, "start method")
+            with rpc_method(ctx["method"]), tracing.trace(
+                req["method"], call_id=ctx["call_id"]
+            ):
+                respond = self.rpc_service.call_py(ctx, req)
+            # encoded here so a result that can't be serialized is returned as an error
+            rpc_result = self._encode(respond)
+            self.log(log.INFO, ctx, "end method")
+            return rpc_result, True
+        except JSONRPCError as jre:
+            err = {
+                "error": {
+                    "code": jre.code,
+                    "name": jre.message,
+                    "message": jre.data,
+                }
+            }
+            trace = jre.trace if hasattr(jre, "trace") else None
+            return self.process_error(err, ctx, req, trace), False
+        except Exception:
+            err = {
+                "error": {
+                    "code": 0,
+                    "name": "Unexpected Server Error",
+                    "message": "An unexpected server error " + "occurred",
+                }
+            }
+            return self.process_error(err, ctx, req, traceback.format_exc()), False
+
+    def _call_batch(self, ctx, reqs, token):
+        """
+        Run the calls in a JSON-RPC batch. The token is validated at most once for the whole
+        batch, and runs of consecutive read only calls are run concurrently. The calls'
+        errors are returned in the batch response.
+
+        :return: the encoded list of responses, or an error response if the batch is invalid,
+            and whether the batch was run.
+        """
+        ctx["batch_size"] = len(reqs)
+        if not reqs or len(reqs) > self.batch_max_calls:
+            err = {
+                "error": {
+                    "code": -32600,
+                    "name": "Invalid Request",
+                    "message": "Empty batch"
+                    if not reqs
+                    else f"Batch of {len(reqs)} calls exceeds the maximum of "
+                    + f"{self.batch_max_calls}",
+                }
+            }
+            return self.process_error(err, ctx, {"version": "1.1"}), False
+
+        user = []
+        user_lock = threading.Lock()
+
+        def get_user():
+            with user_lock:
+                if not user:
+                    try:
+                        user.append((self.auth_client.get_user(token), None))
+                    except Exception as e:
+                        user.append((None, e))
+            if user[0][1]:
+                raise user[0][1]
+            return user[0][0]
+
+        def run(req):
+            call_ctx = MethodContext(self.userlog)
+            call_ctx["client_ip"] = ctx["client_ip"]
+            call_ctx["stream_responses"] = ctx["stream_responses"]
+            method = req.get("method") if isinstance(req, dict) else None
+            if not isinstance(method, str) or "." not in method:
+                err = {
+                    "error": {
+                        "code": -32600,
+                        "name": "Invalid Request",
+                        "message": "Batch entries must be calls with a method",
+                    }
+                }
+                request = req if isinstance(req, dict) else {"version": "1.1"}
+                return self.process_error(err, call_ctx, request)
+            self._fill_context(call_ctx, req)
+            respond = self._dispatch(call_ctx, req, token, get_user)[0]
+            # Don't respond to notifications, even if they fail
+            return respond if "id" in req else None
+
+        responses = []
+        i = 0
+        while i < len(reqs):
+            j = i + 1
+            if _is_concurrent(reqs[i]):
+                while j < len(reqs) and _is_concurrent(reqs[j]):
+                    j += 1
+            if j - i == 1:
+                responses.append(run(reqs[i]))
+            else:
+                # each call gets a copy of the request's context
+                futures = [
+                    self.batch_executor.submit(contextvars.copy_context().run, run, r)
+                    for r in reqs[i:j]
+                ]
+                responses.extend(f.result() for f in futures)
+            i = j
+        # Don't respond to notifications
+        responses = [r for r in responses if r is not None]
+        return _join_batch(responses) if responses else None, True
+
+    def _encode(self, respond):
+        if respond is None:
+            return None
+        if has_stream(respond):
+            return iter_encode(respond, _codec.dumps)
+        return _codec.dumps(respond)
+
+    def _log_stream_errors(self, chunks, ctx):
+        # The status has been sent by the time the error happens, so all that can be done is
+        # to log it and abort the response
+        try:
+            yield from chunks
+        except Exception:
+            self.log(log.ERR, ctx, traceback.format_exc().split("\n")[0:-1])
+            raise
+
+    def _error_response(self, error, context, request, trace=None):
         if trace:
             self.log(log.ERR, context, trace.split("\n")[0:-1])
         if "id" in request:
@@ -705,7 +1025,10 @@ class Application(object):
         else:
             error["version"] = "1.0"
             error["error"]["error"] = trace
-        return json.dumps(error)
+        return error
+
+    def process_error(self, error, context, request, trace=None):
+        return _codec.dumps(self._error_response(error, context, request, trace))
 
     def now_in_utc(self):
         # noqa Taken from http://stackoverflow.com/questions/3401428/how-to-get-an-isoformat-datetime-string-including-the-default-timezone @IgnorePep8
@@ -716,8 +1039,28 @@ class Application(object):
         return "%s%+02d:%02d" % (dtnow.isoformat(), hh, mm)
 
 
+def preload():
+    """
+    Load the state that doesn't change while serving, so workers forked afterwards share it
+    rather than each loading their own copy: the lazily imported libraries and the clients that
+    don't hold connections. MongoDB, kafka, slack and condor clients are created in each
+    worker, since their connections and threads don't survive a fork.
+    """
+    load(lazy_import(m) for m in _PRELOAD_MODULES)
+    for client in _PRELOAD_CLIENTS:
+        getattr(impl_execution_engine2.clients, client)
+    # objects created so far are never collected, so the collector doesn't write to, and
+    # copy, the shared memory pages they're in
+    gc.collect()
+    gc.freeze()
+
+
 application = Application()
 
+# gunicorn --preload imports this module once before forking the workers
+if os.environ.get(PRELOAD):
+    preload()
+
 # This is the uwsgi application dictionary. On startup uwsgi will look
 # for this dict and pull its configuration from here.
 # This simply lists where to "mount" the application in the URL path
@@ -1,14 +1,21 @@
+import time
+from datetime import datetime
 from enum import Enum
 from typing import Dict, NamedTuple
 
-from execution_engine2.db.models.models import JobLog as JLModel, LogLines
-from execution_engine2.exceptions import RecordNotFoundException
+from execution_engine2.utils.json_stream import Deferred, StreamedList
 
 
 # if TYPE_CHECKING:
 #     from lib.execution_engine2.sdk.SDKMethodRunner import SDKMethodRunner
 
 
+# Timestamps between these, in seconds, are always valid, so they're converted without
+# check_and_convert_time
+_MIN_FAST_TS = 0
+_MAX_FAST_TS = 2**32
+
+
 class JobPermissions(Enum):
     READ = "r"
     WRITE = "w"
@@ -25,59 +32,61 @@ class EE2Logs:
         self.sdkmr = sdkmr
 
     def _format_job_logs(self, record_position, log_lines):
+        """
+        Validate log lines and convert them to the documents stored in the log, as the LogLines
+        Document would store them.
 
+        The lines are checked with plain type checks rather than by creating a LogLines
+        Document per line, and common timestamp formats are converted without
+        check_and_convert_time.
+        """
+        now = time.time()
         log_lines_formatted = []
-        for input_line in log_lines:
-            record_position += 1
-            ll = LogLines()
-            ll.error = int(input_line.get("is_error", 0)) == 1
-            ll.linepos = record_position
+        for linepos, input_line in enumerate(log_lines, record_position + 1):
+            line = input_line.get("line")
+            if not isinstance(line, str):
+                raise ValueError(
+                    f"Log line {linepos}: "
+                    + ("line is required" if line is None else "line must be a string")
+                )
+            is_error = input_line.get("is_error", 0)
+            if not isinstance(is_error, int):
+                is_error = int(is_error)
             ts = input_line.get("ts")
-            if ts is not None:
-                ts = self.sdkmr.check_and_convert_time(ts, assign_default_time=True)
-            ll.ts = ts
-            ll.line = input_line.get("line")
-            ll.validate()
-            log_lines_formatted.append(ll.to_mongo().to_dict())
-
+            log_lines_formatted.append(
+                {
+                    "line": line,
+                    "linepos": linepos,
+                    "error": is_error == 1,
+                    # lines without a timestamp get the time they were added
+                    "ts": now if ts is None else self._convert_ts(ts),
+                }
+            )
         return log_lines_formatted
 
-    def _create_new_log(self, pk, log_lines: list):
-        """
-        :param ee2_log: The mongo ee2_log to operate on
-        :param log_lines: The lines to add to this log
-        :return:
+    def _convert_ts(self, ts) -> float:
         """
-        jl = JLModel()
-        jl.primary_key = pk
-        jl.original_line_count = 0
-        jl.stored_line_count = 0
-        jl.lines = self._format_job_logs(record_position=-1, log_lines=log_lines)
-        jl.original_line_count = jl.stored_line_count = len(log_lines)
-        jl.save()
-        return jl
-
-    def _add_first_logs(self, log_lines, job_id):
+        Convert a log line timestamp to seconds since the epoch, as check_and_convert_time
+        does, which only handles the unusual formats.
         """
-        Initialize the log since it doesn't exist
-        :param log_lines:
-        :param job_id:
-        :return:
-        """
-        self.sdkmr.logger.debug(f"About to create new log record for {job_id}")
-        log = self._create_new_log(pk=job_id, log_lines=log_lines)
-        return AddLogResult(success=True, stored_line_count=log.stored_line_count)
-
-    def _add_subsequent_logs(self, job_log, log_lines):
-        """Add logs to an existing log entry"""
-        formatted_logs = self._format_job_logs(
-            record_position=job_log["stored_line_count"] - 1, log_lines=log_lines
-        )
-        record_count = int(job_log["stored_line_count"]) + len(formatted_logs)
-        slc = self.sdkmr.mongo_util._push_job_logs(
-            formatted_logs, job_id=job_log["_id"], record_count=record_count
-        )
-        return AddLogResult(success=True, stored_line_count=slc)
+        seconds = None
+        ts_type = type(ts)
+        if ts_type is float:
+            seconds = ts
+        elif ts_type is int:
+            # milliseconds
+            seconds = ts / 1000.0
+        elif ts_type is str and ts.isascii():
+            if ts.replace(".", "", 1).isdigit():
+                seconds = float(ts) if "." in ts else int(ts) / 1000.0
+            elif ts[4:5] == "-":
+                try:
+                    seconds = datetime.fromisoformat(ts).timestamp()
+                except ValueError:
+                    pass
+        if seconds is not None and _MIN_FAST_TS <= seconds < _MAX_FAST_TS:
+            return seconds
+        return self.sdkmr.check_and_convert_time(ts, assign_default_time=True)
 
     def add_job_logs(self, job_id, log_lines, as_admin=False) -> AddLogResult:
         """
@@ -100,33 +109,32 @@ class EE2Logs:
         :param as_admin:
         :return:
         """
-        job_log = {"stored_line_count": -1}
         self.sdkmr.get_job_with_permission(
             job_id, JobPermissions.WRITE, as_admin=as_admin
         )
+        mongo_util = self.sdkmr.get_mongo_util()
         try:
-            try:
-                job_log = self.sdkmr.mongo_util.get_job_log_pymongo(job_id)
-            except RecordNotFoundException:
-                return self._add_first_logs(log_lines=log_lines, job_id=job_id)
-            return self._add_subsequent_logs(job_log, log_lines)
-        except Exception as e:
-            self.sdkmr.logger.error(e)
-            return AddLogResult(
-                success=False, stored_line_count=job_log["stored_line_count"]
+            formatted_logs = self._format_job_logs(
+                record_position=-1, log_lines=log_lines
             )
+            slc = mongo_util.append_job_logs(job_id, formatted_logs)
+            return AddLogResult(success=True, stored_line_count=slc)
+        except Exception as e:
+            self.sdkmr.get_logger().error(e)
+            try:
+                slc = mongo_util.get_job_log_summary(job_id)["stored_line_count"]
+            except Exception:
+                slc = -1
+            return AddLogResult(success=False, stored_line_count=slc)
 
     def _get_job_logs(self, job_id, skip_lines, limit=None) -> Dict:
         """
-        # TODO Do I have to query this another way so I don't load all lines into memory?
-        # Does mongoengine lazy-load it?
-
-        # TODO IMPLEMENT SKIP LINES
         # TODO MAKE ONLY THE TIMESTAMP A STRING, so AS TO NOT HAVING TO LOOP OVER EACH ATTRIBUTE?
-        # TODO Filter the lines in the mongo query?
-        # TODO AVOID LOADING ENTIRE THING INTO MEMORY?
         # TODO Check if there is an off by one for line_count?
 
+        Only the requested lines are read from the database, and for logs stored in the
+        compact encoding only the chunks containing them are decoded.
+
 
            :returns: instance of type "GetJobLogsResults" (last_line_number -
            common number of lines (including those in skip_lines parameter),
@@ -142,45 +150,83 @@ class EE2Logs:
         :return:
         """
 
-        log = self.sdkmr.mongo_util.get_job_log_pymongo(job_id)
+        mongo_util = self.sdkmr.get_mongo_util()
+        summary = mongo_util.get_job_log_summary(job_id)
         lines = []
         last_line_number = 0
-        count = len(log.get("lines", []))
-        for log_line in log.get("lines", []):  # type: LogLines
-
-            if skip_lines and int(skip_lines) >= log_line.get("linepos", 0):
-                continue
-            linepos = log_line.get("linepos")
-
-            is_error = 0
-            if log_line.get("error") is True:
-                is_error = 1
-
-            lines.append(
-                {"line": log_line.get("line"), "linepos": linepos, "is_error": is_error}
-            )
-            ts = int(log_line.get("ts", 0) * 1000)
-            jan_1_2010 = 1262307660
-            if ts > jan_1_2010:
-                lines[-1]["ts"] = ts
-
-            last_line_number = max(int(linepos), last_line_number)
-            if limit and limit <= len(lines):
-                break
+        for log_line in mongo_util.iter_job_log_lines(job_id, skip_lines, limit):
+            lines.append(self._format_log_line(log_line))
+            last_line_number = max(int(lines[-1]["linepos"]), last_line_number)
 
         if not lines:  # skipped all lines
-            last_line_number = log["stored_line_count"]
+            last_line_number = summary["stored_line_count"]
 
-        log_obj = {"lines": lines, "last_line_number": last_line_number, "count": count}
+        log_obj = {
+            "lines": lines,
+            "last_line_number": last_line_number,
+            "count": summary["count"],
+        }
         return log_obj
 
+    @staticmethod
+    def _format_log_line(log_line: Dict) -> Dict:
+        is_error = 0
+        if log_line.get("error") is True:
+            is_error = 1
+
+        line = {
+            "line": log_line.get("line"),
+            "linepos": log_line.get("linepos"),
+            "is_error": is_error,
+        }
+        ts = int(log_line.get("ts", 0) * 1000)
+        jan_1_2010 = 1262307660
+        if ts > jan_1_2010:
+            line["ts"] = ts
+        return line
+
+    def _stream_job_logs(self, job_id, skip_lines, limit=None) -> Dict:
+        """
+        The same as _get_job_logs, except the lines are read from the database in batches as
+        the response is written, rather than loaded into memory at once.
+        """
+        mongo_util = self.sdkmr.get_mongo_util()
+        # fails if the log doesn't exist before anything is sent
+        summary = mongo_util.get_job_log_summary(job_id)
+        sent = {"lines": 0, "last_line_number": 0}
+
+        def lines():
+            for log_line in mongo_util.iter_job_log_lines(job_id, skip_lines, limit):
+                line = self._format_log_line(log_line)
+                sent["lines"] += 1
+                sent["last_line_number"] = max(
+                    int(line["linepos"]), sent["last_line_number"]
+                )
+                yield line
+
+        def last_line_number():
+            if not sent["lines"]:  # skipped all lines
+                return summary["stored_line_count"]
+            return sent["last_line_number"]
+
+        return {
+            "lines": StreamedList(lines()),
+            "last_line_number": Deferred(last_line_number),
+            "count": summary["count"],
+        }
+
     # @allow_job_read
-    def view_job_logs(self, job_id, skip_lines, as_admin=False, limit=None):
+    def view_job_logs(
+        self, job_id, skip_lines, as_admin=False, limit=None, stream=False
+    ):
         """
         Authorization Required: Ability to read from the workspace
         :param sdkmr: An instance of the SDK Method Runner, which contains the current request context
         :param job_id: The Job ID to view Jobs For
         :param skip_lines: An offset of the job logs
+        :param stream: read the lines from the database as the response is written. The lines
+            and last line number are then only available by encoding the result with
+            execution_engine2.utils.json_stream.
         :return:
         """
         # TODO Pass this into decorator?
@@ -188,4 +234,6 @@ class EE2Logs:
             job_id, JobPermissions.READ, as_admin=as_admin
         )
 
+        if stream:
+            return self._stream_job_logs(job_id, skip_lines, limit)
         return self._get_job_logs(job_id, skip_lines, limit)
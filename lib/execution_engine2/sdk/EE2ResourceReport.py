@@ -0,0 +1,166 @@
+"""
+Reports how the resources requested by jobs compare to the resources they actually used, so
+that catalog client group settings can be sized from data rather than guesses.
+"""
+
+import math
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+
+from execution_engine2.exceptions import IncorrectParamsException
+from execution_engine2.utils.job_requirements_resolver import (
+    REQUEST_CPUS,
+    REQUEST_MEMORY,
+    REQUEST_DISK,
+)
+
+# (report key, requested key, used key) for each resource in the aggregated job records
+_RESOURCES = [
+    ("cpu", "cpu_requested", "cpu_used"),
+    ("memory_mb", "memory_requested", "memory_used"),
+    ("disk_gb", "disk_requested", "disk_used"),
+]
+_PERCENTILES = [50, 90, 95, 99]
+
+
+def _percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    """
+    Nearest rank percentiles of a list of values, or None if the list is empty.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    ret = {}
+    for p in _PERCENTILES:
+        rank = max(math.ceil(p / 100 * len(values)), 1)
+        ret[f"p{p}"] = values[rank - 1]
+    ret["max"] = values[-1]
+    return ret
+
+
+class ResourceReport:
+    """
+    Builds the resource usage report from the job records.
+    """
+
+    # Minimum number of jobs with usage data for a method before suggesting settings
+    DEFAULT_MIN_JOBS = 10
+    # Multiplier applied to the observed memory and disk usage when suggesting settings
+    HEADROOM = 1.25
+    # The percentile of the observed usage used when suggesting settings
+    SUGGESTION_PERCENTILE = "p99"
+
+    def __init__(self, sdkmr):
+        self.sdkmr = sdkmr
+
+    def get_resource_usage_report(
+        self,
+        start_time,
+        end_time,
+        methods: List[str] = None,
+        min_jobs: int = None,
+    ) -> Dict:
+        """
+        Report the requested versus used resources for jobs created in a time range.
+
+        :param start_time: Only include jobs created after this time
+        :param end_time: Only include jobs created before this time
+        :param methods: Only include jobs running these methods. Default all methods
+        :param min_jobs: The minimum number of jobs with usage data for a method and client
+            group before client group settings are suggested
+        :return: the report, as described in the spec
+        """
+        if start_time is None or end_time is None:
+            raise IncorrectParamsException(
+                "Please provide a start time and an end time"
+            )
+        start = self.sdkmr.check_and_convert_time(start_time)
+        end = self.sdkmr.check_and_convert_time(end_time)
+        if start > end:
+            raise IncorrectParamsException(
+                "The start time cannot be greater than the end time."
+            )
+        if methods is not None and not isinstance(methods, list):
+            raise IncorrectParamsException("methods must be a list")
+        if min_jobs is None:
+            min_jobs = self.DEFAULT_MIN_JOBS
+
+        groups = self.sdkmr.get_mongo_util().get_resource_usage_by_method(
+            ObjectId.from_datetime(datetime.fromtimestamp(start, tz=timezone.utc)),
+            ObjectId.from_datetime(datetime.fromtimestamp(end, tz=timezone.utc)),
+            methods=methods,
+        )
+        report = [self._report_group(group, min_jobs) for group in groups]
+        report.sort(key=lambda r: (-r["waste"]["cpu_hours"], r["method"] or ""))
+        return {
+            "start_time": start,
+            "end_time": end,
+            "methods": report,
+        }
+
+    def _report_group(self, group: Dict, min_jobs: int) -> Dict:
+        jobs = group["jobs"]
+        report = {
+            "method": group["method"],
+            "client_group": group["client_group"],
+            "job_count": len(jobs),
+            "jobs_with_usage": sum(1 for j in jobs if j.get("memory_used") is not None),
+        }
+        for name, req_key, used_key in _RESOURCES:
+            report[name] = {
+                "requested": _percentiles(
+                    [j[req_key] for j in jobs if j.get(req_key) is not None]
+                ),
+                "used": _percentiles(
+                    [j[used_key] for j in jobs if j.get(used_key) is not None]
+                ),
+            }
+        waste = {"cpu_hours": 0.0, "memory_gb_hours": 0.0, "disk_gb_hours": 0.0}
+        for j in jobs:
+            hours = j.get("runtime_hours")
+            if not hours or hours < 0:
+                continue
+            waste["cpu_hours"] += self._unused(j, "cpu_requested", "cpu_used") * hours
+            waste["memory_gb_hours"] += (
+                self._unused(j, "memory_requested", "memory_used") / 1024 * hours
+            )
+            waste["disk_gb_hours"] += (
+                self._unused(j, "disk_requested", "disk_used") * hours
+            )
+        report["waste"] = {k: round(v, 2) for k, v in waste.items()}
+        report["suggested_client_groups"] = self._suggest(report, min_jobs)
+        return report
+
+    @staticmethod
+    def _unused(job: Dict, req_key: str, used_key: str) -> float:
+        requested = job.get(req_key)
+        used = job.get(used_key)
+        if requested is None or used is None:
+            return 0
+        return max(requested - used, 0)
+
+    def _suggest(self, report: Dict, min_jobs: int) -> Optional[List[str]]:
+        """
+        Suggest the catalog client group settings, in the catalog's CSV format, for a method.
+        """
+        if report["client_group"] is None:
+            return None
+        used = {name: report[name]["used"] for name, _, _ in _RESOURCES}
+        if any(u is None for u in used.values()):
+            return None
+        if report["jobs_with_usage"] < min_jobs:
+            return None
+        p = self.SUGGESTION_PERCENTILE
+        # cpu usage is averaged over the job's lifetime, so no headroom is added
+        cpus = max(math.ceil(used["cpu"][p]), 1)
+        # round memory up to the next 100MB to avoid suggesting spuriously precise values
+        memory = max(math.ceil(used["memory_mb"][p] * self.HEADROOM / 100) * 100, 100)
+        disk = max(math.ceil(used["disk_gb"][p] * self.HEADROOM), 1)
+        return [
+            report["client_group"],
+            f"{REQUEST_CPUS}={cpus}",
+            f"{REQUEST_MEMORY}={memory}M",
+            f"{REQUEST_DISK}={disk}GB",
+        ]
@@ -35,6 +35,7 @@ from execution_engine2.sdk.job_submission_parameters import (
     UserCreds,
 )
 from execution_engine2.utils.KafkaUtils import KafkaCreateJob, KafkaQueueChange
+from execution_engine2.utils.tracing import in_background_span, traced
 from execution_engine2.utils.job_requirements_resolver import (
     REQUEST_CPUS,
     REQUEST_DISK,
@@ -258,6 +259,7 @@ class EE2RunJob:
         )
         return self._generate_job_submission_params(job_id, params)
 
+    @traced()
     def _submit_multiple_wrapper(self, job_ids: list, runjob_params: List[Dict]):
         # Generate job submission params
         job_submission_params = []
@@ -282,6 +284,7 @@ class EE2RunJob:
             self._abort_multiple_jobs(job_ids)
             raise e
 
+    @traced()
     def _run_multiple(self, runjob_params: List[Dict]):
         """
         Get the job records, bulk save them, then submit to condor.
@@ -299,12 +302,13 @@ class EE2RunJob:
         # Start up job submission thread
         # For testing, mock this out and check to see it is called with these params?
         threading.Thread(
-            target=self._submit_multiple_wrapper,
+            target=in_background_span("submit_jobs", self._submit_multiple_wrapper),
             kwargs={"runjob_params": runjob_params, "job_ids": job_ids},
             daemon=True,
         ).start()
         return job_ids
 
+    @traced()
     def _finish_multiple_job_submission(self, job_ids):
         """
         This is called during job submission. If a job is terminated during job submission,
@@ -329,33 +333,33 @@ class EE2RunJob:
                 # used by the initial transition to Terminated
                 self._safe_cancel(job_id, TerminatedCode.terminated_by_user)
 
+    @traced()
     def _submit_multiple(self, job_submission_params):
         """
         Submit multiple jobs. If any of the submissions are a failure, raise exception in order
         to fail all submitted jobs, rather than allowing the submissions to continue
         """
         begin = time.time()
-        job_ids = []
-        condor_job_ids = []
-        for job_submit_param in job_submission_params:
-            job_id = job_submit_param.job_id
-            job_ids.append(job_id)
-            try:
-                submission_info = self.sdkmr.get_condor().run_job(
-                    params=job_submit_param
-                )
-                condor_job_id = submission_info.clusterid
-            except Exception as e:
-                self.logger.error(e)
-                self._finish_created_job(job_id=job_id, exception=e)
-                raise e
+        job_ids = [p.job_id for p in job_submission_params]
+        scheduler = self.sdkmr.get_scheduler()
+        # All the jobs are submitted in one call, so condor can submit them in one transaction.
+        # If the call itself fails the first job records the error, and the caller aborts the
+        # rest
+        try:
+            submission_infos = scheduler.submit_jobs(job_submission_params)
+        except Exception as e:
+            self.logger.error(e)
+            self._finish_created_job(job_id=job_ids[0], exception=e)
+            raise e
 
+        for job_id, submission_info in zip(job_ids, submission_infos):
+            scheduler_id = submission_info.scheduler_id
             if submission_info.error is not None and isinstance(
                 submission_info.error, Exception
             ):
                 self._finish_created_job(exception=submission_info.error, job_id=job_id)
                 raise submission_info.error
-            if condor_job_id is None:
+            if scheduler_id is None:
                 error_msg = (
                     "Condor job not run, and error not found. Something went wrong"
                 )
@@ -363,12 +367,14 @@ class EE2RunJob:
                     job_id=job_id, exception=RuntimeError(error_msg)
                 )
                 raise RuntimeError(error_msg)
-            condor_job_ids.append(condor_job_id)
             # Previously the jobs were updated in a batch after submitting all jobs to condor.
             # This led to issues where a large job count could result in jobs switching to
             # running prior to all jobs being submitted and so the queued timestamp was
-            # never added to the job record.
-            self.sdkmr.get_mongo_util().update_job_to_queued(job_id, condor_job_id)
+            # never added to the job record. The jobs are now submitted in one transaction,
+            # so they're updated right after they're submitted.
+            self.sdkmr.get_mongo_util().update_job_to_queued(
+                job_id, scheduler_id, scheduler.scheduler_type
+            )
 
         self.logger.error(
             f"It took {time.time() - begin} to submit jobs to condor and update to queued"
@@ -382,13 +388,15 @@ class EE2RunJob:
 
         return job_ids
 
+    @traced()
     def _run(self, params):
         job_params = self._prepare_to_run(params=params)
         job_id = job_params.job_id
 
+        scheduler = self.sdkmr.get_scheduler()
         try:
-            submission_info = self.sdkmr.get_condor().run_job(params=job_params)
-            condor_job_id = submission_info.clusterid
+            submission_info = scheduler.run_job(params=job_params)
+            scheduler_id = submission_info.scheduler_id
         except Exception as e:
             self.logger.error(e)
             self._finish_created_job(job_id=job_id, exception=e)
@@ -399,12 +407,16 @@ class EE2RunJob:
         ):
             self._finish_created_job(exception=submission_info.error, job_id=job_id)
             raise submission_info.error
-        if condor_job_id is None:
+        if scheduler_id is None:
             error_msg = "Condor job not run, and error not found. Something went wrong"
             self._finish_created_job(job_id=job_id, exception=RuntimeError(error_msg))
             raise RuntimeError(error_msg)
 
-        self.update_job_to_queued(job_id=job_id, scheduler_id=condor_job_id)
+        self.update_job_to_queued(
+            job_id=job_id,
+            scheduler_id=scheduler_id,
+            scheduler_type=scheduler.scheduler_type,
+        )
 
         return job_id
 
@@ -422,6 +434,7 @@ class EE2RunJob:
                 # TODO Maybe add a retry here?
                 self.logger.error(f"Couldn't cancel child job {e}")
 
+    @traced()
     def _create_batch_job(self, wsid, meta):
         """
         This creates the parent job for all children to mark as their ancestor
@@ -506,6 +519,7 @@ class EE2RunJob:
         return {_BATCH_ID: str(batch_job.id), "child_job_ids": children_jobs}
 
     # modifies the jobs in place
+    @traced()
     def _add_job_requirements(self, jobs: List[Dict[str, Any]], is_write_admin: bool):
         f"""
         Adds the job requirements, generated from the job requirements resolver,
@@ -597,6 +611,7 @@ class EE2RunJob:
             raise error
         raise IncorrectParamsException(f"{error_prefix}{error.args[0]}") from error
 
+    @traced()
     def _check_job_arguments(self, jobs, batch_job=False):
         # perform sanity checks before creating any jobs, including the parent job for batch jobs
         for i, job in enumerate(jobs):
@@ -877,6 +892,7 @@ class EE2RunJob:
                 # Do we do a deepcopy here in case the params point to the same obj?
                 runjob_param["wsid"] = batch_wsid
 
+    @traced()
     def _preflight(
         self,
         runjob_params: Union[dict, list],
@@ -980,16 +996,15 @@ class EE2RunJob:
             debug_mode=norm.get(DEBUG_MODE),
         )
 
-    def update_job_to_queued(self, job_id, scheduler_id):
+    def update_job_to_queued(self, job_id, scheduler_id, scheduler_type="condor"):
         # TODO RETRY FOR RACE CONDITION OF RUN/CANCEL
         # TODO PASS QUEUE TIME IN FROM SCHEDULER ITSELF?
-        # TODO PASS IN SCHEDULER TYPE?
         j = self.sdkmr.get_mongo_util().get_job(job_id=job_id)
         previous_status = j.status
         j.status = Status.queued.value
         j.queued = time.time()
         j.scheduler_id = scheduler_id
-        j.scheduler_type = "condor"
+        j.scheduler_type = scheduler_type
         self.sdkmr.save_job(j)
 
         self.sdkmr.get_kafka_client().send_kafka_message(
@@ -1,7 +1,8 @@
 import json
+import threading
 from collections import OrderedDict
 from enum import Enum
-from typing import Dict
+from typing import Dict, List
 
 from bson import ObjectId
 
@@ -12,6 +13,7 @@ from execution_engine2.exceptions import (
 from execution_engine2.sdk.EE2Constants import JobError
 from execution_engine2.utils.arg_processing import parse_bool
 from lib.execution_engine2.authorization.authstrategy import can_read_jobs
+from lib.execution_engine2.db.models.job_view import RESOURCE_USAGE_FIELDS
 from lib.execution_engine2.db.models.models import (
     Job,
     JobOutput,
@@ -35,6 +37,16 @@ class JobPermissions(Enum):
 
 
 class JobsStatus:
+    _FINISHED_STATES = [
+        Status.completed.value,
+        Status.error.value,
+        Status.terminated.value,
+    ]
+    _HELD_ERROR_MESSAGE_SHORT = "Job was held"
+    _HELD_ERROR_MESSAGE_LONG = (
+        "Job was terminated by automation due to an unexpected error. Please resubmit."
+    )
+
     def __init__(self, sdkmr):
         self.sdkmr = sdkmr
 
@@ -53,25 +65,15 @@ class JobsStatus:
         j = self.sdkmr.get_mongo_util().get_job(job_id=job_id)  # type: Job
 
         try:
-            error_message_long = "Job was terminated by automation due to an unexpected error. Please resubmit."
-            error_message_short = "Job was held"
-
-            error = JobError(
-                code=ErrorCode.job_terminated_by_automation.value,
-                name="Job was held",
-                message=error_message_long,
-                error=error_message_long,
-            )._asdict()
-
             self.finish_job(
                 job_id=job_id,
-                error_message=error_message_short,
+                error_message=self._HELD_ERROR_MESSAGE_SHORT,
                 error_code=ErrorCode.job_terminated_by_automation.value,
-                error=dict(error),
+                error=self._held_job_error(),
                 as_admin=as_admin,
             )
             log_line = {
-                "line": error_message_long,
+                "line": self._HELD_ERROR_MESSAGE_LONG,
                 "is_error": True,
             }
             self.sdkmr.get_job_logs().add_job_logs(
@@ -85,6 +87,101 @@ class JobsStatus:
         # There's probably a better way and a return type, but not really sure what I need yet
         return json.loads(json.dumps(j.to_mongo().to_dict(), default=str))
 
+    def _held_job_error(self) -> Dict:
+        return dict(
+            JobError(
+                code=ErrorCode.job_terminated_by_automation.value,
+                name=self._HELD_ERROR_MESSAGE_SHORT,
+                message=self._HELD_ERROR_MESSAGE_LONG,
+                error=self._HELD_ERROR_MESSAGE_LONG,
+            )._asdict()
+        )
+
+    def handle_held_jobs(self, cluster_ids: List[str]) -> List[Dict]:
+        """
+        Mark many held jobs as errors at once. Jobs that already finished, for example because
+        they finished OK before something bad happened with the scheduler, are left alone.
+
+        The jobs are looked up by their scheduler ids with one query, finished with one update,
+        and the held message is appended to their logs with one bulk write.
+        Callers are expected to have checked for admin permissions.
+
+        :param cluster_ids: The condor cluster ids of the held jobs
+        :return: One result per cluster id, in order, with the keys
+            cluster_id - the cluster id
+            job_id - the id of the job, or None if no job has the cluster id
+            status - the status of the job, or None if no job has the cluster id
+            finished - whether the job was marked as an error by this call
+        """
+        mongo = self.sdkmr.get_mongo_util()
+        jobs = mongo.get_jobs_by_scheduler_ids(
+            cluster_ids, projection=["status", "running"]
+        )
+        jobs_by_cluster_id = {job["scheduler_id"]: job for job in jobs}
+        unfinished = [job for job in jobs if job["status"] not in self._FINISHED_STATES]
+        finished = mongo.finish_jobs_with_error(
+            [str(job["_id"]) for job in unfinished],
+            error_message=self._HELD_ERROR_MESSAGE_SHORT,
+            error_code=ErrorCode.job_terminated_by_automation.value,
+            error=self._held_job_error(),
+        )
+        finished_ids = {job["_id"] for job in finished}
+        mongo.add_job_log_line(
+            [str(job_id) for job_id in finished_ids],
+            line=self._HELD_ERROR_MESSAGE_LONG,
+            is_error=True,
+        )
+
+        kafka = self.sdkmr.get_kafka_client()
+        for job in unfinished:
+            if job["_id"] in finished_ids:
+                kafka.send_kafka_message(
+                    message=KafkaFinishJob(
+                        job_id=str(job["_id"]),
+                        new_status=Status.error.value,
+                        previous_status=job["status"],
+                        error_message=self._HELD_ERROR_MESSAGE_SHORT,
+                        error_code=ErrorCode.job_terminated_by_automation.value,
+                        scheduler_id=job["scheduler_id"],
+                    )
+                )
+        # Only send jobs to catalog that actually ran on a worker
+        ran = [
+            job
+            for job in finished
+            if job.get("running")
+            and job["running"] >= job["_id"].generation_time.timestamp()
+        ]
+        if ran:
+            threading.Thread(
+                target=self._post_finish_jobs, args=(ran,), daemon=True
+            ).start()
+
+        results = []
+        for cluster_id in cluster_ids:
+            job = jobs_by_cluster_id.get(cluster_id)
+            if job is None:
+                results.append(
+                    {
+                        "cluster_id": cluster_id,
+                        "job_id": None,
+                        "status": None,
+                        "finished": False,
+                    }
+                )
+            else:
+                results.append(
+                    {
+                        "cluster_id": cluster_id,
+                        "job_id": str(job["_id"]),
+                        "status": Status.error.value
+                        if job["_id"] in finished_ids
+                        else job["status"],
+                        "finished": job["_id"] in finished_ids,
+                    }
+                )
+        return results
+
     def cancel_job(self, job_id, terminated_code=None, as_admin=False):
         """
         Authorization Required: Ability to Read and Write to the Workspace
@@ -118,12 +215,12 @@ class JobsStatus:
             )
 
         self.sdkmr.logger.debug(
-            f"About to cancel job in CONDOR using jobid {job_id} {job.scheduler_id}"
+            f"About to cancel job in the scheduler using jobid {job_id} {job.scheduler_id}"
         )
 
         # TODO Issue #190 IF success['TotalSuccess = 0'] == FALSE, don't send a kafka message?
 
-        self.sdkmr.get_condor().cancel_job(job_id=f"{job.scheduler_id}.0")
+        self.sdkmr.get_scheduler().cancel_job(job.scheduler_id)
         self.sdkmr.kafka_client.send_kafka_message(
             message=KafkaCancelJob(
                 job_id=str(job_id),
@@ -142,6 +239,81 @@ class JobsStatus:
             )
         )
 
+    def cancel_jobs(self, job_ids: List[str], terminated_code=None) -> List[Dict]:
+        """
+        Cancel many jobs at once. Jobs that have already finished are left alone, and the
+        children of canceled batch jobs are canceled as well.
+
+        The jobs are looked up with one query, canceled with one update and removed from
+        the scheduler with one call.
+        Callers are expected to have checked for admin permissions.
+
+        :param job_ids: The ids of the jobs to cancel
+        :param terminated_code: The reason the jobs were canceled. Default terminated by user
+        :return: One result per job id, in order, with the keys
+            job_id - the id of the job
+            status - the status of the job before this call, or None if there is no such job
+            canceled - whether the job was canceled by this call
+        """
+        if terminated_code is None:
+            terminated_code = TerminatedCode.terminated_by_user.value
+        mongo = self.sdkmr.get_mongo_util()
+        jobs = mongo.get_job_records(job_ids, projection=["status"])
+        status_by_id = {str(job["_id"]): job["status"] for job in jobs}
+        canceled = mongo.cancel_jobs(list(status_by_id), terminated_code)
+        canceled_ids = {str(job["_id"]) for job in canceled}
+
+        child_job_ids = [
+            child_job_id
+            for job in canceled
+            for child_job_id in job.get("child_jobs", [])
+        ]
+        if child_job_ids:
+            self.cancel_jobs(
+                child_job_ids,
+                terminated_code=TerminatedCode.terminated_by_batch_abort.value,
+            )
+
+        # Jobs that never reached the scheduler have no scheduler id
+        scheduler_ids = [
+            job["scheduler_id"] for job in canceled if job.get("scheduler_id")
+        ]
+        if scheduler_ids:
+            self.sdkmr.get_logger().debug(
+                f"About to cancel {len(scheduler_ids)} jobs in the scheduler"
+            )
+            self.sdkmr.get_scheduler().cancel_jobs(scheduler_ids)
+
+        kafka = self.sdkmr.get_kafka_client()
+        for job in canceled:
+            job_id = str(job["_id"])
+            scheduler_id = job.get("scheduler_id")
+            kafka.send_kafka_message(
+                message=KafkaCancelJob(
+                    job_id=job_id,
+                    previous_status=status_by_id[job_id],
+                    new_status=Status.terminated.value,
+                    scheduler_id=scheduler_id,
+                    terminated_code=terminated_code,
+                )
+            )
+            kafka.send_kafka_message(
+                message=KafkaCondorCommand(
+                    job_id=job_id,
+                    scheduler_id=scheduler_id,
+                    condor_command="condor_rm",
+                )
+            )
+
+        return [
+            {
+                "job_id": job_id,
+                "status": status_by_id.get(job_id),
+                "canceled": job_id in canceled_ids,
+            }
+            for job_id in job_ids
+        ]
+
     def check_job_canceled(self, job_id, as_admin=False) -> Dict:
         """
         Authorization Required: None
@@ -229,19 +401,20 @@ class JobsStatus:
         if error_code is None:
             error_code = ErrorCode.unknown_error.value
 
-        self.sdkmr.get_mongo_util().finish_job_with_error(
+        return self.sdkmr.get_mongo_util().finish_job_with_error(
             job_id=job_id,
             error_message=error_message,
             error_code=error_code,
             error=error,
         )
 
-    def _finish_job_with_success(self, job_id, job_output):
+    def _finish_job_with_success(self, job_id, job_output) -> Dict:
         """
         Allow either blank job outputs or outputs in a specific format (version/id/result)
 
         :param job_id: The job to finish
         :param job_output: Either the job output or {}, else something is not right
+        :return: The post-image of the finished job record
         """
         output = JobOutput()
         output.version = job_output.get("version")
@@ -270,7 +443,7 @@ class JobsStatus:
                 )
                 raise Exception(str(e) + str(error_message))
 
-        self.sdkmr.get_mongo_util().finish_job_with_success(
+        return self.sdkmr.get_mongo_util().finish_job_with_success(
             job_id=job_id, job_output=job_output
         )
 
@@ -296,16 +469,16 @@ class JobsStatus:
         :param error_code: int - default None, if given give this job an error code
         :param error: dict - default None, if given, set the error to this structure
         :param job_output: dict - default None, if given this job has some output
+
+        The job is fetched once for the permission check and then finished with a single
+        conditional update. Sending the execution stats to the catalog happens in a background
+        thread, so the caller (usually the JobRunner) does not wait on the catalog.
         """
 
         job = self.sdkmr.get_job_with_permission(
             job_id=job_id, requested_job_perm=JobPermissions.WRITE, as_admin=as_admin
         )
-        if job.status in [
-            Status.error.value,
-            Status.completed.value,
-            Status.terminated.value,
-        ]:
+        if job.status in self._FINISHED_STATES:
             raise InvalidStatusTransitionException(
                 f"Cannot finish job with a status of {job.status}"
             )
@@ -315,7 +488,7 @@ class JobsStatus:
             if error_code is None:
                 error_code = ErrorCode.job_crashed.value
 
-            self._finish_job_with_error(
+            job_record = self._finish_job_with_error(
                 job_id=job_id,
                 error_message=error_message,
                 error_code=error_code,
@@ -340,7 +513,7 @@ class JobsStatus:
             if error is None:
                 error = {"code": error_code, "name": msg, "error": msg, "message": msg}
 
-            self._finish_job_with_error(
+            job_record = self._finish_job_with_error(
                 job_id=job_id, error_message=msg, error_code=error_code, error=error
             )
 
@@ -356,7 +529,9 @@ class JobsStatus:
             )
         else:
             self.sdkmr.get_logger().debug("Finishing job with a success")
-            self._finish_job_with_success(job_id=job_id, job_output=job_output)
+            job_record = self._finish_job_with_success(
+                job_id=job_id, job_output=job_output
+            )
             self.sdkmr.get_kafka_client().send_kafka_message(
                 message=KafkaFinishJob(
                     job_id=str(job_id),
@@ -370,52 +545,50 @@ class JobsStatus:
 
         # Only send jobs to catalog that actually ran on a worker
         if job.running and job.running >= job.id.generation_time.timestamp():
-            self._send_exec_stats_to_catalog(job_id=job_id)
-            self._update_finished_job_with_usage(job_id, as_admin=as_admin)
+            threading.Thread(
+                target=self._post_finish_job,
+                kwargs={"job_record": job_record},
+                daemon=True,
+            ).start()
 
-    def _update_finished_job_with_usage(self, job_id, as_admin=None) -> Dict:
+    def _post_finish_job(self, job_record: Dict) -> None:
         """
-        # TODO Does this need a kafka message?
-        # TODO EE2 issue #251 : The saved job stats are inaccurate:
-        # The usage is not recorded until the job is completely finished.
-        :return: Resources at the time the job almost finished.
+        Work that is done after a job is finished and that the caller doesn't need to wait on.
+        Failures are logged rather than raised, as the job has already been finished.
+        The condor resource usage is recorded later by the ResourceUsageCollector, once condor
+        has the final values for the job.
+        :param job_record: The post-image of the finished job record
         """
-        # note this method is replaced by a magic mock in some tests
-        job = self.sdkmr.get_job_with_permission(
-            job_id=job_id, requested_job_perm=JobPermissions.WRITE, as_admin=as_admin
-        )
-        if job.status not in [
-            Status.completed.value,
-            Status.terminated.value,
-            Status.error.value,
-        ]:
-            raise Exception(
-                f"Cannot update job {job_id} because it was not yet finished. {job.status}"
+        try:
+            self._send_exec_stats_to_catalog(job_record=job_record)
+        except Exception:
+            self.sdkmr.get_logger().error(
+                f"Couldn't send execution stats to the catalog for {job_record['_id']}",
+                exc_info=True,
             )
-        condor = self.sdkmr.get_condor()
-        resources = condor.get_job_resource_info(job_id=job_id)
-        self.sdkmr.get_logger().debug(
-            f"Extracted the following condor job ads {resources}"
-        )
-        self.sdkmr.get_mongo_util().update_job_resources(
-            job_id=job_id, resources=resources
-        )
-        return resources
 
-    def check_job(self, job_id, check_permission, exclude_fields=None):
+    def _post_finish_jobs(self, job_records: List[Dict]) -> None:
+        for job_record in job_records:
+            self._post_finish_job(job_record)
+
+    def check_job(
+        self,
+        job_id,
+        check_permission,
+        exclude_fields=None,
+        return_resource_usage=False,
+    ):
 
         """
         check_job: check and return job status for a given job_id
 
         Parameters:
         job_id: id of job
+        return_resource_usage: whether to include the sampled resource usage of the job
         """
 
         self.sdkmr.logger.debug("Start fetching status for job: {}".format(job_id))
 
-        if exclude_fields is None:
-            exclude_fields = []
-
         if not job_id:
             raise ValueError("Please provide valid job_id")
 
@@ -424,6 +597,7 @@ class JobsStatus:
             check_permission=check_permission,
             exclude_fields=exclude_fields,
             return_list=0,
+            return_resource_usage=return_resource_usage,
         ).get(job_id)
 
         if "checkjob_error" in job_state:
@@ -432,19 +606,28 @@ class JobsStatus:
         return job_state
 
     def check_jobs(
-        self, job_ids, check_permission: bool, exclude_fields=None, return_list=None
+        self,
+        job_ids,
+        check_permission: bool,
+        exclude_fields=None,
+        return_list=None,
+        return_resource_usage=False,
     ):
         """
         check_jobs: check and return job status for a given of list job_ids
+
+        return_resource_usage: whether to include the sampled resource usage of the jobs
         """
 
         if exclude_fields is None:
             exclude_fields = []
 
-        with self.sdkmr.get_mongo_util().mongo_engine_connection():
-            jobs = self.sdkmr.get_mongo_util().get_jobs(
-                job_ids=job_ids, exclude_fields=exclude_fields
-            )
+        if not return_resource_usage:
+            exclude_fields = exclude_fields + RESOURCE_USAGE_FIELDS
+
+        jobs = self.sdkmr.get_mongo_util().get_job_views(
+            job_ids=job_ids, exclude_fields=exclude_fields
+        )
 
         if check_permission:
             try:
@@ -456,7 +639,7 @@ class JobsStatus:
                 )
             except RuntimeError as e:
                 self.sdkmr.logger.error(
-                    f"An error occurred while checking read permissions for jobs {jobs}"
+                    f"An error occurred while checking read permissions for jobs {job_ids}"
                 )
                 raise e
         else:
@@ -473,23 +656,7 @@ class JobsStatus:
                     "check_job_error": True,
                 }
             else:
-                mongo_rec = job.to_mongo().to_dict()
-                del mongo_rec["_id"]
-                mongo_rec["retry_count"] = len(job["retry_ids"])
-                mongo_rec["job_id"] = str(job.id)
-                mongo_rec["batch_id"] = job.batch_id
-                mongo_rec["created"] = int(job.id.generation_time.timestamp() * 1000)
-                mongo_rec["updated"] = int(job.updated * 1000)
-                if job.estimating:
-                    mongo_rec["estimating"] = int(job.estimating * 1000)
-                if job.running:
-                    mongo_rec["running"] = int(job.running * 1000)
-                if job.finished:
-                    mongo_rec["finished"] = int(job.finished * 1000)
-                if job.queued:
-                    mongo_rec["queued"] = int(job.queued * 1000)
-
-                job_states[str(job.id)] = mongo_rec
+                job_states[str(job.id)] = job.to_job_state()
 
         job_states = OrderedDict(
             {job_id: job_states.get(job_id, []) for job_id in job_ids}
@@ -520,7 +687,10 @@ class JobsStatus:
             )
 
         with self.sdkmr.get_mongo_util().mongo_engine_connection():
-            job_ids = [str(job.id) for job in Job.objects(wsid=workspace_id)]
+            job_ids = [
+                str(job["_id"])
+                for job in Job.objects(wsid=workspace_id).only("id").as_pymongo()
+            ]
 
         if not job_ids:
             return {}
@@ -534,18 +704,17 @@ class JobsStatus:
 
         return job_states
 
-    def _send_exec_stats_to_catalog(self, job_id):
+    def _send_exec_stats_to_catalog(self, job_record: Dict):
         # Some notes about app_ids in general
         # Batch apps containers have an app_id of "batch_app"
         # Download apps do not have an "app_id" or have it in the format of "module_id.app_name"
         # Jobs launched directly via EE2 client directly should not specify an "app_id"
 
-        job = self.sdkmr.get_mongo_util().get_job(job_id)
-        job_input = job.job_input
+        job_input = job_record["job_input"]
 
         log_exec_stats_params = dict()
-        log_exec_stats_params["user_id"] = job.user
-        app_id = job_input.app_id
+        log_exec_stats_params["user_id"] = job_record["user"]
+        app_id = job_input.get("app_id")
         if app_id:
             # Note this will not work properly for app_ids incorrectly separated by a '.',
             # which happens in some KBase code (which needs to be fixed at some point) -
@@ -554,15 +723,19 @@ class JobsStatus:
             log_exec_stats_params["app_module_name"] = app_id.split("/")[0]
             log_exec_stats_params["app_id"] = app_id.split("/")[-1]
 
-        method = job_input.method
+        method = job_input["method"]
         log_exec_stats_params["func_module_name"] = method.split(".")[0]
         log_exec_stats_params["func_name"] = method.split(".")[-1]
-        log_exec_stats_params["git_commit_hash"] = job_input.service_ver
-        log_exec_stats_params["creation_time"] = job.id.generation_time.timestamp()
-        log_exec_stats_params["exec_start_time"] = job.running
-        log_exec_stats_params["finish_time"] = job.finished
-        log_exec_stats_params["is_error"] = int(job.status == Status.error.value)
-        log_exec_stats_params["job_id"] = job_id
+        log_exec_stats_params["git_commit_hash"] = job_input.get("service_ver")
+        log_exec_stats_params["creation_time"] = job_record[
+            "_id"
+        ].generation_time.timestamp()
+        log_exec_stats_params["exec_start_time"] = job_record.get("running")
+        log_exec_stats_params["finish_time"] = job_record.get("finished")
+        log_exec_stats_params["is_error"] = int(
+            job_record["status"] == Status.error.value
+        )
+        log_exec_stats_params["job_id"] = str(job_record["_id"])
 
         self.sdkmr.get_catalog().log_exec_stats(log_exec_stats_params)
 
@@ -8,6 +8,7 @@ from bson import ObjectId
 
 from execution_engine2.utils.arg_processing import parse_bool
 from execution_engine2.exceptions import AuthError
+from execution_engine2.utils.json_stream import Deferred, StreamedList
 
 
 # TODO this class is duplicated all over the place, move to common file
@@ -28,24 +29,10 @@ class JobStatusRange:
         :param job_states: Processed Job States
         :return:
         """
-        stats = {}
-        keys = ["clientgroup", "user", "app_id", "method", "wsid", "status"]
-        for key in keys:
-            stats[key] = Counter()
-
+        stats = _JobStats()
         for job in job_states:
-            for key in keys:
-                attribute = job.get(key)
-                job_input = job.get("job_input", {})
-                requirements = job_input.get("requirements", {})
-                if attribute is None:
-                    attribute = job_input.get(key)
-                if attribute is None:
-                    attribute = requirements.get(key)
-                stats[key][attribute] += 1
-        for key in keys:
-            stats[key] = dict(stats[key])
-        return stats
+            stats.add(job)
+        return stats.to_dict()
 
     def check_jobs_date_range_for_user(
         self,
@@ -57,6 +44,7 @@ class JobStatusRange:
         user=None,
         offset=None,
         ascending=None,
+        stream=False,
     ):
 
         """
@@ -68,6 +56,9 @@ class JobStatusRange:
         :param user: Optional Username or "ALL" for all users
         :param offset: Optional offset for skipping records
         :param ascending: Sort by id ascending or descending
+        :param stream: read the jobs from the database as the response is written. The jobs,
+            count and stats are then only available by encoding the result with
+            execution_engine2.utils.json_stream.
         :return:
         """
         sort_order = self.get_sort_order(ascending)
@@ -119,7 +110,7 @@ class JobStatusRange:
             job_filter_temp["user"] = user
 
         count = self.sdkmr.get_job_counts(job_filter_temp)
-        jobs = self.sdkmr.get_jobs(
+        jobs = self.sdkmr.get_job_views(
             job_filter_temp, job_projection, sort_order, offset, limit
         )
 
@@ -127,12 +118,24 @@ class JobStatusRange:
             f"Searching for jobs with id_gt {dummy_ids.start} id_lt {dummy_ids.stop}"
         )
 
-        job_states = self._job_state_from_jobs(jobs)
-
         # Remove ObjectIds
         for item in job_filter_temp:
             job_filter_temp[item] = str(job_filter_temp[item])
 
+        if stream:
+            return self._stream_job_states(
+                jobs,
+                {
+                    "query_count": count,
+                    "filter": job_filter_temp,
+                    "skip": offset,
+                    "projection": job_projection,
+                    "limit": limit,
+                    "sort_order": sort_order,
+                },
+            )
+
+        job_states = self._job_state_from_jobs(jobs)
         stats = self._create_stats(job_states)
 
         return {
@@ -150,12 +153,30 @@ class JobStatusRange:
         # TODO Move to MongoUtils?
         # TODO Add support for projection (validate the allowed fields to project?) (Need better api design)
         # TODO Add support for filter (validate the allowed fields to project?) (Need better api design)
-        # TODO USE AS_PYMONGO() FOR SPEED
         # TODO Better define default fields
         # TODO Instead of SKIP use ID GT LT https://www.codementor.io/arpitbhayani/fast-and-efficient-pagination-in-mongodb-9095flbqr
         # ^ this one is important - the workspace was DOSed by a single open narrative at one
         #   point due to skip abuse, which is why it was removed
 
+    def _stream_job_states(self, jobs, fields: Dict) -> Dict:
+        """
+        Build a result whose job states are produced as the response is written, with the
+        count and stats following the jobs.
+        """
+        stats = _JobStats()
+
+        def job_states():
+            for job_state in self._iter_job_states(jobs):
+                stats.add(job_state)
+                yield job_state
+
+        return {
+            "jobs": StreamedList(job_states()),
+            "count": Deferred(lambda: stats.count),
+            **fields,
+            "stats": Deferred(stats.to_dict),
+        }
+
     def _get_dummy_dates(self, creation_start_time, creation_end_time):
 
         if creation_start_time is None:
@@ -197,34 +218,43 @@ class JobStatusRange:
         """
         Returns as per the spec file
 
-        :param jobs: MongoEngine Job Objects Query
+        :param jobs: JobViews of the jobs
         :return: list of job states of format
         Special Cases:
         str(_id)
         str(job_id)
         float(created/queued/estimating/running/finished/updated/) (Time in MS)
         """
-        hidden_keys = ["retry_saved_toggle"]
+        return list(JobStatusRange._iter_job_states(jobs))
 
-        job_states = []
+    @staticmethod
+    def _iter_job_states(jobs):
         for job in jobs:
-            mongo_rec = job.to_mongo().to_dict()
-
-            for key in hidden_keys:
-                if key in mongo_rec:
-                    del mongo_rec[key]
-
-            mongo_rec["_id"] = str(job.id)
-            mongo_rec["job_id"] = str(job.id)
-            mongo_rec["created"] = int(job.id.generation_time.timestamp() * 1000)
-            mongo_rec["updated"] = int(job.updated * 1000)
-            if job.estimating:
-                mongo_rec["estimating"] = int(job.estimating * 1000)
-            if job.queued:
-                mongo_rec["queued"] = int(job.queued * 1000)
-            if job.running:
-                mongo_rec["running"] = int(job.running * 1000)
-            if job.finished:
-                mongo_rec["finished"] = int(job.finished * 1000)
-            job_states.append(mongo_rec)
-        return job_states
+            yield job.to_range_state()
+
+
+class _JobStats:
+    """
+    Counts the values of various job attributes over a set of job states.
+    """
+
+    _KEYS = ["clientgroup", "user", "app_id", "method", "wsid", "status"]
+
+    def __init__(self):
+        self.count = 0
+        self._stats = {key: Counter() for key in self._KEYS}
+
+    def add(self, job: Dict):
+        self.count += 1
+        job_input = job.get("job_input", {})
+        requirements = job_input.get("requirements", {})
+        for key in self._KEYS:
+            attribute = job.get(key)
+            if attribute is None:
+                attribute = job_input.get(key)
+            if attribute is None:
+                attribute = requirements.get(key)
+            self._stats[key][attribute] += 1
+
+    def to_dict(self) -> Dict:
+        return {key: dict(counter) for key, counter in self._stats.items()}
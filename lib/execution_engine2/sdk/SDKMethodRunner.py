@@ -12,22 +12,24 @@ import time
 from datetime import datetime
 from enum import Enum
 from logging import Logger
-from typing import List
+from typing import Iterator, List
 
 import dateutil
 
 from execution_engine2.db.MongoUtil import MongoUtil
+from execution_engine2.db.models.job_view import RESOURCE_USAGE_FIELDS, JobView
 from execution_engine2.db.models.models import Job
-from execution_engine2.exceptions import AuthError
+from execution_engine2.exceptions import AuthError, IncorrectParamsException
 from execution_engine2.sdk import (
     EE2Runjob,
     EE2StatusRange,
     EE2Authentication,
     EE2Status,
     EE2Logs,
+    EE2ResourceReport,
 )
 from execution_engine2.sdk.EE2Constants import KBASE_CONCIERGE_USERNAME
-from execution_engine2.utils.Condor import Condor
+from execution_engine2.utils.scheduler import Scheduler
 from execution_engine2.authorization.workspaceauth import WorkspaceAuth
 from execution_engine2.utils.job_requirements_resolver import JobRequirementsResolver
 from execution_engine2.utils.clients import UserClientSet, ClientSet
@@ -37,6 +39,7 @@ from execution_engine2.utils.SlackUtils import SlackClient
 from installed_clients.CatalogClient import Catalog
 from installed_clients.WorkspaceClient import Workspace
 from execution_engine2.utils.catalog_cache import CatalogCache
+from execution_engine2.utils.tracing import traced
 
 
 class JobPermissions(Enum):
@@ -69,7 +72,7 @@ class SDKMethodRunner:
         if not clients:
             raise ValueError("clients is required")
         self.mongo_util = clients.mongo_util
-        self.condor = clients.condor
+        self.scheduler = clients.scheduler
         self.catalog = clients.catalog
         # Cache Instantiated on a per request basis
         self.catalog_cache = CatalogCache(catalog=clients.catalog_no_auth)
@@ -98,6 +101,7 @@ class SDKMethodRunner:
         self._ee2_status = None
         self._ee2_logs = None
         self._ee2_status_range = None
+        self._ee2_resource_report = None
         self._ee2_auth = None
         self.kafka_client = clients.kafka_client
         self.slack_client = clients.slack_client
@@ -114,6 +118,11 @@ class SDKMethodRunner:
             self._ee2_status_range = EE2StatusRange.JobStatusRange(self)
         return self._ee2_status_range
 
+    def get_resource_report(self) -> EE2ResourceReport.ResourceReport:
+        if self._ee2_resource_report is None:
+            self._ee2_resource_report = EE2ResourceReport.ResourceReport(self)
+        return self._ee2_resource_report
+
     def get_job_logs(self) -> EE2Logs.EE2Logs:
         if self._ee2_logs is None:
             self._ee2_logs = EE2Logs.EE2Logs(self)
@@ -206,11 +215,11 @@ class SDKMethodRunner:
         """
         return self.mongo_util
 
-    def get_condor(self) -> Condor:
+    def get_scheduler(self) -> Scheduler:
         """
-        Get the Condor interface for this instance of SDKMR
+        Get the job scheduler for this instance of SDKMR
         """
-        return self.condor
+        return self.scheduler
 
     # Permissions Decorators    #TODO Verify these actually work     #TODO add as_admin to these
 
@@ -252,6 +261,7 @@ class SDKMethodRunner:
     # at this point since MongoEngine creates a global connection to MongoDB
     # and makes it available to all the model objects.
 
+    @traced()
     def save_jobs(self, jobs: List[Job]) -> List[str]:
         """
         Save multiple jobs to the Mongo DB at once, and return all of the job ids
@@ -311,6 +321,18 @@ class SDKMethodRunner:
             .only(*job_projection)
         )
 
+    def get_job_views(
+        self, job_filter, job_projection, sort_order, offset, limit
+    ) -> Iterator[JobView]:
+        """
+        Get read only views of jobs from the database, created as the jobs are read from the
+        cursor rather than all at once. Takes the same arguments as get_jobs. The sampled
+        resource usage is never returned.
+        """
+        jobs = self.get_jobs(job_filter, job_projection, sort_order, offset, limit)
+        jobs = jobs.exclude(*RESOURCE_USAGE_FIELDS)
+        return map(JobView.from_mongo, jobs.as_pymongo().no_cache())
+
     # API ENDPOINTS
 
     # ENDPOINTS: Admin Related Endpoints
@@ -360,10 +382,16 @@ class SDKMethodRunner:
             job_id=job_id, log_lines=log_lines, as_admin=as_admin
         )
 
-    def view_job_logs(self, job_id, skip_lines=None, as_admin=False, limit=None):
+    def view_job_logs(
+        self, job_id, skip_lines=None, as_admin=False, limit=None, stream=False
+    ):
         """Authorization Required Read"""
         return self.get_job_logs().view_job_logs(
-            job_id=job_id, skip_lines=skip_lines, as_admin=as_admin, limit=limit
+            job_id=job_id,
+            skip_lines=skip_lines,
+            as_admin=as_admin,
+            limit=limit,
+            stream=stream,
         )
 
     # Endpoints: Changing a job's status
@@ -394,6 +422,15 @@ class SDKMethodRunner:
             job_id=job_id, terminated_code=terminated_code, as_admin=as_admin
         )
 
+    def cancel_jobs(self, job_ids, terminated_code=None):
+        """Authorization Required Admin Write"""
+        self.check_as_admin(requested_perm=JobPermissions.WRITE)
+        if not isinstance(job_ids, list):
+            raise IncorrectParamsException("job_ids must be a list")
+        return self.get_jobs_status().cancel_jobs(
+            job_ids=job_ids, terminated_code=terminated_code
+        )
+
     def handle_held_job(self, cluster_id):
         """Authorization Required Read/Write"""
         if self.check_as_admin(requested_perm=JobPermissions.WRITE):
@@ -401,6 +438,25 @@ class SDKMethodRunner:
                 cluster_id=cluster_id, as_admin=True
             )
 
+    def handle_held_jobs(self, cluster_ids):
+        """Authorization Required Admin Write"""
+        self.check_as_admin(requested_perm=JobPermissions.WRITE)
+        if not isinstance(cluster_ids, list):
+            raise IncorrectParamsException("cluster_ids must be a list")
+        return self.get_jobs_status().handle_held_jobs(cluster_ids=cluster_ids)
+
+    def get_resource_usage_report(
+        self, start_time, end_time, methods=None, min_jobs=None
+    ):
+        """Authorization Required Admin Read"""
+        self.check_as_admin(requested_perm=JobPermissions.READ)
+        return self.get_resource_report().get_resource_usage_report(
+            start_time=start_time,
+            end_time=end_time,
+            methods=methods,
+            min_jobs=min_jobs,
+        )
+
     def finish_job(
         self,
         job_id,
@@ -423,7 +479,9 @@ class SDKMethodRunner:
 
     # Endpoints: Checking a job's status
 
-    def check_job(self, job_id, exclude_fields=None, as_admin=False):
+    def check_job(
+        self, job_id, exclude_fields=None, as_admin=False, return_resource_usage=False
+    ):
         """Authorization Required: Read"""
         check_permission = True
 
@@ -435,6 +493,7 @@ class SDKMethodRunner:
             job_id=job_id,
             check_permission=check_permission,
             exclude_fields=exclude_fields,
+            return_resource_usage=return_resource_usage,
         )
 
     def check_job_canceled(self, job_id, as_admin=False):
@@ -453,6 +512,7 @@ class SDKMethodRunner:
         check_permission=True,
         exclude_fields=None,
         as_admin=False,
+        return_resource_usage=False,
     ):
         """Authorization Required: Read"""
 
@@ -467,6 +527,7 @@ class SDKMethodRunner:
             job_id=batch_id,
             check_permission=check_permission,
             exclude_fields=exclude_fields,
+            return_resource_usage=return_resource_usage,
         )
         child_job_ids = parent_job_status.get("child_jobs")
         child_job_states = []
@@ -476,6 +537,7 @@ class SDKMethodRunner:
                 check_permission=True,
                 exclude_fields=exclude_fields,
                 return_list=1,
+                return_resource_usage=return_resource_usage,
             )["job_states"]
         return {
             "batch_jobstate": parent_job_status,
@@ -513,6 +575,7 @@ class SDKMethodRunner:
         offset=None,
         ascending=None,
         as_admin=False,
+        stream=False,
     ):
         """Authorization Required: Read"""
         if as_admin:
@@ -527,6 +590,7 @@ class SDKMethodRunner:
             user=user,
             offset=offset,
             ascending=ascending,
+            stream=stream,
         )
 
     def get_job_with_permission(
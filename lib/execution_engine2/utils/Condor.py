@@ -4,9 +4,8 @@ Functions to call condor to manage jobs and extract resource requirements
 """
 import logging
 import pathlib
-from typing import Dict, Optional, Any
-
-import htcondor
+from types import MappingProxyType
+from typing import Dict, Optional, Any, List, Tuple
 
 from execution_engine2.sdk.job_submission_parameters import (
     JobSubmissionParameters,
@@ -17,9 +16,50 @@ from lib.execution_engine2.utils.CondorTuples import (
     JobInfo,
 )
 from execution_engine2.utils.arg_processing import not_falsy as _not_falsy
+from execution_engine2.utils.lazy_import import lazy_import
+from execution_engine2.utils.schedd_connection import ScheddConnection
+from execution_engine2.utils.scheduler import Scheduler
+
+htcondor = lazy_import("htcondor")
+
+_DISK_KEYS = ["RemoteUserCpu", "DiskUsage_RAW", "DiskUsage"]
+_CPU_KEYS = ["CpusUsage", "CumulativeRemoteSysCpu", "CumulativeRemoteUserCpu"]
+_MEMORY_KEYS = ["ResidentSetSize_RAW", "ResidentSetSize", "ImageSize_RAW"]
+_HELD_JOB_KEYS = ["HoldReason", "HoldReasonCode"]
+_MACHINE_KEYS = ["RemoteHost", "LastRemoteHost"]
+_TIME_KEYS = [
+    "CommittedTime",
+    "CommittedSuspensionTime",
+    "CompletionDate",
+    "CumulativeSuspensionTime",
+    "CumulativeTransferTime",
+    "JobCurrentFinishTransferInputDate",
+    "JobCurrentFinishTransferOutputDate",
+    "JobCurrentStartDate",
+    "JobCurrentStartExecutingDate",
+    "JobCurrentStartTransferInputDate",
+    "JobCurrentStartTransferOutputDate",
+]
+# The job ad keys saved to the job record as condor_job_ads
+RESOURCE_INFO_KEYS = (
+    _DISK_KEYS + _CPU_KEYS + _MEMORY_KEYS + _HELD_JOB_KEYS + _MACHINE_KEYS + _TIME_KEYS
+)
+# The job ad keys sampled from running jobs to build their resource usage time series
+_RUNNING_USAGE_KEYS = ("CpusUsage", "ResidentSetSize_RAW", "DiskUsage_RAW")
+
+
+# The maximum number of distinct submit description templates kept
+_SUBMIT_CACHE_SIZE = 128
+
+
+def _quote(value) -> str:
+    # Empty and missing label values are left empty rather than quoted
+    return f'"{value}"' if value else ""
 
 
-class Condor:
+class Condor(Scheduler):
+    scheduler_type = "condor"
+
     # TODO: Should these be outside of the class?
     CG = "+CLIENTGROUP"
     EXTERNAL_URL = "external-url"
@@ -31,6 +71,8 @@ class Condor:
     LEAVE_JOB_IN_QUEUE = "leavejobinqueue"
     TRANSFER_INPUT_FILES = "transfer_input_files"
     PYTHON_EXECUTABLE = "PYTHON_EXECUTABLE"
+    JOB_BATCH_NAME = "JobBatchName"
+    SCHEDD_REFRESH_SECONDS = "schedd-refresh-seconds"
 
     def __init__(self, config: Dict[str, str], htc=htcondor):
         """
@@ -59,154 +101,240 @@ class Condor:
             self.TRANSFER_INPUT_FILES, "/condor_shared/JobRunner.tgz"
         )
         self.logger = logging.getLogger("ee2")
+        # One schedd handle is shared by every call this process makes
+        self.schedd = ScheddConnection(
+            htc,
+            self.logger,
+            refresh_seconds=float(config.get(self.SCHEDD_REFRESH_SECONDS, 300)),
+        )
+        self._build_submit_templates()
+        self._submit_cache = {}
 
-    def _setup_environment_vars(self, params: JobSubmissionParameters) -> str:
+    def _build_submit_templates(self):
+        """
+        Build the parts of the submit description that are the same for every job, so that
+        only the job specific fields are built per job. The keys are kept in the order that
+        the description has always been built in.
+        """
         # 7 day docker job timeout default, Catalog token used to get access to volume mounts
-        environment_vars = {
-            "DOCKER_JOB_TIMEOUT": self.docker_timeout,
-            "KB_ADMIN_AUTH_TOKEN": self.catalog_token,
-            "KB_AUTH_TOKEN": params.user_creds.token,
-            "CLIENTGROUP": params.job_reqs.client_group,
-            "JOB_ID": params.job_id,
-            # "WORKDIR": f"{config.get('WORKDIR')}/{params.get('USER')}/{params.get('JOB_ID')}",
-            "CONDOR_ID": "$(Cluster).$(Process)",
-            "PYTHON_EXECUTABLE": self.python_executable,
-            "DEBUG_MODE": str(params.job_reqs.debug_mode),
-            "PARENT_JOB_ID": params.parent_job_id or "",
-        }
+        self._environment_head = (
+            f'"DOCKER_JOB_TIMEOUT={self.docker_timeout} '
+            + f"KB_ADMIN_AUTH_TOKEN={self.catalog_token} "
+            + "KB_AUTH_TOKEN="
+        )
+        # "WORKDIR": f"{config.get('WORKDIR')}/{params.get('USER')}/{params.get('JOB_ID')}",
+        self._environment_middle = (
+            "CONDOR_ID=$(Cluster).$(Process) "
+            + f"PYTHON_EXECUTABLE={self.python_executable} "
+        )
+        self._submit_head = MappingProxyType(
+            {
+                "universe": "vanilla",
+                "ShouldTransferFiles": "YES",
+                # If a job exits incorrectly put it on hold
+                "on_exit_hold": "ExitCode =!= 0",
+                #  Allow up to 12 hours of no response from job
+                "JobLeaseDuration": "43200",
+                #  Allow up to 12 hours for condor drain
+                "MaxJobRetirementTime": "43200",
+                # Remove jobs running longer than 7 days
+                "Periodic_Hold": "( RemoteWallClockTime > 604800 )",
+                "log": "runner_logs/$(Cluster).$(Process).log",
+            }
+        )
+        self._submit_tail = MappingProxyType(
+            {
+                "When_To_Transfer_Output": "ON_EXIT_OR_EVICT",
+                "getenv": "false",
+                self.LEAVE_JOB_IN_QUEUE: str(self.leave_job_in_queue),
+                "initial_dir": str(self.initial_dir),
+                "+Owner": f'"{self.pool_user}"',  # Must be quoted
+                "executable": f"{self.initial_dir}/{self.executable}",  # Must exist
+                "transfer_input_files": str(self.transfer_input_files),
+            }
+        )
 
-        environment = ""
-        for key, val in environment_vars.items():
-            environment += f"{key}={val} "
+    def _create_requirements_statement(self, job_reqs: JobRequirements) -> str:
+        reqs = []
+        if job_reqs.client_group_regex is not False:
+            # Default is True, so a value of None means True
+            reqs = [f'regexp("{job_reqs.client_group}",CLIENTGROUP)']
+        else:
+            reqs = [f'(CLIENTGROUP == "{job_reqs.client_group}")']
+        for key in sorted(job_reqs.scheduler_requirements):
+            reqs.append(f'({key} == "{job_reqs.scheduler_requirements[key]}")')
+        return " && ".join(reqs)
 
-        return f'"{environment}"'
+    def _create_submit(self, params: JobSubmissionParameters) -> Dict[str, str]:
+        # note some tests call this function directly and will need to be updated if the
+        # signature is changed
 
-    @staticmethod
-    def _add_hardcoded_attributes(sub, job_id):
-        sub["universe"] = "vanilla"
-        sub["ShouldTransferFiles"] = "YES"
-        # If a job exits incorrectly put it on hold
-        sub["on_exit_hold"] = "ExitCode =!= 0"
-        #  Allow up to 12 hours of no response from job
-        sub["JobLeaseDuration"] = "43200"
-        #  Allow up to 12 hours for condor drain
-        sub["MaxJobRetirementTime"] = "43200"
-        # Remove jobs running longer than 7 days
-        sub["Periodic_Hold"] = "( RemoteWallClockTime > 604800 )"
-        sub["log"] = "runner_logs/$(Cluster).$(Process).log"
-        err_file = f"{job_id}.err"
-        out_file = f"{job_id}.out"
-        err_path = f"runner_logs/{err_file}"
-        out_path = f"runner_logs/{out_file}"
-        err_path_remap = f"cluster_logs/{err_file}"
-        out_path_remap = f"cluster_logs/{out_file}"
+        # Jobs in a batch usually only differ by job id and input objects, so the rest of the
+        # description is built once per batch and copied. The user's token is never cached, so
+        # it isn't kept in memory after the submission
+        key = self._template_key(params)
+        cached = self._submit_cache.get(key)
+        if cached is None:
+            if len(self._submit_cache) >= _SUBMIT_CACHE_SIZE:
+                self._submit_cache.clear()
+            env_middle, env_tail = self._environment_parts(params)
+            cached = (self._build_submit(params), env_middle, env_tail)
+            self._submit_cache[key] = cached
+        template, env_middle, env_tail = cached
+
+        # Templates are never handed out, only copied. Overwriting keys in the copy keeps them
+        # in the template's order
+        job_id = params.job_id
+        source_ws_objects = ",".join(params.source_ws_objects)
+        sub = template.copy()
+        sub[self.JOB_BATCH_NAME] = job_id
+        sub["arguments"] = f"{job_id} {self.ee_endpoint}"
+        sub["+KB_SOURCE_WS_OBJECTS"] = (
+            f'"{source_ws_objects}"' if source_ws_objects else ""
+        )
+        sub["environment"] = (
+            f"{self._environment_head}{params.user_creds.token}"
+            f"{env_middle}{job_id}{env_tail}"
+        )
+        err_path = f"runner_logs/{job_id}.err"
+        out_path = f"runner_logs/{job_id}.out"
         sub["error"] = err_path
         sub["output"] = out_path
-        remap = f'"{err_path}={err_path_remap};{out_path}={out_path_remap}"'
-        sub["transfer_output_remaps"] = remap
-        sub["When_To_Transfer_Output"] = "ON_EXIT_OR_EVICT"
-        sub["getenv"] = "false"
+        sub["transfer_output_remaps"] = (
+            f'"{err_path}=cluster_logs/{job_id}.err;'
+            f'{out_path}=cluster_logs/{job_id}.out"'
+        )
         return sub
 
-    def _add_configurable_attributes(self, sub):
-        sub[self.LEAVE_JOB_IN_QUEUE] = self.leave_job_in_queue
-        sub["initial_dir"] = self.initial_dir
-        sub["+Owner"] = f'"{self.pool_user}"'  # Must be quoted
-        sub["executable"] = f"{self.initial_dir}/{self.executable}"  # Must exist
-        sub["transfer_input_files"] = self.transfer_input_files
-        return sub
+    @staticmethod
+    def _template_key(params: JobSubmissionParameters) -> Tuple:
+        """
+        Everything in the submit description other than the job id, input objects and token.
+        The application module is part of the application id. Comparing the parameter objects
+        themselves is several times slower.
+        """
+        reqs = params.job_reqs
+        app = params.app_info
+        sched_reqs = reqs.scheduler_requirements
+        return (
+            reqs.cpus,
+            reqs.memory_MB,
+            reqs.disk_GB,
+            reqs.client_group,
+            reqs.client_group_regex,
+            reqs.bill_to_user,
+            reqs.ignore_concurrency_limits,
+            reqs.debug_mode,
+            tuple(sched_reqs.items()) if sched_reqs else (),
+            app.module,
+            app.method,
+            app.get_application_id(),
+            params.user_creds.username,
+            params.parent_job_id,
+            params.wsid,
+        )
+
+    def _environment_parts(self, params: JobSubmissionParameters) -> Tuple[str, str]:
+        """
+        The job's environment variables between the token and the job id, and after the job
+        id.
+        """
+        job_reqs = params.job_reqs
+        middle = f" CLIENTGROUP={job_reqs.client_group} JOB_ID="
+        tail = (
+            f" {self._environment_middle}"
+            + f"DEBUG_MODE={job_reqs.debug_mode} "
+            + f'PARENT_JOB_ID={params.parent_job_id or ""} "'
+        )
+        return middle, tail
+
+    def _build_submit(self, params: JobSubmissionParameters) -> Dict[str, str]:
+        job_id = params.job_id
+        job_reqs = params.job_reqs
+        sub = {
+            self.JOB_BATCH_NAME: job_id,
+            "arguments": f"{job_id} {self.ee_endpoint}",
+        }
+        self._add_job_labels(sub=sub, params=params)
 
-    def _extract_resources_and_requirements(
-        self, sub: Dict[str, Any], job_reqs: JobRequirements
-    ) -> Dict[str, Any]:
         # Extract minimum condor resource requirements and client_group
-        sub["request_cpus"] = job_reqs.cpus
+        sub["request_cpus"] = str(job_reqs.cpus)
         sub["request_memory"] = f"{job_reqs.memory_MB}MB"
         sub["request_disk"] = f"{job_reqs.disk_GB}GB"
-        # Set requirements statement
         sub["requirements"] = self._create_requirements_statement(job_reqs)
         sub["+KB_CLIENTGROUP"] = f'"{job_reqs.client_group}"'
-        return sub
 
-    def _create_requirements_statement(self, job_reqs: JobRequirements) -> str:
-        reqs = []
-        if job_reqs.client_group_regex is not False:
-            # Default is True, so a value of None means True
-            reqs = [f'regexp("{job_reqs.client_group}",CLIENTGROUP)']
-        else:
-            reqs = [f'(CLIENTGROUP == "{job_reqs.client_group}")']
-        for key in sorted(job_reqs.scheduler_requirements):
-            reqs.append(f'({key} == "{job_reqs.scheduler_requirements[key]}")')
-        return " && ".join(reqs)
-
-    def _add_resources_and_special_attributes(
-        self, params: JobSubmissionParameters
-    ) -> Dict[str, str]:
-        sub = dict()
-        sub["JobBatchName"] = params.job_id
-        sub["arguments"] = f"{params.job_id} {self.ee_endpoint}"
-        sub = self._add_job_labels(sub=sub, params=params)
-        # Extract special requirements
-        sub = self._extract_resources_and_requirements(sub, params.job_reqs)
-
-        btu = params.job_reqs.bill_to_user
+        btu = job_reqs.bill_to_user
         user = btu if btu else params.user_creds.username
-        if not params.job_reqs.ignore_concurrency_limits:
+        if not job_reqs.ignore_concurrency_limits:
             sub["Concurrency_Limits"] = user
         sub["+AccountingGroup"] = f'"{user}"'
 
-        sub["environment"] = self._setup_environment_vars(params)
+        # set per job, as it contains the user's token
+        sub["environment"] = ""
 
-        return sub
-
-    def _create_submit(self, params: JobSubmissionParameters) -> Dict[str, str]:
-        # note some tests call this function directly and will need to be updated if the
-        # signature is changed
-
-        sub = self._add_resources_and_special_attributes(params)
-        sub = self._add_hardcoded_attributes(sub=sub, job_id=params.job_id)
-        sub = self._add_configurable_attributes(sub)
-        # Ensure all values are a string
-        for item in sub.keys():
-            sub[item] = str(sub[item])
+        sub.update(self._submit_head)
+        err_path = f"runner_logs/{job_id}.err"
+        out_path = f"runner_logs/{job_id}.out"
+        sub["error"] = err_path
+        sub["output"] = out_path
+        sub["transfer_output_remaps"] = (
+            f'"{err_path}=cluster_logs/{job_id}.err;'
+            + f'{out_path}=cluster_logs/{job_id}.out"'
+        )
+        sub.update(self._submit_tail)
         return sub
 
     @staticmethod
     def _add_job_labels(sub: Dict, params: JobSubmissionParameters):
-        sub["+KB_PARENT_JOB_ID"] = params.parent_job_id or ""
-        sub["+KB_MODULE_NAME"] = params.app_info.module
-        sub["+KB_FUNCTION_NAME"] = params.app_info.method
-        sub["+KB_APP_ID"] = params.app_info.get_application_id() or ""
-        sub["+KB_APP_MODULE_NAME"] = params.app_info.application_module or ""
-        sub["+KB_WSID"] = params.wsid or ""
-        sub["+KB_SOURCE_WS_OBJECTS"] = ",".join(params.source_ws_objects)
-
+        app_info = params.app_info
         # Ensure double quoted user inputs
-        for key in sub.keys():
-            if "+KB" in key:
-                value = sub[key]
-                if value != "":
-                    sub[key] = f'"{value}"'
-
+        sub["+KB_PARENT_JOB_ID"] = _quote(params.parent_job_id)
+        sub["+KB_MODULE_NAME"] = _quote(app_info.module)
+        sub["+KB_FUNCTION_NAME"] = _quote(app_info.method)
+        sub["+KB_APP_ID"] = _quote(app_info.get_application_id())
+        sub["+KB_APP_MODULE_NAME"] = _quote(app_info.application_module)
+        sub["+KB_WSID"] = _quote(params.wsid)
+        sub["+KB_SOURCE_WS_OBJECTS"] = _quote(",".join(params.source_ws_objects))
         return sub
 
-    def run_job(self, params: JobSubmissionParameters) -> SubmissionInfo:
+    def submit_jobs(
+        self, params: List[JobSubmissionParameters]
+    ) -> List[SubmissionInfo]:
         """
-        TODO: Add a retry
-        TODO: Add list of required params
-        :param params:  Params to run the job.
-        :return: ClusterID, Submit File, and Info about Errors
+        Submit jobs to condor in a single schedd transaction. If queuing any of the jobs fails
+        the transaction is aborted, so either all of the jobs are queued or none of them are.
+        :param params: Params to run the jobs.
+        :return: ClusterID, Submit File, and Info about Errors for each job, in order
         """
+        if not params:
+            return []
         # Contains sensitive information to be sent to condor
-        submit = self._create_submit(_not_falsy(params, "params"))
+        subs = [
+            self.htcondor.Submit(self._create_submit(_not_falsy(p, "params")))
+            for p in params
+        ]
 
-        sub = self.htcondor.Submit(submit)
-        try:
-            schedd = self.htcondor.Schedd()
+        def _submit(schedd):
             with schedd.transaction() as txn:
-                return SubmissionInfo(str(sub.queue(txn, 1)), sub, None)
+                return [sub.queue(txn, 1) for sub in subs]
+
+        try:
+            # The jobs may have been queued before a failure, so don't retry
+            cluster_ids = self.schedd.call("submit", _submit, retry=False)
         except Exception as e:
-            return SubmissionInfo(None, sub, e)
+            return [SubmissionInfo(None, sub, e) for sub in subs]
+        return [
+            SubmissionInfo(str(cluster_id), sub, None)
+            for cluster_id, sub in zip(cluster_ids, subs)
+        ]
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the number of calls this process made to the schedd, and their latencies, by kind
+        of call.
+        """
+        return self.schedd.get_stats()
 
     def get_job_resource_info(
         self, job_id: str = None, cluster_id: str = None
@@ -220,32 +348,71 @@ class Condor:
         if job_info is None:
             return {}
 
-        disk_keys = ["RemoteUserCpu", "DiskUsage_RAW", "DiskUsage"]
-        cpu_keys = ["CpusUsage", "CumulativeRemoteSysCpu", "CumulativeRemoteUserCpu"]
-        memory_keys = ["ResidentSetSize_RAW", "ResidentSetSize", "ImageSize_RAW"]
-
-        resource_keys = disk_keys + cpu_keys + memory_keys
-        held_job_keys = ["HoldReason", "HoldReasonCode"]
-        machine_keys = ["RemoteHost", "LastRemoteHost"]
-        time_keys = [
-            "CommittedTime",
-            "CommittedSuspensionTime",
-            "CompletionDate",
-            "CumulativeSuspensionTime",
-            "CumulativeTransferTime",
-            "JobCurrentFinishTransferInputDate",
-            "JobCurrentFinishTransferOutputDate",
-            "JobCurrentStartDate",
-            "JobCurrentStartExecutingDate",
-            "JobCurrentStartTransferInputDate",
-            "JobCurrentStartTransferOutputDate",
-        ]
+        return self._extract_resource_info(job_info)
+
+    @staticmethod
+    def _extract_resource_info(job_info: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: job_info.get(key) for key in RESOURCE_INFO_KEYS}
+
+    def get_jobs_resource_info(self, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the resource usage for many jobs at once with a single query against the schedd
+        queue and a single query against the schedd history.
+
+        :param job_ids: The ee2 job ids (condor JobBatchNames) to look up.
+        :return: A mapping of job id to the same resource keys as get_job_resource_info.
+            Jobs that condor doesn't know about are omitted.
+        """
+        if not job_ids:
+            return {}
+        batch_names = ", ".join(f'"{job_id}"' for job_id in job_ids)
+        constraint = f"member(JobBatchName, {{{batch_names}}})"
+        projection = [self.JOB_BATCH_NAME] + RESOURCE_INFO_KEYS
+        queue = self.schedd.call(
+            "query", lambda s: s.query(constraint=constraint, projection=projection)
+        )
+        history = self.schedd.call(
+            "history",
+            lambda s: list(s.history(constraint, projection, match=len(job_ids))),
+        )
 
-        extracted_resources = dict()
-        for key in resource_keys + held_job_keys + machine_keys + time_keys:
-            extracted_resources[key] = job_info.get(key)
+        resources = dict()
+        # Ads in the history are more accurate than ads for jobs still in the queue,
+        # so read the queue first and let the history overwrite it
+        for ad in queue:
+            resources[ad.get(self.JOB_BATCH_NAME)] = self._extract_resource_info(ad)
+        for ad in history:
+            resources[ad.get(self.JOB_BATCH_NAME)] = self._extract_resource_info(ad)
+        resources.pop(None, None)
+        return resources
+
+    def get_running_jobs_resource_usage(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get the current resource usage of all running ee2 jobs with a single query against
+        the schedd queue.
 
-        return extracted_resources
+        :return: A mapping of job id to a dict with the keys
+            cpu - the number of cpus currently in use
+            memory - the resident set size in MB
+            disk - the disk usage in MB
+        """
+        # Only ee2 jobs have a client group label
+        constraint = "JobStatus == 2 && KB_CLIENTGROUP =!= undefined"
+        projection = [self.JOB_BATCH_NAME] + list(_RUNNING_USAGE_KEYS)
+        usage = dict()
+        for ad in self.schedd.call(
+            "query", lambda s: s.query(constraint=constraint, projection=projection)
+        ):
+            job_id = ad.get(self.JOB_BATCH_NAME)
+            if job_id is None:
+                continue
+            # RSS and disk usage are reported in KiB
+            usage[job_id] = {
+                "cpu": round(float(ad.get("CpusUsage") or 0), 2),
+                "memory": int(ad.get("ResidentSetSize_RAW") or 0) // 1024,
+                "disk": int(ad.get("DiskUsage_RAW") or 0) // 1024,
+            }
+        return usage
 
     def _get_job_info(
         self, job_id: Optional[str] = None, cluster_id: Optional[str] = None
@@ -268,7 +435,9 @@ class Condor:
         )
 
         try:
-            job = self.htcondor.Schedd().query(constraint=constraint, limit=1)
+            job = self.schedd.call(
+                "query", lambda s: s.query(constraint=constraint, limit=1)
+            )
             if len(job) == 0:
                 job = [{}]
             return JobInfo(info=job[0], error=None)
@@ -277,13 +446,16 @@ class Condor:
             raise e
             # return JobInfo(info=None, error=e)
 
-    def cancel_job(self, job_id: str) -> bool:
+    def cancel_jobs(self, scheduler_ids: List[str]):
         """
-
-        :param job_id:
-        :return:
+        Remove many jobs from condor with one call to the schedd.
+        :param scheduler_ids: The condor cluster ids, e.g. 1234. Condor job ids, e.g. 1234.0,
+            are also accepted.
+        :return: The result of the removal, or False if condor could not be reached
         """
-        return self._cancel_jobs([f"{job_id}"])
+        return self._cancel_jobs(
+            [sid if "." in str(sid) else f"{sid}.0" for sid in scheduler_ids]
+        )
 
     def _cancel_jobs(self, scheduler_ids: list):
         """
@@ -306,8 +478,12 @@ class Condor:
             raise Exception("Please provide a list of condor ids to cancel")
 
         try:
-            cancel_jobs = self.htcondor.Schedd().act(
-                action=self.htcondor.JobAction.Remove, job_spec=scheduler_ids
+            # Removing a job twice is harmless, so it's safe to retry
+            cancel_jobs = self.schedd.call(
+                "act",
+                lambda s: s.act(
+                    action=self.htcondor.JobAction.Remove, job_spec=scheduler_ids
+                ),
             )
             return cancel_jobs
         except Exception:
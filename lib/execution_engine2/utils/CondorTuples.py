@@ -14,6 +14,13 @@ class SubmissionInfo(NamedTuple):
     submit: Dict
     error: Optional[Exception]
 
+    @property
+    def scheduler_id(self) -> Optional[str]:
+        """
+        The id the scheduler assigned to the job. For condor, the cluster id.
+        """
+        return self.clusterid
+
 
 class JobStatusCodes(enum.Enum):
     UNEXPANDED = 0
@@ -5,9 +5,11 @@ import logging
 from dataclasses import dataclass
 from typing import Optional
 
-from confluent_kafka import Producer
-
 from lib.execution_engine2.db.models.models import Status, ErrorCode
+from execution_engine2.utils.lazy_import import lazy_import
+from execution_engine2.utils.metrics import KAFKA, dependency_timer
+
+confluent_kafka = lazy_import("confluent_kafka")
 
 logger = logging.getLogger("ee2")
 STATUS_EVENT_TYPE = "job_status_update"
@@ -206,12 +208,15 @@ class KafkaClient:
         :return:
         """
         try:
-            producer = Producer({"bootstrap.servers": self.server_address})
-            producer.produce(
-                topic, json.dumps(message.__dict__), callback=_delivery_report
-            )
-            # TODO Remove POLL?
-            producer.poll(2)
+            with dependency_timer(KAFKA, "send"):
+                producer = confluent_kafka.Producer(
+                    {"bootstrap.servers": self.server_address}
+                )
+                producer.produce(
+                    topic, json.dumps(message.__dict__), callback=_delivery_report
+                )
+                # TODO Remove POLL?
+                producer.poll(2)
         except Exception as e:
             logger.error(
                 f"Failed to send message to kafka at topic={topic} message={json.dumps(message.__dict__)} server_address={self.server_address}"
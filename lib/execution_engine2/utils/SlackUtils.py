@@ -1,4 +1,87 @@
-import slack
+"""
+Sends notifications to slack without blocking the caller.
+
+Messages are put on a bounded queue and sent by a background thread. Messages of the same kind
+that arrive within a time window are coalesced into one post, e.g.
+"42 jobs have been canceled due to `2`: ...", and posts are rate limited with a token bucket
+so callers never need to sleep between messages. If slack is slow or down the queue fills up,
+further messages are dropped, and the number dropped is reported once slack is reachable
+again.
+"""
+
+import atexit
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from execution_engine2.utils.lazy_import import lazy_import
+
+slack = lazy_import("slack")
+
+# The maximum number of coalesced messages listed in a single post
+_MAX_COALESCED_DETAILS = 20
+
+
+class _Notification(NamedTuple):
+    channel: str
+    text: str
+    # Messages with the same group and channel in a window are coalesced. None means never
+    group: Optional[Tuple] = None
+    # Describes the coalesced messages, e.g. "jobs have been canceled"
+    summary: Optional[str] = None
+    # Identifies one message in the coalesced post, e.g. the job id
+    detail: Optional[str] = None
+
+
+class TokenBucket:
+    """
+    A token bucket rate limiter. Not thread safe.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param rate: The number of tokens added per second
+        :param capacity: The maximum number of tokens in the bucket, i.e. the burst size
+        :param clock: A monotonic clock, in seconds
+        """
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._last = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self) -> bool:
+        """
+        Take a token if one is available.
+        :return: True if a token was taken
+        """
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        """
+        :return: The number of seconds until a token is available
+        """
+        self._refill()
+        return max(0.0, (1 - self._tokens) / self.rate)
 
 
 class SlackClient:
@@ -8,15 +91,173 @@ class SlackClient:
         channel="#execution_engine_notifications",
         debug=False,
         endpoint=None,
+        window_seconds: float = 5,
+        messages_per_second: float = 1,
+        burst: int = 5,
+        max_queue_size: int = 1000,
+        close_timeout_seconds: float = 10,
     ):
+        """
+        :param token: The slack token
+        :param channel: The default channel for messages
+        :param debug: Whether to send the run, cancel and finish job messages
+        :param endpoint: The ee2 url, included in messages
+        :param window_seconds: How long to collect messages for before coalescing and sending
+            them
+        :param messages_per_second: The maximum sustained rate of posts to slack
+        :param burst: The maximum number of posts sent at once after a quiet period
+        :param max_queue_size: The maximum number of messages waiting to be sent. Further
+            messages are dropped
+        :param close_timeout_seconds: How long to spend sending queued messages when the
+            process exits
+        """
         if token is None:
             raise Exception("Please set add slack token to deploy.cfg")
+        if max_queue_size < 1:
+            raise ValueError("max_queue_size must be at least 1")
         self.client = slack.WebClient(token=token)
         self.channel = channel
         self.debug = debug
         self.endpoint = endpoint or "Endpoint not set"
+        self.window_seconds = window_seconds
+        self.close_timeout_seconds = close_timeout_seconds
+        self._bucket = TokenBucket(messages_per_second, burst)
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+        # Held while sending, so the worker and flush don't send out of order
+        self._send_lock = threading.Lock()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._close_deadline = None
 
     def safe_chat_post_message(self, channel, text):
+        """
+        Queue a message for slack. Never blocks and never raises.
+        """
+        self._enqueue(_Notification(channel, text))
+
+    def _enqueue(self, notification: _Notification):
+        try:
+            self._queue.put_nowait(notification)
+        except queue.Full:
+            with self._dropped_lock:
+                self._dropped += 1
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is not None or self._closed.is_set():
+                return
+            self._worker = threading.Thread(
+                target=self._run, name="slack-notifications", daemon=True
+            )
+            self._worker.start()
+            # Scripts such as the reapers exit right after queueing their last message
+            atexit.register(self.close)
+
+    def _run(self):
+        while not self._closed.is_set():
+            try:
+                first = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            # Collect everything that arrives in the window, then send it coalesced. Closing
+            # ends the window early
+            self._closed.wait(self.window_seconds)
+            self._send(self._coalesce([first] + self._drain()), self._close_time_left())
+        # Send whatever was queued before the client was closed
+        self._send(self._coalesce(self._drain()), self._close_time_left())
+
+    def _close_time_left(self) -> Optional[float]:
+        if self._close_deadline is None:
+            return None
+        return max(0.0, self._close_deadline - time.monotonic())
+
+    def flush(self, timeout: float = None):
+        """
+        Send all queued messages now, rather than at the end of the current window.
+        :param timeout: Give up and drop the remaining messages after this many seconds.
+            Default wait as long as the rate limit requires
+        """
+        self._send(self._coalesce(self._drain()), timeout)
+
+    def close(self):
+        """
+        Stop the background thread and send any queued messages, including those the thread
+        is collecting, waiting at most close_timeout_seconds.
+        """
+        self._close_deadline = time.monotonic() + self.close_timeout_seconds
+        with self._worker_lock:
+            self._closed.set()
+            worker = self._worker
+        if worker is not None:
+            worker.join(self._close_time_left())
+        else:
+            self.flush(self._close_time_left())
+
+    def _drain(self) -> List[_Notification]:
+        notifications = []
+        while True:
+            try:
+                notifications.append(self._queue.get_nowait())
+            except queue.Empty:
+                return notifications
+
+    def _coalesce(self, notifications: List[_Notification]) -> List[Tuple[str, str]]:
+        """
+        :return: A list of (channel, text) posts, in the order the first message of each post
+            was queued
+        """
+        posts = []
+        groups: Dict[Tuple, List[_Notification]] = {}
+        for n in notifications:
+            if n.group is None:
+                posts.append([n])
+                continue
+            key = (n.channel, n.group)
+            if key not in groups:
+                groups[key] = []
+                posts.append(groups[key])
+            groups[key].append(n)
+        ret = [(ns[0].channel, self._coalesced_text(ns)) for ns in posts]
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            ret.append(
+                (
+                    self.channel,
+                    f"{dropped} slack notifications were dropped as too many were queued"
+                    + f" ({self.endpoint})",
+                )
+            )
+        return ret
+
+    def _coalesced_text(self, notifications: List[_Notification]) -> str:
+        if len(notifications) == 1:
+            return notifications[0].text
+        details = [n.detail for n in notifications[:_MAX_COALESCED_DETAILS]]
+        text = f"{len(notifications)} {notifications[0].summary} ({self.endpoint}): "
+        text += ", ".join(details)
+        if len(notifications) > _MAX_COALESCED_DETAILS:
+            text += f" and {len(notifications) - _MAX_COALESCED_DETAILS} more"
+        return text
+
+    def _send(self, posts: List[Tuple[str, str]], timeout: float = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._send_lock:
+            for i, (channel, text) in enumerate(posts):
+                while not self._bucket.try_acquire():
+                    wait = self._bucket.wait_time()
+                    if deadline is not None and time.monotonic() + wait > deadline:
+                        with self._dropped_lock:
+                            self._dropped += len(posts) - i
+                        return
+                    time.sleep(wait)
+                self._post(channel, text)
+
+    def _post(self, channel, text):
         try:
             self.client.chat_postMessage(channel=channel, text=text)
         except Exception as e:
@@ -45,6 +286,30 @@ class SlackClient:
             f"Job {job_id} {batch_name} was successfully marked as error (status == {status})."
             + f" It probably died because of {calculated_hold_reason} ({hold_reason} {hold_reason_code}"
         )
+        self._enqueue(
+            _Notification(
+                self.channel,
+                message,
+                group=("held",),
+                summary="held jobs were marked as error",
+                detail=f"`{job_id}` ({hold_reason_code})",
+            )
+        )
+
+    def purge_summary_message(self, sweeps):
+        """
+        Send one message summarizing a run of the bad job purge.
+        :param sweeps: A list of dicts with the keys description, found, canceled and
+            failed, one per kind of stuck job that was looked for
+        """
+        if not any(sweep["found"] for sweep in sweeps):
+            return
+        lines = [
+            f"{sweep['description']}: found {sweep['found']}, canceled {sweep['canceled']}"
+            + (f", failed to cancel {sweep['failed']}" if sweep["failed"] else "")
+            for sweep in sweeps
+        ]
+        message = f"EE2 bad job purge ({self.endpoint})\n" + "\n".join(lines)
         self.safe_chat_post_message(channel=self.channel, text=message)
 
     def run_job_message(self, job_id, scheduler_id, username):
@@ -52,14 +317,30 @@ class SlackClient:
             return
 
         message = f"{username} has submitted job_id:{job_id} scheduler_id:{scheduler_id} ({self.endpoint}) "
-        self.safe_chat_post_message(channel=self.channel, text=message)
+        self._enqueue(
+            _Notification(
+                self.channel,
+                message,
+                group=("run",),
+                summary="jobs were submitted",
+                detail=f"{username} `{job_id}`",
+            )
+        )
 
     def cancel_job_message(self, job_id, scheduler_id, termination_code):
         if self.debug is False:
             return
 
         message = f"scheduler_id:`{scheduler_id}` job_id:`{job_id}` has been canceled due to `{termination_code}` ({self.endpoint})"
-        self.safe_chat_post_message(channel=self.channel, text=message)
+        self._enqueue(
+            _Notification(
+                self.channel,
+                message,
+                group=("cancel", termination_code),
+                summary=f"jobs have been canceled due to `{termination_code}`",
+                detail=f"`{job_id}`",
+            )
+        )
 
     def finish_job_message(self, job_id, scheduler_id, finish_status, error_code=None):
         if self.debug is False:
@@ -68,4 +349,13 @@ class SlackClient:
         message = f"scheduler_id:{scheduler_id} job_id:{job_id} has ended with a status of {finish_status} ({self.endpoint})"
         if error_code is not None:
             message += f" Error code is {error_code}"
-        self.safe_chat_post_message(channel=self.channel, text=message)
+        self._enqueue(
+            _Notification(
+                self.channel,
+                message,
+                group=("finish", finish_status, error_code),
+                summary=f"jobs have ended with a status of {finish_status}"
+                + (f" and error code {error_code}" if error_code is not None else ""),
+                detail=f"`{job_id}`",
+            )
+        )
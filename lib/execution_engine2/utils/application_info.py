@@ -98,6 +98,7 @@ class AppInfo:
         self.application = app
         self.application_module = mod
         self._sep = sep
+        self._application_id = f"{mod}{sep}{app}" if app else mod
 
     def get_method_id(self) -> str:
         """
@@ -109,11 +110,7 @@ class AppInfo:
         """
         Get the application id, e.g. module/application, if present
         """
-        if not self.application_module:
-            return None
-        if self.application:
-            return f"{self.application_module}{self._sep}{self.application}"
-        return self.application_module
+        return self._application_id
 
     def __eq__(self, other):
         if type(self) == type(other):  # noqa E721
@@ -3,7 +3,8 @@
 # Note on testing - this class is not generally unit-testable, and is only tested fully in
 # integration tests.
 
-from typing import Dict, Iterable
+import threading
+from typing import Any, Callable, Dict, Iterable
 
 from execution_engine2.authorization.roles import AdminAuthUtil
 from execution_engine2.authorization.workspaceauth import WorkspaceAuth
@@ -15,6 +16,9 @@ from execution_engine2.utils.SlackUtils import SlackClient
 from execution_engine2.utils.arg_processing import not_falsy as _not_falsy
 from execution_engine2.utils.arg_processing import parse_bool
 from execution_engine2.utils.job_requirements_resolver import JobRequirementsResolver
+from execution_engine2.utils.local_scheduler import LocalScheduler
+from execution_engine2.utils.metrics import AUTH, CATALOG, WORKSPACE, timed_client
+from execution_engine2.utils.scheduler import Scheduler
 from installed_clients.CatalogClient import Catalog
 from installed_clients.WorkspaceClient import Workspace
 from installed_clients.authclient import KBaseAuth
@@ -78,7 +82,7 @@ def get_user_client_set(cfg: Dict[str, str], user_id: str, token: str):
     ws_url = cfg.get("workspace-url")  # may want to make the keys constants?
     if not ws_url or not ws_url.strip():
         raise ValueError("missing workspace-url in configuration")
-    workspace = Workspace(ws_url, token=token)
+    workspace = timed_client(Workspace(ws_url, token=token), WORKSPACE)
     workspace_auth = WorkspaceAuth(user_id, workspace)
     return UserClientSet(user_id, token, workspace, workspace_auth)
 
@@ -94,7 +98,7 @@ class ClientSet:
         self,
         auth: KBaseAuth,
         auth_admin: AdminAuthUtil,
-        condor: Condor,
+        scheduler: Scheduler,
         catalog: Catalog,
         catalog_no_auth: Catalog,
         requirements_resolver: JobRequirementsResolver,
@@ -108,7 +112,7 @@ class ClientSet:
 
         self.auth = _not_falsy(auth, "auth")
         self.auth_admin = _not_falsy(auth_admin, "auth_admin")
-        self.condor = _not_falsy(condor, "condor")
+        self.scheduler = _not_falsy(scheduler, "scheduler")
         self.catalog = _not_falsy(catalog, "catalog")
         self.catalog_no_auth = _not_falsy(catalog_no_auth, "catalog_no_auth")
         self.requirements_resolver = _not_falsy(
@@ -119,6 +123,33 @@ class ClientSet:
         self.slack_client = _not_falsy(slack_client, "slack_client")
 
 
+class LazyClientSet(ClientSet):
+    """
+    A ClientSet whose clients are each created the first time they're used.
+    """
+
+    def __init__(self, factories: Dict[str, Callable[[], Any]]):
+        """
+        Initialize the client set.
+
+        factories - functions that create each client, keyed by the client attribute name.
+        """
+        # the clients are set as attributes when created, after which __getattr__ isn't called
+        self._factories = factories
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        factories = self.__dict__.get("_factories")
+        if not factories or name not in factories:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+        with self._lock:
+            if name not in self.__dict__:
+                self.__dict__[name] = _not_falsy(factories[name](), name)
+        return self.__dict__[name]
+
+
 # the constructor allows for mix and match of mocks and real implementations as needed
 # the method below handles all the client set up for going straight from a config
 
@@ -130,7 +161,7 @@ def get_clients(
 ) -> (
     KBaseAuth,
     AdminAuthUtil,
-    Condor,
+    Scheduler,
     Catalog,
     Catalog,
     JobRequirementsResolver,
@@ -153,50 +184,100 @@ def get_clients(
     catalog-token - a token to use with the catalog service. Ideally a service token
     kafka-host - the host string for a Kafka service
     slack-token - a token for contacting Slack
+    scheduler - the scheduler to run jobs with, condor or local. Default condor
     """
-    # Condor needs access to the entire deploy.cfg file, not just the ee2 section
-    condor = Condor(cfg)
+    factories = _client_factories(cfg, cfg_file, override_client_group)
+    return tuple(factories[name]() for name in _CLIENT_NAMES)
+
+
+# The ClientSet constructor arguments, in order
+_CLIENT_NAMES = (
+    "auth",
+    "auth_admin",
+    "scheduler",
+    "catalog",
+    "catalog_no_auth",
+    "requirements_resolver",
+    "kafka_client",
+    "mongo_util",
+    "slack_client",
+)
+
+
+def _client_factories(
+    cfg: Dict[str, str],
+    cfg_file: Iterable[str],
+    override_client_group: str = None,
+) -> Dict[str, Callable[[], Any]]:
+    # Returns functions that create each of the clients, keyed by ClientSet attribute
+    # the file may be closed by the time the requirements resolver is created
+    cfg_lines = list(cfg_file)
+    auth_url = cfg["auth-url"]
     # Do a check to ensure the urls and tokens actually work correctly?
     # TODO check keys are present - make some general methods for dealing with this
-    # token is needed for running log_exec_stats in EE2Status
-    catalog = Catalog(cfg["catalog-url"], token=cfg["catalog-token"])
-    # instance of catalog without creds is used here
-    catalog_no_auth = Catalog(cfg["catalog-url"])
-    jrr = JobRequirementsResolver(cfg_file, override_client_group)
-    auth_url = cfg["auth-url"]
-    auth = KBaseAuth(auth_url=auth_url + "/api/legacy/KBase/Sessions/Login")
-    # TODO using hardcoded roles for now to avoid possible bugs with mismatched cfg roles
-    #      these should probably be configurable.
-    #      See https://github.com/kbase/execution_engine2/issues/295
-    auth_admin = AdminAuthUtil(auth_url, [ADMIN_READ_ROLE, ADMIN_WRITE_ROLE])
-
-    # KafkaClient has a nice error message when the arg is None
-    kafka_client = KafkaClient(cfg.get("kafka-host"))
-
-    debug = parse_bool(cfg.get("debug"))
-    # SlackClient handles None arguments
-    slack_client = SlackClient(
-        cfg.get("slack-token"), debug=debug, endpoint=cfg.get("ee2-url")
-    )
-    # TODO check how MongoUtil handles a bad config + that error messages are understandable
-    mongo_util = MongoUtil(cfg)
-    return (
-        auth,
-        auth_admin,
-        condor,
-        catalog,
-        catalog_no_auth,
-        jrr,
-        kafka_client,
-        mongo_util,
-        slack_client,
-    )
+    return {
+        "auth": lambda: timed_client(
+            KBaseAuth(auth_url=auth_url + "/api/legacy/KBase/Sessions/Login"), AUTH
+        ),
+        # TODO using hardcoded roles for now to avoid possible bugs with mismatched cfg roles
+        #      these should probably be configurable.
+        #      See https://github.com/kbase/execution_engine2/issues/295
+        "auth_admin": lambda: timed_client(
+            AdminAuthUtil(auth_url, [ADMIN_READ_ROLE, ADMIN_WRITE_ROLE]), AUTH
+        ),
+        "scheduler": lambda: get_scheduler(cfg),
+        # token is needed for running log_exec_stats in EE2Status
+        "catalog": lambda: timed_client(
+            Catalog(cfg["catalog-url"], token=cfg["catalog-token"]), CATALOG
+        ),
+        # instance of catalog without creds is used here
+        "catalog_no_auth": lambda: timed_client(Catalog(cfg["catalog-url"]), CATALOG),
+        "requirements_resolver": lambda: JobRequirementsResolver(
+            cfg_lines, override_client_group
+        ),
+        # KafkaClient has a nice error message when the arg is None
+        "kafka_client": lambda: KafkaClient(cfg.get("kafka-host")),
+        # TODO check how MongoUtil handles a bad config + that error messages are understandable
+        "mongo_util": lambda: MongoUtil(cfg),
+        # SlackClient handles None arguments
+        "slack_client": lambda: SlackClient(
+            cfg.get("slack-token"),
+            debug=parse_bool(cfg.get("debug")),
+            endpoint=cfg.get("ee2-url"),
+        ),
+    }
+
+
+def get_scheduler(cfg: Dict[str, str]) -> Scheduler:
+    """
+    Create the scheduler jobs are run with.
+
+    cfg - the configuration dictionary
+
+    Keys in config:
+    scheduler - condor or local. Default condor
+    local-scheduler-workers - for the local scheduler, the maximum number of jobs running at
+        once. Default the number of cpus
+    external-url - for the local scheduler, the ee2 url the jobs contact
+    See the Condor class for the keys used by condor.
+    """
+    scheduler_type = cfg.get("scheduler", Condor.scheduler_type)
+    if scheduler_type == Condor.scheduler_type:
+        # Condor needs access to the entire deploy.cfg file, not just the ee2 section
+        return Condor(cfg)
+    if scheduler_type == LocalScheduler.scheduler_type:
+        workers = cfg.get("local-scheduler-workers")
+        return LocalScheduler(
+            cfg.get("external-url"), workers=int(workers) if workers else None
+        )
+    raise ValueError(f"Unknown scheduler {scheduler_type}")
 
 
 def get_client_set(
     cfg: Dict[str, str],
     cfg_file: Iterable[str],
     override_client_group: str = None,
+    lazy: bool = False,
 ) -> ClientSet:
     """
     A helper method to create a ClientSet from a config dict rather than constructing and passing
@@ -213,6 +294,12 @@ def get_client_set(
     catalog-token - a token to use with the catalog service. Ideally a service token
     kafka-host - the host string for a Kafka service
     slack-token - a token for contacting Slack
-    """
+    scheduler - the scheduler to run jobs with, condor or local. Default condor
 
+    lazy - create each client the first time it's used rather than now, so creating the set
+        doesn't connect to MongoDB or import the condor, kafka and slack libraries. A client
+        that can't be created raises the error when it's first used.
+    """
+    if lazy:
+        return LazyClientSet(_client_factories(cfg, cfg_file, override_client_group))
     return ClientSet(*get_clients(cfg, cfg_file, override_client_group))
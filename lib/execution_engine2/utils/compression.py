@@ -0,0 +1,128 @@
+"""
+HTTP response compression.
+
+JSON responses such as job lists and logs compress by an order of magnitude, so responses over
+a size threshold are compressed with gzip or deflate if the client accepts it.
+"""
+
+import gzip
+import zlib
+from typing import Dict, Iterable, Iterator, Optional
+
+GZIP = "gzip"
+DEFLATE = "deflate"
+
+# In order of preference when the client accepts both equally
+_SUPPORTED = (GZIP, DEFLATE)
+
+
+def _parse_accept_encoding(accept_encoding: str) -> Dict[str, float]:
+    ret = {}
+    for part in accept_encoding.split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for p in params:
+            name, _, value = p.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        ret[coding.lower()] = q
+    return ret
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Choose the content coding for a response from the Accept-Encoding request header.
+
+    :param accept_encoding: the header value, e.g. "gzip, deflate;q=0.5", or None.
+    :return: gzip, deflate, or None if the response shouldn't be compressed.
+    """
+    if not accept_encoding:
+        return None
+    accepted = _parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in _SUPPORTED:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, coding: str, level: int = 6) -> bytes:
+    """
+    Compress a response body.
+
+    :param body: the body.
+    :param coding: gzip or deflate.
+    :param level: the compression level, from 1, fastest, to 9, smallest.
+    """
+    if coding == GZIP:
+        # a fixed mtime so the same body always compresses to the same bytes
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if coding == DEFLATE:
+        # HTTP deflate is the zlib format
+        return zlib.compress(body, level)
+    raise ValueError(f"Unsupported content coding {coding}")
+
+
+def compress_stream(
+    chunks: Iterable[bytes], coding: str, level: int = 6
+) -> Iterator[bytes]:
+    """
+    Compress a response body produced in chunks, without holding the whole body in memory.
+
+    :param chunks: the body.
+    :param coding: gzip or deflate.
+    :param level: the compression level, from 1, fastest, to 9, smallest.
+    """
+    if coding not in _SUPPORTED:
+        raise ValueError(f"Unsupported content coding {coding}")
+    # wbits 31 writes a gzip header and trailer, 15 the zlib format
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31 if coding == GZIP else 15)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+class ResponseCompressor:
+    """
+    Compresses response bodies over a size threshold with a coding the client accepts.
+    """
+
+    def __init__(self, min_bytes: int = 1024, level: int = 6):
+        """
+        :param min_bytes: don't compress bodies smaller than this. 0 compresses every body.
+        :param level: the compression level, from 1, fastest, to 9, smallest. 0 turns
+            compression off.
+        """
+        if not 0 <= level <= 9:
+            raise ValueError("level must be between 0 and 9")
+        if min_bytes < 0:
+            raise ValueError("min_bytes must be at least 0")
+        self.min_bytes = min_bytes
+        self.level = level
+
+    def choose(self, accept_encoding: Optional[str], size: int = None) -> Optional[str]:
+        """
+        Choose the content coding for a response.
+
+        :param accept_encoding: the Accept-Encoding request header, or None.
+        :param size: the size of the body, if known.
+        :return: the coding, or None if the response shouldn't be compressed.
+        """
+        if not self.level or (size is not None and size < self.min_bytes):
+            return None
+        return negotiate(accept_encoding)
+
+    def compress(self, body: bytes, coding: str) -> bytes:
+        return compress(body, coding, self.level)
+
+    def compress_stream(self, chunks: Iterable[bytes], coding: str) -> Iterator[bytes]:
+        return compress_stream(chunks, coding, self.level)
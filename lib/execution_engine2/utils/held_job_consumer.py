@@ -0,0 +1,245 @@
+"""
+Follows the HTCondor job event log and hands held jobs to a handler in batches.
+
+The consumer keeps the event log open and saves its position (the inode of the log file, the
+byte offset into it and the id of the last event read) to Mongo after every batch, so
+restarting the reaper resumes where it left off rather than replaying days of events.
+Positions are only saved after the handler succeeds, so a batch is retried if the handler
+fails or the reaper dies; handling a held job twice is harmless as finished jobs are left
+alone.
+
+When condor rotates the event log, the consumer finishes reading the rotated file before
+moving on to the new one.
+"""
+
+import os
+import time
+from logging import Logger
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from execution_engine2.db.MongoUtil import MongoUtil
+from execution_engine2.utils.arg_processing import not_falsy as _not_falsy
+from execution_engine2.utils.lazy_import import lazy_import
+
+htcondor = lazy_import("htcondor")
+
+# Suffixes condor appends to rotated event logs, depending on EVENT_LOG_MAX_ROTATIONS
+_ROTATED_SUFFIXES = [".old", ".1"]
+# Jobs held while their input is spooled are not broken
+_IGNORED_HOLD_REASON_CODES = {16}
+
+
+def _get_offset(log) -> int:
+    # The htcondor bindings only expose the read position of an event log through its
+    # pickle state, which is (dict, deadline, offset)
+    return log.__getstate__()[2]
+
+
+def _set_offset(log, offset: int):
+    state = log.__getstate__()
+    log.__setstate__((state[0], state[1], offset))
+
+
+def _event_id(event) -> str:
+    return f"{event.cluster}.{event.proc}:{int(event.type)}:{event.timestamp}"
+
+
+class HeldJobEventConsumer:
+    """
+    Reads held job events from the condor event log and passes them to a handler in batches.
+    """
+
+    CHECKPOINT_NAME = "held_job_event_log"
+
+    def __init__(
+        self,
+        event_log_path: Path,
+        mongo_util: MongoUtil,
+        handler: Callable[[List[Dict]], None],
+        logger: Logger,
+        batch_size: int = 100,
+        wait_seconds: int = 15,
+        checkpoint_events: int = 1000,
+        initial_lookback_seconds: int = 5 * 24 * 60 * 60,
+        htc=htcondor,
+    ):
+        """
+        Create the consumer.
+
+        event_log_path - the path to the condor event log.
+        mongo_util - the mongo utilities used to save the position in the event log.
+        handler - called with a list of held job events, each a dict with the keys
+            cluster_id, hold_reason_code, hold_reason and timestamp.
+        logger - the logger.
+        batch_size - the maximum number of held jobs passed to the handler at once.
+        wait_seconds - how long to wait for new events before handling a partial batch.
+        checkpoint_events - the maximum number of events read before saving the position,
+            whether or not any jobs were held.
+        initial_lookback_seconds - when no position has been saved, events older than this
+            are skipped.
+        htc - the htcondor module, or an alternate implementation or mock.
+        """
+        self.event_log_path = Path(_not_falsy(event_log_path, "event_log_path"))
+        self.mongo_util = _not_falsy(mongo_util, "mongo_util")
+        self.handler = _not_falsy(handler, "handler")
+        self.logger = _not_falsy(logger, "logger")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if checkpoint_events < 1:
+            raise ValueError("checkpoint_events must be at least 1")
+        self.batch_size = batch_size
+        self.wait_seconds = wait_seconds
+        self.checkpoint_events = checkpoint_events
+        self.initial_lookback_seconds = initial_lookback_seconds
+        self.htcondor = htc
+
+        self._log = None
+        self._inode = None
+        self._last_event_id = None
+        self._skip_event_id = None
+        self._skip_before = None
+
+    def run(self):
+        """
+        Follow the event log forever.
+        """
+        while True:
+            self.consume()
+
+    def consume(self) -> int:
+        """
+        Read one batch of events, waiting up to wait_seconds for new events, and pass any held
+        jobs to the handler.
+
+        :return: the number of held jobs passed to the handler.
+        """
+        try:
+            if self._log is None:
+                return self._open()
+            if self._has_rotated():
+                handled = self._drain()
+                self._open_log(self.event_log_path, self._stat().st_ino, 0)
+                self._save_checkpoint()
+                return handled
+            return self._consume_batch(self.wait_seconds)[1]
+        except Exception:
+            # Start again from the last saved position so no held jobs are missed
+            self.close()
+            raise
+
+    def close(self):
+        """
+        Close the event log. The next call to consume resumes from the last saved position.
+        """
+        if self._log is not None:
+            self._log.close()
+        self._log = None
+
+    def _stat(self) -> os.stat_result:
+        return os.stat(self.event_log_path)
+
+    def _has_rotated(self) -> bool:
+        try:
+            return self._stat().st_ino != self._inode
+        except FileNotFoundError:
+            # condor hasn't created the new log yet
+            return False
+
+    def _find_rotated(self, inode: int) -> Optional[Path]:
+        for suffix in _ROTATED_SUFFIXES:
+            path = self.event_log_path.with_name(self.event_log_path.name + suffix)
+            if path.exists() and os.stat(path).st_ino == inode:
+                return path
+        return None
+
+    def _open(self) -> int:
+        checkpoint = self.mongo_util.get_checkpoint(self.CHECKPOINT_NAME)
+        stat = self._stat()
+        if checkpoint is None:
+            self.logger.info(f"No saved position for {self.event_log_path}")
+            self._skip_before = time.time() - self.initial_lookback_seconds
+            self._open_log(self.event_log_path, stat.st_ino, 0)
+            return 0
+        inode = checkpoint["inode"]
+        offset = checkpoint["offset"]
+        event_id = checkpoint.get("event_id")
+        if inode == stat.st_ino and offset <= stat.st_size:
+            self._open_log(self.event_log_path, inode, offset, event_id)
+            return 0
+        handled = 0
+        rotated = self._find_rotated(inode)
+        if rotated:
+            self.logger.info(f"Finishing rotated event log {rotated} from {offset}")
+            self._open_log(rotated, inode, offset, event_id)
+            handled = self._drain()
+        else:
+            self.logger.warning(
+                f"Could not find the event log at the saved position {checkpoint}, "
+                + f"starting from the beginning of {self.event_log_path}"
+            )
+        self._open_log(self.event_log_path, stat.st_ino, 0)
+        self._save_checkpoint()
+        return handled
+
+    def _open_log(self, path: Path, inode: int, offset: int, skip_event_id=None):
+        self.close()
+        self._log = self.htcondor.JobEventLog(str(path))
+        if offset:
+            _set_offset(self._log, offset)
+        self._inode = inode
+        self._skip_event_id = skip_event_id
+
+    def _drain(self) -> int:
+        handled = 0
+        while True:
+            read, held = self._consume_batch(0)
+            handled += held
+            if not read:
+                return handled
+
+    def _consume_batch(self, wait_seconds: int) -> Tuple[int, int]:
+        read = 0
+        held = []
+        for event in self._log.events(wait_seconds):
+            read += 1
+            event_id = _event_id(event)
+            skip_event_id, self._skip_event_id = self._skip_event_id, None
+            if event_id == skip_event_id:
+                # already handled before the last checkpoint
+                continue
+            self._last_event_id = event_id
+            if self._skip_before is not None and event.timestamp < self._skip_before:
+                continue
+            if self._is_held(event):
+                held.append(
+                    {
+                        "cluster_id": str(event.cluster),
+                        "hold_reason_code": event.get("HoldReasonCode"),
+                        "hold_reason": event.get("HoldReason"),
+                        "timestamp": event.timestamp,
+                    }
+                )
+            if len(held) >= self.batch_size or read >= self.checkpoint_events:
+                break
+        if held:
+            self.handler(held)
+        if read:
+            self._save_checkpoint()
+        return read, len(held)
+
+    def _is_held(self, event) -> bool:
+        if event.type != self.htcondor.JobEventType.JOB_HELD:
+            return False
+        code = event.get("HoldReasonCode")
+        return code is None or int(code) not in _IGNORED_HOLD_REASON_CODES
+
+    def _save_checkpoint(self):
+        self.mongo_util.save_checkpoint(
+            self.CHECKPOINT_NAME,
+            {
+                "inode": self._inode,
+                "offset": _get_offset(self._log),
+                "event_id": self._last_event_id,
+            },
+        )
@@ -0,0 +1,107 @@
+"""
+Reports where the time importing a module goes, to keep the server's cold start fast.
+
+Imports the module in a fresh interpreter with python -X importtime and lists the slowest
+imports by their own time and by their time including the modules they import.
+
+Run from the repository root, with the server's environment:
+
+    KB_DEPLOYMENT_CONFIG=deploy.cfg PYTHONPATH=.:lib \\
+        python -m execution_engine2.utils.import_profile [--top 20] [module]
+
+The module defaults to execution_engine2.execution_engine2Server.
+"""
+
+import argparse
+import subprocess
+import sys
+from typing import List, NamedTuple
+
+_DEFAULT_MODULE = "execution_engine2.execution_engine2Server"
+_PREFIX = "import time:"
+
+
+class ImportTime(NamedTuple):
+    module: str
+    # the time importing the module's own code, in microseconds
+    self_us: int
+    # the time including the modules it imported
+    cumulative_us: int
+    # how deeply nested the import is, 0 for the top level
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportTime]:
+    """
+    Parse the output of python -X importtime.
+
+    :param output: the interpreter's stderr.
+    :return: the imports, in the order they completed.
+    """
+    ret = []
+    for line in output.splitlines():
+        if not line.startswith(_PREFIX):
+            continue
+        fields = line.partition(_PREFIX)[2].split("|")
+        if len(fields) != 3:
+            continue
+        self_us, cumulative_us, name = fields
+        try:
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            # the header line
+            continue
+        stripped = name.lstrip()
+        # the name is indented by two spaces per level, after the separating space
+        depth = (len(name) - len(stripped) - 1) // 2
+        ret.append(ImportTime(stripped.rstrip(), self_us, cumulative_us, depth))
+    return ret
+
+
+def profile(module: str) -> List[ImportTime]:
+    """
+    Import a module in a new interpreter and return the import times.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if proc.returncode:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr}")
+    return parse_importtime(proc.stderr)
+
+
+def report(times: List[ImportTime], top: int = 20) -> str:
+    """
+    Format a report of the slowest imports.
+    """
+    total = sum(t.cumulative_us for t in times if t.depth == 0)
+    lines = [f"total import time: {total / 1000:.1f} ms, {len(times)} modules"]
+    for title, key in [
+        ("by own time", lambda t: t.self_us),
+        ("by cumulative time", lambda t: t.cumulative_us),
+    ]:
+        lines += ["", f"slowest {top} {title}", f"{'ms':>10}{'cumul ms':>10}  module"]
+        for t in sorted(times, key=key, reverse=True)[:top]:
+            lines.append(
+                f"{t.self_us / 1000:>10.1f}{t.cumulative_us / 1000:>10.1f}  {t.module}"
+            )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("module", nargs="?", default=_DEFAULT_MODULE)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+    try:
+        times = profile(args.module)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    print(report(times, args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+JSON encoding and decoding for the JSON-RPC server.
+
+Large responses, e.g. check_jobs for thousands of jobs or get_job_logs with tens of thousands of
+lines, spend most of their CPU time in JSON encoding, so orjson is used when it's installed. The
+standard library json module is used otherwise.
+
+Both codecs serialize sets and frozensets as lists and objects with a toJSONable method as the
+method's return value. If orjson can't encode a value, e.g. an integer larger than 64 bits, the
+standard library is used for that value.
+"""
+
+import json
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+STDLIB = "stdlib"
+ORJSON = "orjson"
+
+
+def _default(obj):
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "toJSONable"):
+        return obj.toJSONable()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class JSONObjectEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, (set, frozenset)) or hasattr(obj, "toJSONable"):
+            return _default(obj)
+        return json.JSONEncoder.default(self, obj)
+
+
+class StdlibCodec:
+    """
+    Encodes and decodes JSON with the standard library.
+    """
+
+    name = STDLIB
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, cls=JSONObjectEncoder).encode("utf-8")
+
+    def loads(self, data) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """
+    Encodes and decodes JSON with orjson.
+    """
+
+    name = ORJSON
+
+    def __init__(self):
+        if orjson is None:
+            raise ValueError("orjson is not installed")
+        self._fallback = StdlibCodec()
+
+    def dumps(self, obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # e.g. integers larger than 64 bits. JSONEncodeError is a TypeError
+            return self._fallback.dumps(obj)
+
+    def loads(self, data) -> Any:
+        # JSONDecodeError is a ValueError
+        return orjson.loads(data)
+
+
+def get_codec(name: Optional[str] = None):
+    """
+    Get a JSON codec.
+
+    :param name: stdlib or orjson. Default orjson if it's installed, stdlib otherwise.
+    """
+    if not name:
+        name = ORJSON if orjson is not None else STDLIB
+    if name == ORJSON:
+        return OrjsonCodec()
+    if name == STDLIB:
+        return StdlibCodec()
+    raise ValueError(f"Unknown JSON codec {name}")
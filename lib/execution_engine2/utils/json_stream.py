@@ -0,0 +1,121 @@
+"""
+Incrementally encoded JSON, so large RPC results can be sent as they're read from the database
+rather than built in memory first.
+
+A method result marks a list to be streamed by wrapping an iterator in a StreamedList, and a
+value that's only known once the list has been read, e.g. a count, with a Deferred placed after
+the list. iter_encode then produces the JSON in chunks, in the same form as encoding the fully
+built result.
+"""
+
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator
+
+# Items encoded with a single call to the JSON encoder
+_ITEM_BATCH = 500
+# The minimum size of the chunks produced, other than the last
+_CHUNK_BYTES = 64 * 1024
+# How far into a result to look for streamed values
+_MAX_DEPTH = 4
+
+
+class StreamedList:
+    """
+    A JSON array whose items come from an iterable as the response is written. Can only be
+    iterated once.
+    """
+
+    def __init__(self, items: Iterable[Any]):
+        self._items = items
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._items)
+
+
+class Deferred:
+    """
+    A JSON value computed when the response reaches it, i.e. after any streamed values before it
+    in the result have been written.
+    """
+
+    def __init__(self, compute: Callable[[], Any]):
+        self._compute = compute
+
+    def value(self) -> Any:
+        return self._compute()
+
+
+def _is_stream(obj) -> bool:
+    return type(obj) is StreamedList or type(obj) is Deferred
+
+
+def has_stream(obj, depth: int = _MAX_DEPTH) -> bool:
+    """
+    Check whether a result contains streamed values in its top levels of dicts and lists.
+    """
+    if _is_stream(obj):
+        return True
+    if depth == 0:
+        return False
+    if isinstance(obj, dict):
+        values = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        values = obj
+    else:
+        return False
+    return any(
+        _is_stream(v)
+        or (isinstance(v, (dict, list, tuple)) and has_stream(v, depth - 1))
+        for v in values
+    )
+
+
+def _encode(obj, dumps: Callable[[Any], bytes], depth: int) -> Iterator[bytes]:
+    if type(obj) is StreamedList:
+        yield b"["
+        items = iter(obj)
+        first = True
+        while True:
+            batch = list(islice(items, _ITEM_BATCH))
+            if not batch:
+                break
+            if not first:
+                yield b","
+            first = False
+            # strip the brackets
+            yield dumps(batch)[1:-1]
+        yield b"]"
+    elif type(obj) is Deferred:
+        yield from _encode(obj.value(), dumps, depth)
+    elif isinstance(obj, dict) and has_stream(obj, depth):
+        yield b"{"
+        for i, (k, v) in enumerate(obj.items()):
+            yield (b"," if i else b"") + dumps(str(k)) + b":"
+            yield from _encode(v, dumps, depth - 1)
+        yield b"}"
+    elif isinstance(obj, (list, tuple)) and has_stream(obj, depth):
+        yield b"["
+        for i, v in enumerate(obj):
+            if i:
+                yield b","
+            yield from _encode(v, dumps, depth - 1)
+        yield b"]"
+    else:
+        yield dumps(obj)
+
+
+def iter_encode(obj, dumps: Callable[[Any], bytes]) -> Iterator[bytes]:
+    """
+    Encode a result containing streamed values as JSON, in chunks.
+
+    :param obj: the result.
+    :param dumps: encodes a value without streamed values as UTF-8 JSON.
+    """
+    buf = bytearray()
+    for part in _encode(obj, dumps, _MAX_DEPTH):
+        buf += part
+        if len(buf) >= _CHUNK_BYTES:
+            yield bytes(buf)
+            buf.clear()
+    if buf:
+        yield bytes(buf)
@@ -0,0 +1,57 @@
+"""
+Deferred imports for heavy optional dependencies.
+
+htcondor, confluent_kafka and slack together take a large part of the server's start up time,
+and many requests, and some processes, never use them. lazy_import returns a module that is
+only loaded when one of its attributes is first used.
+"""
+
+import importlib
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+from typing import Iterable
+
+_LOCK = threading.Lock()
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Import a module when one of its attributes is first used.
+
+    :param name: the absolute name of the module.
+    :return: the module, loaded already if it had been imported elsewhere.
+    """
+    with _LOCK:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        return module
+
+
+def is_loaded(module: ModuleType) -> bool:
+    """
+    Check whether a module returned by lazy_import has been loaded.
+    """
+    # the lazy module's class is switched back to a plain module when it loads
+    return not isinstance(module, importlib.util._LazyModule)
+
+
+def load(modules: Iterable[ModuleType]):
+    """
+    Load modules returned by lazy_import now, e.g. before forking workers so they share the
+    loaded modules.
+    """
+    for module in modules:
+        if not is_loaded(module):
+            # any attribute access loads the module
+            getattr(module, "__dict__")
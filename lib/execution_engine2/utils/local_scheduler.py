@@ -0,0 +1,272 @@
+"""
+A scheduler that runs jobs as processes on the ee2 host, so the whole run, start, log and
+finish lifecycle of a job can be run and benchmarked without an HTCondor pool.
+
+By default each job runs run_stub_job, which calls back into ee2 the same way the job runner
+does: it starts the job, adds some log lines and finishes the job. Not for production use, jobs
+are lost if ee2 restarts.
+"""
+
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from logging import getLogger
+from multiprocessing.connection import wait
+from typing import Any, Callable, Dict, List, Optional
+
+from execution_engine2.sdk.job_submission_parameters import JobSubmissionParameters
+from execution_engine2.utils.Condor import RESOURCE_INFO_KEYS
+from execution_engine2.utils.CondorTuples import SubmissionInfo
+from execution_engine2.utils.arg_processing import not_falsy as _not_falsy
+from execution_engine2.utils.scheduler import Scheduler
+from installed_clients.execution_engine2Client import execution_engine2
+
+# The number of finished jobs remembered for resource lookups
+_MAX_FINISHED_JOBS = 10000
+
+
+def run_stub_job(
+    job_id: str,
+    ee2_url: str,
+    token: str,
+    log_lines: int = 10,
+    runtime_seconds: float = 0,
+):
+    """
+    Go through the lifecycle of a job against an ee2 server without running anything.
+
+    :param job_id: the ee2 job id.
+    :param ee2_url: the url of the ee2 server.
+    :param token: the token of the user that ran the job.
+    :param log_lines: the number of log lines to add.
+    :param runtime_seconds: how long the job pretends to run for.
+    """
+    ee2 = execution_engine2(ee2_url, token=token)
+    ee2.start_job({"job_id": job_id, "skip_estimation": 1})
+    if log_lines:
+        lines = [
+            {"line": f"stub job {job_id} line {i}", "is_error": 0}
+            for i in range(log_lines)
+        ]
+        ee2.add_job_logs({"job_id": job_id}, lines)
+    if runtime_seconds:
+        time.sleep(runtime_seconds)
+    ee2.finish_job(
+        {"job_id": job_id, "job_output": {"version": "1.1", "id": job_id, "result": []}}
+    )
+
+
+class _LocalJob:
+    __slots__ = ["job_id", "token", "process", "started", "finished", "exit_code"]
+
+    def __init__(self, job_id: str, token: str):
+        self.job_id = job_id
+        self.token = token
+        self.process = None
+        self.started = None
+        self.finished = None
+        self.exit_code = None
+
+
+class LocalScheduler(Scheduler):
+    """
+    Runs each job in its own process, with at most a fixed number of jobs running at once.
+    """
+
+    scheduler_type = "local"
+
+    def __init__(
+        self,
+        ee2_url: str,
+        workers: int = None,
+        job_runner: Callable[[str, str, str], Any] = run_stub_job,
+        start_method: str = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        :param ee2_url: the url the jobs use to contact ee2.
+        :param workers: the maximum number of jobs running at once. Default the number of cpus.
+        :param job_runner: called in the job's process with the job id, ee2 url and the user's
+            token. Must be picklable, e.g. a module level function or a partial of one.
+        :param start_method: the multiprocessing start method, e.g. spawn. Default the
+            platform default.
+        :param clock: the clock used for the job start and completion dates, in seconds.
+        """
+        self.ee2_url = _not_falsy(ee2_url, "ee2_url")
+        self.workers = multiprocessing.cpu_count() if workers is None else workers
+        if self.workers < 1:
+            raise ValueError("workers must be at least 1")
+        self._job_runner = job_runner
+        self._mp = multiprocessing.get_context(start_method)
+        self._clock = clock
+        self._logger = getLogger("ee2")
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, _LocalJob] = {}
+        self._finished = OrderedDict()
+        self._pending = deque()
+        self._running: Dict[str, _LocalJob] = {}
+        # Wakes the dispatcher when a job is submitted or canceled
+        self._wake_recv, self._wake_send = self._mp.Pipe(duplex=False)
+        self._dispatcher = None
+        self._closed = False
+
+    def submit_jobs(
+        self, params: List[JobSubmissionParameters]
+    ) -> List[SubmissionInfo]:
+        ret = []
+        with self._lock:
+            if self._closed:
+                raise ValueError("The scheduler is closed")
+            for p in params:
+                p = _not_falsy(p, "params")
+                scheduler_id = str(next(self._ids))
+                self._jobs[scheduler_id] = _LocalJob(p.job_id, p.user_creds.token)
+                self._pending.append(scheduler_id)
+                ret.append(SubmissionInfo(scheduler_id, {"job_id": p.job_id}, None))
+            self._ensure_dispatcher()
+        self._wake()
+        return ret
+
+    def cancel_jobs(self, scheduler_ids: List[str]) -> bool:
+        with self._lock:
+            for scheduler_id in scheduler_ids:
+                job = self._jobs.get(str(scheduler_id))
+                if job is None or job.finished is not None:
+                    continue
+                if job.process is None:
+                    self._pending.remove(str(scheduler_id))
+                    self._finish(str(scheduler_id), None)
+                else:
+                    job.process.terminate()
+        self._wake()
+        return True
+
+    def get_jobs_resource_info(self, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        wanted = set(job_ids)
+        ret = {}
+        with self._lock:
+            for job in self._jobs.values():
+                if job.job_id not in wanted or job.started is None:
+                    continue
+                info = dict.fromkeys(RESOURCE_INFO_KEYS)
+                info["RemoteHost"] = "localhost"
+                info["JobCurrentStartDate"] = int(job.started)
+                if job.finished is not None:
+                    info["CompletionDate"] = int(job.finished)
+                ret[job.job_id] = info
+        return ret
+
+    def get_running_jobs_resource_usage(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            running = [(job.job_id, job.process.pid) for job in self._running.values()]
+        # Only memory is tracked, and only where /proc is available
+        return {
+            job_id: {"cpu": 0.0, "memory": _rss_mb(pid), "disk": 0}
+            for job_id, pid in running
+        }
+
+    def close(self, timeout: float = 10):
+        """
+        Stop starting jobs, terminate any running jobs and wait for the dispatcher to stop.
+        """
+        with self._lock:
+            self._closed = True
+            for job in self._running.values():
+                job.process.terminate()
+            dispatcher = self._dispatcher
+        self._wake()
+        if dispatcher is not None:
+            dispatcher.join(timeout)
+
+    def wait_for_jobs(self, timeout: float = None) -> bool:
+        """
+        Wait until no jobs are pending or running.
+        :return: True if all jobs finished, False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if not self._pending and not self._running:
+                    return True
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+
+    def _ensure_dispatcher(self):
+        # the caller must hold the lock
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(
+                target=self._dispatch, name="local-scheduler", daemon=True
+            )
+            self._dispatcher.start()
+
+    def _wake(self):
+        self._wake_send.send_bytes(b"")
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                for scheduler_id, job in list(self._running.items()):
+                    if job.process.exitcode is not None:
+                        job.process.join()
+                        del self._running[scheduler_id]
+                        self._finish(scheduler_id, job.process.exitcode)
+                if self._closed and not self._running:
+                    return
+                while (
+                    not self._closed
+                    and self._pending
+                    and len(self._running) < self.workers
+                ):
+                    scheduler_id = self._pending.popleft()
+                    self._start(scheduler_id)
+                sentinels = [job.process.sentinel for job in self._running.values()]
+            ready = wait(sentinels + [self._wake_recv])
+            if self._wake_recv in ready:
+                while self._wake_recv.poll():
+                    self._wake_recv.recv_bytes()
+
+    def _start(self, scheduler_id: str):
+        # the caller must hold the lock
+        job = self._jobs[scheduler_id]
+        job.process = self._mp.Process(
+            target=self._job_runner,
+            args=(job.job_id, self.ee2_url, job.token),
+            name=f"ee2-job-{job.job_id}",
+            daemon=True,
+        )
+        job.started = self._clock()
+        try:
+            job.process.start()
+        except Exception:
+            self._logger.exception(f"Failed to start local job {job.job_id}")
+            job.process = None
+            self._finish(scheduler_id, None)
+            return
+        self._running[scheduler_id] = job
+
+    def _finish(self, scheduler_id: str, exit_code: Optional[int]):
+        # the caller must hold the lock
+        job = self._jobs[scheduler_id]
+        job.finished = self._clock()
+        job.exit_code = exit_code
+        if exit_code:
+            self._logger.warning(f"Local job {job.job_id} exited with code {exit_code}")
+        job.token = None
+        self._finished[scheduler_id] = True
+        while len(self._finished) > _MAX_FINISHED_JOBS:
+            old, _ = self._finished.popitem(last=False)
+            del self._jobs[old]
+
+
+def _rss_mb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0
+    return pages * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
@@ -0,0 +1,121 @@
+"""
+Moves the logs of long finished jobs out of ee2_logs to a log archive store.
+
+Logs are written while a job runs and rarely read once it has finished, but stay in
+ee2_logs, and so in the database's working set, forever. The archiver runs periodically and
+archives the logs of jobs that finished more than a configurable time ago, a batch at a time,
+so each run only does a bounded amount of work. Archived logs are still served by
+view_job_logs, see execution_engine2.db.log_archive.
+"""
+
+import time
+from logging import Logger
+from typing import List, Optional, Tuple
+
+from execution_engine2.db.MongoUtil import MongoUtil
+from execution_engine2.db.log_archive import LogArchiveStore, encode_archive
+from execution_engine2.utils.arg_processing import not_falsy as _not_falsy
+
+
+class JobLogArchiver:
+    """
+    Periodically archives the logs of finished jobs.
+    """
+
+    def __init__(
+        self,
+        mongo_util: MongoUtil,
+        store: LogArchiveStore,
+        logger: Logger,
+        archive_after_seconds: int = 30 * 24 * 60 * 60,
+        batch_size: int = 100,
+    ):
+        """
+        Create the archiver.
+
+        mongo_util - the mongo utilities used to find, read and update the logs.
+        store - the store the logs are archived in.
+        logger - the logger.
+        archive_after_seconds - logs are archived this long after their job finished.
+        batch_size - the maximum number of logs archived in one batch.
+        """
+        self.mongo_util = _not_falsy(mongo_util, "mongo_util")
+        self.store = _not_falsy(store, "store")
+        self.logger = _not_falsy(logger, "logger")
+        if archive_after_seconds < 1:
+            raise ValueError("archive_after_seconds must be at least 1")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.archive_after_seconds = archive_after_seconds
+        self.batch_size = batch_size
+
+    def archive(self) -> int:
+        """
+        Archive one batch of logs. A log that fails to archive is logged and retried in a
+        later batch.
+
+        :return: the number of logs that were archived.
+        """
+        return self._archive(None)[0]
+
+    def _archive(self, after_id: Optional[str]) -> Tuple[int, List[str]]:
+        job_ids = self.mongo_util.get_job_logs_to_archive(
+            finished_before=time.time() - self.archive_after_seconds,
+            limit=self.batch_size,
+            after_id=after_id,
+        )
+        archived = 0
+        for job_id in job_ids:
+            try:
+                if self.archive_job_log(job_id):
+                    archived += 1
+            except Exception:
+                self.logger.exception(f"Failed to archive the log for job {job_id}")
+        if job_ids:
+            self.logger.debug(f"Archived {archived} of {len(job_ids)} job logs")
+        return archived, job_ids
+
+    def archive_all(self, max_batches: int = None) -> int:
+        """
+        Archive logs in batches until a batch finds fewer logs to archive than the batch size.
+        Logs that fail to archive are skipped, and retried by the next run.
+
+        :param max_batches: stop after this many batches, so a run with a large backlog
+            doesn't run for too long. The rest of the logs are archived in later runs.
+        :return: the number of logs that were archived.
+        """
+        self.mongo_util.create_log_archive_index()
+        total = 0
+        batches = 0
+        after_id = None
+        while True:
+            archived, job_ids = self._archive(after_id)
+            total += archived
+            batches += 1
+            if len(job_ids) < self.batch_size or batches == max_batches:
+                return total
+            after_id = job_ids[-1]
+
+    def archive_job_log(self, job_id: str) -> bool:
+        """
+        Archive a job's log. The archive is written before the lines are removed from the
+        log, so a failure part way leaves the log as it was.
+
+        :param job_id: the job ID.
+        :return: False if lines were added to the log while it was archived, in which case it's
+            left as it is.
+        """
+        job_log = self.mongo_util.get_job_log_pymongo(job_id)
+        data, count = encode_archive(job_log)
+        self.store.put(job_id, data)
+        return self.mongo_util.set_job_log_archived(
+            job_id,
+            job_log.get("stored_line_count"),
+            {
+                "store": self.store.name,
+                "key": job_id,
+                "count": count,
+                "size": len(data),
+                "time": time.time(),
+            },
+        )
@@ -0,0 +1,389 @@
+"""
+Per RPC method metrics for the ee2 server, exposed in the Prometheus text format.
+
+For each method the latency, request size and response size are recorded as histograms, along
+with the number of requests that failed. The time each request spent waiting on the services
+ee2 depends on, e.g. mongo or the workspace, is recorded per method and service.
+
+Each server process records its own metrics. If a directory is configured, each process
+periodically writes its metrics to a file in the directory and the metrics of all the processes
+started by the same parent, e.g. the workers of one gunicorn master, are summed when the
+metrics are exposed. Files left by the processes of other parents are deleted.
+
+Code that calls another service reports the time it took with dependency_timer or
+record_dependency. The time is attributed to the request being served in the current thread
+or greenlet, if any.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging import getLogger
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from execution_engine2.utils import tracing
+
+# Services ee2 depends on
+MONGO = "mongo"
+WORKSPACE = "workspace"
+CATALOG = "catalog"
+AUTH = "auth"
+CONDOR = "condor"
+KAFKA = "kafka"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_REQUEST_SECONDS = "ee2_rpc_request_seconds"
+_REQUEST_BYTES = "ee2_rpc_request_bytes"
+_RESPONSE_BYTES = "ee2_rpc_response_bytes"
+_ERRORS = "ee2_rpc_errors_total"
+_DEPENDENCY_SECONDS = "ee2_rpc_dependency_seconds"
+_DEPENDENCY_CALLS = "ee2_rpc_dependency_calls_total"
+
+_HISTOGRAMS = {
+    _REQUEST_SECONDS: ("Time taken to serve RPC requests.", LATENCY_BUCKETS),
+    _REQUEST_BYTES: ("Size of RPC request bodies.", SIZE_BUCKETS),
+    _RESPONSE_BYTES: ("Size of RPC response bodies.", SIZE_BUCKETS),
+    _DEPENDENCY_SECONDS: (
+        "Time RPC requests spent calling a service ee2 depends on.",
+        LATENCY_BUCKETS,
+    ),
+}
+_COUNTERS = {
+    _ERRORS: "RPC requests that returned an error.",
+    _DEPENDENCY_CALLS: "Calls made by RPC requests to a service ee2 depends on.",
+}
+
+# dependency -> [seconds, calls] for the request being served
+_DEPENDENCIES: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar(
+    "ee2_rpc_dependencies", default=None
+)
+
+
+def record_dependency(dependency: str, seconds: float, calls: int = 1):
+    """
+    Attribute time spent calling a service to the request being served, if any.
+    """
+    deps = _DEPENDENCIES.get()
+    if deps is not None:
+        totals = deps.get(dependency)
+        if totals is None:
+            deps[dependency] = [seconds, calls]
+        else:
+            totals[0] += seconds
+            totals[1] += calls
+
+
+@contextmanager
+def dependency_timer(dependency: str, operation: str = None):
+    """
+    Attribute the time spent in the context to calling a service. The call is also recorded as
+    a tracing span named <dependency>.<operation>.
+    """
+    start = time.perf_counter()
+    try:
+        with tracing.span(f"{dependency}.{operation}" if operation else dependency):
+            yield
+    finally:
+        record_dependency(dependency, time.perf_counter() - start)
+
+
+@contextmanager
+def track_dependencies():
+    """
+    Collect the time spent calling other services while serving a request.
+
+    :return: a dict of dependency to a list of the total seconds and the number of calls,
+        filled in as the context runs.
+    """
+    deps = {}
+    token = _DEPENDENCIES.set(deps)
+    try:
+        yield deps
+    finally:
+        _DEPENDENCIES.reset(token)
+
+
+class _TimedClient:
+    """
+    Wraps a service client so the time spent in each public method is recorded.
+    """
+
+    def __init__(self, client, dependency: str):
+        self._client = client
+        self._dependency = dependency
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def timed(*args, **kwargs):
+            with dependency_timer(self._dependency, name):
+                return attr(*args, **kwargs)
+
+        return timed
+
+
+def timed_client(client, dependency: str):
+    """
+    Wrap a service client, e.g. a Workspace client, so the time spent in its public methods is
+    attributed to the dependency.
+    """
+    return _TimedClient(client, dependency)
+
+
+class _Histogram:
+    __slots__ = ["buckets", "sum", "count"]
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Metrics:
+    """
+    Records the metrics of the RPC calls served by this process. Thread safe.
+    """
+
+    def __init__(
+        self,
+        directory: str = None,
+        flush_seconds: float = 10,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param directory: a directory shared by the server processes on this host. If not
+            provided only this process's metrics are exposed.
+        :param flush_seconds: the minimum number of seconds between writes of this process's
+            metrics to the directory. The metrics are always written before they're exposed.
+        :param clock: a monotonic clock, in seconds.
+        """
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self._clock = clock
+        self._logger = getLogger("ee2")
+        self._lock = threading.Lock()
+        # metric name -> labels -> histogram
+        self._histograms: Dict[str, Dict[Tuple[str, ...], _Histogram]] = {
+            name: {} for name in _HISTOGRAMS
+        }
+        # metric name -> labels -> value
+        self._counters: Dict[str, Dict[Tuple[str, ...], float]] = {
+            name: {} for name in _COUNTERS
+        }
+        self._last_flush = None
+        self._dirty = False
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def observe_request(
+        self,
+        method: str,
+        seconds: float,
+        request_bytes: int,
+        response_bytes: int,
+        error: bool,
+        dependencies: Dict[str, List[float]] = None,
+    ):
+        """
+        Record a served RPC request.
+
+        :param method: the method, e.g. run_job_batch.
+        :param seconds: the time taken to serve the request.
+        :param request_bytes: the size of the request body.
+        :param response_bytes: the size of the response body.
+        :param error: whether the request returned an error.
+        :param dependencies: the time spent calling other services, as returned by
+            track_dependencies.
+        """
+        labels = (method,)
+        with self._lock:
+            self._observe(_REQUEST_SECONDS, labels, seconds)
+            self._observe(_REQUEST_BYTES, labels, request_bytes)
+            self._observe(_RESPONSE_BYTES, labels, response_bytes)
+            self._inc(_ERRORS, labels, 1 if error else 0)
+            for dependency, (dep_seconds, calls) in (dependencies or {}).items():
+                self._observe(_DEPENDENCY_SECONDS, (method, dependency), dep_seconds)
+                self._inc(_DEPENDENCY_CALLS, (method, dependency), calls)
+            self._dirty = True
+            flush = self.directory and (
+                self._last_flush is None
+                or self._clock() - self._last_flush >= self.flush_seconds
+            )
+        if flush:
+            self.flush()
+
+    def _observe(self, name: str, labels: Tuple[str, ...], value: float):
+        # the caller must hold the lock
+        buckets = _HISTOGRAMS[name][1]
+        hist = self._histograms[name].get(labels)
+        if hist is None:
+            hist = self._histograms[name][labels] = _Histogram(len(buckets))
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                hist.buckets[i] += 1
+                break
+        hist.sum += value
+        hist.count += 1
+
+    def _inc(self, name: str, labels: Tuple[str, ...], value: float):
+        # the caller must hold the lock
+        counter = self._counters[name]
+        counter[labels] = counter.get(labels, 0) + value
+
+    def _snapshot(self) -> Dict[str, Any]:
+        # the caller must hold the lock
+        return {
+            "histograms": {
+                name: [
+                    [list(labels), h.buckets, h.sum, h.count]
+                    for labels, h in values.items()
+                ]
+                for name, values in self._histograms.items()
+            },
+            "counters": {
+                name: [[list(labels), v] for labels, v in values.items()]
+                for name, values in self._counters.items()
+            },
+        }
+
+    def _file_prefix(self) -> str:
+        # Processes started by the same parent share a prefix
+        return f"ee2-metrics-{os.getppid()}-"
+
+    def flush(self):
+        """
+        Write this process's metrics to the shared directory, if there is one.
+        """
+        if not self.directory:
+            return
+        with self._lock:
+            self._last_flush = self._clock()
+            if not self._dirty:
+                return
+            snapshot = self._snapshot()
+            self._dirty = False
+        path = os.path.join(self.directory, f"{self._file_prefix()}{os.getpid()}.json")
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp, path)
+        except OSError:
+            self._logger.exception(f"Failed to write metrics to {path}")
+
+    def _read_snapshots(self) -> List[Dict[str, Any]]:
+        prefix = self._file_prefix()
+        snapshots = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.startswith("ee2-metrics-"):
+                continue
+            if not name.startswith(prefix):
+                # left over from a previous run of the server
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                self._logger.exception(f"Failed to read metrics from {path}")
+        return snapshots
+
+    def render(self) -> str:
+        """
+        Get the metrics of all the server processes in the Prometheus text format.
+        """
+        if self.directory:
+            self.flush()
+            snapshots = self._read_snapshots()
+        else:
+            with self._lock:
+                snapshots = [self._snapshot()]
+        histograms = _merge_histograms(snapshots)
+        counters = _merge_counters(snapshots)
+        lines = []
+        for name, (help_, buckets) in _HISTOGRAMS.items():
+            label_names = _label_names(name)
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, (counts, sum_, count) in sorted(histograms[name].items()):
+                label_str = _labels(label_names, labels)
+                cumulative = 0
+                for bound, c in zip(buckets, counts):
+                    cumulative += c
+                    le = _labels(label_names + ("le",), labels + (_number(bound),))
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                le = _labels(label_names + ("le",), labels + ("+Inf",))
+                lines.append(f"{name}_bucket{le} {count}")
+                lines.append(f"{name}_sum{label_str} {_number(sum_)}")
+                lines.append(f"{name}_count{label_str} {count}")
+        for name, help_ in _COUNTERS.items():
+            label_names = _label_names(name)
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in sorted(counters[name].items()):
+                lines.append(f"{name}{_labels(label_names, labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _label_names(name: str) -> Tuple[str, ...]:
+    if name in (_DEPENDENCY_SECONDS, _DEPENDENCY_CALLS):
+        return ("method", "dependency")
+    return ("method",)
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    parts = []
+    for n, v in zip(names, values):
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{n}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _merge_histograms(snapshots: List[Dict[str, Any]]) -> Dict[str, Dict]:
+    merged = {name: {} for name in _HISTOGRAMS}
+    for snapshot in snapshots:
+        for name, values in snapshot["histograms"].items():
+            if name not in merged:
+                continue
+            for labels, counts, sum_, count in values:
+                labels = tuple(labels)
+                current = merged[name].get(labels)
+                if current is None:
+                    merged[name][labels] = (list(counts), sum_, count)
+                else:
+                    merged[name][labels] = (
+                        [a + b for a, b in zip(current[0], counts)],
+                        current[1] + sum_,
+                        current[2] + count,
+                    )
+    return merged
+
+
+def _merge_counters(snapshots: List[Dict[str, Any]]) -> Dict[str, Dict]:
+    merged = {name: {} for name in _COUNTERS}
+    for snapshot in snapshots:
+        for name, values in snapshot["counters"].items():
+            if name not in merged:
+                continue
+            for labels, value in values:
+                labels = tuple(labels)
+                merged[name][labels] = merged[name].get(labels, 0) + value
+    return merged
@@ -0,0 +1,149 @@
+"""
+Collects the condor resource usage of finished jobs and saves it to the job records.
+
+Resource usage used to be captured synchronously while finishing a job, which both slowed
+down finish_job and captured the usage before condor had recorded the final values
+(see EE2 issue #251). The collector instead runs periodically, looks up all recently finished
+jobs that don't have their usage recorded yet with one bulk query against the schedd, and
+writes the results back with one bulk write.
+
+The sampler records the usage of jobs while they are running, so that peak usage is known
+even for jobs whose final job ads don't reflect it.
+"""
+
+import time
+from logging import Logger
+from typing import List, Optional, Tuple
+
+from execution_engine2.db.MongoUtil import FinishedJob, MongoUtil
+from execution_engine2.utils.Condor import Condor
+from execution_engine2.utils.arg_processing import not_falsy as _not_falsy
+
+
+class ResourceUsageCollector:
+    """
+    Periodically records condor resource usage for finished jobs.
+    """
+
+    def __init__(
+        self,
+        condor: Condor,
+        mongo_util: MongoUtil,
+        logger: Logger,
+        lookback_seconds: int = 2 * 24 * 60 * 60,
+        settle_seconds: int = 60,
+        batch_size: int = 500,
+    ):
+        """
+        Create the collector.
+
+        condor - the condor wrapper used to look up job ads.
+        mongo_util - the mongo utilities used to find jobs and save their usage.
+        logger - the logger.
+        lookback_seconds - jobs that finished longer ago than this are no longer collected.
+            Bounds the number of jobs that are looked up repeatedly when condor no longer
+            knows about them.
+        settle_seconds - jobs that finished more recently than this are not collected yet,
+            to give condor time to write the final job ads to the history.
+        batch_size - the maximum number of jobs to look up in a single condor query.
+        """
+        self.condor = _not_falsy(condor, "condor")
+        self.mongo_util = _not_falsy(mongo_util, "mongo_util")
+        self.logger = _not_falsy(logger, "logger")
+        if lookback_seconds <= settle_seconds:
+            raise ValueError("lookback_seconds must be greater than settle_seconds")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.lookback_seconds = lookback_seconds
+        self.settle_seconds = settle_seconds
+        self.batch_size = batch_size
+
+    def collect(self) -> int:
+        """
+        Record the resource usage for one batch of finished jobs.
+
+        :return: the number of job records that were updated.
+        """
+        return self._collect(None)[0]
+
+    def _collect(
+        self, start_after: Optional[FinishedJob]
+    ) -> Tuple[int, List[FinishedJob]]:
+        now = time.time()
+        jobs = self.mongo_util.get_finished_jobs_without_resources(
+            finished_after=now - self.lookback_seconds,
+            finished_before=now - self.settle_seconds,
+            limit=self.batch_size,
+            start_after=start_after,
+        )
+        if not jobs:
+            return 0, jobs
+        resources = self.condor.get_jobs_resource_info([job.job_id for job in jobs])
+        updated = self.mongo_util.update_jobs_resources(resources)
+        self.logger.debug(
+            f"Recorded condor resource usage for {updated} of {len(jobs)} finished jobs"
+        )
+        return updated, jobs
+
+    def collect_all(self) -> int:
+        """
+        Record the resource usage for all finished jobs in the time window, in batches. Jobs
+        condor has no usage for are skipped, and looked up again by the next run until they
+        fall out of the lookback window.
+
+        :return: the number of job records that were updated.
+        """
+        total = 0
+        start_after = None
+        while True:
+            updated, jobs = self._collect(start_after)
+            total += updated
+            if len(jobs) < self.batch_size:
+                return total
+            start_after = jobs[-1]
+
+
+class RunningJobResourceSampler:
+    """
+    Periodically samples condor resource usage for running jobs.
+    """
+
+    def __init__(
+        self,
+        condor: Condor,
+        mongo_util: MongoUtil,
+        logger: Logger,
+        max_samples: int = 1000,
+    ):
+        """
+        Create the sampler.
+
+        condor - the condor wrapper used to look up job ads.
+        mongo_util - the mongo utilities used to save the samples.
+        logger - the logger.
+        max_samples - the maximum number of samples kept per job. Older samples are dropped,
+            but the peaks are kept for the lifetime of the job.
+        """
+        self.condor = _not_falsy(condor, "condor")
+        self.mongo_util = _not_falsy(mongo_util, "mongo_util")
+        self.logger = _not_falsy(logger, "logger")
+        if max_samples < 1:
+            raise ValueError("max_samples must be at least 1")
+        self.max_samples = max_samples
+
+    def sample(self) -> int:
+        """
+        Record one resource usage sample for every running job.
+
+        :return: the number of job records that were updated.
+        """
+        usage = self.condor.get_running_jobs_resource_usage()
+        if not usage:
+            return 0
+        updated = self.mongo_util.append_jobs_resource_usage(
+            usage, timestamp=time.time(), max_samples=self.max_samples
+        )
+        self.logger.debug(
+            f"Recorded resource usage samples for {updated} of {len(usage)} running jobs"
+        )
+        return updated
@@ -0,0 +1,31 @@
+"""
+Tracks which ee2 RPC method the current thread is serving, so work done deep in the call stack,
+e.g. a MongoDB query, can be attributed to the method that caused it.
+
+Threads started while serving a method don't inherit the method name.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+_RPC_METHOD: ContextVar[Optional[str]] = ContextVar("ee2_rpc_method", default=None)
+
+
+def current_rpc_method() -> Optional[str]:
+    """
+    Get the name of the RPC method being served, e.g. check_jobs, or None if not serving one.
+    """
+    return _RPC_METHOD.get()
+
+
+@contextmanager
+def rpc_method(name: str):
+    """
+    Mark the current thread as serving an RPC method for the duration of the context.
+    """
+    token = _RPC_METHOD.set(name)
+    try:
+        yield
+    finally:
+        _RPC_METHOD.reset(token)
@@ -0,0 +1,155 @@
+"""
+A shared, self-healing handle to the HTCondor schedd.
+
+Constructing an htcondor.Schedd looks up the schedd's address in the collector, so the handle
+is kept for the life of the process and only rebuilt when a call to the schedd fails or the
+handle is older than the refresh interval, in case the schedd has moved.
+
+The latency of each kind of call to the schedd is recorded so it's possible to tell when the
+schedd is the bottleneck.
+"""
+
+import threading
+import time
+from collections import deque
+from logging import Logger
+from typing import Any, Callable, Dict, TypeVar
+
+from execution_engine2.utils import tracing
+from execution_engine2.utils.metrics import CONDOR, record_dependency
+
+T = TypeVar("T")
+
+# The number of recent calls of each kind used to calculate latency percentiles
+_LATENCY_SAMPLES = 1000
+
+
+class _OperationStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=_LATENCY_SAMPLES)
+
+    def record(self, seconds: float, error: bool):
+        self.count += 1
+        if error:
+            self.errors += 1
+        self.latencies.append(seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        ret = {"count": self.count, "errors": self.errors}
+        for p in [50, 95, 99]:
+            # nearest rank
+            index = max(-(-p * len(latencies) // 100) - 1, 0)
+            ret[f"p{p}_ms"] = round(latencies[index] * 1000, 3) if latencies else None
+        ret["max_ms"] = round(latencies[-1] * 1000, 3) if latencies else None
+        return ret
+
+
+class ScheddConnection:
+    """
+    Holds an htcondor.Schedd for reuse across calls. Thread safe.
+    """
+
+    def __init__(
+        self,
+        htc,
+        logger: Logger,
+        refresh_seconds: float = 300,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param htc: the htcondor module, or an alternate implementation or mock.
+        :param logger: the logger.
+        :param refresh_seconds: rebuild the handle after this many seconds, even if it's
+            working.
+        :param clock: a monotonic clock, in seconds.
+        """
+        if refresh_seconds <= 0:
+            raise ValueError("refresh_seconds must be greater than 0")
+        self._htc = htc
+        self._logger = logger
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._schedd = None
+        self._created = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _OperationStats] = {}
+
+    def get(self):
+        """
+        Get the schedd handle, connecting if there is no handle or it's too old.
+        """
+        with self._lock:
+            now = self._clock()
+            if self._schedd is None or now - self._created >= self.refresh_seconds:
+                # includes the collector lookup
+                error = True
+                try:
+                    self._schedd = self._htc.Schedd()
+                    error = False
+                finally:
+                    self._record("connect", self._clock() - now, error)
+                self._created = now
+            return self._schedd
+
+    def invalidate(self, schedd=None):
+        """
+        Drop the handle so the next call reconnects.
+        :param schedd: only drop the handle if it's this handle, so a handle that another
+            thread already replaced is kept.
+        """
+        with self._lock:
+            if schedd is None or schedd is self._schedd:
+                self._schedd = None
+
+    def call(self, operation: str, fn: Callable[[Any], T], retry: bool = True) -> T:
+        """
+        Call the schedd, recording the latency of the call.
+
+        :param operation: the kind of call, e.g. query, for the latency statistics.
+        :param fn: called with the schedd handle.
+        :param retry: if the call fails, reconnect and try once more. Only set this for calls
+            that are safe to repeat. Failed calls always cause a reconnect on the next call.
+        :return: the return value of fn.
+        """
+        schedd = self.get()
+        try:
+            return self._timed(operation, fn, schedd)
+        except Exception:
+            self.invalidate(schedd)
+            if not retry:
+                raise
+            self._logger.warning(
+                f"Schedd {operation} failed, reconnecting and retrying", exc_info=True
+            )
+            return self._timed(operation, fn, self.get())
+
+    def _timed(self, operation: str, fn: Callable[[Any], T], schedd) -> T:
+        start = self._clock()
+        error = True
+        try:
+            with tracing.span(f"{CONDOR}.{operation}"):
+                ret = fn(schedd)
+            error = False
+            return ret
+        finally:
+            with self._lock:
+                self._record(operation, self._clock() - start, error)
+
+    def _record(self, operation: str, seconds: float, error: bool):
+        # the caller must hold the lock
+        record_dependency(CONDOR, seconds)
+        if operation not in self._stats:
+            self._stats[operation] = _OperationStats()
+        self._stats[operation].record(seconds, error)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the call counts and latencies for each kind of call to the schedd.
+        :return: a dict with a key per kind of call, each with the keys count, errors, p50_ms,
+            p95_ms, p99_ms and max_ms. Creating the handle is recorded as connect.
+        """
+        with self._lock:
+            return {op: stats.to_dict() for op, stats in self._stats.items()}
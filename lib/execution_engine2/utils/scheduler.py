@@ -0,0 +1,101 @@
+"""
+The interface EE2 uses to run jobs on a batch scheduler.
+
+The scheduler id of a job is whatever id the scheduler assigns when the job is submitted, e.g.
+the condor cluster id. It is saved in the job record and passed back to the scheduler to
+cancel the job, so callers never need to know how a particular scheduler names its jobs.
+Resource information is keyed by the ee2 job id.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+from execution_engine2.sdk.job_submission_parameters import JobSubmissionParameters
+from execution_engine2.utils.CondorTuples import SubmissionInfo
+
+
+class Scheduler(ABC):
+    """
+    A batch scheduler. Implementations must be thread safe.
+    """
+
+    # Saved in the job record as the scheduler_type
+    scheduler_type: str = None
+
+    @abstractmethod
+    def submit_jobs(
+        self, params: List[JobSubmissionParameters]
+    ) -> List[SubmissionInfo]:
+        """
+        Submit jobs to the scheduler.
+
+        :param params: the parameters of each job.
+        :return: one result per job, in order. A job that failed to submit has a scheduler
+            id of None and the error set.
+        """
+        raise NotImplementedError()
+
+    def run_job(self, params: JobSubmissionParameters) -> SubmissionInfo:
+        """
+        Submit a single job to the scheduler.
+
+        :param params: the parameters of the job.
+        :return: the scheduler id of the job, or the error if it failed to submit.
+        """
+        return self.submit_jobs([params])[0]
+
+    @abstractmethod
+    def cancel_jobs(self, scheduler_ids: List[str]) -> Any:
+        """
+        Remove jobs from the scheduler. Removing a job that has already finished or was already
+        removed is not an error.
+
+        :param scheduler_ids: the scheduler ids of the jobs.
+        :return: a truthy value if the request was accepted, or False if the scheduler could
+            not be reached.
+        """
+        raise NotImplementedError()
+
+    def cancel_job(self, scheduler_id: str) -> Any:
+        """
+        Remove a single job from the scheduler. See cancel_jobs.
+        """
+        return self.cancel_jobs([scheduler_id])
+
+    @abstractmethod
+    def get_jobs_resource_info(self, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the resources used by jobs, running or finished.
+
+        :param job_ids: the ee2 job ids.
+        :return: a mapping of job id to the job's resource information, with the keys in
+            execution_engine2.utils.Condor.RESOURCE_INFO_KEYS. Keys the scheduler doesn't
+            provide are None. Jobs the scheduler doesn't know about are omitted.
+        """
+        raise NotImplementedError()
+
+    def get_job_resource_info(self, job_id: str) -> Dict[str, Any]:
+        """
+        Get the resources used by a single job. See get_jobs_resource_info.
+
+        :return: the resource information, or an empty dict if the job isn't known.
+        """
+        return self.get_jobs_resource_info([job_id]).get(job_id, {})
+
+    @abstractmethod
+    def get_running_jobs_resource_usage(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get the current resource usage of all running jobs.
+
+        :return: a mapping of job id to a dict with the keys
+            cpu - the number of cpus currently in use
+            memory - the resident set size in MB
+            disk - the disk usage in MB
+        """
+        raise NotImplementedError()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get statistics about the calls this process made to the scheduler, by kind of call.
+        """
+        return {}
@@ -0,0 +1,324 @@
+"""
+Lightweight request tracing.
+
+A trace is started for a sampled fraction of RPC calls. Code run while serving the call opens
+spans with the span context manager or the traced decorator, and the spans nest according to
+the current context, so they work with threads and with gevent greenlets. Work handed off to a
+background thread is included with in_background_span.
+
+Once every span of a trace has ended, the trace is written by the configured exporter as a
+list of spans in the Zipkin v2 JSON format, either as a line in a local file or by posting it
+to a collector.
+
+When no trace is being recorded, opening a span costs a context variable lookup.
+"""
+
+import functools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from logging import getLogger
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+SERVICE_NAME = "execution_engine2"
+
+# The maximum number of traces waiting to be posted to a collector
+_MAX_QUEUED_TRACES = 1000
+
+
+class _Trace:
+    __slots__ = ["trace_id", "spans", "open_spans", "lock"]
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List["Span"] = []
+        self.open_spans = 0
+        self.lock = threading.Lock()
+
+
+class Span:
+    """
+    A timed operation within a trace.
+    """
+
+    __slots__ = ["trace", "span_id", "parent_id", "name", "start", "duration", "tags"]
+
+    def __init__(self, trace: _Trace, name: str, parent_id: Optional[str], tags: Dict):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.duration = None
+        self.tags = {k: str(v) for k, v in tags.items()}
+
+    def set_tag(self, key: str, value: Any):
+        self.tags[key] = str(value)
+
+    def to_zipkin(self) -> Dict[str, Any]:
+        ret = {
+            "traceId": self.trace.trace_id,
+            "id": self.span_id,
+            "name": self.name,
+            "timestamp": int(self.start * 1_000_000),
+            "duration": max(int(self.duration * 1_000_000), 1),
+            "localEndpoint": {"serviceName": SERVICE_NAME},
+        }
+        if self.parent_id:
+            ret["parentId"] = self.parent_id
+        if self.tags:
+            ret["tags"] = self.tags
+        return ret
+
+
+class FileExporter:
+    """
+    Appends each trace to a file as a line of JSON.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Dict[str, Any]]):
+        line = (json.dumps(spans) + "\n").encode("utf-8")
+        with self._lock:
+            # one write per trace so processes sharing the file don't interleave traces
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+
+class CollectorExporter:
+    """
+    Posts each trace to a Zipkin compatible collector, e.g. http://zipkin:9411/api/v2/spans,
+    from a background thread. Traces are dropped if the collector can't keep up.
+    """
+
+    def __init__(self, url: str, timeout: float = 5):
+        self.url = url
+        self.timeout = timeout
+        self._logger = getLogger("ee2")
+        self._queue = queue.Queue(maxsize=_MAX_QUEUED_TRACES)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Dict[str, Any]]):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._post, name="trace-exporter", daemon=True
+                )
+                self._thread.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            pass
+
+    def _post(self):
+        while True:
+            spans = self._queue.get()
+            try:
+                requests.post(self.url, json=spans, timeout=self.timeout)
+            except Exception as e:
+                self._logger.warning(f"Failed to send a trace to {self.url}: {e}")
+
+
+class Tracer:
+    """
+    Starts traces for a sampled fraction of requests and exports them when they're complete.
+    """
+
+    def __init__(
+        self,
+        exporter,
+        sample_rate: float,
+        rand: Callable[[], float] = random.random,
+    ):
+        """
+        :param exporter: the exporter for completed traces, e.g. a FileExporter.
+        :param sample_rate: the fraction of requests to trace, from 0 to 1.
+        :param rand: a source of random numbers in [0, 1), to choose which requests to trace.
+        """
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self._rand = rand
+        self._logger = getLogger("ee2")
+
+    def sample(self) -> bool:
+        return self.sample_rate > 0 and self._rand() < self.sample_rate
+
+    def finished(self, trace: _Trace):
+        try:
+            self.exporter.export([s.to_zipkin() for s in trace.spans])
+        except Exception:
+            self._logger.exception("Failed to export a trace")
+
+
+_TRACER: Optional[Tracer] = None
+_CURRENT_SPAN: ContextVar[Optional[Span]] = ContextVar("ee2_span", default=None)
+
+
+def configure(cfg: Dict[str, str]):
+    """
+    Set up tracing for this process from the configuration. Tracing is off unless
+    tracing-sample-rate is above 0 and tracing-file or tracing-collector-url is set.
+    """
+    global _TRACER
+    sample_rate = float(cfg.get("tracing-sample-rate") or 0)
+    path = cfg.get("tracing-file")
+    url = cfg.get("tracing-collector-url")
+    if not sample_rate or not (path or url):
+        _TRACER = None
+        return
+    exporter = CollectorExporter(url) if url else FileExporter(path)
+    set_tracer(Tracer(exporter, sample_rate))
+
+
+def set_tracer(tracer: Optional[Tracer]):
+    """
+    Set the tracer for this process, or None to turn tracing off.
+    """
+    global _TRACER
+    _TRACER = tracer
+
+
+def current_span() -> Optional[Span]:
+    """
+    Get the innermost open span in the current context, or None if no trace is being recorded.
+    """
+    return _CURRENT_SPAN.get()
+
+
+def _open(trace: _Trace, name: str, parent: Optional[Span], tags: Dict) -> Span:
+    span = Span(trace, name, parent.span_id if parent else None, tags)
+    with trace.lock:
+        trace.open_spans += 1
+    return span
+
+
+def _close(span: Span, error: Optional[BaseException] = None):
+    span.duration = time.time() - span.start
+    if error is not None:
+        span.set_tag("error", type(error).__name__)
+    trace = span.trace
+    with trace.lock:
+        trace.spans.append(span)
+        trace.open_spans -= 1
+        done = trace.open_spans == 0
+    if done and _TRACER is not None:
+        _TRACER.finished(trace)
+
+
+@contextmanager
+def _activate(span: Span):
+    token = _CURRENT_SPAN.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        _close(span, e)
+        raise
+    else:
+        _close(span)
+    finally:
+        _CURRENT_SPAN.reset(token)
+
+
+@contextmanager
+def trace(name: str, **tags):
+    """
+    Start a trace, if this request is sampled, with a root span covering the context.
+
+    :return: the root span, or None if the request isn't traced.
+    """
+    if _TRACER is None or _CURRENT_SPAN.get() is not None or not _TRACER.sample():
+        yield None
+        return
+    with _activate(_open(_Trace(), name, None, tags)) as span:
+        yield span
+
+
+@contextmanager
+def span(name: str, **tags):
+    """
+    Record a span covering the context, if a trace is being recorded.
+
+    :return: the span, or None if no trace is being recorded.
+    """
+    parent = _CURRENT_SPAN.get()
+    if parent is None:
+        yield None
+        return
+    with _activate(_open(parent.trace, name, parent, tags)) as s:
+        yield s
+
+
+def traced(name: str = None):
+    """
+    Decorate a function so each call is recorded as a span, if a trace is being recorded.
+
+    :param name: the span name. Default the function's qualified name.
+    """
+
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _CURRENT_SPAN.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_span(name: str, seconds: float, **tags):
+    """
+    Record a span for an operation that has just finished, e.g. from an event listener, if a
+    trace is being recorded.
+
+    :param seconds: how long the operation took.
+    """
+    parent = _CURRENT_SPAN.get()
+    if parent is None:
+        return
+    s = _open(parent.trace, name, parent, tags)
+    s.start -= seconds
+    _close(s)
+
+
+def in_background_span(name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Prepare a function to be run in another thread as part of the current trace. The span
+    starts now and ends when the function returns, and the trace isn't exported before then.
+
+    :return: a function to run in the other thread in place of fn.
+    """
+    parent = _CURRENT_SPAN.get()
+    if parent is None:
+        return fn
+    s = _open(parent.trace, name, parent, {})
+    ctx = copy_context()
+
+    def run(*args, **kwargs):
+        def in_span():
+            with _activate(s):
+                return fn(*args, **kwargs)
+
+        return ctx.run(in_span)
+
+    return run
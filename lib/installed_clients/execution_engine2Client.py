@@ -84,7 +84,9 @@ class execution_engine2(object):
            Execution Engine status git_commit - the Git hash of the version
            of the module. version - the semantic version for the module.
            service - the name of the service. server_time - the current
-           server timestamp since epoch # TODO - add some or all of the
+           server timestamp since epoch schedd - the calls this server
+           process made to the HTCondor schedd by kind of call: connect,
+           submit, query, history or act. # TODO - add some or all of the
            following reboot_mode - if 1, then in the process of rebooting
            stopping_mode - if 1, then in the process of stopping
            running_tasks_total - number of total running jobs
@@ -92,7 +94,15 @@ class execution_engine2(object):
            jobs for that user tasks_in_queue - number of jobs in the queue
            that are not running) -> structure: parameter "git_commit" of
            String, parameter "version" of String, parameter "service" of
-           String, parameter "server_time" of Double
+           String, parameter "server_time" of Double, parameter "schedd" of
+           mapping from String to type "ScheddCallStats" (Calls made by this
+           server process to the HTCondor schedd of one kind, e.g. submit.
+           count - the number of calls. errors - the number of calls that
+           failed. p50_ms, p95_ms, p99_ms, max_ms - latency percentiles of
+           the recent calls, in milliseconds.) -> structure: parameter
+           "count" of Long, parameter "errors" of Long, parameter "p50_ms" of
+           Double, parameter "p95_ms" of Double, parameter "p99_ms" of
+           Double, parameter "max_ms" of Double
         """
         return self._client.call_method(
             "execution_engine2.status", [], self._service_ver, context
@@ -613,10 +623,14 @@ class execution_engine2(object):
         :param params: instance of type "CheckJobParams" (exclude_fields:
            exclude certain fields to return. default None. exclude_fields
            strings can be one of fields defined in
-           execution_engine2.db.models.models.Job) -> structure: parameter
-           "job_id" of type "job_id" (A job id.), parameter "exclude_fields"
-           of list of String, parameter "as_admin" of type "boolean" (@range
-           [0,1])
+           execution_engine2.db.models.models.Job return_resource_usage:
+           check_job and check_job_batch only. whether to return the
+           resource_usage time series and resource_usage_peaks sampled while
+           the job was running. default false. The other endpoints never
+           return them.) -> structure: parameter "job_id" of type "job_id"
+           (A job id.), parameter "exclude_fields" of list of String,
+           parameter "as_admin" of type "boolean" (@range [0,1]), parameter
+           "return_resource_usage" of type "boolean" (@range [0,1])
         :returns: instance of type "JobState" (job_id - string - id of the
            job user - string - user who started the job wsid - int - optional
            id of the workspace where the job is bound authstrat - string -
@@ -736,10 +750,14 @@ class execution_engine2(object):
         :param params: instance of type "CheckJobParams" (exclude_fields:
            exclude certain fields to return. default None. exclude_fields
            strings can be one of fields defined in
-           execution_engine2.db.models.models.Job) -> structure: parameter
-           "job_id" of type "job_id" (A job id.), parameter "exclude_fields"
-           of list of String, parameter "as_admin" of type "boolean" (@range
-           [0,1])
+           execution_engine2.db.models.models.Job return_resource_usage:
+           check_job and check_job_batch only. whether to return the
+           resource_usage time series and resource_usage_peaks sampled while
+           the job was running. default false. The other endpoints never
+           return them.) -> structure: parameter "job_id" of type "job_id"
+           (A job id.), parameter "exclude_fields" of list of String,
+           parameter "as_admin" of type "boolean" (@range [0,1]), parameter
+           "return_resource_usage" of type "boolean" (@range [0,1])
         :returns: instance of type "CheckJobBatchResults" (parent_job - state
            of parent job job_states - states of child jobs IDEA: ADD
            aggregate_states - count of all available child job states, even
@@ -1235,6 +1253,28 @@ class execution_engine2(object):
             "execution_engine2.cancel_job", [params], self._service_ver, context
         )
 
+    def cancel_jobs(self, params, context=None):
+        """
+        Cancel many jobs at once (Admin function). Returns one result per job id, in order.
+        The children of canceled batch jobs are canceled as well.
+        :param params: instance of type "CancelJobsParams" (job_ids - the ids
+           of the jobs to cancel. terminated_code - the reason the jobs were
+           canceled. See CancelJobParams. Default terminated_by_user 0.
+           @optional terminated_code) -> structure: parameter "job_ids" of
+           list of type "job_id" (A job id.), parameter "terminated_code" of
+           Long
+        :returns: instance of list of type "CancelJobResult" (job_id - the id
+           of the job. status - the status of the job before the call, or
+           null if there is no such job. canceled - whether the job was
+           canceled by this call. False if the job had already finished.) ->
+           structure: parameter "job_id" of type "job_id" (A job id.),
+           parameter "status" of String, parameter "canceled" of type
+           "boolean" (@range [0,1])
+        """
+        return self._client.call_method(
+            "execution_engine2.cancel_jobs", [params], self._service_ver, context
+        )
+
     def check_job_canceled(self, params, context=None):
         """
         Check whether a job has been canceled. This method is lightweight compared to check_job.
@@ -1653,6 +1693,77 @@ class execution_engine2(object):
             context,
         )
 
+    def handle_held_jobs(self, cluster_ids, context=None):
+        """
+        Handle many held CONDOR jobs at once (Admin function). Returns one result per
+        cluster id, in order. You probably never want to run this, only the reaper should
+        run it.
+        :param cluster_ids: instance of list of String
+        :returns: instance of list of type "HeldJobResult" (cluster_id - the
+           condor cluster id of the held job. job_id - the id of the job with
+           the cluster id, or null if there is no such job. status - the
+           status of the job, or null if there is no such job. finished -
+           whether the job was marked as an error by this call. False if the
+           job had already finished.) -> structure: parameter "cluster_id" of
+           String, parameter "job_id" of type "job_id" (A job id.), parameter
+           "status" of String, parameter "finished" of type "boolean" (@range
+           [0,1])
+        """
+        return self._client.call_method(
+            "execution_engine2.handle_held_jobs",
+            [cluster_ids],
+            self._service_ver,
+            context,
+        )
+
+    def get_resource_usage_report(self, params, context=None):
+        """
+        Report the resources requested versus used by finished jobs, per method, and
+        suggest catalog client group settings (Admin function).
+        :param params: instance of type "ResourceUsageReportParams"
+           (start_time - Filter based on job creation time. See
+           CheckJobsDateRangeParams for the accepted formats. end_time -
+           Filter based on job creation time. methods - Only report on jobs
+           running these methods, in module.method format. Default all
+           methods. min_jobs - The minimum number of jobs with usage data for
+           a method and client group before client group settings are
+           suggested. Default 10.) -> structure: parameter "start_time" of
+           Double, parameter "end_time" of Double, parameter "methods" of
+           list of String, parameter "min_jobs" of Long
+        :returns: instance of type "ResourceUsageReport" (start_time - the
+           start of the creation time range in seconds since the epoch.
+           end_time - the end of the creation time range in seconds since the
+           epoch. methods - per method and client group usage, most wasted
+           cpu hours first.) -> structure: parameter "start_time" of Double,
+           parameter "end_time" of Double, parameter "methods" of list of
+           type "MethodResourceUsage" (method - the method, in module.method
+           format. client_group - the client group the jobs ran in. job_count
+           - the number of completed or errored jobs with condor job ads.
+           jobs_with_usage - the number of those jobs with recorded memory
+           usage. cpu - requested versus used cpus. memory_mb - requested
+           versus used memory in MB. disk_gb - requested versus used disk in
+           GB. waste - the over-allocation of resources.
+           suggested_client_groups - suggested catalog client group settings,
+           in the catalog's CSV format, sized from the 99th percentile of the
+           used resources plus headroom. null if there are too few jobs, or
+           the client group or usage is unknown.) -> structure: parameter
+           "method" of String, parameter "client_group" of String, parameter
+           "job_count" of Long, parameter "jobs_with_usage" of Long,
+           parameter "cpu" of type "ResourceUsage", parameter "memory_mb" of
+           type "ResourceUsage", parameter "disk_gb" of type "ResourceUsage",
+           parameter "waste" of type "ResourceWaste" (Resources that were
+           requested but not used, multiplied by the job run time and summed
+           over the jobs.) -> structure: parameter "cpu_hours" of Double,
+           parameter "memory_gb_hours" of Double, parameter "disk_gb_hours"
+           of Double, parameter "suggested_client_groups" of list of String
+        """
+        return self._client.call_method(
+            "execution_engine2.get_resource_usage_report",
+            [params],
+            self._service_ver,
+            context,
+        )
+
     def is_admin(self, context=None):
         """
         Check if current user has ee2 admin rights.
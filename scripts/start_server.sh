@@ -12,6 +12,8 @@ calc_workers="$(($(nproc) * 2 + 1))"
 workers=${WORKERS:-$calc_workers}
 
 export PYTHONPATH=$lib_dir:$wsgi_dir:$PYTHONPATH
+# With PRELOAD set the app is loaded once and the workers forked from it share the libraries
+# and configuration. Don't combine with DEVELOPMENT, as --reload won't reload preloaded code
 
 # Set up the purge held jobs script
 bash /kb/module/scripts/purge_held_jobs.sh >> purge.log 2>&1 &
@@ -34,4 +36,5 @@ gunicorn \
   --workers $workers  \
   --bind :5000 \
   ${DEVELOPMENT:+"--reload"} \
+  ${PRELOAD:+"--preload"} \
   execution_engine2Server:application
\ No newline at end of file
@@ -0,0 +1,142 @@
+"""
+Microbenchmark for add_job_logs' validation and formatting of log lines.
+
+Adds batches of log lines with a mix of timestamp formats through EE2Logs.add_job_logs, once
+with the lines checked by creating a LogLines Document per line as add_job_logs used to and
+once with the current formatting, and reports the throughput in lines per second. The
+database is replaced by a stub, so only the server side cost of the request is measured.
+Checks that both produce the same stored lines.
+
+Run from the repository root:
+
+    PYTHONPATH=.:lib python test/benchmarks/add_job_logs_benchmark.py [--lines 10000]
+
+The script exits with an error if the stored lines differ or the speedup is less than
+--min-speedup.
+"""
+
+import argparse
+import logging
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from execution_engine2.db.models.models import LogLines
+from execution_engine2.sdk.EE2Logs import EE2Logs
+from execution_engine2.sdk.SDKMethodRunner import SDKMethodRunner
+
+_JOB_ID = "0" * 24
+
+
+class _MongoUtil:
+    def __init__(self):
+        self.pushed = None
+
+    def append_job_logs(self, job_id, log_lines):
+        self.pushed = log_lines
+        return len(log_lines)
+
+
+class _SDKMR:
+    check_and_convert_time = staticmethod(SDKMethodRunner.check_and_convert_time)
+
+    def __init__(self):
+        self.mongo_util = _MongoUtil()
+        self.logger = logging.getLogger("ee2")
+
+    def get_mongo_util(self):
+        return self.mongo_util
+
+    def get_logger(self):
+        return self.logger
+
+    def get_job_with_permission(self, job_id, permission, as_admin=False):
+        pass
+
+
+class _DocumentEE2Logs(EE2Logs):
+    # the formatting before the lines were checked without LogLines Documents
+    def _format_job_logs(self, record_position, log_lines):
+        log_lines_formatted = []
+        for input_line in log_lines:
+            record_position += 1
+            ll = LogLines()
+            ll.error = int(input_line.get("is_error", 0)) == 1
+            ll.linepos = record_position
+            ts = input_line.get("ts")
+            if ts is not None:
+                ts = self.sdkmr.check_and_convert_time(ts, assign_default_time=True)
+            ll.ts = ts
+            ll.line = input_line.get("line")
+            ll.validate()
+            log_lines_formatted.append(ll.to_mongo().to_dict())
+        return log_lines_formatted
+
+
+def _log_lines(count: int, ts_format: str) -> List[Dict[str, Any]]:
+    lines = []
+    for i in range(count):
+        ms = 1_600_000_000_000 + i * 7
+        ts = {
+            "ms": ms,
+            "seconds": ms / 1000,
+            "ms string": str(ms),
+            "iso": f"2021-02-20T00:{i // 60 % 60:02d}:{i % 60:02d}.{i % 1000:03d}Z",
+        }[ts_format]
+        lines.append(
+            {
+                "line": f"[2022-01-01 00:00:{i % 60:02d}] step {i}: processed {i * 7} reads",
+                "is_error": int(i % 97 == 0),
+                "ts": ts,
+            }
+        )
+    return lines
+
+
+def _best(fn: Callable[[], Any], rounds: int) -> float:
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--lines", type=int, default=10_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-speedup", type=float, default=10)
+    args = parser.parse_args()
+
+    logs = {"LogLines": _DocumentEE2Logs(_SDKMR()), "current": EE2Logs(_SDKMR())}
+
+    print(f"{args.lines} lines per request, best of {args.rounds} rounds")
+    print(f"{'lines/sec':<20}{'LogLines':>12}{'current':>12}{'speedup':>10}")
+    speedups = []
+    for ts_format in ["ms", "seconds", "ms string", "iso"]:
+        lines = _log_lines(args.lines, ts_format)
+        rates = []
+        for ee2logs in logs.values():
+            result = ee2logs.add_job_logs(_JOB_ID, lines)
+            if not result.success:
+                sys.exit(f"add_job_logs failed for {ts_format} timestamps")
+            rates.append(
+                args.lines
+                / _best(lambda: ee2logs.add_job_logs(_JOB_ID, lines), args.rounds)
+            )
+        if logs["LogLines"].sdkmr.mongo_util.pushed != (
+            logs["current"].sdkmr.mongo_util.pushed
+        ):
+            sys.exit(f"The stored lines differ for {ts_format} timestamps")
+        speedups.append(rates[1] / rates[0])
+        print(
+            f"{ts_format:<20}{rates[0]:>12,.0f}{rates[1]:>12,.0f}{speedups[-1]:>9.1f}x"
+        )
+    if min(speedups) < args.min_speedup:
+        sys.exit(f"Speedup {min(speedups):.1f}x is less than {args.min_speedup}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Microbenchmark for building condor submit descriptions.
+
+Compares Condor._create_submit against the implementation it replaced, which rebuilt the whole
+description for every job, and checks that both produce exactly the same description, key
+order included.
+
+Run from the repository root:
+
+    PYTHONPATH=.:lib python test/benchmarks/condor_submit_benchmark.py [--jobs 1000] [--rounds 100]
+
+The script exits with an error if the descriptions differ or the speedup is less than
+--min-speedup. The speedup is the median over the rounds of the ratio of the two
+implementations' times, so a few rounds slowed by other processes don't move it.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from typing import Any, Dict
+
+from execution_engine2.sdk.job_submission_parameters import (
+    JobSubmissionParameters,
+    JobRequirements,
+)
+from execution_engine2.utils.Condor import Condor
+from execution_engine2.utils.application_info import AppInfo
+from execution_engine2.utils.user_info import UserCreds
+
+_CONFIG = {
+    "external-url": "https://ci.kbase.us/services/ee2",
+    "executable": "execute_runner.sh",
+    "catalog-token": "catalogtoken",
+}
+
+
+class _LegacyCondor(Condor):
+    """
+    The submit description code as it was before the static parts were cached.
+    """
+
+    def _setup_environment_vars(self, params: JobSubmissionParameters) -> str:
+        # 7 day docker job timeout default, Catalog token used to get access to volume mounts
+        environment_vars = {
+            "DOCKER_JOB_TIMEOUT": self.docker_timeout,
+            "KB_ADMIN_AUTH_TOKEN": self.catalog_token,
+            "KB_AUTH_TOKEN": params.user_creds.token,
+            "CLIENTGROUP": params.job_reqs.client_group,
+            "JOB_ID": params.job_id,
+            # "WORKDIR": f"{config.get('WORKDIR')}/{params.get('USER')}/{params.get('JOB_ID')}",
+            "CONDOR_ID": "$(Cluster).$(Process)",
+            "PYTHON_EXECUTABLE": self.python_executable,
+            "DEBUG_MODE": str(params.job_reqs.debug_mode),
+            "PARENT_JOB_ID": params.parent_job_id or "",
+        }
+
+        environment = ""
+        for key, val in environment_vars.items():
+            environment += f"{key}={val} "
+
+        return f'"{environment}"'
+
+    @staticmethod
+    def _add_hardcoded_attributes(sub, job_id):
+        sub["universe"] = "vanilla"
+        sub["ShouldTransferFiles"] = "YES"
+        # If a job exits incorrectly put it on hold
+        sub["on_exit_hold"] = "ExitCode =!= 0"
+        #  Allow up to 12 hours of no response from job
+        sub["JobLeaseDuration"] = "43200"
+        #  Allow up to 12 hours for condor drain
+        sub["MaxJobRetirementTime"] = "43200"
+        # Remove jobs running longer than 7 days
+        sub["Periodic_Hold"] = "( RemoteWallClockTime > 604800 )"
+        sub["log"] = "runner_logs/$(Cluster).$(Process).log"
+        err_file = f"{job_id}.err"
+        out_file = f"{job_id}.out"
+        err_path = f"runner_logs/{err_file}"
+        out_path = f"runner_logs/{out_file}"
+        err_path_remap = f"cluster_logs/{err_file}"
+        out_path_remap = f"cluster_logs/{out_file}"
+        sub["error"] = err_path
+        sub["output"] = out_path
+        remap = f'"{err_path}={err_path_remap};{out_path}={out_path_remap}"'
+        sub["transfer_output_remaps"] = remap
+        sub["When_To_Transfer_Output"] = "ON_EXIT_OR_EVICT"
+        sub["getenv"] = "false"
+        return sub
+
+    def _add_configurable_attributes(self, sub):
+        sub[self.LEAVE_JOB_IN_QUEUE] = self.leave_job_in_queue
+        sub["initial_dir"] = self.initial_dir
+        sub["+Owner"] = f'"{self.pool_user}"'  # Must be quoted
+        sub["executable"] = f"{self.initial_dir}/{self.executable}"  # Must exist
+        sub["transfer_input_files"] = self.transfer_input_files
+        return sub
+
+    def _extract_resources_and_requirements(
+        self, sub: Dict[str, Any], job_reqs: JobRequirements
+    ) -> Dict[str, Any]:
+        # Extract minimum condor resource requirements and client_group
+        sub["request_cpus"] = job_reqs.cpus
+        sub["request_memory"] = f"{job_reqs.memory_MB}MB"
+        sub["request_disk"] = f"{job_reqs.disk_GB}GB"
+        # Set requirements statement
+        sub["requirements"] = self._create_requirements_statement(job_reqs)
+        sub["+KB_CLIENTGROUP"] = f'"{job_reqs.client_group}"'
+        return sub
+
+    def _create_requirements_statement(self, job_reqs: JobRequirements) -> str:
+        reqs = []
+        if job_reqs.client_group_regex is not False:
+            # Default is True, so a value of None means True
+            reqs = [f'regexp("{job_reqs.client_group}",CLIENTGROUP)']
+        else:
+            reqs = [f'(CLIENTGROUP == "{job_reqs.client_group}")']
+        for key in sorted(job_reqs.scheduler_requirements):
+            reqs.append(f'({key} == "{job_reqs.scheduler_requirements[key]}")')
+        return " && ".join(reqs)
+
+    def _add_resources_and_special_attributes(
+        self, params: JobSubmissionParameters
+    ) -> Dict[str, str]:
+        sub = dict()
+        sub["JobBatchName"] = params.job_id
+        sub["arguments"] = f"{params.job_id} {self.ee_endpoint}"
+        sub = self._add_job_labels(sub=sub, params=params)
+        # Extract special requirements
+        sub = self._extract_resources_and_requirements(sub, params.job_reqs)
+
+        btu = params.job_reqs.bill_to_user
+        user = btu if btu else params.user_creds.username
+        if not params.job_reqs.ignore_concurrency_limits:
+            sub["Concurrency_Limits"] = user
+        sub["+AccountingGroup"] = f'"{user}"'
+
+        sub["environment"] = self._setup_environment_vars(params)
+
+        return sub
+
+    def _create_submit(self, params: JobSubmissionParameters) -> Dict[str, str]:
+        # note some tests call this function directly and will need to be updated if the
+        # signature is changed
+
+        sub = self._add_resources_and_special_attributes(params)
+        sub = self._add_hardcoded_attributes(sub=sub, job_id=params.job_id)
+        sub = self._add_configurable_attributes(sub)
+        # Ensure all values are a string
+        for item in sub.keys():
+            sub[item] = str(sub[item])
+        return sub
+
+    @staticmethod
+    def _add_job_labels(sub: Dict, params: JobSubmissionParameters):
+        sub["+KB_PARENT_JOB_ID"] = params.parent_job_id or ""
+        sub["+KB_MODULE_NAME"] = params.app_info.module
+        sub["+KB_FUNCTION_NAME"] = params.app_info.method
+        sub["+KB_APP_ID"] = params.app_info.get_application_id() or ""
+        sub["+KB_APP_MODULE_NAME"] = params.app_info.application_module or ""
+        sub["+KB_WSID"] = params.wsid or ""
+        sub["+KB_SOURCE_WS_OBJECTS"] = ",".join(params.source_ws_objects)
+
+        # Ensure double quoted user inputs
+        for key in sub.keys():
+            if "+KB" in key:
+                value = sub[key]
+                if value != "":
+                    sub[key] = f'"{value}"'
+
+        return sub
+
+
+def _varied_params(count: int):
+    """
+    Jobs that vary in every optional field, to check the descriptions are identical.
+    """
+    parent = "6046b539ce9c58ecf8c3e5f3"
+    ret = []
+    for i in range(count):
+        ret.append(
+            JobSubmissionParameters(
+                f"6046b539ce9c58ecf8c{i:06d}",
+                AppInfo(
+                    "kb_uploadmethods.import_reads", "kb_uploadmethods/import_reads"
+                )
+                if i % 2
+                else AppInfo("mod.meth"),
+                JobRequirements(
+                    4,
+                    2000 + i % 3,
+                    30,
+                    "njs",
+                    client_group_regex=None if i % 2 else False,
+                    bill_to_user="otheruser" if i % 5 == 0 else None,
+                    ignore_concurrency_limits=i % 7 == 0,
+                    scheduler_requirements={"a": "b", "c": str(i % 4)}
+                    if i % 3
+                    else None,
+                    debug_mode=i % 11 == 0,
+                ),
+                UserCreds("someuser", "usertoken"),
+                parent_job_id=parent if i % 4 else None,
+                wsid=i if i % 6 else None,
+                source_ws_objects=[f"1/{i}/1", "1/2/3"] if i % 2 else None,
+            )
+        )
+    return ret
+
+
+def _batch_params(count: int):
+    """
+    A batch of jobs as built by run_job_batch: the same method, requirements, user and batch
+    parent for every job, each with its own parameter objects.
+    """
+    ret = []
+    for i in range(count):
+        ret.append(
+            JobSubmissionParameters(
+                f"6046b539ce9c58ecf8c{i:06d}",
+                AppInfo(
+                    "kb_uploadmethods.import_reads", "kb_uploadmethods/import_reads"
+                ),
+                JobRequirements(4, 2000, 30, "njs"),
+                UserCreds("someuser", "usertoken"),
+                parent_job_id="6046b539ce9c58ecf8c3e5f3",
+                wsid=42,
+                source_ws_objects=[f"42/{i}/1"],
+            )
+        )
+    return ret
+
+
+def _time(create_submits, params, rounds: int):
+    """
+    The time of each implementation for each round, after a warmup round that isn't counted.
+    The implementations take turns so that noise from other processes affects them equally.
+    """
+    times = [[] for _ in create_submits]
+    for r in range(rounds + 1):
+        for i, create_submit in enumerate(create_submits):
+            start = time.perf_counter()
+            for p in params:
+                create_submit(p)
+            elapsed = time.perf_counter() - start
+            if r:
+                times[i].append(elapsed)
+    return times
+
+
+def _items(sub: Dict[str, Any]):
+    return list(sub.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--min-speedup", type=float, default=5)
+    args = parser.parse_args()
+
+    legacy = _LegacyCondor(_CONFIG)
+    current = Condor(_CONFIG)
+
+    for p in _varied_params(args.jobs) + _batch_params(args.jobs):
+        if _items(legacy._create_submit(p)) != _items(current._create_submit(p)):
+            sys.exit(f"Submit descriptions differ for job {p.job_id}")
+
+    params = _batch_params(args.jobs)
+
+    legacy_times, current_times = _time(
+        [legacy._create_submit, current._create_submit], params, args.rounds
+    )
+    speedup = statistics.median(lt / ct for lt, ct in zip(legacy_times, current_times))
+    legacy_time = statistics.median(legacy_times)
+    current_time = statistics.median(current_times)
+    print(f"jobs per batch: {args.jobs}, median of {args.rounds} rounds")
+    print(
+        f"legacy:  {legacy_time * 1000:8.2f} ms ({legacy_time / args.jobs * 1e6:.2f} us/job)"
+    )
+    print(
+        f"current: {current_time * 1000:8.2f} ms ({current_time / args.jobs * 1e6:.2f} us/job)"
+    )
+    print(f"speedup: {speedup:.1f}x")
+    if speedup < args.min_speedup:
+        sys.exit(f"Speedup {speedup:.1f}x is less than {args.min_speedup}x")
+
+
+if __name__ == "__main__":
+    main()
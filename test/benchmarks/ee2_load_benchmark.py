@@ -0,0 +1,351 @@
+"""
+End to end load benchmark for the ee2 server.
+
+Drives the WSGI Application in process from a pool of threads, each acting as a user that runs
+jobs, plays the part of the job runner for them (start_job, add_job_logs, finish_job), polls them
+with check_jobs and tails their logs. Condor, Kafka, the workspace, the catalog and the auth
+service are replaced with the in memory fakes in fakes.py, so MongoDB is the only service
+needed, e.g. the one from docker-compose.
+
+Run from the repository root:
+
+    PYTHONPATH=.:lib:test python test/benchmarks/ee2_load_benchmark.py \\
+        --concurrency 8 --duration 60 --output ee2_benchmark.json
+
+The latency percentiles and throughput of each endpoint are printed and written to --output,
+so runs can be compared between releases. The jobs are written to the --mongo-database
+database, which is emptied first if --reset is given.
+"""
+
+import argparse
+import configparser
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from benchmarks.fakes import FakeAuth, FakeProducer, fake_services, token_for
+
+_DEFAULT_MIX = (
+    "run_job=2,run_job_batch=1,start_job=3,add_job_logs=8,finish_job=2,"
+    + "check_jobs=6,get_job_logs=4"
+)
+_METHOD = "kb_benchmark.run_app"
+_APP_ID = "kb_benchmark/run_app"
+
+
+def _percentile(ordered: List[float], p: int) -> float:
+    # nearest rank
+    index = max(-(-p * len(ordered) // 100) - 1, 0)
+    return ordered[index]
+
+
+class _Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(list)
+        self._errors = defaultdict(int)
+        self._first_errors = {}
+
+    def record(self, method: str, seconds: float, error: str = None):
+        with self._lock:
+            self._latencies[method].append(seconds)
+            if error:
+                self._errors[method] += 1
+                self._first_errors.setdefault(method, error)
+
+    def report(self, elapsed: float) -> Dict[str, Dict]:
+        ret = {}
+        with self._lock:
+            for method in sorted(self._latencies):
+                ordered = sorted(self._latencies[method])
+                ret[method] = {
+                    "count": len(ordered),
+                    "errors": self._errors[method],
+                    "throughput_per_s": round(len(ordered) / elapsed, 3),
+                    "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+                    "p50_ms": round(_percentile(ordered, 50) * 1000, 3),
+                    "p95_ms": round(_percentile(ordered, 95) * 1000, 3),
+                    "p99_ms": round(_percentile(ordered, 99) * 1000, 3),
+                    "max_ms": round(ordered[-1] * 1000, 3),
+                    "first_error": self._first_errors.get(method),
+                }
+        return ret
+
+
+class _Client:
+    """
+    Calls the WSGI application directly, the way the uwsgi server would.
+    """
+
+    def __init__(self, app, token: str, recorder: _Recorder):
+        self.app = app
+        self.token = token
+        self.recorder = recorder
+        self._ids = iter(range(1, sys.maxsize))
+
+    def call(self, method: str, *params):
+        body = json.dumps(
+            {
+                "version": "1.1",
+                "method": f"execution_engine2.{method}",
+                "params": list(params),
+                "id": str(next(self._ids)),
+            }
+        ).encode("utf-8")
+        environ = {
+            "REQUEST_METHOD": "POST",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+            "HTTP_AUTHORIZATION": self.token,
+            "REMOTE_ADDR": "127.0.0.1",
+        }
+        start = time.perf_counter()
+        response = b"".join(self.app(environ, lambda status, headers: None))
+        elapsed = time.perf_counter() - start
+        resp = json.loads(response)
+        error = resp["error"].get("message") if "error" in resp else None
+        self.recorder.record(method, elapsed, error)
+        if error:
+            raise RuntimeError(f"{method} failed: {error}")
+        return resp.get("result")
+
+
+class _User(threading.Thread):
+    """
+    One simulated user, running jobs and acting as the job runner for them.
+    """
+
+    def __init__(self, index: int, app, recorder: _Recorder, args, deadline: float):
+        super().__init__(name=f"user-{index}", daemon=True)
+        self.user = f"benchmark_user_{index % args.users}"
+        self.wsid = 1000 + index % args.users
+        self.client = _Client(app, token_for(self.user), recorder)
+        self.args = args
+        self.deadline = deadline
+        self.random = random.Random(args.seed + index)
+        ops, weights = zip(*args.mix.items())
+        self.ops = ops
+        self.weights = weights
+        self.queued = []
+        self.running = []
+        # job id -> number of log lines added
+        self.logged = {}
+        self.finished = []
+        self.failures = 0
+
+    def run(self):
+        while time.monotonic() < self.deadline:
+            op = self.random.choices(self.ops, self.weights)[0]
+            try:
+                getattr(self, f"_{op}")()
+            except RuntimeError:
+                self.failures += 1
+
+    def _job_params(self, i: int) -> Dict:
+        return {
+            "method": _METHOD,
+            "app_id": _APP_ID,
+            "service_ver": "release",
+            "params": [{"input": i}],
+            "source_ws_objects": [f"{self.wsid}/1/1"],
+        }
+
+    def _run_job(self):
+        params = self._job_params(0)
+        params["wsid"] = self.wsid
+        self.queued.append(self.client.call("run_job", params))
+
+    def _run_job_batch(self):
+        params = [self._job_params(i) for i in range(self.args.batch_children)]
+        ret = self.client.call("run_job_batch", params, {"wsid": self.wsid})
+        # children are submitted in the background
+        self.queued.extend(ret["child_job_ids"])
+
+    def _start_job(self):
+        if not self.queued:
+            return self._run_job()
+        job_id = self.queued.pop(0)
+        try:
+            self.client.call("start_job", {"job_id": job_id, "skip_estimation": 1})
+        except RuntimeError:
+            # batch children may not be queued yet
+            self.queued.append(job_id)
+            raise
+        self.running.append(job_id)
+        self.logged[job_id] = 0
+
+    def _add_job_logs(self):
+        if not self.running:
+            return self._start_job()
+        job_id = self.random.choice(self.running)
+        start = self.logged[job_id]
+        lines = [
+            {"line": f"line {start + i} of job {job_id}", "is_error": 0}
+            for i in range(self.args.log_lines)
+        ]
+        self.client.call("add_job_logs", {"job_id": job_id}, lines)
+        self.logged[job_id] += len(lines)
+
+    def _finish_job(self):
+        if not self.running:
+            return self._start_job()
+        job_id = self.running.pop(0)
+        self.client.call(
+            "finish_job",
+            {
+                "job_id": job_id,
+                "job_output": {"version": "1.1", "id": job_id, "result": [{}]},
+            },
+        )
+        self.finished.append(job_id)
+
+    def _check_jobs(self):
+        count = self.args.poll_jobs
+        job_ids = (self.queued + self.running + self.finished)[-count:]
+        if not job_ids:
+            return self._run_job()
+        self.client.call("check_jobs", {"job_ids": job_ids})
+
+    def _get_job_logs(self):
+        if not self.logged:
+            return self._add_job_logs()
+        job_id = self.random.choice(list(self.logged))
+        offset = max(self.logged[job_id] - self.args.tail_lines, 0)
+        self.client.call(
+            "get_job_logs",
+            {"job_id": job_id, "offset": offset, "limit": self.args.tail_lines},
+        )
+
+
+def _parse_mix(mix: str) -> Dict[str, float]:
+    ret = {}
+    for part in mix.split(","):
+        op, weight = part.split("=")
+        if not hasattr(_User, f"_{op.strip()}"):
+            raise ValueError(f"Unknown operation {op} in the job mix")
+        ret[op.strip()] = float(weight)
+    return ret
+
+
+def _write_config(args) -> str:
+    """
+    Copy the deploy config with the benchmark's settings.
+    """
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    section = config["execution_engine2"]
+    section["mongo-database"] = args.mongo_database
+    if args.mongo_host:
+        section["mongo-host"] = args.mongo_host
+    section["scheduler"] = "condor"
+    section["debug"] = "false"
+    fd, path = tempfile.mkstemp(prefix="ee2_benchmark_", suffix=".cfg")
+    with os.fdopen(fd, "w") as f:
+        config.write(f)
+    return path
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--config", default="test/deploy.cfg")
+    parser.add_argument("--mongo-host")
+    parser.add_argument("--mongo-database", default="ee2_load_benchmark")
+    parser.add_argument("--reset", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix(_DEFAULT_MIX))
+    parser.add_argument("--batch-children", type=int, default=10)
+    parser.add_argument("--log-lines", type=int, default=100)
+    parser.add_argument("--tail-lines", type=int, default=100)
+    parser.add_argument("--poll-jobs", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="ee2_benchmark.json")
+    args = parser.parse_args()
+
+    config_path = _write_config(args)
+    os.environ["KB_DEPLOYMENT_CONFIG"] = config_path
+    try:
+        with fake_services() as htc:
+            # the server module builds the ee2 implementation from the config on import
+            from execution_engine2 import execution_engine2Server as server
+
+            app = server.application
+            app.auth_client = FakeAuth()
+            if args.reset:
+                mongo = server.impl_execution_engine2.clients.mongo_util
+                mongo.pymongoc.drop_database(args.mongo_database)
+
+            recorder = _Recorder()
+            start = time.monotonic()
+            users = [
+                _User(i, app, recorder, args, start + args.duration)
+                for i in range(args.concurrency)
+            ]
+            for u in users:
+                u.start()
+            for u in users:
+                u.join()
+            elapsed = time.monotonic() - start
+    finally:
+        os.remove(config_path)
+
+    endpoints = recorder.report(elapsed)
+    total = sum(e["count"] for e in endpoints.values())
+    report = {
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+        "settings": {
+            "concurrency": args.concurrency,
+            "users": args.users,
+            "duration_s": args.duration,
+            "mix": args.mix,
+            "batch_children": args.batch_children,
+            "log_lines": args.log_lines,
+            "tail_lines": args.tail_lines,
+            "poll_jobs": args.poll_jobs,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "throughput_per_s": round(total / elapsed, 3),
+        "jobs_submitted": htc.next_cluster_id() - 1,
+        "kafka_messages": FakeProducer.messages,
+        "endpoints": endpoints,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{total} requests in {elapsed:.1f}s, {report['throughput_per_s']}/s")
+    print(
+        f"{'endpoint':<16}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}"
+        + f"{'p99 ms':>10}{'per s':>10}"
+    )
+    for method, e in endpoints.items():
+        print(
+            f"{method:<16}{e['count']:>8}{e['errors']:>8}{e['p50_ms']:>10}"
+            + f"{e['p95_ms']:>10}{e['p99_ms']:>10}{e['throughput_per_s']:>10}"
+        )
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+In memory stand ins for the services ee2 talks to, so the server can be driven in process
+without condor, kafka, the workspace, the catalog or the auth service. Only MongoDB is real.
+
+Tokens are of the form token-<user>, and every user administers every workspace.
+"""
+
+import itertools
+import threading
+from contextlib import ExitStack, contextmanager
+from unittest.mock import patch
+
+from execution_engine2.utils.Condor import Condor
+
+TOKEN_PREFIX = "token-"
+
+
+def token_for(user: str) -> str:
+    return TOKEN_PREFIX + user
+
+
+def _user_for(token: str) -> str:
+    if not token or not token.startswith(TOKEN_PREFIX):
+        raise ValueError("Invalid token")
+    return token.split(TOKEN_PREFIX, 1)[1]
+
+
+class _FakeTransaction:
+    def __init__(self, htc):
+        self.htc = htc
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class _FakeSubmit:
+    def __init__(self, htc, description):
+        self.htc = htc
+        self.description = description
+
+    def queue(self, txn, count=1):
+        return self.htc.next_cluster_id()
+
+
+class _FakeSchedd:
+    def __init__(self, htc):
+        self.htc = htc
+
+    def transaction(self):
+        return _FakeTransaction(self.htc)
+
+    def query(self, constraint=None, projection=None, limit=-1):
+        return []
+
+    def history(self, constraint, projection, match=-1):
+        return iter([])
+
+    def act(self, action, job_spec):
+        with self.htc.lock:
+            self.htc.removed += len(job_spec)
+        return {"TotalSuccess": len(job_spec)}
+
+
+class FakeHtcondor:
+    """
+    Accepts submissions and hands out cluster ids. Jobs never run; the benchmark plays the
+    part of the job runner.
+    """
+
+    class JobAction:
+        Remove = "Remove"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.removed = 0
+
+    def next_cluster_id(self) -> int:
+        with self.lock:
+            return next(self._ids)
+
+    def Submit(self, description):
+        return _FakeSubmit(self, description)
+
+    def Schedd(self):
+        return _FakeSchedd(self)
+
+
+class FakeProducer:
+    """
+    A confluent_kafka.Producer that counts messages rather than sending them.
+    """
+
+    lock = threading.Lock()
+    messages = 0
+
+    def __init__(self, config):
+        self.config = config
+
+    def produce(self, topic, value, callback=None):
+        with FakeProducer.lock:
+            FakeProducer.messages += 1
+
+    def poll(self, timeout=None):
+        return 0
+
+    def flush(self, timeout=None):
+        return 0
+
+
+class FakeWorkspace:
+    def __init__(self, url=None, token=None):
+        self.user = _user_for(token) if token else None
+
+    def get_permissions_mass(self, params):
+        return {"perms": [{self.user: "a"} for _ in params["workspaces"]]}
+
+    def get_object_info3(self, params):
+        refs = [o["ref"] for o in params["objects"]]
+        return {"infos": [None for _ in refs], "paths": [[ref] for ref in refs]}
+
+
+class FakeCatalog:
+    def __init__(self, url=None, token=None):
+        pass
+
+    def get_module_version(self, params):
+        return {"git_commit_hash": "0" * 40}
+
+    def list_client_group_configs(self, params):
+        return []
+
+    def log_exec_stats(self, params):
+        return None
+
+
+class FakeAuth:
+    def __init__(self, auth_url=None):
+        pass
+
+    def get_user(self, token):
+        return _user_for(token)
+
+
+class FakeAdminAuthUtil:
+    def __init__(self, auth_url=None, admin_roles=None):
+        pass
+
+    def get_admin_role(self, token, read_role, write_role):
+        return None
+
+    def get_user_roles(self, token):
+        return []
+
+
+@contextmanager
+def fake_services():
+    """
+    Replace the clients ee2 builds from its configuration with the fakes above. ee2 must be
+    imported and its Application created inside the context, and the Application's
+    auth_client replaced with a FakeAuth.
+
+    :return: the FakeHtcondor the Condor scheduler uses.
+    """
+    htc = FakeHtcondor()
+    clients = "execution_engine2.utils.clients"
+    with ExitStack() as stack:
+        stack.enter_context(
+            patch(f"{clients}.get_scheduler", lambda cfg: Condor(cfg, htc=htc))
+        )
+        stack.enter_context(patch(f"{clients}.Workspace", FakeWorkspace))
+        stack.enter_context(patch(f"{clients}.Catalog", FakeCatalog))
+        stack.enter_context(patch(f"{clients}.KBaseAuth", FakeAuth))
+        stack.enter_context(patch(f"{clients}.AdminAuthUtil", FakeAdminAuthUtil))
+        stack.enter_context(patch("confluent_kafka.Producer", FakeProducer))
+        yield htc
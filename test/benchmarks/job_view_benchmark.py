@@ -0,0 +1,172 @@
+"""
+Microbenchmark for the read only job representation used by the job status endpoints.
+
+Converts thousands of job documents, as pymongo returns them, into check_jobs job states, once
+by loading them into Job Documents as the endpoints used to and once through JobView. Reports
+the time per job, the memory held per loaded job and the peak memory of the conversion, and
+checks that both paths produce the same job states.
+
+Run from the repository root:
+
+    PYTHONPATH=.:lib python test/benchmarks/job_view_benchmark.py [--jobs 5000]
+
+The script exits with an error if the paths disagree or JobView's speedup converting the jobs
+is less than --min-speedup.
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from bson import ObjectId
+
+from execution_engine2.db.models.job_view import JobView
+from execution_engine2.db.models.models import Job
+
+
+def _job_doc(i: int) -> Dict[str, Any]:
+    created = 1_600_000_000 + i
+    return {
+        "_id": ObjectId(f"{created:08x}{i:016x}"),
+        "user": f"user{i % 50}",
+        "authstrat": "kbaseworkspace",
+        "wsid": 10_000 + i % 100,
+        "status": ["queued", "running", "completed", "error"][i % 4],
+        "updated": created + 3600.5,
+        "queued": created + 1.25,
+        "running": created + 60.5,
+        "finished": created + 3600.5,
+        "job_input": {
+            "wsid": 10_000 + i % 100,
+            "method": "kb_uploadmethods.import_fastq_sra_as_reads_from_staging",
+            "app_id": "kb_uploadmethods/import_fastq_sra_as_reads_from_staging",
+            "service_ver": "a" * 40,
+            "source_ws_objects": [f"{10_000 + i % 100}/{j}/1" for j in range(3)],
+            "params": [
+                {
+                    "fastq_fwd_staging_file_name": f"reads_{i}_1.fq.gz",
+                    "sequencing_tech": "Illumina",
+                    "name": f"reads_{i}",
+                }
+            ],
+            "requirements": {
+                "clientgroup": "njs",
+                "cpu": 4,
+                "memory": 2000,
+                "disk": 100,
+            },
+            "narrative_cell_info": {"run_id": f"run-{i}", "tag": "release"},
+        },
+        "job_output": {"version": "1.1", "id": str(i), "result": [{"ok": True}]},
+        "retry_ids": [],
+        "child_jobs": [],
+        "batch_job": False,
+        "scheduler_type": "condor",
+        "scheduler_id": str(100_000 + i),
+    }
+
+
+def _document_job_state(doc: Dict[str, Any]) -> Dict[str, Any]:
+    # the conversion check_jobs made before JobView
+    job = Job._from_son(doc)
+    mongo_rec = job.to_mongo().to_dict()
+    del mongo_rec["_id"]
+    mongo_rec["retry_count"] = len(job["retry_ids"])
+    mongo_rec["job_id"] = str(job.id)
+    mongo_rec["batch_id"] = job.batch_id
+    mongo_rec["created"] = int(job.id.generation_time.timestamp() * 1000)
+    mongo_rec["updated"] = int(job.updated * 1000)
+    for key in ["estimating", "queued", "running", "finished"]:
+        if job[key]:
+            mongo_rec[key] = int(job[key] * 1000)
+    return mongo_rec
+
+
+def _view_job_state(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return JobView.from_mongo(doc).to_job_state()
+
+
+def _best(fn: Callable[[], Any], rounds: int) -> float:
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _held(load: Callable[[Dict[str, Any]], Any], docs: List[Dict[str, Any]]) -> int:
+    # the memory held by the loaded jobs
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    loaded = [load(d) for d in docs]
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del loaded
+    return held
+
+
+def _peak(fn: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--jobs", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-speedup", type=float, default=3)
+    args = parser.parse_args()
+
+    docs = [_job_doc(i) for i in range(args.jobs)]
+    paths = {"Job": _document_job_state, "JobView": _view_job_state}
+    loads = {"Job": Job._from_son, "JobView": JobView.from_mongo}
+
+    states = [[state(d) for d in docs] for state in paths.values()]
+    if states[0] != states[1]:
+        sys.exit("The Job and JobView job states disagree")
+    del states
+
+    per_job = 1_000_000 / args.jobs
+    times = {
+        name: _best(lambda: [state(d) for d in docs], args.rounds) * per_job
+        for name, state in paths.items()
+    }
+    load_times = {
+        name: _best(lambda: [load(d) for d in docs], args.rounds) * per_job
+        for name, load in loads.items()
+    }
+    held = {name: _held(load, docs) / args.jobs for name, load in loads.items()}
+    peaks = {
+        name: _peak(lambda: [state(d) for d in docs]) / args.jobs
+        for name, state in paths.items()
+    }
+
+    print(f"{args.jobs} jobs, best of {args.rounds} rounds")
+    print(f"{'per job':<30}{'Job':>12}{'JobView':>12}{'ratio':>10}")
+    rows = [
+        ("load us", load_times),
+        ("load and convert us", times),
+        ("memory held by load, bytes", held),
+        ("peak convert memory, bytes", peaks),
+    ]
+    for name, values in rows:
+        ratio = values["Job"] / values["JobView"]
+        print(
+            f"{name:<30}{values['Job']:>12.1f}{values['JobView']:>12.1f}{ratio:>9.1f}x"
+        )
+    speedup = times["Job"] / times["JobView"]
+    if speedup < args.min_speedup:
+        sys.exit(f"Conversion speedup {speedup:.1f}x is less than {args.min_speedup}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Microbenchmark for the JSON-RPC server's JSON codecs.
+
+Encodes a check_jobs response for thousands of jobs and a get_job_logs response with tens of
+thousands of lines, and decodes an add_job_logs request, with the standard library codec and
+with orjson. Checks that both codecs produce the same JSON documents.
+
+Run from the repository root:
+
+    PYTHONPATH=.:lib python test/benchmarks/json_codec_benchmark.py [--jobs 5000] [--lines 50000]
+
+The script exits with an error if the codecs disagree or orjson's speedup encoding the
+responses is less than --min-speedup.
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from execution_engine2.utils.json_codec import ORJSON, STDLIB, get_codec
+
+
+def _job_state(i: int) -> Dict[str, Any]:
+    created = 1_600_000_000_000 + i * 1000
+    return {
+        "job_id": f"{i:024x}",
+        "user": f"user{i % 50}",
+        "authstrat": "kbaseworkspace",
+        "wsid": 10_000 + i % 100,
+        "status": ["queued", "running", "completed", "error"][i % 4],
+        "job_input": {
+            "wsid": 10_000 + i % 100,
+            "method": "kb_uploadmethods.import_fastq_sra_as_reads_from_staging",
+            "app_id": "kb_uploadmethods/import_fastq_sra_as_reads_from_staging",
+            "service_ver": "a" * 40,
+            "source_ws_objects": [f"{10_000 + i % 100}/{j}/1" for j in range(3)],
+            "params": [
+                {
+                    "fastq_fwd_staging_file_name": f"reads_{i}_1.fq.gz",
+                    "fastq_rev_staging_file_name": f"reads_{i}_2.fq.gz",
+                    "sequencing_tech": "Illumina",
+                    "name": f"reads_{i}",
+                    "single_genome": 1,
+                    "insert_size_mean": None,
+                }
+            ],
+            "requirements": {
+                "clientgroup": "njs",
+                "cpu": 4,
+                "memory": 2000,
+                "disk": 100,
+            },
+            "narrative_cell_info": {
+                "run_id": f"run-{i}",
+                "cell_id": f"cell-{i}",
+                "tag": "release",
+            },
+        },
+        "job_output": {"version": "1.1", "id": str(i), "result": [{"ok": True}]},
+        "created": created,
+        "queued": created + 1000,
+        "running": created + 60_000,
+        "finished": created + 3_600_000,
+        "updated": created + 3_600_000,
+        "retry_count": 0,
+        "retry_ids": [],
+        "child_jobs": [],
+        "batch_job": False,
+        "scheduler_type": "condor",
+        "scheduler_id": str(100_000 + i),
+    }
+
+
+def _response(result: Any) -> Dict[str, Any]:
+    return {"version": "1.1", "result": [result], "id": "12345"}
+
+
+def _log_lines(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "line": f"[2022-01-01 00:00:{i % 60:02d}] step {i}: processed {i * 7} reads",
+            "linepos": i,
+            "is_error": int(i % 97 == 0),
+            "ts": 1_600_000_000_000 + i,
+        }
+        for i in range(count)
+    ]
+
+
+def _best(fn: Callable[[], Any], rounds: int) -> float:
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--jobs", type=int, default=5000)
+    parser.add_argument("--lines", type=int, default=50_000)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--min-speedup", type=float, default=3)
+    args = parser.parse_args()
+
+    try:
+        codecs = {STDLIB: get_codec(STDLIB), ORJSON: get_codec(ORJSON)}
+    except ValueError as e:
+        sys.exit(str(e))
+
+    check_jobs = _response({"job_states": [_job_state(i) for i in range(args.jobs)]})
+    lines = _log_lines(args.lines)
+    get_job_logs = _response(
+        {"lines": lines, "last_line_number": args.lines - 1, "count": args.lines}
+    )
+    add_job_logs = json.dumps(
+        {
+            "version": "1.1",
+            "method": "execution_engine2.add_job_logs",
+            "params": [{"job_id": "0" * 24}, lines],
+            "id": "12345",
+        }
+    ).encode("utf-8")
+
+    cases = {
+        f"encode check_jobs ({args.jobs} jobs)": lambda c: c.dumps(check_jobs),
+        f"encode get_job_logs ({args.lines} lines)": lambda c: c.dumps(get_job_logs),
+        f"decode add_job_logs ({args.lines} lines)": lambda c: c.loads(add_job_logs),
+    }
+
+    for name, case in cases.items():
+        results = [
+            json.loads(case(c)) if "encode" in name else case(c)
+            for c in codecs.values()
+        ]
+        if results[0] != results[1]:
+            sys.exit(f"The codecs disagree: {name}")
+
+    print(f"best of {args.rounds} rounds")
+    print(f"{'':<40}{STDLIB + ' ms':>12}{ORJSON + ' ms':>12}{'speedup':>10}")
+    encode_speedups = []
+    for name, case in cases.items():
+        times = [_best(lambda: case(c), args.rounds) for c in codecs.values()]
+        speedup = times[0] / times[1]
+        if name.startswith("encode"):
+            encode_speedups.append(speedup)
+        print(
+            f"{name:<40}{times[0] * 1000:>12.2f}{times[1] * 1000:>12.2f}{speedup:>9.1f}x"
+        )
+    if min(encode_speedups) < args.min_speedup:
+        sys.exit(
+            f"Encoding speedup {min(encode_speedups):.1f}x is less than {args.min_speedup}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
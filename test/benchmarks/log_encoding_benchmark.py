@@ -0,0 +1,127 @@
+"""
+Microbenchmark for the compact job log encoding.
+
+Builds a job log of tool-like output added in batches, as JobRunners add their logs, and
+compares the BSON size of the raw and compact encodings, the time to encode the batches, and
+the time to read a window of lines from the end of the log.
+
+Run from the repository root:
+
+    PYTHONPATH=.:lib python test/benchmarks/log_encoding_benchmark.py [--lines 100000]
+
+The script exits with an error if the decoded lines differ from the originals or the compact
+log isn't at least --min-ratio times smaller.
+"""
+
+import argparse
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import bson
+
+from execution_engine2.db.log_encoding import (
+    default_codec,
+    encode_chunk,
+    iter_chunk_lines,
+)
+
+
+def _log_lines(count: int) -> List[Dict[str, Any]]:
+    lines = []
+    for i in range(count):
+        if i % 10 == 9:
+            line = f"Completed step {i // 10}, wrote /kb/module/work/tmp/out_{i}.fastq"
+        elif i % 3:
+            line = f"[{i % 60:02d}.{i % 1000:03d}] processed {i * 7919 % 100000} reads"
+        else:
+            line = ""
+        lines.append(
+            {
+                "line": line,
+                "linepos": i,
+                "error": i % 101 == 0,
+                "ts": 1_613_779_407.123 + i * 0.0173,
+            }
+        )
+    return lines
+
+
+def _best(fn: Callable[[], Any], rounds: int) -> float:
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--window", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-ratio", type=float, default=3)
+    args = parser.parse_args()
+
+    lines = _log_lines(args.lines)
+    batches = []
+    for start in range(0, args.lines, args.batch):
+        end = start + args.batch
+        batches.append(lines[start:end])
+
+    def encode():
+        return [encode_chunk(b, b[0]["linepos"]) for b in batches]
+
+    chunks = encode()
+    skip_lines = args.lines - args.window - 1
+
+    def read_raw():
+        return [line for line in lines if line["linepos"] > skip_lines]
+
+    def read_compact():
+        return [
+            line
+            for c in chunks
+            if c["start"] + c["n"] > skip_lines + 1
+            for line in iter_chunk_lines(c, skip_lines)
+        ]
+
+    decoded = [line for c in chunks for line in iter_chunk_lines(c)]
+    if [
+        (d["line"], d["linepos"], d["error"], int(d["ts"] * 1000)) for d in decoded
+    ] != [
+        (line["line"], line["linepos"], line["error"], int(line["ts"] * 1000))
+        for line in lines
+    ]:
+        sys.exit("The decoded lines differ from the originals")
+
+    raw_size = len(bson.encode({"lines": lines}))
+    compact_size = len(bson.encode({"chunks": chunks}))
+    ratio = raw_size / compact_size
+    print(
+        f"{args.lines} lines in batches of {args.batch}, codec {default_codec()}, "
+        + f"best of {args.rounds} rounds"
+    )
+    print(f"{'':<30}{'raw':>12}{'compact':>12}")
+    print(f"{'BSON size, KB':<30}{raw_size / 1024:>12.0f}{compact_size / 1024:>12.0f}")
+    raw_per_line, compact_per_line = raw_size / args.lines, compact_size / args.lines
+    print(f"{'bytes per line':<30}{raw_per_line:>12.1f}{compact_per_line:>12.1f}")
+    encode_ms = _best(encode, args.rounds) * 1000
+    print(f"{'encode ms':<30}{'':>12}{encode_ms:>12.2f}")
+    raw_ms = _best(read_raw, args.rounds) * 1000
+    compact_ms = _best(read_compact, args.rounds) * 1000
+    print(
+        f"{f'read last {args.window} lines ms':<30}{raw_ms:>12.2f}{compact_ms:>12.2f}"
+    )
+    print(f"compact is {ratio:.1f}x smaller")
+    if ratio < args.min_ratio:
+        sys.exit(
+            f"The compact log is only {ratio:.1f}x smaller, less than {args.min_ratio}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -104,7 +104,7 @@ class EE2TestAdminMode(unittest.TestCase):
         condor = MagicMock(return_value={})
         condor._get_job_info = MagicMock(return_value="")
         condor.get_job_resource_info = MagicMock(return_value="njs")
-        runner.condor = condor
+        runner.scheduler = condor
 
         return runner
 
@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
 import logging
 import os
+import tempfile
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
 
 from bson.objectid import ObjectId
 from pytest import raises
 
 from execution_engine2.db.MongoUtil import MongoUtil
 from execution_engine2.db.models.models import Job, JobLog, Status
+from execution_engine2.utils.log_archiver import JobLogArchiver
 from test.utils_shared.test_utils import (
     bootstrap,
     get_example_job,
@@ -302,3 +308,231 @@ class MongoUtilTest(unittest.TestCase):
         self.assertEqual(job_log.get("original_line_count"), 0)
         self.assertEqual(job_log.get("stored_line_count"), 0)
         self.assertIsNone(job_log.get("lines"))
+
+    def test_append_job_logs(self):
+        mongo_util = self.getMongoUtil()
+        job_id = str(ObjectId())
+
+        def lines(*text):
+            return [{"line": t, "linepos": 0, "error": False, "ts": 1.5} for t in text]
+
+        # creates the log
+        assert mongo_util.append_job_logs(job_id, lines("a", "b")) == 2
+        assert mongo_util.append_job_logs(job_id, lines("c")) == 3
+
+        # concurrent appends are grouped and still numbered in order
+        with ThreadPoolExecutor(4) as executor:
+            counts = list(
+                executor.map(
+                    lambda t: mongo_util.append_job_logs(job_id, lines(t, t)),
+                    ["d", "e", "f", "g"],
+                )
+            )
+        assert sorted(counts) == [5, 7, 9, 11]
+
+        job_log = mongo_util.get_job_log_pymongo(job_id)
+        assert job_log["stored_line_count"] == 11
+        assert job_log["original_line_count"] == 11
+        assert [line["linepos"] for line in job_log["lines"]] == list(range(11))
+        assert [line["line"] for line in job_log["lines"][:3]] == ["a", "b", "c"]
+        # each call's lines are kept together
+        pairs = [job_log["lines"][i]["line"] for i in range(3, 11, 2)]
+        assert sorted(pairs) == ["d", "e", "f", "g"]
+        for i in range(3, 11, 2):
+            assert job_log["lines"][i]["line"] == job_log["lines"][i + 1]["line"]
+
+    def test_add_job_log_line(self):
+        mongo_util = self.getMongoUtil()
+        job_ids = [str(ObjectId()) for _ in range(3)]
+        mongo_util.append_job_logs(
+            job_ids[0], [{"line": "a", "linepos": 0, "error": False, "ts": 1.5}]
+        )
+
+        # a line added to job 0's log between the read and the write is retried
+        get_requests = mongo_util._job_log_line_requests
+        calls = []
+
+        def concurrent_append(*args):
+            requests = get_requests(*args)
+            if not calls:
+                mongo_util.append_job_logs(
+                    job_ids[0],
+                    [{"line": "b", "linepos": 0, "error": False, "ts": 2.5}],
+                )
+            calls.append(args)
+            return requests
+
+        with patch.object(mongo_util, "_job_log_line_requests", concurrent_append):
+            assert mongo_util.add_job_log_line(job_ids, "held", True) == 3
+        assert len(calls) == 2
+        assert [len(c[1]) for c in calls] == [3, 1]
+
+        job_log = mongo_util.get_job_log_pymongo(job_ids[0])
+        assert [(line["line"], line["linepos"]) for line in job_log["lines"]] == [
+            ("a", 0),
+            ("b", 1),
+            ("held", 2),
+        ]
+        for job_id in job_ids[1:]:
+            job_log = mongo_util.get_job_log_pymongo(job_id)
+            assert job_log["stored_line_count"] == 1
+            assert [line["line"] for line in job_log["lines"]] == ["held"]
+
+    def test_get_resource_usage_by_method(self):
+        mongo_util = self.getMongoUtil()
+        col = mongo_util.pymongoc[mongo_util.mongo_database][mongo_util._col_jobs]
+        start = datetime.now(timezone.utc) - timedelta(days=400)
+        start_id = ObjectId.from_datetime(start)
+        records = []
+        for i, (method, client_group) in enumerate(
+            [("mod.b", "njs"), ("mod.a", "njs"), ("mod.b", "njs"), ("mod.a", None)]
+        ):
+            records.append(
+                {
+                    "_id": ObjectId.from_datetime(start + timedelta(seconds=i + 1)),
+                    "status": Status.completed.value,
+                    "job_input": {
+                        "method": method,
+                        "requirements": {"cpu": 4, "clientgroup": client_group},
+                    },
+                    "condor_job_ads": {"CpusUsage": i},
+                    "running": 0,
+                    "finished": 3600 * (i + 1),
+                }
+            )
+        col.insert_many(records)
+        stop_id = ObjectId.from_datetime(start + timedelta(seconds=10))
+
+        groups = list(mongo_util.get_resource_usage_by_method(start_id, stop_id))
+        assert [(g["method"], g["client_group"]) for g in groups] == [
+            ("mod.a", None),
+            ("mod.a", "njs"),
+            ("mod.b", "njs"),
+        ]
+        # requested resources missing from the job record are left out
+        assert groups[0]["jobs"] == [
+            {
+                "cpu_requested": 4,
+                "cpu_used": 3,
+                "memory_used": None,
+                "disk_used": None,
+                "runtime_hours": 4,
+            }
+        ]
+        assert sorted(j["cpu_used"] for j in groups[2]["jobs"]) == [0, 2]
+
+        groups = mongo_util.get_resource_usage_by_method(
+            start_id, stop_id, methods=["mod.b"]
+        )
+        assert [len(g["jobs"]) for g in groups] == [2]
+
+    def test_append_job_logs_compact(self):
+        raw_util = self.getMongoUtil()
+        compact_util = MongoUtil(dict(self.config, **{"mongo-log-encoding": "compact"}))
+        job_id = str(ObjectId())
+
+        def lines(*text):
+            return [
+                {"line": t, "linepos": 0, "error": t == "e", "ts": 1.5} for t in text
+            ]
+
+        # a log started in the raw encoding and continued in the compact one
+        assert raw_util.append_job_logs(job_id, lines("a", "b")) == 2
+        assert compact_util.append_job_logs(job_id, lines("c", "d", "e")) == 5
+        assert compact_util.append_job_logs(job_id, lines("f")) == 6
+
+        job_log = raw_util.get_job_log_pymongo(job_id)
+        assert len(job_log["lines"]) == 2
+        assert [(c["start"], c["n"]) for c in job_log["chunks"]] == [(2, 3), (5, 1)]
+        assert raw_util.get_job_log_summary(job_id)["count"] == 6
+
+        got = list(raw_util.iter_job_log_lines(job_id))
+        assert [line["line"] for line in got] == ["a", "b", "c", "d", "e", "f"]
+        assert [line["linepos"] for line in got] == list(range(6))
+        assert [line["error"] for line in got] == [False] * 4 + [True, False]
+        assert [int(line["ts"] * 1000) for line in got] == [1500] * 6
+
+        got = list(raw_util.iter_job_log_lines(job_id, skip_lines=2, limit=2))
+        assert [line["line"] for line in got] == ["d", "e"]
+        assert list(raw_util.iter_job_log_lines(job_id, skip_lines=5)) == []
+
+    def test_archive_job_logs(self):
+        with tempfile.TemporaryDirectory() as archive_dir:
+            mu = MongoUtil(
+                dict(
+                    self.config,
+                    **{
+                        "log-archive-store": "file",
+                        "log-archive-directory": archive_dir,
+                    },
+                )
+            )
+            now = time.time()
+            created = datetime.now(timezone.utc) - timedelta(days=40)
+            job_ids = []
+            for i, finished in enumerate([now - 35 * 86400, now - 20 * 86400, None]):
+                job = get_example_job(status=Status.created.value)
+                job.id = ObjectId.from_datetime(created + timedelta(seconds=i))
+                job.finished = finished
+                job_ids.append(str(mu.insert_jobs([job])[0]))
+                mu.append_job_logs(
+                    job_ids[-1],
+                    [
+                        {"line": f"line {n}", "linepos": 0, "error": n == 1, "ts": 1.5}
+                        for n in range(3)
+                    ],
+                )
+            old_job, recent_job, running_job = job_ids
+
+            mu.create_log_archive_index()
+            assert mu.get_job_logs_to_archive(now - 30 * 86400, 10) == [old_job]
+            assert mu.get_job_logs_to_archive(now - 10 * 86400, 10) == [
+                old_job,
+                recent_job,
+            ]
+            assert mu.get_job_logs_to_archive(now - 10 * 86400, 1) == [old_job]
+            assert mu.get_job_logs_to_archive(now - 10 * 86400, 10, old_job) == [
+                recent_job
+            ]
+
+            archiver = JobLogArchiver(
+                mu,
+                mu.log_archive_store,
+                logging.getLogger(),
+                archive_after_seconds=30 * 86400,
+            )
+            assert archiver.archive_all() == 1
+            assert mu.get_job_logs_to_archive(now - 30 * 86400, 10) == []
+
+            job_log = mu.get_job_log_pymongo(old_job)
+            assert "lines" not in job_log
+            assert job_log["archived"]["store"] == "file"
+            assert job_log["archived"]["count"] == 3
+            assert mu.get_job_log_summary(old_job) == {
+                "_id": ObjectId(old_job),
+                "stored_line_count": 3,
+                "count": 3,
+            }
+            got = list(mu.iter_job_log_lines(old_job, skip_lines=0, limit=1))
+            assert [(g["line"], g["linepos"], g["error"]) for g in got] == [
+                ("line 1", 1, True)
+            ]
+
+            with raises(Exception) as got:
+                mu.append_job_logs(old_job, [{"line": "late", "linepos": 0}])
+            assert_exception_correct(
+                got.value, ValueError(f"The log for job {old_job} is archived")
+            )
+            assert mu.add_job_log_line([old_job, recent_job], "held", True) == 1
+            assert mu.get_job_log_summary(old_job)["stored_line_count"] == 3
+
+            # archived logs can't be read without the store
+            with raises(Exception) as got:
+                list(self.getMongoUtil().iter_job_log_lines(old_job))
+            assert_exception_correct(
+                got.value,
+                ValueError(
+                    "The log is archived in the file log archive store, "
+                    + "which isn't configured"
+                ),
+            )
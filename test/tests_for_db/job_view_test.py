@@ -0,0 +1,154 @@
+"""
+Unit tests for the JobView class. No MongoDB server is needed.
+"""
+
+from bson.objectid import ObjectId
+
+from execution_engine2.db.models.job_view import JobView
+from execution_engine2.db.models.models import Job
+
+JOB_ID = "603051cfaf2e3401b0500982"
+# the creation time embedded in the job ID, in milliseconds
+CREATED = 1613779407000
+
+MINIMAL = {"_id": ObjectId(JOB_ID), "user": "user1", "updated": 1000.5}
+
+FULL = {
+    "_id": ObjectId(JOB_ID),
+    "user": "user1",
+    "authstrat": "kbaseworkspace",
+    "wsid": 42,
+    "status": "running",
+    "updated": 1000.5,
+    "estimating": 0.0,
+    "queued": 990.25,
+    "running": 995.125,
+    "finished": None,
+    "errormsg": None,
+    "batch_id": "603051cfaf2e3401b0500981",
+    "retry_ids": ["603051cfaf2e3401b0500983", "603051cfaf2e3401b0500984"],
+    "retry_saved_toggle": True,
+    "scheduler_id": "123",
+    "job_input": {
+        "wsid": 42,
+        "method": "mod.meth",
+        "app_id": "mod/app",
+        "params": [{"foo": "bar"}],
+        "service_ver": "abcdef",
+        "source_ws_objects": None,
+        "narrative_cell_info": {"run_id": "run", "tag": "dev"},
+        "requirements": {
+            "clientgroup": "njs",
+            "cpu": 4,
+            "memory": 2000,
+            "disk": 100,
+            "estimate": {"cpu": 1},
+        },
+    },
+    "job_output": {"result": [1]},
+}
+
+
+def _document_job_state(doc):
+    # the job state as built from a Job Document before JobView was added
+    job = Job._from_son(dict(doc))
+    mongo_rec = job.to_mongo().to_dict()
+    del mongo_rec["_id"]
+    mongo_rec["retry_count"] = len(job["retry_ids"])
+    mongo_rec["job_id"] = str(job.id)
+    mongo_rec["batch_id"] = job.batch_id
+    mongo_rec["created"] = int(job.id.generation_time.timestamp() * 1000)
+    mongo_rec["updated"] = int(job.updated * 1000)
+    for key in ["estimating", "queued", "running", "finished"]:
+        if job[key]:
+            mongo_rec[key] = int(job[key] * 1000)
+    return mongo_rec
+
+
+def test_from_mongo_minimal():
+    view = JobView.from_mongo(MINIMAL)
+    assert view.id == ObjectId(JOB_ID)
+    assert view.user == "user1"
+    assert view.authstrat == "kbaseworkspace"
+    assert view.wsid is None
+    assert view.batch_id is None
+    assert view.retry_count == 0
+    assert view.times == {"created": CREATED, "updated": 1000500}
+    assert view.record == {
+        "user": "user1",
+        "authstrat": "kbaseworkspace",
+        "updated": 1000.5,
+        "batch_job": False,
+        "child_jobs": [],
+        "retry_ids": [],
+        "retry_saved_toggle": False,
+    }
+
+
+def test_from_mongo_full():
+    view = JobView.from_mongo(FULL)
+    assert view.wsid == 42
+    assert view.batch_id == "603051cfaf2e3401b0500981"
+    assert view.retry_count == 2
+    assert view.times == {
+        "created": CREATED,
+        "updated": 1000500,
+        "queued": 990250,
+        "running": 995125,
+    }
+    # None values are dropped and defaults filled in, in embedded documents too
+    assert "finished" not in view.record
+    assert "errormsg" not in view.record
+    assert view.record["job_input"]["source_ws_objects"] == []
+    assert view.record["job_input"]["narrative_cell_info"] == {
+        "run_id": "run",
+        "tag": "dev",
+    }
+
+
+def test_to_job_state_matches_document():
+    excluded = {k: v for k, v in FULL.items() if k not in ("job_input", "updated")}
+    for doc in [MINIMAL, FULL, excluded]:
+        state = JobView.from_mongo(doc).to_job_state()
+        expected = _document_job_state(doc)
+        if "updated" not in doc:
+            # the default update time is the current time
+            assert abs(state.pop("updated") - expected.pop("updated")) < 1000
+        assert state == expected
+
+
+def test_to_job_state():
+    assert JobView.from_mongo(MINIMAL).to_job_state() == {
+        "user": "user1",
+        "authstrat": "kbaseworkspace",
+        "updated": 1000500,
+        "batch_job": False,
+        "child_jobs": [],
+        "retry_ids": [],
+        "retry_saved_toggle": False,
+        "retry_count": 0,
+        "job_id": JOB_ID,
+        "batch_id": None,
+        "created": CREATED,
+    }
+
+
+def test_to_range_state():
+    state = JobView.from_mongo(FULL).to_range_state()
+    assert state["_id"] == JOB_ID
+    assert state["job_id"] == JOB_ID
+    assert "retry_saved_toggle" not in state
+    assert "retry_count" not in state
+    assert state["created"] == CREATED
+    assert state["running"] == 995125
+    assert state["estimating"] == 0.0
+    assert state["job_input"]["requirements"]["cpu"] == 4
+
+
+def test_views_do_not_share_state():
+    view = JobView.from_mongo(MINIMAL)
+    state = view.to_job_state()
+    state["user"] = "user2"
+    state["updated"] = 0
+    assert view.to_job_state()["user"] == "user1"
+    assert view.to_range_state()["updated"] == 1000500
@@ -0,0 +1,183 @@
+"""
+Unit tests for the job log archive format and stores.
+"""
+
+import os
+
+import bson
+from pytest import raises
+
+from execution_engine2.db import log_archive
+from execution_engine2.db.log_archive import (
+    FileLogArchiveStore,
+    GridFSLogArchiveStore,
+    LogArchiveStore,
+    encode_archive,
+    get_log_archive_store,
+    iter_archive_lines,
+)
+from execution_engine2.db.log_encoding import ZLIB, encode_chunk
+from execution_engine2.exceptions import RecordNotFoundException
+
+from utils_shared.test_utils import assert_exception_correct
+
+
+def _lines(start, count):
+    return [
+        {
+            "line": f"line {i} ✓" if i % 3 else "",
+            "linepos": start + i,
+            "error": i % 4 == 1,
+            "ts": 1613779407.1234 + i * 0.0137,
+        }
+        for i in range(count)
+    ]
+
+
+def _assert_lines_equal(got, expected):
+    assert [(g["line"], g["linepos"], g["error"]) for g in got] == [
+        (e["line"], e["linepos"], e["error"]) for e in expected
+    ]
+    assert [int(g["ts"] * 1000) for g in got] == [int(e["ts"] * 1000) for e in expected]
+
+
+def test_round_trip_raw_and_compact():
+    # a log started in the raw encoding and continued in the compact one
+    lines = _lines(0, 30)
+    job_log = {
+        "_id": "603051cfaf2e3401b0500982",
+        "original_line_count": 30,
+        "stored_line_count": 30,
+        "lines": lines[:10],
+        "chunks": [encode_chunk(lines[10:25], 10), encode_chunk(lines[25:], 25)],
+    }
+    data, count = encode_archive(job_log, ZLIB)
+
+    assert count == 30
+    archive = bson.decode(data)
+    assert archive["original_line_count"] == 30
+    assert archive["stored_line_count"] == 30
+    assert archive["count"] == 30
+    assert [(c["start"], c["n"], c["codec"]) for c in archive["chunks"]] == [
+        (0, 30, ZLIB)
+    ]
+    _assert_lines_equal(list(iter_archive_lines(data)), lines)
+
+
+def test_round_trip_chunk_boundaries(monkeypatch):
+    monkeypatch.setattr(log_archive, "ARCHIVE_CHUNK_LINES", 4)
+    # positions that aren't consecutive start a new chunk
+    lines = _lines(0, 6) + _lines(10, 3)
+    data, count = encode_archive({"lines": lines})
+
+    assert count == 9
+    chunks = bson.decode(data)["chunks"]
+    assert [(c["start"], c["n"]) for c in chunks] == [(0, 4), (4, 2), (10, 3)]
+    for skip_lines, expected in [
+        (None, lines),
+        (2, lines[3:]),
+        (5, lines[6:]),
+        (7, lines[6:]),
+        (11, lines[8:]),
+        (12, []),
+    ]:
+        _assert_lines_equal(list(iter_archive_lines(data, skip_lines)), expected)
+
+
+def test_encode_empty_log():
+    data, count = encode_archive({"stored_line_count": 0})
+    assert count == 0
+    assert bson.decode(data)["chunks"] == []
+    assert list(iter_archive_lines(data)) == []
+
+
+def test_file_store(tmp_path):
+    store = FileLogArchiveStore(str(tmp_path / "archive"))
+    assert store.name == "file"
+    store.put("603051cfaf2e3401b0500982", b"first")
+    store.put("603051cfaf2e3401b0500983", b"other")
+    store.put("603051cfaf2e3401b0500982", b"second")
+
+    assert store.get("603051cfaf2e3401b0500982") == b"second"
+    assert store.get("603051cfaf2e3401b0500983") == b"other"
+    assert sorted(os.listdir(tmp_path / "archive" / "6030")) == [
+        "603051cfaf2e3401b0500982.bson",
+        "603051cfaf2e3401b0500983.bson",
+    ]
+
+
+def test_file_store_fail(tmp_path):
+    with raises(Exception) as got:
+        FileLogArchiveStore("")
+    assert_exception_correct(got.value, ValueError("directory is required"))
+
+    store = FileLogArchiveStore(str(tmp_path))
+    with raises(Exception) as got:
+        store.get("603051cfaf2e3401b0500982")
+    assert_exception_correct(
+        got.value,
+        RecordNotFoundException("Cannot find log archive 603051cfaf2e3401b0500982"),
+    )
+    for key in ["../etc/passwd", "a/b", ""]:
+        with raises(Exception) as got:
+            store.put(key, b"data")
+        assert_exception_correct(
+            got.value, ValueError(f"Illegal log archive key {key}")
+        )
+
+
+class _CustomStore(LogArchiveStore):
+    name = "custom"
+
+    def __init__(self, config):
+        self.config = config
+
+    def put(self, key, data):
+        pass
+
+    def get(self, key):
+        return b""
+
+
+def test_get_log_archive_store(tmp_path):
+    assert get_log_archive_store({}, None) is None
+    assert get_log_archive_store({"log-archive-store": ""}, None) is None
+
+    store = get_log_archive_store(
+        {"log-archive-store": "file", "log-archive-directory": str(tmp_path)}, None
+    )
+    assert type(store) is FileLogArchiveStore
+    assert store.directory == str(tmp_path)
+
+    config = {"log-archive-store": "log_archive_test:_CustomStore"}
+    store = get_log_archive_store(config, None)
+    assert type(store).__name__ == "_CustomStore"
+    assert store.config == config
+
+
+def test_get_log_archive_store_mongo(monkeypatch):
+    buckets = []
+
+    def bucket(database, bucket_name):
+        buckets.append((database, bucket_name))
+
+    monkeypatch.setattr(log_archive, "GridFSBucket", bucket)
+
+    store = get_log_archive_store({"log-archive-store": "mongo"}, "db")
+    assert type(store) is GridFSLogArchiveStore
+    store = get_log_archive_store(
+        {"log-archive-store": "mongo", "mongo-log-archive-collection": "archive"}, "db"
+    )
+    assert store.name == "mongo"
+    assert buckets == [("db", "ee2_log_archive"), ("db", "archive")]
+
+
+def test_get_log_archive_store_fail():
+    with raises(Exception) as got:
+        get_log_archive_store({"log-archive-store": "file"}, None)
+    assert_exception_correct(
+        got.value, ValueError("log-archive-directory is required for the file store")
+    )
+    with raises(Exception) as got:
+        get_log_archive_store({"log-archive-store": "s3"}, None)
+    assert_exception_correct(got.value, ValueError("Unsupported log-archive-store s3"))
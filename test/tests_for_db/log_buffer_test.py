@@ -0,0 +1,93 @@
+"""
+Unit tests for the LogAppendBuffer class.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pytest import raises
+
+from execution_engine2.db.log_buffer import LogAppendBuffer
+
+from utils_shared.test_utils import assert_exception_correct
+
+
+class _Log:
+    def __init__(self, error=None):
+        self.commits = []
+        self.count = 0
+        self.error = error
+        self.lock = threading.Lock()
+
+    def commit(self, job_id, batches):
+        with self.lock:
+            self.commits.append((job_id, [list(b) for b in batches]))
+            if self.error:
+                raise self.error
+            counts = []
+            for batch in batches:
+                self.count += len(batch)
+                counts.append(self.count)
+            return counts
+
+
+def test_init_fail():
+    with raises(Exception) as got:
+        LogAppendBuffer(_Log().commit, -0.001)
+    assert_exception_correct(got.value, ValueError("window_seconds must be at least 0"))
+
+
+def test_append_without_window():
+    log = _Log()
+    buf = LogAppendBuffer(log.commit, 0)
+    assert buf.append("job1", ["a", "b"]) == 2
+    assert buf.append("job1", ["c"]) == 3
+    assert log.commits == [("job1", [["a", "b"]]), ("job1", [["c"]])]
+
+
+def test_append_groups_concurrent_appends():
+    log = _Log()
+    buf = LogAppendBuffer(log.commit, 0.2)
+    batches = [[f"{i}a", f"{i}b"] for i in range(5)]
+    with ThreadPoolExecutor(5) as executor:
+        counts = list(executor.map(lambda b: buf.append("job1", b), batches))
+
+    assert len(log.commits) == 1
+    job_id, committed = log.commits[0]
+    assert job_id == "job1"
+    assert sorted(committed) == batches
+    # each caller gets the count after its own lines
+    assert counts == [2 * (committed.index(b) + 1) for b in batches]
+
+    # later appends start a new group
+    assert buf.append("job1", ["c"]) == 11
+    assert log.commits[1] == ("job1", [["c"]])
+
+
+def test_append_groups_by_job():
+    log = _Log()
+    buf = LogAppendBuffer(log.commit, 0.2)
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(lambda j: buf.append(j, ["a"]), ["job1", "job2"] * 2))
+
+    assert sorted(log.commits) == [
+        ("job1", [["a"], ["a"]]),
+        ("job2", [["a"], ["a"]]),
+    ]
+
+
+def test_append_fail():
+    log = _Log(error=ValueError("no mongo"))
+    buf = LogAppendBuffer(log.commit, 0.2)
+
+    def append(batch):
+        with raises(Exception) as got:
+            buf.append("job1", batch)
+        return got.value
+
+    with ThreadPoolExecutor(3) as executor:
+        errors = list(executor.map(append, [["a"], ["b"], ["c"]]))
+
+    assert len(log.commits) == 1
+    for e in errors:
+        assert_exception_correct(e, ValueError("no mongo"))
@@ -0,0 +1,107 @@
+"""
+Unit tests for the compact job log encoding.
+"""
+
+from pytest import raises
+
+from execution_engine2.db import log_encoding
+from execution_engine2.db.log_encoding import (
+    ZLIB,
+    ZSTD,
+    default_codec,
+    encode_chunk,
+    iter_chunk_lines,
+)
+
+from utils_shared.test_utils import assert_exception_correct
+
+
+def _lines(start, count):
+    return [
+        {
+            "line": f"step {i}: ünïcödé ✓ output" if i % 3 else "",
+            "linepos": start + i,
+            "error": i % 4 == 1,
+            "ts": 1613779407.1234 + i * 0.0137,
+        }
+        for i in range(count)
+    ]
+
+
+def _assert_lines_equal(got, expected):
+    assert [(g["line"], g["linepos"], g["error"]) for g in got] == [
+        (e["line"], e["linepos"], e["error"]) for e in expected
+    ]
+    # timestamps are kept to the millisecond
+    assert [int(g["ts"] * 1000) for g in got] == [int(e["ts"] * 1000) for e in expected]
+
+
+def test_round_trip():
+    lines = _lines(10, 50)
+    chunk = encode_chunk(lines, 10, ZLIB)
+    assert chunk["start"] == 10
+    assert chunk["n"] == 50
+    assert chunk["codec"] == ZLIB
+    assert chunk["errors"] == list(range(1, 50, 4))
+    _assert_lines_equal(list(iter_chunk_lines(chunk)), lines)
+
+
+def test_round_trip_default_codec():
+    lines = _lines(0, 5)
+    chunk = encode_chunk(lines, 0)
+    assert chunk["codec"] == default_codec()
+    _assert_lines_equal(list(iter_chunk_lines(chunk)), lines)
+
+
+def test_round_trip_missing_timestamps_and_single_line():
+    lines = [{"line": "no ts", "linepos": 0, "error": False}]
+    got = list(iter_chunk_lines(encode_chunk(lines, 0)))
+    assert [g["line"] for g in got] == ["no ts"]
+    assert int(got[0]["ts"] * 1000) == 0
+
+
+def test_skip_lines():
+    lines = _lines(10, 20)
+    chunk = encode_chunk(lines, 10)
+    for skip_lines, expected in [
+        (None, lines),
+        (3, lines),
+        (9, lines),
+        (10, lines[1:]),
+        (24, lines[15:]),
+        (28, lines[19:]),
+        (29, []),
+        (100, []),
+    ]:
+        _assert_lines_equal(list(iter_chunk_lines(chunk, skip_lines)), expected)
+
+
+def test_compresses():
+    lines = [
+        {"line": f"Processed {i} reads", "linepos": i, "error": False, "ts": 1.0 + i}
+        for i in range(1000)
+    ]
+    chunk = encode_chunk(lines, 0, ZLIB)
+    assert len(chunk["data"]) * 5 < sum(len(line["line"]) for line in lines)
+
+
+def test_zstd_not_installed(monkeypatch):
+    monkeypatch.setattr(log_encoding, "zstandard", None)
+    assert default_codec() == ZLIB
+    with raises(Exception) as got:
+        encode_chunk(_lines(0, 1), 0, ZSTD)
+    assert_exception_correct(got.value, ValueError("zstandard is not installed"))
+    chunk = dict(encode_chunk(_lines(0, 1), 0, ZLIB), codec=ZSTD)
+    with raises(Exception) as got:
+        list(iter_chunk_lines(chunk))
+    assert_exception_correct(got.value, ValueError("zstandard is not installed"))
+
+
+def test_unsupported_codec():
+    with raises(Exception) as got:
+        encode_chunk(_lines(0, 1), 0, "lz4")
+    assert_exception_correct(got.value, ValueError("Unsupported log chunk codec lz4"))
+    chunk = dict(encode_chunk(_lines(0, 1), 0, ZLIB), codec="lz4")
+    with raises(Exception) as got:
+        list(iter_chunk_lines(chunk))
+    assert_exception_correct(got.value, ValueError("Unsupported log chunk codec lz4"))
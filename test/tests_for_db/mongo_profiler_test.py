@@ -0,0 +1,178 @@
+"""
+Unit tests for the MongoProfiler class. No MongoDB server is needed.
+"""
+
+import time
+from types import SimpleNamespace
+from unittest.mock import create_autospec
+
+from logging import Logger
+
+import bson
+from pytest import raises
+
+from execution_engine2.db.mongo_profiler import MongoProfiler, filter_shape
+from execution_engine2.utils.rpc_context import current_rpc_method, rpc_method
+from utils_shared.test_utils import assert_exception_correct
+
+
+def _started(request_id, command_name, command):
+    return SimpleNamespace(
+        connection_id=("localhost", 27017),
+        request_id=request_id,
+        command_name=command_name,
+        command=command,
+        database_name="ee2",
+    )
+
+
+def _finished(request_id, command_name, duration_ms, reply=None):
+    return SimpleNamespace(
+        connection_id=("localhost", 27017),
+        request_id=request_id,
+        command_name=command_name,
+        duration_micros=int(duration_ms * 1000),
+        reply=reply,
+    )
+
+
+def test_filter_shape():
+    assert filter_shape(
+        {"status": {"$in": ["queued", "running"]}, "user": "foo", "wsid": 3}
+    ) == {"status": {"$in": ["str"]}, "user": "str", "wsid": "int"}
+    assert filter_shape(None) == "NoneType"
+
+
+def test_rpc_method():
+    assert current_rpc_method() is None
+    with rpc_method("check_jobs"):
+        assert current_rpc_method() == "check_jobs"
+        with rpc_method("get_job_logs"):
+            assert current_rpc_method() == "get_job_logs"
+        assert current_rpc_method() == "check_jobs"
+    assert current_rpc_method() is None
+
+
+def test_stats():
+    logger = create_autospec(Logger, spec_set=True, instance=True)
+    p = MongoProfiler(logger, slow_ms=1000)
+
+    with rpc_method("check_jobs"):
+        p.started(_started(1, "find", {"find": "ee2_jobs", "filter": {"_id": 1}}))
+    p.succeeded(
+        _finished(1, "find", 4, {"cursor": {"firstBatch": [{"a": 1}, {"a": 2}]}})
+    )
+    with rpc_method("check_jobs"):
+        p.started(_started(2, "find", {"find": "ee2_jobs", "filter": {"_id": 2}}))
+    p.failed(_finished(2, "find", 2))
+    p.started(_started(3, "update", {"update": "ee2_logs", "updates": []}))
+    p.succeeded(_finished(3, "update", 1, {"n": 3, "ok": 1}))
+    # explains aren't recorded, and unknown finished commands are ignored
+    p.started(_started(4, "explain", {"explain": {}}))
+    p.succeeded(_finished(4, "explain", 1, {"ok": 1}))
+    p.succeeded(_finished(5, "find", 1, {"ok": 1}))
+
+    stats = p.get_stats()
+    find = stats.pop("check_jobs.find.ee2_jobs")
+    reply_bytes = find.pop("reply_bytes")
+    assert reply_bytes > 0
+    assert find == {
+        "count": 2,
+        "failures": 1,
+        "mean_ms": 3.0,
+        "max_ms": 4.0,
+        "docs_returned": 2,
+    }
+    update = stats.pop("none.update.ee2_logs")
+    assert update["count"] == 1
+    assert update["docs_returned"] == 3
+    assert stats == {}
+    logger.warning.assert_not_called()
+
+
+def test_reply_size_sampled():
+    logger = create_autospec(Logger, spec_set=True, instance=True)
+    p = MongoProfiler(logger, slow_ms=1000, reply_sample_interval=3)
+    small = {"cursor": {"firstBatch": [{"a": 1}]}}
+    big = {"cursor": {"firstBatch": [{"a": "x" * 1000}]}}
+
+    # replies 1 and 4 are measured, and failures aren't counted as replies
+    for i, reply in enumerate([small, big, None, big, big, small]):
+        p.started(_started(i, "find", {"find": "ee2_jobs", "filter": {}}))
+        if reply is None:
+            p.failed(_finished(i, "find", 1))
+        else:
+            p.succeeded(_finished(i, "find", 1, reply))
+
+    stats = p.get_stats()["none.find.ee2_jobs"]
+    assert stats["count"] == 6
+    assert stats["failures"] == 1
+    assert stats["reply_bytes"] == round(
+        (len(bson.encode(small)) + len(bson.encode(big))) * 5 / 2
+    )
+
+
+def test_reply_sample_interval_fail():
+    logger = create_autospec(Logger, spec_set=True, instance=True)
+    with raises(Exception) as got:
+        MongoProfiler(logger, reply_sample_interval=0)
+    assert_exception_correct(
+        got.value, ValueError("reply_sample_interval must be at least 1")
+    )
+
+
+def test_slow_op_logged_with_shape_and_explained():
+    logger = create_autospec(Logger, spec_set=True, instance=True)
+    clock = SimpleNamespace(now=0)
+    p = MongoProfiler(
+        logger, slow_ms=100, explain_interval_seconds=60, clock=lambda: clock.now
+    )
+    client = {
+        "ee2": SimpleNamespace(
+            command=lambda cmd: {
+                "queryPlanner": {
+                    "winningPlan": {
+                        "stage": "FETCH",
+                        "inputStage": {"stage": "IXSCAN", "indexName": "status_1"},
+                    }
+                }
+            }
+        )
+    }
+    p.client = client
+
+    command = {
+        "find": "ee2_jobs",
+        "filter": {"status": "queued", "user": "secret_user"},
+        "lsid": {"id": 1},
+    }
+    for i in range(2):
+        with rpc_method("check_workspace_jobs"):
+            p.started(_started(i, "find", command))
+        p.succeeded(_finished(i, "find", 250, {"cursor": {"firstBatch": []}}))
+    p._explainer.shutdown(wait=True)
+
+    messages = [c[0][0] for c in logger.warning.call_args_list]
+    # two slow op messages, one query plan as the second is within the interval
+    assert len(messages) == 3
+    slow = [m for m in messages if m.startswith("Slow mongo find")]
+    assert len(slow) == 2
+    assert "check_workspace_jobs" in slow[0]
+    assert "{'status': 'str', 'user': 'str'}" in slow[0]
+    assert "secret_user" not in "".join(messages)
+    plans = [m for m in messages if m.startswith("Query plan")]
+    assert plans == [
+        "Query plan for slow mongo find on ee2_jobs with filter shape "
+        + "{'status': 'str', 'user': 'str'}: FETCH <- IXSCAN(status_1)"
+    ]
+
+
+def test_explain_disabled():
+    logger = create_autospec(Logger, spec_set=True, instance=True)
+    p = MongoProfiler(logger, slow_ms=0, explain_interval_seconds=0)
+    p.client = {}
+    p.started(_started(1, "find", {"find": "ee2_jobs", "filter": {}}))
+    p.succeeded(_finished(1, "find", 1, {"cursor": {"firstBatch": []}}))
+    time.sleep(0.01)
+    assert p._explainer is None
+    assert logger.warning.call_count == 1
@@ -0,0 +1,196 @@
+"""
+Unit tests for the EE2Logs class.
+"""
+
+import time
+from datetime import datetime, timezone
+from logging import Logger
+from unittest.mock import create_autospec
+
+from pytest import raises
+
+from execution_engine2.db.MongoUtil import MongoUtil
+from execution_engine2.db.models.models import LogLines
+from execution_engine2.exceptions import RecordNotFoundException
+from execution_engine2.sdk.EE2Logs import AddLogResult, EE2Logs, JobPermissions
+from execution_engine2.sdk.SDKMethodRunner import SDKMethodRunner
+
+from utils_shared.test_utils import assert_exception_correct
+
+JOB_ID = "603051cfaf2e3401b0500982"
+
+
+def _logs():
+    sdkmr = create_autospec(SDKMethodRunner, spec_set=True, instance=True)
+    sdkmr.check_and_convert_time.side_effect = SDKMethodRunner.check_and_convert_time
+    return EE2Logs(sdkmr), sdkmr
+
+
+def _document_format(record_position, log_lines):
+    # the formatting before the lines were checked without LogLines Documents
+    formatted = []
+    for input_line in log_lines:
+        record_position += 1
+        ll = LogLines()
+        ll.error = int(input_line.get("is_error", 0)) == 1
+        ll.linepos = record_position
+        ts = input_line.get("ts")
+        if ts is not None:
+            ts = SDKMethodRunner.check_and_convert_time(ts, assign_default_time=True)
+        ll.ts = ts
+        ll.line = input_line.get("line")
+        ll.validate()
+        formatted.append(ll.to_mongo().to_dict())
+    return formatted
+
+
+def test_format_job_logs_matches_document():
+    log_lines = [
+        {"line": "ms", "ts": 1613779407123},
+        {"line": "seconds", "ts": 1613779407.5, "is_error": 1},
+        {"line": "ms string", "ts": "1613779407123", "is_error": True},
+        {"line": "seconds string", "ts": "1613779407.25", "is_error": "1"},
+        {"line": "iso", "ts": "2021-02-20T00:03:27.123+00:00", "is_error": 0},
+        {"line": "iso z", "ts": "2021-02-20T00:03:27Z", "is_error": False},
+        {"line": "naive iso", "ts": "2021-02-20 00:03:27"},
+        {"line": "other date", "ts": "Feb 20 2021 00:03:27 UTC"},
+        {"line": "datetime", "ts": datetime(2021, 2, 20, tzinfo=timezone.utc)},
+        {"line": "negative", "ts": -5000},
+        {"line": "", "ts": 0.0, "is_error": 1.0},
+    ]
+    logs, _ = _logs()
+    assert logs._format_job_logs(41, log_lines) == _document_format(41, log_lines)
+
+
+def test_format_job_logs_default_times():
+    logs, _ = _logs()
+    before = time.time()
+    got = logs._format_job_logs(
+        -1, [{"line": "no ts"}, {"line": "bad ts", "ts": "not a time"}]
+    )
+    after = time.time()
+    assert [(g["line"], g["linepos"], g["error"]) for g in got] == [
+        ("no ts", 0, False),
+        ("bad ts", 1, False),
+    ]
+    for g in got:
+        assert before <= g["ts"] <= after
+
+
+def test_format_job_logs_fast_path():
+    logs, sdkmr = _logs()
+    logs._format_job_logs(
+        -1,
+        [
+            {"line": "a", "ts": 1613779407123},
+            {"line": "b", "ts": 1613779407.5},
+            {"line": "c", "ts": "1613779407123"},
+            {"line": "d", "ts": "2021-02-20T00:03:27Z"},
+            {"line": "e"},
+        ],
+    )
+    sdkmr.check_and_convert_time.assert_not_called()
+
+
+def test_format_job_logs_fail():
+    _format_job_logs_fail([{"line": None}], ValueError("Log line 6: line is required"))
+    _format_job_logs_fail([{"ts": 1}], ValueError("Log line 6: line is required"))
+    _format_job_logs_fail(
+        [{"line": "a"}, {"line": 1}], ValueError("Log line 7: line must be a string")
+    )
+    _format_job_logs_fail(
+        [{"line": "a", "is_error": "yes"}],
+        ValueError("invalid literal for int() with base 10: 'yes'"),
+    )
+
+
+def _format_job_logs_fail(log_lines, expected):
+    logs, _ = _logs()
+    with raises(Exception) as got:
+        logs._format_job_logs(5, log_lines)
+    assert_exception_correct(got.value, expected)
+
+
+def _logs_with_mongo():
+    logs, sdkmr = _logs()
+    mongo = create_autospec(MongoUtil, spec_set=True, instance=True)
+    sdkmr.get_mongo_util.return_value = mongo
+    sdkmr.get_logger.return_value = create_autospec(
+        Logger, spec_set=True, instance=True
+    )
+    return logs, sdkmr, mongo
+
+
+def test_add_job_logs():
+    logs, sdkmr, mongo = _logs_with_mongo()
+    mongo.append_job_logs.return_value = 12
+
+    got = logs.add_job_logs(
+        JOB_ID, [{"line": "a", "ts": 1000}, {"line": "b", "is_error": 1, "ts": 2000}]
+    )
+
+    assert got == AddLogResult(success=True, stored_line_count=12)
+    sdkmr.get_job_with_permission.assert_called_once_with(
+        JOB_ID, JobPermissions.WRITE, as_admin=False
+    )
+    mongo.append_job_logs.assert_called_once_with(
+        JOB_ID,
+        [
+            {"line": "a", "linepos": 0, "error": False, "ts": 1.0},
+            {"line": "b", "linepos": 1, "error": True, "ts": 2.0},
+        ],
+    )
+
+
+def test_add_job_logs_fail():
+    logs, _, mongo = _logs_with_mongo()
+    mongo.get_job_log_summary.return_value = {"stored_line_count": 7, "count": 7}
+
+    got = logs.add_job_logs(JOB_ID, [{"line": "a"}, {"ts": 1}], as_admin=True)
+
+    assert got == AddLogResult(success=False, stored_line_count=7)
+    mongo.append_job_logs.assert_not_called()
+    mongo.get_job_log_summary.assert_called_once_with(JOB_ID)
+
+    # no log yet
+    mongo.append_job_logs.side_effect = ValueError("no mongo")
+    mongo.get_job_log_summary.side_effect = RecordNotFoundException("no log")
+    got = logs.add_job_logs(JOB_ID, [{"line": "a"}])
+    assert got == AddLogResult(success=False, stored_line_count=-1)
+
+
+def test_get_job_logs():
+    logs, sdkmr, mongo = _logs_with_mongo()
+    mongo.get_job_log_summary.return_value = {"stored_line_count": 10, "count": 10}
+    mongo.iter_job_log_lines.return_value = iter(
+        [
+            {"line": "a", "linepos": 3, "error": False, "ts": 1613779407.1235},
+            {"line": "b", "linepos": 4, "error": True, "ts": 0},
+        ]
+    )
+
+    got = logs.view_job_logs(JOB_ID, 2, limit=2)
+
+    assert got == {
+        "lines": [
+            {"line": "a", "linepos": 3, "is_error": 0, "ts": 1613779407123},
+            {"line": "b", "linepos": 4, "is_error": 1},
+        ],
+        "last_line_number": 4,
+        "count": 10,
+    }
+    sdkmr.get_job_with_permission.assert_called_once_with(
+        JOB_ID, JobPermissions.READ, as_admin=False
+    )
+    mongo.get_job_log_summary.assert_called_once_with(JOB_ID)
+    mongo.iter_job_log_lines.assert_called_once_with(JOB_ID, 2, 2)
+
+
+def test_get_job_logs_all_skipped():
+    logs, _, mongo = _logs_with_mongo()
+    mongo.get_job_log_summary.return_value = {"stored_line_count": 10, "count": 10}
+    mongo.iter_job_log_lines.return_value = iter([])
+
+    got = logs.view_job_logs(JOB_ID, 20)
+
+    assert got == {"lines": [], "last_line_number": 10, "count": 10}
@@ -0,0 +1,163 @@
+"""
+Unit tests for the ResourceReport class.
+"""
+
+from unittest.mock import create_autospec
+
+from bson import ObjectId
+from pytest import raises
+
+from execution_engine2.db.MongoUtil import MongoUtil
+from execution_engine2.exceptions import IncorrectParamsException
+from execution_engine2.sdk.EE2ResourceReport import ResourceReport
+from execution_engine2.sdk.SDKMethodRunner import SDKMethodRunner
+from utils_shared.test_utils import assert_exception_correct
+
+
+def _mocks():
+    sdkmr = create_autospec(SDKMethodRunner, spec_set=True, instance=True)
+    mongo = create_autospec(MongoUtil, spec_set=True, instance=True)
+    sdkmr.get_mongo_util.return_value = mongo
+    sdkmr.check_and_convert_time.side_effect = lambda t: float(t)
+    return sdkmr, mongo
+
+
+def _job(cpu_used, memory_used, disk_used, runtime_hours=2):
+    return {
+        "cpu_requested": 4,
+        "memory_requested": 4096,
+        "disk_requested": 30,
+        "cpu_used": cpu_used,
+        "memory_used": memory_used,
+        "disk_used": disk_used,
+        "runtime_hours": runtime_hours,
+    }
+
+
+def test_get_resource_usage_report():
+    sdkmr, mongo = _mocks()
+    mongo.get_resource_usage_by_method.return_value = [
+        {
+            "method": "mod.small",
+            "client_group": "njs",
+            "jobs": [_job(0.5, 100 * i, 1.5) for i in range(1, 11)],
+        },
+        {
+            "method": "mod.unknown",
+            "client_group": None,
+            "jobs": [{"cpu_requested": 4, "runtime_hours": None}],
+        },
+        {
+            "method": "mod.big",
+            "client_group": "bigmem",
+            # uses more than it asked for, so nothing is wasted
+            "jobs": [_job(6, 8192, 40)],
+        },
+    ]
+
+    report = ResourceReport(sdkmr).get_resource_usage_report(
+        "1000", "2000", methods=["mod.small", "mod.big"], min_jobs=5
+    )
+
+    mongo.get_resource_usage_by_method.assert_called_once_with(
+        ObjectId("000003e80000000000000000"),
+        ObjectId("000007d00000000000000000"),
+        methods=["mod.small", "mod.big"],
+    )
+    assert report["start_time"] == 1000
+    assert report["end_time"] == 2000
+    small, big, unknown = report["methods"]
+
+    assert small["method"] == "mod.small"
+    assert small["client_group"] == "njs"
+    assert small["job_count"] == 10
+    assert small["jobs_with_usage"] == 10
+    assert small["cpu"] == {
+        "requested": {"p50": 4, "p90": 4, "p95": 4, "p99": 4, "max": 4},
+        "used": {"p50": 0.5, "p90": 0.5, "p95": 0.5, "p99": 0.5, "max": 0.5},
+    }
+    assert small["memory_mb"]["used"] == {
+        "p50": 500,
+        "p90": 900,
+        "p95": 1000,
+        "p99": 1000,
+        "max": 1000,
+    }
+    assert small["disk_gb"]["used"]["p99"] == 1.5
+    assert small["waste"] == {
+        "cpu_hours": 70.0,
+        # 10 jobs * 4096MB - (100 + 200 + ... + 1000)MB over 2 hours
+        "memory_gb_hours": 69.26,
+        "disk_gb_hours": 570.0,
+    }
+    assert small["suggested_client_groups"] == [
+        "njs",
+        "request_cpus=1",
+        "request_memory=1300M",
+        "request_disk=2GB",
+    ]
+
+    assert big["method"] == "mod.big"
+    assert big["waste"] == {
+        "cpu_hours": 0,
+        "memory_gb_hours": 0,
+        "disk_gb_hours": 0,
+    }
+    # too few jobs to make a suggestion
+    assert big["suggested_client_groups"] is None
+
+    assert unknown["method"] == "mod.unknown"
+    assert unknown["jobs_with_usage"] == 0
+    assert unknown["cpu"]["used"] is None
+    assert unknown["memory_mb"] == {"requested": None, "used": None}
+    assert unknown["suggested_client_groups"] is None
+
+
+def test_get_resource_usage_report_default_min_jobs():
+    sdkmr, mongo = _mocks()
+    mongo.get_resource_usage_by_method.return_value = [
+        {
+            "method": "mod.meth",
+            "client_group": "njs",
+            "jobs": [_job(1, 1000, 1)] * 9,
+        }
+    ]
+
+    report = ResourceReport(sdkmr).get_resource_usage_report(1000, 2000)
+
+    mongo.get_resource_usage_by_method.assert_called_once_with(
+        ObjectId("000003e80000000000000000"),
+        ObjectId("000007d00000000000000000"),
+        methods=None,
+    )
+    assert report["methods"][0]["suggested_client_groups"] is None
+
+
+def test_get_resource_usage_report_fail():
+    _report_fail(
+        None,
+        2,
+        None,
+        IncorrectParamsException("Please provide a start time and an end time"),
+    )
+    _report_fail(
+        1,
+        None,
+        None,
+        IncorrectParamsException("Please provide a start time and an end time"),
+    )
+    _report_fail(
+        3,
+        2,
+        None,
+        IncorrectParamsException("The start time cannot be greater than the end time."),
+    )
+    _report_fail(1, 2, "mod.meth", IncorrectParamsException("methods must be a list"))
+
+
+def _report_fail(start, end, methods, expected):
+    sdkmr, mongo = _mocks()
+    with raises(Exception) as got:
+        ResourceReport(sdkmr).get_resource_usage_report(start, end, methods=methods)
+    assert_exception_correct(got.value, expected)
+    mongo.get_resource_usage_by_method.assert_not_called()
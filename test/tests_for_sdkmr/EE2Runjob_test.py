@@ -16,6 +16,7 @@ from pytest import raises
 from execution_engine2.authorization.workspaceauth import WorkspaceAuth
 from execution_engine2.db.MongoUtil import MongoUtil
 from execution_engine2.db.models.models import (
+    ErrorCode,
     Job,
     JobInput,
     JobRequirements,
@@ -113,7 +114,8 @@ def _set_up_mocks(user: str, token: str) -> Dict[Any, Any]:
     # Set up basic getter calls
     sdkmr.get_catalog_cache.return_value = mocks[CatalogCache]
     sdkmr.get_catalog.return_value = mocks[Catalog]
-    sdkmr.get_condor.return_value = mocks[Condor]
+    sdkmr.get_scheduler.return_value = mocks[Condor]
+    mocks[Condor].scheduler_type = "condor"
     sdkmr.get_kafka_client.return_value = mocks[KafkaClient]
     sdkmr.get_logger.return_value = mocks[Logger]
     sdkmr.get_mongo_util.return_value = mocks[MongoUtil]
@@ -798,7 +800,7 @@ def _set_up_common_return_values_batch(mocks, returned_job_state=_QUEUED_STATE):
         [_JOB_ID_1, _JOB_ID_2],
     ]
 
-    mocks[Condor].run_job.side_effect = [
+    mocks[Condor].submit_jobs.return_value = [
         SubmissionInfo(_CLUSTER_1, {}, None),
         SubmissionInfo(_CLUSTER_2, {}, None),
     ]
@@ -903,15 +905,15 @@ def _check_common_mock_calls_batch(
         parent_job_id=_JOB_ID,
         wsid=parent_wsid,
     )
-    mocks[Condor].run_job.assert_has_calls(
-        [call(params=jsp_expected_1), call(params=jsp_expected_2)]
-    )
+    # the jobs are submitted together
+    mocks[Condor].submit_jobs.assert_called_once_with([jsp_expected_1, jsp_expected_2])
+    mocks[Condor].run_job.assert_not_called()
 
     # update to queued state
     mocks[MongoUtil].update_job_to_queued.assert_has_calls(
         [
-            call(_JOB_ID_1, _CLUSTER_1),
-            call(_JOB_ID_2, _CLUSTER_2),
+            call(_JOB_ID_1, _CLUSTER_1, "condor"),
+            call(_JOB_ID_2, _CLUSTER_2, "condor"),
         ]
     )
     job_ids = [_JOB_ID_1, _JOB_ID_2]
@@ -1275,6 +1277,43 @@ def test_run_job_batch_as_admin_with_job_requirements():
     _check_common_mock_calls_batch(mocks, reqs1, reqs2, None)
 
 
+def test_submit_multiple_fail_submission():
+    """
+    Jobs submitted before the failure are updated to queued so they can be aborted, and the
+    job that failed records the error.
+    """
+    mocks = _set_up_mocks(_USER, _TOKEN)
+    sdkmr = mocks[SDKMethodRunner]
+    err = ValueError("no schedd")
+    mocks[Condor].submit_jobs.return_value = [
+        SubmissionInfo(_CLUSTER_1, {}, None),
+        SubmissionInfo(None, {}, err),
+    ]
+    reqs = ResolvedRequirements(cpus=1, memory_MB=2, disk_GB=3, client_group="cg1")
+    jsps = [
+        JobSubmissionParameters(
+            job_id, AppInfo(_METHOD_1), reqs, UserCreds(_USER, _TOKEN)
+        )
+        for job_id in [_JOB_ID_1, _JOB_ID_2]
+    ]
+
+    with raises(Exception) as got:
+        EE2RunJob(sdkmr)._submit_multiple(jsps)
+    assert_exception_correct(got.value, err)
+
+    mocks[Condor].submit_jobs.assert_called_once_with(jsps)
+    mocks[MongoUtil].update_job_to_queued.assert_called_once_with(
+        _JOB_ID_1, _CLUSTER_1, "condor"
+    )
+    sdkmr.finish_job.assert_called_once_with(
+        job_id=_JOB_ID_2,
+        error_message="Cannot submit to condor no schedd",
+        error_code=ErrorCode.job_crashed.value,
+        error="no schedd",
+    )
+    mocks[MongoUtil].get_jobs.assert_not_called()
+
+
 def test_run_batch_preflight_failures():
     mocks = _set_up_mocks(_USER, _TOKEN)
     sdkmr = mocks[SDKMethodRunner]
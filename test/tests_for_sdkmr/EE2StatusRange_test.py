@@ -2,6 +2,8 @@
 Unit tests for the EE2StatusRange class.
 """
 
+import json
+
 from pytest import raises
 
 from logging import Logger
@@ -11,7 +13,10 @@ from bson.objectid import ObjectId
 from execution_engine2.exceptions import AuthError
 from execution_engine2.sdk.SDKMethodRunner import SDKMethodRunner
 from execution_engine2.sdk.EE2StatusRange import JobStatusRange
+from execution_engine2.db.models.job_view import JobView
 from execution_engine2.db.models.models import Job
+from execution_engine2.utils.json_codec import StdlibCodec
+from execution_engine2.utils.json_stream import StreamedList, iter_encode
 
 from utils_shared.test_utils import assert_exception_correct
 
@@ -63,7 +68,7 @@ def _run_minimal(user):
     j.user = expected_user
     j.updated = 1000000.0
     j.status = created_state
-    sdkmr.get_jobs.return_value = [j]
+    sdkmr.get_job_views.return_value = [JobView.from_mongo(j.to_mongo().to_dict())]
 
     # call the method
     ee2sr = JobStatusRange(sdkmr)
@@ -105,7 +110,7 @@ def _run_minimal(user):
     # check mocks called as expected. Ordered as per the call order in the EE2SR code
     sdkmr.check_and_convert_time.assert_has_calls([call("5/6/21"), call("7/6/21")])
     sdkmr.get_job_counts.assert_called_once_with(expected_job_filter)
-    sdkmr.get_jobs.assert_called_once_with(expected_job_filter, [], "+", 0, 2000)
+    sdkmr.get_job_views.assert_called_once_with(expected_job_filter, [], "+", 0, 2000)
     logger.debug.assert_called_once_with(
         "Searching for jobs with id_gt 000000230000000000000000 id_lt 0000005c0000000000000000"
     )
@@ -132,3 +137,35 @@ def test_run_with_non_matching_user_and_not_admin():
 
     sdkmr.get_user_id.assert_has_calls([call(), call()])
     sdkmr.check_is_admin.assert_called_once_with()
+
+
+def test_run_streamed():
+    """
+    Test that streaming the job states produces the same result as building them in memory.
+    """
+
+    def run(stream):
+        sdkmr = create_autospec(SDKMethodRunner, spec_set=True, instance=True)
+        sdkmr.get_user_id.return_value = USER1
+        sdkmr.check_and_convert_time.side_effect = [35.6, 92.4]
+        sdkmr.get_job_counts.return_value = 26
+        jobs = []
+        for i, status in enumerate(["created", "queued", "created"]):
+            j = Job()
+            j.id = ObjectId(f"603051cfaf2e3401b050098{i}")
+            j.user = USER1
+            j.updated = 1000000.0
+            j.status = status
+            jobs.append(JobView.from_mongo(j.to_mongo().to_dict()))
+        sdkmr.get_job_views.return_value = jobs
+        return JobStatusRange(sdkmr).check_jobs_date_range_for_user(
+            "5/6/21", "7/6/21", stream=stream
+        )
+
+    dumps = StdlibCodec().dumps
+    streamed = run(True)
+    assert type(streamed["jobs"]) is StreamedList
+    got = json.loads(b"".join(iter_encode(streamed, dumps)))
+    assert got == json.loads(dumps(run(False)))
+    assert got["count"] == 3
+    assert got["stats"]["status"] == {"created": 2, "queued": 1}
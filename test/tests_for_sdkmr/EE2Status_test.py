@@ -2,8 +2,9 @@
 Unit tests for the EE2Status class.
 """
 
+import time
 from logging import Logger
-from unittest.mock import create_autospec, call
+from unittest.mock import create_autospec, MagicMock
 
 from bson.objectid import ObjectId
 
@@ -13,7 +14,12 @@ from execution_engine2.sdk.EE2Status import JobsStatus, JobPermissions
 from execution_engine2.sdk.SDKMethodRunner import SDKMethodRunner
 from installed_clients.CatalogClient import Catalog
 from lib.execution_engine2.utils.Condor import Condor
-from lib.execution_engine2.utils.KafkaUtils import KafkaClient, KafkaFinishJob
+from lib.execution_engine2.utils.KafkaUtils import (
+    KafkaClient,
+    KafkaFinishJob,
+    KafkaCancelJob,
+    KafkaCondorCommand,
+)
 
 
 def _finish_job_complete_minimal_get_test_job(job_id, sched, app_id, gitcommit, user):
@@ -50,7 +56,6 @@ def _finish_job_complete_minimal(app_id, app_module):
     job_output = {"version": "1.1", "id": job_id, "result": [{"foo": "bar"}]}
     user = "someuser"
     gitcommit = "somecommit"
-    resources = {"fake": "condor", "resources": "in", "here": "yo"}
     sched = "somescheduler"
 
     # set up mocks
@@ -63,7 +68,7 @@ def _finish_job_complete_minimal(app_id, app_module):
     sdkmr.get_mongo_util.return_value = mongo
     sdkmr.get_logger.return_value = logger
     sdkmr.get_kafka_client.return_value = kafka
-    sdkmr.get_condor.return_value = condor
+    sdkmr.get_scheduler.return_value = condor
     sdkmr.get_catalog.return_value = catalog
 
     # set up return values for mocks. Ordered as per order of operations in code
@@ -75,32 +80,21 @@ def _finish_job_complete_minimal(app_id, app_module):
     )
     job2.status = Status.completed.value
 
-    sdkmr.get_job_with_permission.side_effect = [job1, job2]
-    mongo.get_job.return_value = job2  # gets the job 3x...?
-    condor.get_job_resource_info.return_value = resources
+    sdkmr.get_job_with_permission.return_value = job1
+    mongo.finish_job_with_success.return_value = job2.to_mongo().to_dict()
 
     # call the method
     JobsStatus(sdkmr).finish_job(job_id, job_output=job_output)  # no return
+    # The catalog call happens in a thread
+    # May need to increase sleep if thread takes too long
+    time.sleep(0.1)
 
     # check mocks called as expected. Ordered as per order of operations in code
 
-    sdkmr.get_job_with_permission.assert_has_calls(
-        [
-            call(
-                job_id=job_id, requested_job_perm=JobPermissions.WRITE, as_admin=False
-            ),
-            call(
-                job_id=job_id, requested_job_perm=JobPermissions.WRITE, as_admin=False
-            ),
-        ]
-    )
-    logger.debug.assert_has_calls(
-        [
-            call("Finishing job with a success"),
-            # depending on stable dict ordering for this test to pass
-            call(f"Extracted the following condor job ads {resources}"),
-        ]
+    sdkmr.get_job_with_permission.assert_called_once_with(
+        job_id=job_id, requested_job_perm=JobPermissions.WRITE, as_admin=False
     )
+    logger.debug.assert_called_once_with("Finishing job with a success")
     mongo.finish_job_with_success.assert_called_once_with(job_id, job_output)
     kafka.send_kafka_message.assert_called_once_with(
         KafkaFinishJob(
@@ -112,7 +106,7 @@ def _finish_job_complete_minimal(app_id, app_module):
             error_message=None,
         )
     )
-    mongo.get_job.assert_called_once_with(job_id)
+    mongo.get_job.assert_not_called()
     les_expected = {
         "user_id": user,
         "func_module_name": "module",
@@ -130,15 +124,14 @@ def _finish_job_complete_minimal(app_id, app_module):
         app_id = app_id.split("/")[-1]
         les_expected.update({"app_id": app_id, "app_module_name": app_module})
     catalog.log_exec_stats.assert_called_once_with(les_expected)
-    mongo.update_job_resources.assert_called_once_with(job_id, resources)
+    # resource usage is recorded by the ResourceUsageCollector, not when finishing the job
+    condor.get_job_resource_info.assert_not_called()
+    mongo.update_job_resources.assert_not_called()
 
     # Ensure that catalog stats were not logged for a job that was created but failed before running
     bad_running_timestamps = [-1, 0, None]
     for timestamp in bad_running_timestamps:
         log_exec_stats_call_count = catalog.log_exec_stats.call_count
-        update_finished_job_with_usage_call_count = (
-            mongo.update_job_resources.call_count
-        )
         job_id2 = "6046b539ce9c58ecf8c3e5f4"
         subject_job = _finish_job_complete_minimal_get_test_job(
             job_id2,
@@ -149,10 +142,231 @@ def _finish_job_complete_minimal(app_id, app_module):
         )
         subject_job.running = timestamp
         subject_job.status = Status.created.value
-        sdkmr.get_job_with_permission.side_effect = [subject_job, subject_job]
+        sdkmr.get_job_with_permission.return_value = subject_job
         JobsStatus(sdkmr).finish_job(subject_job, job_output=job_output)  # no return
+        time.sleep(0.1)
         assert catalog.log_exec_stats.call_count == log_exec_stats_call_count
-        assert (
-            mongo.update_job_resources.call_count
-            == update_finished_job_with_usage_call_count
+
+
+def test_check_job_resource_usage_excluded_by_default():
+    _check_job_resource_usage({}, False)
+
+
+def test_check_job_resource_usage_requested():
+    _check_job_resource_usage({"return_resource_usage": True}, True)
+
+
+def _check_job_resource_usage(kwargs, expected_return_resource_usage):
+    job_id = "6046b539ce9c58ecf8c3e5f3"
+    js = JobsStatus(MagicMock())
+    js.check_jobs = MagicMock(return_value={job_id: {"status": "running"}})
+
+    assert js.check_job(job_id, True, exclude_fields=["job_input"], **kwargs) == {
+        "status": "running"
+    }
+
+    js.check_jobs.assert_called_once_with(
+        [job_id],
+        check_permission=True,
+        exclude_fields=["job_input"],
+        return_list=0,
+        return_resource_usage=expected_return_resource_usage,
+    )
+
+
+def test_check_jobs_resource_usage_excluded_by_default():
+    _check_jobs_resource_usage(
+        {}, ["job_input", "resource_usage", "resource_usage_peaks"]
+    )
+
+
+def test_check_jobs_resource_usage_requested():
+    _check_jobs_resource_usage({"return_resource_usage": True}, ["job_input"])
+
+
+def _check_jobs_resource_usage(kwargs, expected_exclude_fields):
+    # check_jobs logs through the sdkmr.logger attribute, which autospec doesn't provide
+    sdkmr = MagicMock()
+    mongo = create_autospec(MongoUtil, spec_set=True, instance=True)
+    sdkmr.get_mongo_util.return_value = mongo
+    mongo.get_job_views.return_value = []
+    job_id = "6046b539ce9c58ecf8c3e5f3"
+
+    got = JobsStatus(sdkmr).check_jobs(
+        [job_id], False, exclude_fields=["job_input"], return_list=1, **kwargs
+    )
+
+    assert got == {"job_states": [[]]}
+    mongo.get_job_views.assert_called_once_with(
+        job_ids=[job_id], exclude_fields=expected_exclude_fields
+    )
+
+
+def test_handle_held_jobs():
+    sdkmr = create_autospec(SDKMethodRunner, spec_set=True, instance=True)
+    mongo = create_autospec(MongoUtil, spec_set=True, instance=True)
+    kafka = create_autospec(KafkaClient, spec_set=True, instance=True)
+    catalog = create_autospec(Catalog, spec_set=True, instance=True)
+    sdkmr.get_mongo_util.return_value = mongo
+    sdkmr.get_kafka_client.return_value = kafka
+    sdkmr.get_catalog.return_value = catalog
+
+    running_id = ObjectId("6046b539ce9c58ecf8c3e5f3")
+    queued_id = ObjectId("6046b539ce9c58ecf8c3e5f4")
+    completed_id = ObjectId("6046b539ce9c58ecf8c3e5f5")
+    mongo.get_jobs_by_scheduler_ids.return_value = [
+        {"_id": running_id, "scheduler_id": "1", "status": "running", "running": 1},
+        {"_id": queued_id, "scheduler_id": "2", "status": "queued"},
+        {"_id": completed_id, "scheduler_id": "3", "status": "completed"},
+    ]
+    running_ts = running_id.generation_time.timestamp() + 5
+    mongo.finish_jobs_with_error.return_value = [
+        {
+            "_id": running_id,
+            "status": "error",
+            "running": running_ts,
+            "finished": running_ts + 5,
+            "user": "someuser",
+            "job_input": {"method": "module.method_id"},
+        },
+        {"_id": queued_id, "status": "error", "job_input": {"method": "mod.meth"}},
+    ]
+
+    results = JobsStatus(sdkmr).handle_held_jobs(["1", "2", "3", "4"])
+    time.sleep(0.1)
+
+    assert results == [
+        {
+            "cluster_id": "1",
+            "job_id": str(running_id),
+            "status": "error",
+            "finished": True,
+        },
+        {
+            "cluster_id": "2",
+            "job_id": str(queued_id),
+            "status": "error",
+            "finished": True,
+        },
+        {
+            "cluster_id": "3",
+            "job_id": str(completed_id),
+            "status": "completed",
+            "finished": False,
+        },
+        {"cluster_id": "4", "job_id": None, "status": None, "finished": False},
+    ]
+    msg = (
+        "Job was terminated by automation due to an unexpected error. Please resubmit."
+    )
+    mongo.get_jobs_by_scheduler_ids.assert_called_once_with(
+        ["1", "2", "3", "4"], projection=["status", "running"]
+    )
+    mongo.finish_jobs_with_error.assert_called_once_with(
+        [str(running_id), str(queued_id)],
+        error_message="Job was held",
+        error_code=2,
+        error={"code": 2, "name": "Job was held", "message": msg, "error": msg},
+    )
+    mongo.add_job_log_line.assert_called_once()
+    assert sorted(mongo.add_job_log_line.call_args[0][0]) == [
+        str(running_id),
+        str(queued_id),
+    ]
+    assert mongo.add_job_log_line.call_args[1] == {"line": msg, "is_error": True}
+    assert kafka.send_kafka_message.call_count == 2
+    kafka.send_kafka_message.assert_any_call(
+        message=KafkaFinishJob(
+            job_id=str(queued_id),
+            new_status="error",
+            previous_status="queued",
+            error_message="Job was held",
+            error_code=2,
+            scheduler_id="2",
+        )
+    )
+    # only the job that ran is sent to the catalog
+    catalog.log_exec_stats.assert_called_once()
+    assert catalog.log_exec_stats.call_args[0][0]["job_id"] == str(running_id)
+
+
+def test_cancel_jobs():
+    sdkmr = create_autospec(SDKMethodRunner, spec_set=True, instance=True)
+    mongo = create_autospec(MongoUtil, spec_set=True, instance=True)
+    kafka = create_autospec(KafkaClient, spec_set=True, instance=True)
+    condor = create_autospec(Condor, spec_set=True, instance=True)
+    logger = create_autospec(Logger, spec_set=True, instance=True)
+    sdkmr.get_mongo_util.return_value = mongo
+    sdkmr.get_kafka_client.return_value = kafka
+    sdkmr.get_scheduler.return_value = condor
+    sdkmr.get_logger.return_value = logger
+
+    queued = "6046b539ce9c58ecf8c3e5f3"
+    batch = "6046b539ce9c58ecf8c3e5f4"
+    child = "6046b539ce9c58ecf8c3e5f5"
+    completed = "6046b539ce9c58ecf8c3e5f6"
+    missing = "6046b539ce9c58ecf8c3e5f7"
+    mongo.get_job_records.side_effect = [
+        [
+            {"_id": ObjectId(queued), "status": "queued"},
+            {"_id": ObjectId(batch), "status": "created"},
+            {"_id": ObjectId(completed), "status": "completed"},
+        ],
+        [{"_id": ObjectId(child), "status": "running"}],
+    ]
+    mongo.cancel_jobs.side_effect = [
+        [
+            {"_id": ObjectId(queued), "scheduler_id": "123"},
+            {"_id": ObjectId(batch), "child_jobs": [child]},
+        ],
+        [{"_id": ObjectId(child), "scheduler_id": "456"}],
+    ]
+
+    results = JobsStatus(sdkmr).cancel_jobs(
+        [queued, batch, completed, missing], terminated_code=2
+    )
+
+    assert results == [
+        {"job_id": queued, "status": "queued", "canceled": True},
+        {"job_id": batch, "status": "created", "canceled": True},
+        {"job_id": completed, "status": "completed", "canceled": False},
+        {"job_id": missing, "status": None, "canceled": False},
+    ]
+    assert mongo.get_job_records.call_args_list == [
+        (([queued, batch, completed, missing],), {"projection": ["status"]}),
+        (([child],), {"projection": ["status"]}),
+    ]
+    assert mongo.cancel_jobs.call_args_list == [
+        (([queued, batch, completed], 2),),
+        (([child], 3),),
+    ]
+    # the parent without a scheduler id never reached condor
+    assert condor.cancel_jobs.call_args_list == [((["456"],),), ((["123"],),)]
+    assert kafka.send_kafka_message.call_count == 6
+    kafka.send_kafka_message.assert_any_call(
+        message=KafkaCancelJob(
+            job_id=queued,
+            previous_status="queued",
+            new_status="terminated",
+            scheduler_id="123",
+            terminated_code=2,
+        )
+    )
+    kafka.send_kafka_message.assert_any_call(
+        message=KafkaCondorCommand(
+            job_id=child, scheduler_id="456", condor_command="condor_rm"
         )
+    )
+
+
+def test_cancel_jobs_default_terminated_code():
+    sdkmr = create_autospec(SDKMethodRunner, spec_set=True, instance=True)
+    mongo = create_autospec(MongoUtil, spec_set=True, instance=True)
+    sdkmr.get_mongo_util.return_value = mongo
+    mongo.get_job_records.return_value = []
+    mongo.cancel_jobs.return_value = []
+
+    assert JobsStatus(sdkmr).cancel_jobs([]) == []
+
+    mongo.cancel_jobs.assert_called_once_with([], 0)
+    sdkmr.get_scheduler.assert_not_called()
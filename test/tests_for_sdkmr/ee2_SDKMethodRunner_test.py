@@ -35,6 +35,8 @@ from execution_engine2.utils.job_requirements_resolver import (
     JobRequirementsResolver,
     RequirementsType,
 )
+from execution_engine2.utils.json_codec import StdlibCodec
+from execution_engine2.utils.json_stream import iter_encode
 from installed_clients.CatalogClient import Catalog
 from installed_clients.WorkspaceClient import Workspace
 from test.tests_for_sdkmr.ee2_SDKMethodRunner_test_utils import ee2_sdkmr_test_helper
@@ -170,7 +172,7 @@ class ee2_SDKMethodRunner_test(unittest.TestCase):
         assert sdkmr.get_kafka_client() is clients_and_mocks[KafkaClient]
         assert sdkmr.get_mongo_util() is clients_and_mocks[MongoUtil]
         assert sdkmr.get_slack_client() is clients_and_mocks[SlackClient]
-        assert sdkmr.get_condor() is clients_and_mocks[Condor]
+        assert sdkmr.get_scheduler() is clients_and_mocks[Condor]
         assert sdkmr.get_catalog() is clients_and_mocks[Catalog]
         assert (
             sdkmr.get_job_requirements_resolver()
@@ -235,7 +237,7 @@ class ee2_SDKMethodRunner_test(unittest.TestCase):
     def test_cancel_job(self, condor):
         logging.info("\n\n  Test cancel job")
         sdk = self.getRunner()
-        sdk.condor = condor
+        sdk.scheduler = condor
 
         job = get_example_job()
         job.user = self.user_id
@@ -303,7 +305,7 @@ class ee2_SDKMethodRunner_test(unittest.TestCase):
         # _#get_module_git_commit
         # runner.get_runjob = MagicMock(return_value="git_commit_goes_here")
 
-        runner.get_condor = MagicMock(return_value=condor_mock)
+        runner.get_scheduler = MagicMock(return_value=condor_mock)
 
         fixed_rj = EE2RunJob(runner)
         # _get_module_git_commitfixed_rj._get_module_git_commit = MagicMock(return_value="hash_goes_here")
@@ -448,7 +450,7 @@ class ee2_SDKMethodRunner_test(unittest.TestCase):
                 ws_perms_info={"user_id": self.user_id, "ws_perms": {self.ws_id: "a"}}
             )
         )
-        runner.get_condor = MagicMock(return_value=condor_mock)
+        runner.get_scheduler = MagicMock(return_value=condor_mock)
         job = get_example_job(user=self.user_id, wsid=self.ws_id).to_mongo().to_dict()
         job["method"] = job["job_input"]["method"]
         job["app_id"] = job["job_input"]["app_id"]
@@ -586,6 +588,19 @@ class ee2_SDKMethodRunner_test(unittest.TestCase):
         self.assertEqual(log["lines"], [])
         self.assertEqual(log["last_line_number"], 8)
 
+        # streamed logs are read from the db as they're encoded
+        for kwargs in [
+            {},
+            {"skip_lines": 8},
+            {"limit": 2},
+            {"limit": 3, "skip_lines": 5},
+        ]:
+            log = runner.view_job_logs(job_id=job_id, **kwargs)
+            streamed = runner.view_job_logs(job_id=job_id, stream=True, **kwargs)
+            self.assertEqual(
+                json.loads(b"".join(iter_encode(streamed, StdlibCodec().dumps))), log
+            )
+
     @patch("lib.execution_engine2.utils.Condor.Condor", autospec=True)
     def test_finish_job(self, condor):
 
@@ -662,6 +677,9 @@ class ee2_SDKMethodRunner_test(unittest.TestCase):
             "func_module_name": "MEGAHIT",
             "is_error": 0,
         }
+        # Catalog stats are sent from a thread after the job is finished
+        # May need to increase sleep if thread takes too long
+        time.sleep(0.5)
 
         for key in expected_calls:
             assert (
@@ -681,7 +699,7 @@ class ee2_SDKMethodRunner_test(unittest.TestCase):
         runner = self.getRunner()
         condor._get_job_info = MagicMock(return_value={})
         condor.get_job_resource_info = MagicMock(return_value={})
-        runner.condor = condor
+        runner.scheduler = condor
         runner.catalog = MagicMock(return_value=True)
         runner._test_job_permissions = MagicMock(return_value=True)
 
@@ -713,6 +731,9 @@ class ee2_SDKMethodRunner_test(unittest.TestCase):
         runner.finish_job(
             job_id=job_id, error_message="error message", error=error, error_code=0
         )
+        # Catalog stats are sent from a thread after the job is finished
+        # May need to increase sleep if thread takes too long
+        time.sleep(0.5)
 
         job = self.mongo_util.get_job(job_id=job_id)
 
@@ -996,7 +1017,7 @@ class ee2_SDKMethodRunner_test(unittest.TestCase):
         # fixed_rj = RunJob(runner)
         # fixed_rj._get_module_git_commit = MagicMock(return_value='hash_goes_here')
 
-        runner.get_condor = MagicMock(return_value=condor_mock)
+        runner.get_scheduler = MagicMock(return_value=condor_mock)
         # ctx = {"user_id": self.user_id, "wsid": self.ws_id, "token": self.token}
         job = get_example_job().to_mongo().to_dict()
         job["method"] = job["job_input"]["method"]
@@ -245,7 +245,7 @@ class ee2_SDKMethodRunner_test(unittest.TestCase):
             )
         )
         runner = self.getRunner()
-        runner.get_condor = MagicMock(return_value=condor_mock)
+        runner.get_scheduler = MagicMock(return_value=condor_mock)
         job = get_example_job_as_dict(user=self.user_id, wsid=self.ws_id)
 
         si = SubmissionInfo(clusterid="test", submit=job, error=None)
@@ -309,7 +309,7 @@ class ee2_SDKMethodRunner_test(unittest.TestCase):
             )
         )
         runner = self.getRunner()
-        runner.get_condor = MagicMock(return_value=condor_mock)
+        runner.get_scheduler = MagicMock(return_value=condor_mock)
 
         job = get_example_job_as_dict(
             user=self.user_id, wsid=self.ws_id, source_ws_objects=[]
@@ -412,7 +412,7 @@ class ee2_SDKMethodRunner_test(unittest.TestCase):
             )
         )
         runner = self.getRunner()
-        runner.get_condor = MagicMock(return_value=condor_mock)
+        runner.get_scheduler = MagicMock(return_value=condor_mock)
 
         job = get_example_job_as_dict(
             user=self.user_id, wsid=self.ws_id, source_ws_objects=[]
@@ -490,7 +490,7 @@ class ee2_SDKMethodRunner_test(unittest.TestCase):
         )
         runner = self.getRunner()
 
-        runner.get_condor = MagicMock(return_value=condor_mock)
+        runner.get_scheduler = MagicMock(return_value=condor_mock)
 
         quast_params = {
             "workspace_name": "XX:narrative_1620418248793",
@@ -551,7 +551,7 @@ class ee2_SDKMethodRunner_test(unittest.TestCase):
             )
         )
         runner = self.getRunner()
-        runner.get_condor = MagicMock(return_value=condor_mock)
+        runner.get_scheduler = MagicMock(return_value=condor_mock)
 
         job = get_example_job_as_dict(
             user=self.user_id, wsid=None, source_ws_objects=[]
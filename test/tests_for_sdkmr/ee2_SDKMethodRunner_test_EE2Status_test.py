@@ -78,7 +78,7 @@ class ee2_SDKMethodRunner_test_status(unittest.TestCase):
             )
         )
         runner = self.getRunner()
-        runner.get_condor = MagicMock(return_value=condor_mock)
+        runner.get_scheduler = MagicMock(return_value=condor_mock)
         job = get_example_job_as_dict_for_runjob(user=self.user_id, wsid=self.ws_id)
         si = SubmissionInfo(clusterid="test", submit=job, error=None)
         condor_mock.run_job = MagicMock(return_value=si)
@@ -142,7 +142,7 @@ class ee2_SDKMethodRunner_test_status(unittest.TestCase):
             )
         )
         runner = self.getRunner()
-        runner.get_condor = MagicMock(return_value=condor_mock)
+        runner.get_scheduler = MagicMock(return_value=condor_mock)
         job = get_example_job_as_dict_for_runjob(user=self.user_id, wsid=self.ws_id)
 
         si = SubmissionInfo(clusterid="test", submit=job, error=None)
@@ -234,7 +234,7 @@ class ee2_SDKMethodRunner_test_status(unittest.TestCase):
             )
         )
         runner = self.getRunner()  # type: SDKMethodRunner
-        runner.get_condor = MagicMock(return_value=condor_mock)
+        runner.get_scheduler = MagicMock(return_value=condor_mock)
         job = get_example_job_as_dict_for_runjob(user=self.user_id, wsid=None)
         job2 = get_example_job_as_dict_for_runjob(user=self.user_id, wsid=None)
         job3 = get_example_job_as_dict_for_runjob(user=self.user_id, wsid=None)
@@ -264,7 +264,7 @@ class ee2_SDKMethodRunner_test_status(unittest.TestCase):
             )
         )
         runner = self.getRunner()  # type: SDKMethodRunner
-        runner.get_condor = MagicMock(return_value=condor_mock)
+        runner.get_scheduler = MagicMock(return_value=condor_mock)
         job = get_example_job_as_dict_for_runjob(user=self.user_id, wsid=None)
         job2 = get_example_job_as_dict_for_runjob(user=self.user_id, wsid=None)
         job3 = get_example_job_as_dict_for_runjob(user=self.user_id, wsid=None)
@@ -304,7 +304,7 @@ class ee2_SDKMethodRunner_test_status(unittest.TestCase):
             )
         )
         runner = self.getRunner()  # type: SDKMethodRunner
-        runner.get_condor = MagicMock(return_value=condor_mock)
+        runner.get_scheduler = MagicMock(return_value=condor_mock)
         job = get_example_job_as_dict_for_runjob(user=self.user_id, wsid=None)
         job2 = get_example_job_as_dict_for_runjob(user=self.user_id, wsid=None)
         job3 = get_example_job_as_dict_for_runjob(user=self.user_id, wsid=None)
@@ -13,7 +13,7 @@ from execution_engine2.sdk.job_submission_parameters import (
 )
 from execution_engine2.utils.application_info import AppInfo
 from execution_engine2.utils.user_info import UserCreds
-from execution_engine2.utils.Condor import Condor
+from execution_engine2.utils.Condor import Condor, RESOURCE_INFO_KEYS
 from execution_engine2.utils.CondorTuples import SubmissionInfo
 
 # Note the executable existence code in the constructor appears to be buggy and will never
@@ -210,3 +210,261 @@ def _run_job_maximal(ignore_concurrency_limits, update):
         }
     )
     _check_calls(htc, schedd, sub, txn, expected_sub)
+
+
+def test_get_jobs_resource_info():
+    htc, _, schedd, _ = _mock_htc()
+    c = Condor(
+        {
+            "external-url": "https://fake.com",
+            "executable": "file.exe",
+            "catalog-token": "cattoken",
+        },
+        htc=htc,
+    )
+    schedd.query.return_value = [
+        {"JobBatchName": "job1", "CpusUsage": 0.5, "ResidentSetSize_RAW": 100},
+        {"JobBatchName": "job2", "CpusUsage": 1.5, "ResidentSetSize_RAW": 200},
+    ]
+    schedd.history.return_value = [
+        {"JobBatchName": "job2", "CpusUsage": 2.5, "ResidentSetSize_RAW": 300},
+        {"JobBatchName": "job3", "DiskUsage_RAW": 42},
+    ]
+
+    res = c.get_jobs_resource_info(["job1", "job2", "job3", "job4"])
+
+    assert set(res.keys()) == {"job1", "job2", "job3"}
+    assert set(res["job1"].keys()) == set(RESOURCE_INFO_KEYS)
+    assert res["job1"]["CpusUsage"] == 0.5
+    assert res["job1"]["DiskUsage_RAW"] is None
+    # the history wins over the queue
+    assert res["job2"]["CpusUsage"] == 2.5
+    assert res["job2"]["ResidentSetSize_RAW"] == 300
+    assert res["job3"]["DiskUsage_RAW"] == 42
+
+    constraint = 'member(JobBatchName, {"job1", "job2", "job3", "job4"})'
+    projection = ["JobBatchName"] + RESOURCE_INFO_KEYS
+    htc.Schedd.assert_called_once_with()
+    schedd.query.assert_called_once_with(constraint=constraint, projection=projection)
+    schedd.history.assert_called_once_with(constraint, projection, match=4)
+
+
+def test_get_jobs_resource_info_no_jobs():
+    htc, _, schedd, _ = _mock_htc()
+    c = Condor(
+        {
+            "external-url": "https://fake.com",
+            "executable": "file.exe",
+            "catalog-token": "cattoken",
+        },
+        htc=htc,
+    )
+
+    assert c.get_jobs_resource_info([]) == {}
+    htc.Schedd.assert_not_called()
+
+
+def test_get_running_jobs_resource_usage():
+    htc, _, schedd, _ = _mock_htc()
+    c = Condor(
+        {
+            "external-url": "https://fake.com",
+            "executable": "file.exe",
+            "catalog-token": "cattoken",
+        },
+        htc=htc,
+    )
+    schedd.query.return_value = [
+        {
+            "JobBatchName": "job1",
+            "CpusUsage": 0.4567,
+            "ResidentSetSize_RAW": 204800,
+            "DiskUsage_RAW": 2048,
+        },
+        # a job that hasn't reported any usage yet
+        {"JobBatchName": "job2"},
+        {"CpusUsage": 1},
+    ]
+
+    res = c.get_running_jobs_resource_usage()
+
+    assert res == {
+        "job1": {"cpu": 0.46, "memory": 200, "disk": 2},
+        "job2": {"cpu": 0, "memory": 0, "disk": 0},
+    }
+    schedd.query.assert_called_once_with(
+        constraint="JobStatus == 2 && KB_CLIENTGROUP =!= undefined",
+        projection=[
+            "JobBatchName",
+            "CpusUsage",
+            "ResidentSetSize_RAW",
+            "DiskUsage_RAW",
+        ],
+    )
+
+
+def test_schedd_reused_across_calls():
+    htc, sub, schedd, _ = _mock_htc()
+    c = Condor(
+        {
+            "external-url": "https://fake.com",
+            "executable": "file.exe",
+            "catalog-token": "cattoken",
+            "schedd-refresh-seconds": "600",
+        },
+        htc=htc,
+    )
+    assert c.schedd.refresh_seconds == 600
+    sub.queue.return_value = 123
+    schedd.query.return_value = []
+    params = JobSubmissionParameters(
+        "jobbyjob",
+        AppInfo("foo.bar"),
+        JobRequirements(2, 3, 4, "cg"),
+        UserCreds("user1", "token"),
+    )
+
+    c.run_job(params)
+    c.run_job(params)
+    c.get_running_jobs_resource_usage()
+    c.cancel_jobs(["123", "124.0"])
+
+    htc.Schedd.assert_called_once_with()
+    assert schedd.transaction.call_count == 2
+    schedd.act.assert_called_once_with(
+        action=htc.JobAction.Remove, job_spec=["123.0", "124.0"]
+    )
+    stats = c.get_stats()
+    assert {k: v["count"] for k, v in stats.items()} == {
+        "connect": 1,
+        "submit": 2,
+        "query": 1,
+        "act": 1,
+    }
+
+
+def test_run_job_failure_reconnects_without_retry():
+    htc, sub, schedd, _ = _mock_htc()
+    c = Condor(
+        {
+            "external-url": "https://fake.com",
+            "executable": "file.exe",
+            "catalog-token": "cattoken",
+        },
+        htc=htc,
+    )
+    err = ValueError("schedd went away")
+    sub.queue.side_effect = [err, 456]
+    params = JobSubmissionParameters(
+        "jobbyjob",
+        AppInfo("foo.bar"),
+        JobRequirements(2, 3, 4, "cg"),
+        UserCreds("user1", "token"),
+    )
+
+    assert c.run_job(params) == SubmissionInfo(None, sub, err)
+    assert htc.Schedd.call_count == 1
+    assert c.run_job(params) == SubmissionInfo("456", sub, None)
+    assert htc.Schedd.call_count == 2
+    assert c.get_stats()["submit"]["errors"] == 1
+
+
+def test_submit_jobs_single_transaction():
+    htc, sub, schedd, txn = _mock_htc()
+    c = Condor(
+        {
+            "external-url": "https://fake.com",
+            "executable": "file.exe",
+            "catalog-token": "cattoken",
+        },
+        htc=htc,
+    )
+    sub.queue.side_effect = [7, 8]
+    params = [
+        JobSubmissionParameters(
+            job_id,
+            AppInfo("foo.bar"),
+            JobRequirements(2, 3, 4, "cg"),
+            UserCreds("user1", "token"),
+        )
+        for job_id in ["job1", "job2"]
+    ]
+
+    assert c.submit_jobs(params) == [
+        SubmissionInfo("7", sub, None),
+        SubmissionInfo("8", sub, None),
+    ]
+    assert c.submit_jobs([]) == []
+
+    assert [ca[0][0]["JobBatchName"] for ca in htc.Submit.call_args_list] == [
+        "job1",
+        "job2",
+    ]
+    schedd.transaction.assert_called_once_with()
+    assert sub.queue.call_count == 2
+    assert c.get_stats()["submit"]["count"] == 1
+
+    # a failure fails the whole transaction
+    err = ValueError("txn aborted")
+    sub.queue.side_effect = [9, err]
+    assert c.submit_jobs(params) == [
+        SubmissionInfo(None, sub, err),
+        SubmissionInfo(None, sub, err),
+    ]
+
+
+def test_create_submit_reuses_template_per_batch():
+    config = {
+        "external-url": "https://fake.com",
+        "executable": "file.exe",
+        "catalog-token": "cattoken",
+    }
+    c = Condor(config)
+
+    def params(job_id, wsid, objs, client_group="cg", parent="parent", token="token"):
+        return JobSubmissionParameters(
+            job_id,
+            AppInfo("foo.bar", "foo/baz"),
+            JobRequirements(2, 3, 4, client_group),
+            UserCreds("user1", token),
+            parent_job_id=parent,
+            wsid=wsid,
+            source_ws_objects=objs,
+        )
+
+    jobs = [
+        params("job1", 1, ["1/2/3"]),
+        params("job2", None, None),
+        params("job3", 7, ["7/8/9", "7/1/1"]),
+        params("job4", 1, ["1/2/3"], client_group="cg2"),
+        params("job5", 1, ["1/2/3"], parent=None),
+        params("job6", 1, ["1/2/3"], token="token2"),
+    ]
+    subs = [c._create_submit(p) for p in jobs]
+
+    # one template per distinct set of fields other than the job id, input objects and token.
+    # Jobs in a batch share the workspace id, so it's part of the template
+    assert len(c._submit_cache) == 5
+    for p, sub in zip(jobs, subs):
+        # a fresh instance builds the description without a template
+        expected = Condor(config)._build_submit(p)
+        expected["environment"] = (
+            '"DOCKER_JOB_TIMEOUT=604801 KB_ADMIN_AUTH_TOKEN=cattoken '
+            + f"KB_AUTH_TOKEN={p.user_creds.token} "
+            + f"CLIENTGROUP={p.job_reqs.client_group} JOB_ID={p.job_id} "
+            + "CONDOR_ID=$(Cluster).$(Process) PYTHON_EXECUTABLE=/miniconda/bin/python "
+            + f'DEBUG_MODE=False PARENT_JOB_ID={p.parent_job_id or ""} "'
+        )
+        assert list(sub.items()) == list(expected.items())
+    assert subs[1]["+KB_WSID"] == ""
+    assert subs[1]["+KB_SOURCE_WS_OBJECTS"] == ""
+    assert subs[2]["+KB_SOURCE_WS_OBJECTS"] == '"7/8/9,7/1/1"'
+    assert "JOB_ID=job3 " in subs[2]["environment"]
+    assert subs[3]["+KB_CLIENTGROUP"] == '"cg2"'
+    assert subs[4]["+KB_PARENT_JOB_ID"] == ""
+    # the user's token isn't kept in the templates
+    assert "KB_AUTH_TOKEN=token2 " in subs[5]["environment"]
+    assert "token2" not in str(c._submit_cache)
+    assert "KB_AUTH_TOKEN" not in str(c._submit_cache)
+    # the template isn't changed by the jobs built from it
+    assert c._create_submit(jobs[0]) == subs[0]
@@ -0,0 +1,213 @@
+"""
+Unit tests for the SlackClient notification queue.
+"""
+
+import time
+from unittest.mock import MagicMock, call
+
+from pytest import raises
+
+from execution_engine2.utils.SlackUtils import SlackClient, TokenBucket
+from utils_shared.test_utils import assert_exception_correct
+
+
+def _client(**kwargs):
+    client = SlackClient("token", debug=True, endpoint="https://ee2", **kwargs)
+    client.client = MagicMock()
+    return client
+
+
+def _posts(client):
+    return [c[1]["text"] for c in client.client.chat_postMessage.call_args_list]
+
+
+def test_token_bucket():
+    now = [0.0]
+    bucket = TokenBucket(2, 3, clock=lambda: now[0])
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    assert bucket.wait_time() == 0.5
+
+    now[0] = 0.5
+    assert bucket.try_acquire() is True
+    assert bucket.try_acquire() is False
+
+    # never more than the capacity
+    now[0] = 100
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_token_bucket_fail():
+    with raises(Exception) as got:
+        TokenBucket(0, 1)
+    assert_exception_correct(got.value, ValueError("rate must be greater than 0"))
+    with raises(Exception) as got:
+        TokenBucket(1, 0)
+    assert_exception_correct(got.value, ValueError("capacity must be at least 1"))
+
+
+def test_init_fail():
+    with raises(Exception) as got:
+        SlackClient(None)
+    assert_exception_correct(
+        got.value, Exception("Please set add slack token to deploy.cfg")
+    )
+    with raises(Exception) as got:
+        SlackClient("token", max_queue_size=0)
+    assert_exception_correct(got.value, ValueError("max_queue_size must be at least 1"))
+
+
+def test_coalesce():
+    client = _client(messages_per_second=1000)
+    # closing stops the background thread, so the test decides when messages are sent
+    client.close()
+    for i in range(3):
+        client.cancel_job_message(f"job{i}", f"{i}", 2)
+    client.safe_chat_post_message("#other", "hello")
+    client.cancel_job_message("job3", "3", 1)
+    client.run_job_message("job4", "4", "user")
+
+    client.flush()
+
+    assert client.client.chat_postMessage.call_args_list == [
+        call(
+            channel="#execution_engine_notifications",
+            text="3 jobs have been canceled due to `2` (https://ee2): "
+            + "`job0`, `job1`, `job2`",
+        ),
+        call(channel="#other", text="hello"),
+        call(
+            channel="#execution_engine_notifications",
+            text="scheduler_id:`3` job_id:`job3` has been canceled due to `1` "
+            + "(https://ee2)",
+        ),
+        call(
+            channel="#execution_engine_notifications",
+            text="user has submitted job_id:job4 scheduler_id:4 (https://ee2) ",
+        ),
+    ]
+
+
+def test_coalesce_truncates_details():
+    client = _client(messages_per_second=1000)
+    client.close()
+    for i in range(25):
+        client.finish_job_message(f"j{i}", f"{i}", "error", error_code=2)
+
+    client.flush()
+
+    details = ", ".join(f"`j{i}`" for i in range(20))
+    assert _posts(client) == [
+        "25 jobs have ended with a status of error and error code 2 (https://ee2): "
+        + details
+        + " and 5 more"
+    ]
+
+
+def test_debug_off():
+    client = SlackClient("token", debug=False)
+    client.client = MagicMock()
+    client.close()
+    client.run_job_message("job", "1", "user")
+    client.cancel_job_message("job", "1", 2)
+    client.finish_job_message("job", "1", "completed")
+
+    client.flush()
+
+    client.client.chat_postMessage.assert_not_called()
+
+
+def test_overflow_drops_and_reports():
+    client = _client(messages_per_second=1000, max_queue_size=2)
+    client.close()
+    for i in range(5):
+        client.safe_chat_post_message("#chan", f"msg{i}")
+
+    client.flush()
+
+    assert _posts(client) == [
+        "msg0",
+        "msg1",
+        "3 slack notifications were dropped as too many were queued (https://ee2)",
+    ]
+
+
+def test_rate_limit_timeout_drops():
+    client = _client(messages_per_second=0.01, burst=1)
+    client.close()
+    for i in range(3):
+        client.safe_chat_post_message("#chan", f"msg{i}")
+
+    start = time.monotonic()
+    client.flush(timeout=0.1)
+
+    assert time.monotonic() - start < 1
+    assert _posts(client) == ["msg0"]
+    assert client._dropped == 2
+
+
+def test_slack_failure_does_not_raise():
+    client = _client()
+    client.close()
+    client.client.chat_postMessage.side_effect = ValueError("slack is down")
+    client.safe_chat_post_message("#chan", "msg")
+    client.flush()
+    client.client.chat_postMessage.assert_called_once_with(channel="#chan", text="msg")
+
+
+def test_background_send():
+    client = _client(window_seconds=0.1, messages_per_second=1000)
+    # slack being slow doesn't block the caller
+    client.client.chat_postMessage.side_effect = lambda **kwargs: time.sleep(0.5)
+
+    start = time.monotonic()
+    for i in range(3):
+        client.cancel_job_message(f"job{i}", f"{i}", 2)
+    assert time.monotonic() - start < 0.1
+
+    for _ in range(50):
+        if client.client.chat_postMessage.call_count:
+            break
+        time.sleep(0.1)
+    client.close()
+
+    assert client.client.chat_postMessage.call_args_list == [
+        call(
+            channel="#execution_engine_notifications",
+            text="3 jobs have been canceled due to `2` (https://ee2): "
+            + "`job0`, `job1`, `job2`",
+        )
+    ]
+
+
+def test_close_sends_message_in_window():
+    client = _client(window_seconds=60, messages_per_second=1000)
+    client.safe_chat_post_message("#chan", "purge summary")
+    # wait for the background thread to take the message and start its window
+    for _ in range(50):
+        if client._queue.empty():
+            break
+        time.sleep(0.01)
+    assert client._queue.empty()
+
+    start = time.monotonic()
+    client.close()
+
+    assert time.monotonic() - start < 5
+    assert not client._worker.is_alive()
+    client.client.chat_postMessage.assert_called_once_with(
+        channel="#chan", text="purge summary"
+    )
+
+
+def test_close_sends_queued_messages():
+    client = _client(window_seconds=60, messages_per_second=1000)
+    for i in range(3):
+        client.cancel_job_message(f"job{i}", f"{i}", 2)
+    client.safe_chat_post_message("#chan", "last")
+
+    client.close()
+
+    assert _posts(client) == [
+        "3 jobs have been canceled due to `2` (https://ee2): `job0`, `job1`, `job2`",
+        "last",
+    ]
@@ -8,7 +8,9 @@ from execution_engine2.authorization.workspaceauth import WorkspaceAuth
 from execution_engine2.utils.clients import (
     UserClientSet,
     get_user_client_set,
+    get_scheduler,
     ClientSet,
+    LazyClientSet,
 )
 from utils_shared.test_utils import assert_exception_correct
 from utils_shared.mock_utils import get_client_mocks, ALL_CLIENTS
@@ -19,6 +21,7 @@ from execution_engine2.db.MongoUtil import MongoUtil
 from execution_engine2.utils.Condor import Condor
 from execution_engine2.utils.job_requirements_resolver import JobRequirementsResolver
 from execution_engine2.utils.KafkaUtils import KafkaClient
+from execution_engine2.utils.local_scheduler import LocalScheduler
 from execution_engine2.utils.SlackUtils import SlackClient
 
 from installed_clients.authclient import KBaseAuth
@@ -101,7 +104,7 @@ def test_client_set_init_fail():
     _client_set_init_fail(n, aa, c, ca, ca, j, k, m, s, e)
     e = ValueError("auth_admin cannot be a value that evaluates to false")
     _client_set_init_fail(a, n, c, ca, ca, j, k, m, s, e)
-    e = ValueError("condor cannot be a value that evaluates to false")
+    e = ValueError("scheduler cannot be a value that evaluates to false")
     _client_set_init_fail(a, aa, n, ca, ca, j, k, m, s, e)
     e = ValueError("catalog cannot be a value that evaluates to false")
     _client_set_init_fail(a, aa, c, n, ca, j, k, m, s, e)
@@ -142,3 +145,55 @@ def _client_set_init_fail(
             slack_client,
         )
     assert_exception_correct(got.value, expected)
+
+
+def test_get_scheduler():
+    cfg = {
+        "external-url": "https://fake.com",
+        "executable": "file.exe",
+        "catalog-token": "cattoken",
+    }
+    assert type(get_scheduler(cfg)) is Condor
+    assert type(get_scheduler({**cfg, "scheduler": "condor"})) is Condor
+    local = get_scheduler({**cfg, "scheduler": "local", "local-scheduler-workers": "3"})
+    assert type(local) is LocalScheduler
+    assert local.workers == 3
+    assert local.ee2_url == "https://fake.com"
+
+    with raises(Exception) as got:
+        get_scheduler({**cfg, "scheduler": "slurm"})
+    assert_exception_correct(got.value, ValueError("Unknown scheduler slurm"))
+
+
+def test_lazy_client_set():
+    auth = create_autospec(KBaseAuth, spec_set=True, instance=True)
+    mongo = create_autospec(MongoUtil, spec_set=True, instance=True)
+    clients = {"auth": auth, "mongo_util": mongo, "slack_client": None}
+    created = []
+
+    def factory(name):
+        def create():
+            created.append(name)
+            return clients[name]
+
+        return create
+
+    cs = LazyClientSet({name: factory(name) for name in clients})
+    assert created == []
+
+    assert cs.mongo_util is mongo
+    assert cs.mongo_util is mongo
+    assert cs.auth is auth
+    assert created == ["mongo_util", "auth"]
+
+    with raises(Exception) as got:
+        cs.slack_client
+    assert_exception_correct(
+        got.value,
+        ValueError("slack_client cannot be a value that evaluates to false"),
+    )
+    with raises(Exception) as got:
+        cs.catalog
+    assert_exception_correct(
+        got.value, AttributeError("'LazyClientSet' object has no attribute 'catalog'")
+    )
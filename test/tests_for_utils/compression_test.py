@@ -0,0 +1,86 @@
+"""
+Unit tests for the compression module.
+"""
+
+import gzip
+import zlib
+
+from pytest import raises
+
+from execution_engine2.utils.compression import (
+    ResponseCompressor,
+    compress,
+    compress_stream,
+    negotiate,
+)
+from utils_shared.test_utils import assert_exception_correct
+
+
+def test_negotiate():
+    assert negotiate(None) is None
+    assert negotiate("") is None
+    assert negotiate("identity") is None
+    assert negotiate("br") is None
+    assert negotiate("gzip") == "gzip"
+    assert negotiate("GZIP") == "gzip"
+    assert negotiate("deflate") == "deflate"
+    assert negotiate("gzip, deflate, br") == "gzip"
+    assert negotiate("deflate, gzip") == "gzip"
+    assert negotiate("gzip;q=0.5, deflate") == "deflate"
+    assert negotiate("gzip; q=0, deflate;q=0.1") == "deflate"
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("gzip;q=foo") is None
+    assert negotiate("*") == "gzip"
+    assert negotiate("*, gzip;q=0") == "deflate"
+    assert negotiate("*;q=0") is None
+
+
+def test_compress():
+    body = b'{"lines": ["' + b"a log line, " * 1000 + b'"]}'
+    gz = compress(body, "gzip")
+    assert gzip.decompress(gz) == body
+    assert len(gz) < len(body) / 10
+    # deterministic
+    assert compress(body, "gzip") == gz
+    assert zlib.decompress(compress(body, "deflate", 1)) == body
+
+    with raises(Exception) as got:
+        compress(body, "br")
+    assert_exception_correct(got.value, ValueError("Unsupported content coding br"))
+
+
+def test_response_compressor():
+    c = ResponseCompressor(min_bytes=100, level=9)
+    assert c.choose("gzip", 99) is None
+    assert c.choose("gzip", 100) == "gzip"
+    assert c.choose(None, 100) is None
+    assert gzip.decompress(c.compress(b"x" * 100, "gzip")) == b"x" * 100
+
+    assert ResponseCompressor(level=0).choose("gzip", 10**6) is None
+    assert ResponseCompressor(min_bytes=0).choose("deflate", 0) == "deflate"
+
+
+def test_response_compressor_fail():
+    for kwargs, expected in [
+        ({"level": -1}, ValueError("level must be between 0 and 9")),
+        ({"level": 10}, ValueError("level must be between 0 and 9")),
+        ({"min_bytes": -1}, ValueError("min_bytes must be at least 0")),
+    ]:
+        with raises(Exception) as got:
+            ResponseCompressor(**kwargs)
+        assert_exception_correct(got.value, expected)
+
+
+def test_compress_stream():
+    chunks = [b'{"lines": ['] + [b'"a log line",'] * 1000 + [b"null]}"]
+    body = b"".join(chunks)
+    gz = b"".join(compress_stream(iter(chunks), "gzip"))
+    assert gzip.decompress(gz) == body
+    assert len(gz) < len(body) / 10
+    assert zlib.decompress(b"".join(compress_stream(chunks, "deflate", 1))) == body
+    c = ResponseCompressor(level=9)
+    assert gzip.decompress(b"".join(c.compress_stream(chunks, "gzip"))) == body
+
+    with raises(Exception) as got:
+        list(compress_stream(chunks, "br"))
+    assert_exception_correct(got.value, ValueError("Unsupported content coding br"))
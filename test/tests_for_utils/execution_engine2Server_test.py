@@ -0,0 +1,272 @@
+"""
+Unit tests for the JSON-RPC handling in the ee2 WSGI application, in particular batch requests.
+
+The server module builds the ee2 implementation from the deployment config on import, so it's
+imported with the external services replaced by the fakes the benchmarks use.
+"""
+
+import io
+import json
+import os
+import threading
+from unittest.mock import MagicMock
+
+from pytest import fixture
+
+from benchmarks.fakes import fake_services
+from execution_engine2.execution_engine2Impl import execution_engine2
+from execution_engine2.utils.json_stream import StreamedList
+
+VERSION = [execution_engine2.VERSION]
+
+_DEPLOY = os.path.join(os.path.dirname(__file__), "..", "deploy.cfg")
+
+
+@fixture(scope="module")
+def server():
+    os.environ.setdefault("KB_DEPLOYMENT_CONFIG", _DEPLOY)
+    with fake_services():
+        from execution_engine2 import execution_engine2Server
+
+        yield execution_engine2Server
+
+
+@fixture
+def app(server, monkeypatch):
+    with fake_services():
+        app = server.Application()
+    app.auth_client = MagicMock()
+    app.auth_client.get_user.side_effect = lambda token: token.split("-")[1]
+    threads = []
+
+    def whoami(ctx):
+        return [ctx["user_id"]]
+
+    def fail(ctx):
+        raise ValueError("failed")
+
+    def slow(ctx, seconds):
+        threads.append(threading.current_thread().name)
+        threading.Event().wait(seconds)
+        return [seconds]
+
+    def unencodable(ctx):
+        return [object()]
+
+    def stream(ctx):
+        return [{"lines": StreamedList(iter(range(3)))}]
+
+    for method, types in [
+        (whoami, []),
+        (fail, []),
+        (slow, [float]),
+        (unencodable, []),
+        (stream, []),
+    ]:
+        name = f"execution_engine2.{method.__name__}"
+        app.rpc_service.add(method, name=name, types=types)
+        app.method_authentication[name] = "required"
+    monkeypatch.setattr(
+        server,
+        "_CONCURRENT_METHODS",
+        server._CONCURRENT_METHODS | {"execution_engine2.slow"},
+    )
+    app.threads = threads
+    yield app
+    app.batch_executor.shutdown()
+
+
+def _call(app, body, token="token-bob"):
+    body = json.dumps(body).encode()
+    environ = {
+        "REQUEST_METHOD": "POST",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+        "REMOTE_ADDR": "127.0.0.1",
+    }
+    if token:
+        environ["HTTP_AUTHORIZATION"] = token
+    status = []
+    response = b"".join(app(environ, lambda s, headers: status.append(s)))
+    return status[0], json.loads(response) if response else None
+
+
+def _req(method, params=None, id_="1"):
+    req = {"version": "1.1", "method": f"execution_engine2.{method}"}
+    req["params"] = [] if params is None else params
+    if id_ is not None:
+        req["id"] = id_
+    return req
+
+
+def _results(response):
+    return [
+        (r["id"], r.get("result"), r.get("error", {}).get("name")) for r in response
+    ]
+
+
+def test_single_call(app):
+    status, response = _call(app, _req("whoami", id_="a"))
+    assert status == "200 OK"
+    assert response == {"version": "1.1", "result": ["bob"], "id": "a"}
+    app.auth_client.get_user.assert_called_once_with("token-bob")
+
+    status, response = _call(app, _req("fail", id_="b"))
+    assert status == "500 Internal Server Error"
+    assert response["id"] == "b"
+    assert response["error"]["name"] == "Server error"
+
+
+def test_unencodable_result(app):
+    status, response = _call(app, _req("unencodable", id_="a"))
+    assert status == "500 Internal Server Error"
+    assert response["id"] == "a"
+    assert response["error"]["name"] == "Unexpected Server Error"
+    assert "not JSON serializable" in response["error"]["error"]
+
+    status, response = _call(
+        app,
+        [_req("whoami", id_="a"), _req("unencodable", id_="b"), _req("ver", id_="c")],
+    )
+    assert status == "200 OK"
+    assert _results(response) == [
+        ("a", ["bob"], None),
+        ("b", None, "Unexpected Server Error"),
+        ("c", VERSION, None),
+    ]
+
+
+def test_batch_streamed(app):
+    status, response = _call(
+        app, [_req("stream", id_="a"), _req("whoami", id_="b"), _req("stream", id_="c")]
+    )
+    assert status == "200 OK"
+    assert _results(response) == [
+        ("a", [{"lines": [0, 1, 2]}], None),
+        ("b", ["bob"], None),
+        ("c", [{"lines": [0, 1, 2]}], None),
+    ]
+
+
+def test_batch_mixed_in_order(app):
+    status, response = _call(
+        app,
+        [
+            _req("ver", id_="a"),
+            _req("slow", [0.2], id_="b"),
+            _req("slow", [0.1], id_="c"),
+            _req("whoami", id_="d"),
+            _req("slow", [0.0], id_="e"),
+        ],
+    )
+
+    assert status == "200 OK"
+    assert [r["version"] for r in response] == ["1.1"] * 5
+    assert _results(response) == [
+        ("a", VERSION, None),
+        ("b", [0.2], None),
+        ("c", [0.1], None),
+        ("d", ["bob"], None),
+        ("e", [0.0], None),
+    ]
+    # consecutive read only calls run on the thread pool
+    assert all(t.startswith("ee2-batch") for t in app.threads[:2])
+
+
+def test_batch_authenticates_once(app):
+    status, response = _call(app, [_req("whoami", id_=str(i)) for i in range(5)])
+
+    assert status == "200 OK"
+    assert [r["result"] for r in response] == [["bob"]] * 5
+    app.auth_client.get_user.assert_called_once_with("token-bob")
+
+
+def test_batch_auth_failure_cached(app):
+    app.auth_client.get_user.side_effect = ValueError("bad token")
+
+    status, response = _call(
+        app, [_req("whoami", id_="a"), _req("ver", id_="b"), _req("whoami", id_="c")]
+    )
+
+    assert status == "200 OK"
+    assert _results(response) == [
+        ("a", None, "Server error"),
+        ("b", VERSION, None),
+        ("c", None, "Server error"),
+    ]
+    assert response[0]["error"]["message"] == "Token validation failed: bad token"
+    app.auth_client.get_user.assert_called_once_with("token-bob")
+
+
+def test_batch_no_token(app):
+    status, response = _call(app, [_req("whoami", id_="a"), _req("ver")], token=None)
+
+    assert status == "200 OK"
+    assert response[0]["error"]["message"] == (
+        "Authentication required for execution_engine2 but no authentication header "
+        + "was passed"
+    )
+    assert response[1]["result"] == VERSION
+    app.auth_client.get_user.assert_not_called()
+
+
+def test_batch_errors_per_call(app):
+    no_params = _req("ver", id_="d")
+    del no_params["params"]
+    status, response = _call(
+        app,
+        [
+            _req("fail", id_="a"),
+            5,
+            {"version": "1.1", "params": [], "id": "c"},
+            no_params,
+            _req("nope", id_="e"),
+            _req("slow", ["x"], id_="f"),
+            _req("whoami", id_="g"),
+        ],
+    )
+
+    assert status == "200 OK"
+    assert [r.get("id") for r in response] == ["a", None, "c", "d", "e", "f", "g"]
+    assert response[0]["error"]["name"] == "Server error"
+    for r in response[1:3]:
+        assert r["error"]["name"] == "Invalid Request"
+        assert r["error"]["message"] == "Batch entries must be calls with a method"
+    # ver takes no parameters, so a missing params is fine
+    assert response[3]["result"] == VERSION
+    assert response[4]["error"]["name"] == "Method not found"
+    assert response[5]["error"]["name"] == "Invalid params"
+    assert response[6]["result"] == ["bob"]
+
+
+def test_batch_notifications(app):
+    status, response = _call(
+        app,
+        [
+            _req("whoami", id_="1"),
+            _req("ver", id_=None),
+            _req("fail", id_=None),
+            _req("slow", [0.0], id_=None),
+        ],
+    )
+
+    assert status == "200 OK"
+    assert response == [{"version": "1.1", "result": ["bob"], "id": "1"}]
+
+    # nothing to respond
+    status, response = _call(app, [_req("ver", id_=None)])
+    assert status == "200 OK"
+    assert response is None
+
+
+def test_batch_empty_or_too_large(app):
+    status, response = _call(app, [])
+    assert status == "500 Internal Server Error"
+    assert response["error"]["name"] == "Invalid Request"
+    assert response["error"]["message"] == "Empty batch"
+
+    app.batch_max_calls = 3
+    status, response = _call(app, [_req("ver")] * 4)
+    assert status == "500 Internal Server Error"
+    assert response["error"]["message"] == "Batch of 4 calls exceeds the maximum of 3"
+    app.auth_client.get_user.assert_not_called()
@@ -0,0 +1,245 @@
+"""
+Unit tests for the HeldJobEventConsumer.
+
+These tests write real condor event logs and read them with the htcondor bindings.
+"""
+
+import os
+from datetime import datetime
+from logging import Logger
+from unittest.mock import create_autospec, MagicMock
+
+from pytest import raises
+
+from execution_engine2.db.MongoUtil import MongoUtil
+from execution_engine2.utils.held_job_consumer import HeldJobEventConsumer
+from utils_shared.test_utils import assert_exception_correct
+
+_NOW = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _submit(cluster, time=_NOW):
+    return (
+        f"000 ({cluster}.000.000) {time} Job submitted from host: <127.0.0.1:9618>\n"
+        + "...\n"
+    )
+
+
+def _held(cluster, code=34, time=_NOW):
+    return (
+        f"012 ({cluster}.000.000) {time} Job was held.\n"
+        + "\tError from slot\n"
+        + f"\tCode {code} Subcode 0\n"
+        + "...\n"
+    )
+
+
+def _write(path, *events):
+    with open(path, "a") as f:
+        f.write("".join(events))
+
+
+def _held_event(cluster, code=34):
+    return {
+        "cluster_id": str(cluster),
+        "hold_reason_code": code,
+        "hold_reason": "Error from slot",
+        "timestamp": int(datetime.strptime(_NOW, "%Y-%m-%d %H:%M:%S").timestamp()),
+    }
+
+
+def _mocks():
+    """
+    Returns a mongo mock that stores checkpoints in a dict, a handler mock, and a logger mock.
+    """
+    mongo = create_autospec(MongoUtil, spec_set=True, instance=True)
+    checkpoints = {}
+    mongo.get_checkpoint.side_effect = lambda name: checkpoints.get(name)
+    mongo.save_checkpoint.side_effect = lambda name, cp: checkpoints.update(
+        {name: dict(cp)}
+    )
+    handler = MagicMock()
+    logger = create_autospec(Logger, spec_set=True, instance=True)
+    return mongo, checkpoints, handler, logger
+
+
+def test_init_fail(tmp_path):
+    mongo, _, handler, logger = _mocks()
+    path = tmp_path / "event_log"
+    err = "cannot be a value that evaluates to false"
+    _init_fail(None, mongo, handler, logger, {}, ValueError(f"event_log_path {err}"))
+    _init_fail(path, None, handler, logger, {}, ValueError(f"mongo_util {err}"))
+    _init_fail(path, mongo, None, logger, {}, ValueError(f"handler {err}"))
+    _init_fail(path, mongo, handler, None, {}, ValueError(f"logger {err}"))
+    _init_fail(
+        path,
+        mongo,
+        handler,
+        logger,
+        {"batch_size": 0},
+        ValueError("batch_size must be at least 1"),
+    )
+    _init_fail(
+        path,
+        mongo,
+        handler,
+        logger,
+        {"checkpoint_events": 0},
+        ValueError("checkpoint_events must be at least 1"),
+    )
+
+
+def _init_fail(path, mongo, handler, logger, kwargs, expected):
+    with raises(Exception) as got:
+        HeldJobEventConsumer(path, mongo, handler, logger, **kwargs)
+    assert_exception_correct(got.value, expected)
+
+
+def test_consume_without_checkpoint(tmp_path):
+    mongo, checkpoints, handler, logger = _mocks()
+    path = tmp_path / "event_log"
+    _write(
+        path,
+        _held(1, time="2000-01-01 00:00:00"),
+        _submit(2),
+        _held(2),
+        _held(3, code=16),
+        _held(4),
+    )
+
+    c = HeldJobEventConsumer(path, mongo, handler, logger, wait_seconds=0)
+    assert c.consume() == 0  # opens the log
+    assert c.consume() == 2
+
+    handler.assert_called_once_with([_held_event(2), _held_event(4)])
+    logger.info.assert_called_once_with(f"No saved position for {path}")
+    assert checkpoints == {
+        "held_job_event_log": {
+            "inode": os.stat(path).st_ino,
+            "offset": os.stat(path).st_size,
+            "event_id": f"4.0:12:{_held_event(4)['timestamp']}",
+        }
+    }
+
+    # nothing new
+    assert c.consume() == 0
+    assert handler.call_count == 1
+
+
+def test_consume_resumes_from_checkpoint(tmp_path):
+    mongo, checkpoints, handler, logger = _mocks()
+    path = tmp_path / "event_log"
+    _write(path, _held(1))
+    c = HeldJobEventConsumer(path, mongo, handler, logger, wait_seconds=0)
+    c.consume()
+    assert c.consume() == 1
+    c.close()
+
+    _write(path, _held(2))
+    handler.reset_mock()
+    c = HeldJobEventConsumer(path, mongo, handler, logger, wait_seconds=0)
+    assert c.consume() == 0
+    assert c.consume() == 1
+
+    handler.assert_called_once_with([_held_event(2)])
+    assert checkpoints["held_job_event_log"]["offset"] == os.stat(path).st_size
+
+
+def test_consume_batches(tmp_path):
+    mongo, checkpoints, handler, logger = _mocks()
+    path = tmp_path / "event_log"
+    _write(path, _held(1), _held(2), _held(3))
+
+    c = HeldJobEventConsumer(path, mongo, handler, logger, batch_size=2, wait_seconds=0)
+    c.consume()
+    assert c.consume() == 2
+    assert c.consume() == 1
+
+    assert handler.call_args_list[0][0][0] == [_held_event(1), _held_event(2)]
+    assert handler.call_args_list[1][0][0] == [_held_event(3)]
+    assert mongo.save_checkpoint.call_count == 2
+
+
+def test_consume_handler_failure_retries_batch(tmp_path):
+    mongo, checkpoints, handler, logger = _mocks()
+    path = tmp_path / "event_log"
+    _write(path, _held(1))
+    handler.side_effect = [ValueError("oops"), None]
+
+    c = HeldJobEventConsumer(path, mongo, handler, logger, wait_seconds=0)
+    c.consume()
+    with raises(Exception) as got:
+        c.consume()
+    assert_exception_correct(got.value, ValueError("oops"))
+    assert checkpoints == {}
+
+    c.consume()
+    assert c.consume() == 1
+    assert handler.call_count == 2
+    assert handler.call_args_list[1][0][0] == [_held_event(1)]
+
+
+def test_consume_follows_rotation(tmp_path):
+    mongo, checkpoints, handler, logger = _mocks()
+    path = tmp_path / "event_log"
+    _write(path, _held(1))
+    c = HeldJobEventConsumer(path, mongo, handler, logger, wait_seconds=0)
+    c.consume()
+    c.consume()
+
+    # condor writes more events and then rotates the log
+    _write(path, _held(2))
+    os.rename(path, tmp_path / "event_log.old")
+    _write(path, _held(3))
+    handler.reset_mock()
+
+    assert c.consume() == 1
+    handler.assert_called_once_with([_held_event(2)])
+    assert checkpoints["held_job_event_log"]["inode"] == os.stat(path).st_ino
+    assert checkpoints["held_job_event_log"]["offset"] == 0
+
+    assert c.consume() == 1
+    handler.assert_called_with([_held_event(3)])
+
+
+def test_open_finishes_rotated_log(tmp_path):
+    mongo, checkpoints, handler, logger = _mocks()
+    path = tmp_path / "event_log"
+    _write(path, _held(1))
+    c = HeldJobEventConsumer(path, mongo, handler, logger, wait_seconds=0)
+    c.consume()
+    c.consume()
+    c.close()
+
+    # the log is rotated while the reaper is down
+    _write(path, _held(2))
+    os.rename(path, tmp_path / "event_log.old")
+    _write(path, _held(3))
+    handler.reset_mock()
+
+    c = HeldJobEventConsumer(path, mongo, handler, logger, wait_seconds=0)
+    assert c.consume() == 1
+    handler.assert_called_once_with([_held_event(2)])
+    logger.info.assert_called_with(
+        f"Finishing rotated event log {tmp_path / 'event_log.old'} from "
+        + f"{os.stat(tmp_path / 'event_log.old').st_size - len(_held(2))}"
+    )
+    assert c.consume() == 1
+    handler.assert_called_with([_held_event(3)])
+
+
+def test_open_lost_rotated_log(tmp_path):
+    mongo, checkpoints, handler, logger = _mocks()
+    path = tmp_path / "event_log"
+    checkpoint = {"inode": -1, "offset": 100, "event_id": "1.0:12:0"}
+    checkpoints["held_job_event_log"] = checkpoint
+    _write(path, _held(1))
+
+    c = HeldJobEventConsumer(path, mongo, handler, logger, wait_seconds=0)
+    assert c.consume() == 0
+    logger.warning.assert_called_once_with(
+        f"Could not find the event log at the saved position {checkpoint}, "
+        + f"starting from the beginning of {path}"
+    )
+    assert c.consume() == 1
+    handler.assert_called_once_with([_held_event(1)])
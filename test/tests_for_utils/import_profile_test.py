@@ -0,0 +1,46 @@
+"""
+Unit tests for the import_profile module.
+"""
+
+from execution_engine2.utils.import_profile import (
+    ImportTime,
+    parse_importtime,
+    report,
+)
+
+_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:        80 |         80 |     marshal
+import time:       300 |        500 |   requests
+some other output
+import time:      1000 |       1500 | execution_engine2.execution_engine2Server
+import time:        10 |         10 | json
+"""
+
+
+def test_parse_importtime():
+    assert parse_importtime(_OUTPUT) == [
+        ImportTime("_io", 120, 120, 1),
+        ImportTime("marshal", 80, 80, 2),
+        ImportTime("requests", 300, 500, 1),
+        ImportTime("execution_engine2.execution_engine2Server", 1000, 1500, 0),
+        ImportTime("json", 10, 10, 0),
+    ]
+    assert parse_importtime("") == []
+
+
+def test_report():
+    got = report(parse_importtime(_OUTPUT), top=2).split("\n")
+    assert got == [
+        "total import time: 1.5 ms, 5 modules",
+        "",
+        "slowest 2 by own time",
+        "        ms  cumul ms  module",
+        "       1.0       1.5  execution_engine2.execution_engine2Server",
+        "       0.3       0.5  requests",
+        "",
+        "slowest 2 by cumulative time",
+        "        ms  cumul ms  module",
+        "       1.0       1.5  execution_engine2.execution_engine2Server",
+        "       0.3       0.5  requests",
+    ]
@@ -0,0 +1,75 @@
+"""
+Unit tests for the JSON codecs.
+"""
+
+import json
+
+from pytest import raises
+
+from execution_engine2.utils.json_codec import (
+    OrjsonCodec,
+    StdlibCodec,
+    get_codec,
+)
+from utils_shared.test_utils import assert_exception_correct
+
+
+class _JSONable:
+    def toJSONable(self):
+        return {"a": [1, 2]}
+
+
+def _codecs():
+    return [StdlibCodec(), OrjsonCodec()]
+
+
+def test_get_codec():
+    assert type(get_codec()) is OrjsonCodec
+    assert type(get_codec("orjson")) is OrjsonCodec
+    assert type(get_codec("stdlib")) is StdlibCodec
+
+    with raises(Exception) as got:
+        get_codec("simplejson")
+    assert_exception_correct(got.value, ValueError("Unknown JSON codec simplejson"))
+
+
+def test_dumps():
+    obj = {
+        "set": {3},
+        "frozenset": frozenset(["x"]),
+        "jsonable": _JSONable(),
+        "unicode": "μ",
+        "nested": [{"n": None, "f": 1.5, "b": True}],
+        1: "int key",
+        "big": 2**70,
+    }
+    for c in _codecs():
+        got = c.dumps(obj)
+        assert type(got) is bytes
+        assert json.loads(got) == {
+            "set": [3],
+            "frozenset": ["x"],
+            "jsonable": {"a": [1, 2]},
+            "unicode": "μ",
+            "nested": [{"n": None, "f": 1.5, "b": True}],
+            "1": "int key",
+            "big": 2**70,
+        }
+
+
+def test_dumps_fail():
+    for c in _codecs():
+        with raises(TypeError) as got:
+            c.dumps({"o": object()})
+        assert "Object of type object is not JSON serializable" in str(got.value)
+
+
+def test_loads():
+    for c in _codecs():
+        assert c.loads(b'{"params": [{"a": "\\u03bc"}], "id": 1}') == {
+            "params": [{"a": "μ"}],
+            "id": 1,
+        }
+        assert c.loads('{"id": "1"}') == {"id": "1"}
+        with raises(ValueError):
+            c.loads(b'{"id": ')
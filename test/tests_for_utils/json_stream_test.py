@@ -0,0 +1,75 @@
+"""
+Unit tests for the json_stream module.
+"""
+
+import json
+
+from execution_engine2.utils.json_codec import StdlibCodec
+from execution_engine2.utils.json_stream import (
+    Deferred,
+    StreamedList,
+    has_stream,
+    iter_encode,
+)
+
+_DUMPS = StdlibCodec().dumps
+
+
+def _encode(obj) -> bytes:
+    return b"".join(iter_encode(obj, _DUMPS))
+
+
+def test_has_stream():
+    assert has_stream(StreamedList([]))
+    assert has_stream(Deferred(lambda: 1))
+    assert has_stream({"result": [{"lines": StreamedList([])}]})
+    assert has_stream([{"result": [{"count": Deferred(lambda: 1)}]}])
+    assert not has_stream({"result": [{"lines": [1, 2]}]})
+    assert not has_stream("foo")
+    assert not has_stream(None)
+    # too deep to be a method result
+    assert not has_stream([[[[[StreamedList([])]]]]])
+
+
+def test_iter_encode_no_stream():
+    obj = {"version": "1.1", "result": [{"a": [1, "μ"]}], "id": "1"}
+    assert list(iter_encode(obj, _DUMPS)) == [_DUMPS(obj)]
+
+
+def test_iter_encode():
+    seen = []
+
+    def lines():
+        for i in range(1234):
+            seen.append(i)
+            yield {"line": f"line {i}", "linepos": i}
+
+    result = {
+        "lines": StreamedList(lines()),
+        # computed after the lines have been read
+        "last_line_number": Deferred(lambda: seen[-1]),
+        "empty": StreamedList(iter([])),
+        "count": 1234,
+    }
+    got = json.loads(_encode({"version": "1.1", "result": [result], "id": "1"}))
+    assert got == {
+        "version": "1.1",
+        "result": [
+            {
+                "lines": [{"line": f"line {i}", "linepos": i} for i in range(1234)],
+                "last_line_number": 1233,
+                "empty": [],
+                "count": 1234,
+            }
+        ],
+        "id": "1",
+    }
+
+
+def test_iter_encode_chunks():
+    items = ({"line": "x" * 100} for _ in range(2000))
+    chunks = list(iter_encode({"lines": StreamedList(items)}, _DUMPS))
+    assert len(chunks) > 1
+    # each chunk but the last is at least 64KB
+    assert all(len(c) >= 64 * 1024 for c in chunks[:-1])
+    assert json.loads(b"".join(chunks)) == {"lines": [{"line": "x" * 100}] * 2000}
@@ -0,0 +1,50 @@
+"""
+Unit tests for the lazy_import module.
+"""
+
+import sys
+
+from pytest import raises
+
+from execution_engine2.utils.lazy_import import is_loaded, lazy_import, load
+from utils_shared.test_utils import assert_exception_correct
+
+
+def test_lazy_import(tmp_path, monkeypatch):
+    (tmp_path / "ee2_lazy_test_mod.py").write_text(
+        "LOADS = []\nLOADS.append(1)\nX = 42\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "ee2_lazy_test_mod", raising=False)
+
+    mod = lazy_import("ee2_lazy_test_mod")
+    assert not is_loaded(mod)
+    assert sys.modules["ee2_lazy_test_mod"] is mod
+    assert lazy_import("ee2_lazy_test_mod") is mod
+
+    assert mod.X == 42
+    assert is_loaded(mod)
+    assert mod.LOADS == [1]
+
+    import ee2_lazy_test_mod
+
+    assert ee2_lazy_test_mod is mod
+
+
+def test_load(tmp_path, monkeypatch):
+    (tmp_path / "ee2_lazy_test_mod2.py").write_text("X = 1\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "ee2_lazy_test_mod2", raising=False)
+
+    mod = lazy_import("ee2_lazy_test_mod2")
+    load([mod, sys])
+    assert is_loaded(mod)
+    assert is_loaded(sys)
+
+
+def test_lazy_import_fail():
+    with raises(Exception) as got:
+        lazy_import("ee2_no_such_module")
+    assert_exception_correct(
+        got.value, ModuleNotFoundError("No module named 'ee2_no_such_module'")
+    )
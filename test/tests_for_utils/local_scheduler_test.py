@@ -0,0 +1,95 @@
+"""
+Unit tests for the LocalScheduler class. The jobs run in real processes.
+"""
+
+import time
+from functools import partial
+from pathlib import Path
+
+from pytest import raises
+
+from execution_engine2.sdk.job_submission_parameters import (
+    JobSubmissionParameters,
+    JobRequirements,
+)
+from execution_engine2.utils.application_info import AppInfo
+from execution_engine2.utils.local_scheduler import LocalScheduler
+from execution_engine2.utils.user_info import UserCreds
+from utils_shared.test_utils import assert_exception_correct
+
+
+def _write_job(directory, job_id, ee2_url, token):
+    (Path(directory) / job_id).write_text(f"{ee2_url} {token}")
+
+
+def _sleep_job(job_id, ee2_url, token):
+    time.sleep(30)
+
+
+def _params(job_id, token="token"):
+    return JobSubmissionParameters(
+        job_id,
+        AppInfo("foo.bar"),
+        JobRequirements(1, 1, 1, "cg"),
+        UserCreds("user", token),
+    )
+
+
+def test_init_fail():
+    with raises(Exception) as got:
+        LocalScheduler(None)
+    assert_exception_correct(
+        got.value, ValueError("ee2_url cannot be a value that evaluates to false")
+    )
+    with raises(Exception) as got:
+        LocalScheduler("https://ee2", workers=0)
+    assert_exception_correct(got.value, ValueError("workers must be at least 1"))
+
+
+def test_run_jobs(tmp_path):
+    s = LocalScheduler(
+        "https://ee2", workers=2, job_runner=partial(_write_job, str(tmp_path))
+    )
+    try:
+        subs = s.submit_jobs([_params(f"job{i}", f"tok{i}") for i in range(3)])
+        assert [sub.scheduler_id for sub in subs] == ["1", "2", "3"]
+        assert all(sub.error is None for sub in subs)
+        assert s.run_job(_params("job3")).scheduler_id == "4"
+
+        assert s.wait_for_jobs(timeout=30)
+
+        for i in range(3):
+            assert (tmp_path / f"job{i}").read_text() == f"https://ee2 tok{i}"
+        res = s.get_jobs_resource_info(["job0", "job3", "nojob"])
+        assert set(res) == {"job0", "job3"}
+        assert res["job0"]["RemoteHost"] == "localhost"
+        assert res["job0"]["JobCurrentStartDate"] <= res["job0"]["CompletionDate"]
+        assert res["job0"]["CpusUsage"] is None
+        assert s.get_job_resource_info("nojob") == {}
+        assert s.get_running_jobs_resource_usage() == {}
+    finally:
+        s.close()
+
+
+def test_cancel_jobs():
+    s = LocalScheduler("https://ee2", workers=1, job_runner=_sleep_job)
+    try:
+        s.submit_jobs([_params("job1"), _params("job2")])
+        for _ in range(100):
+            if s.get_running_jobs_resource_usage():
+                break
+            time.sleep(0.05)
+        # the second job is waiting for a worker
+        assert list(s.get_running_jobs_resource_usage()) == ["job1"]
+
+        assert s.cancel_jobs(["2", "1", "99"]) is True
+        s.cancel_job("1")
+
+        assert s.wait_for_jobs(timeout=10)
+        assert list(s.get_jobs_resource_info(["job1", "job2"])) == ["job1"]
+    finally:
+        s.close()
+
+    with raises(Exception) as got:
+        s.run_job(_params("job3"))
+    assert_exception_correct(got.value, ValueError("The scheduler is closed"))
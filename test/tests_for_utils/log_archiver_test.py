@@ -0,0 +1,186 @@
+"""
+Unit tests for the JobLogArchiver.
+"""
+
+from logging import Logger
+from unittest.mock import ANY, create_autospec, call, patch
+
+from pytest import raises
+
+from execution_engine2.db.MongoUtil import MongoUtil
+from execution_engine2.db.log_archive import (
+    LogArchiveStore,
+    encode_archive,
+    iter_archive_lines,
+)
+from execution_engine2.utils.log_archiver import JobLogArchiver
+from utils_shared.test_utils import assert_exception_correct
+
+JOB_LOG = {
+    "_id": "603051cfaf2e3401b0500982",
+    "original_line_count": 2,
+    "stored_line_count": 2,
+    "lines": [
+        {"line": "a", "linepos": 0, "error": False, "ts": 1.5},
+        {"line": "b", "linepos": 1, "error": True, "ts": 2.5},
+    ],
+}
+
+
+def _mocks():
+    mongo = create_autospec(MongoUtil, spec_set=True, instance=True)
+    store = create_autospec(LogArchiveStore, spec_set=True, instance=True)
+    store.name = "file"
+    logger = create_autospec(Logger, spec_set=True, instance=True)
+    return mongo, store, logger
+
+
+def test_init_fail():
+    mongo, store, logger = _mocks()
+    err = "cannot be a value that evaluates to false"
+    _init_fail(None, store, logger, {}, ValueError(f"mongo_util {err}"))
+    _init_fail(mongo, None, logger, {}, ValueError(f"store {err}"))
+    _init_fail(mongo, store, None, {}, ValueError(f"logger {err}"))
+    _init_fail(
+        mongo,
+        store,
+        logger,
+        {"archive_after_seconds": 0},
+        ValueError("archive_after_seconds must be at least 1"),
+    )
+    _init_fail(
+        mongo,
+        store,
+        logger,
+        {"batch_size": 0},
+        ValueError("batch_size must be at least 1"),
+    )
+
+
+def _init_fail(mongo, store, logger, kwargs, expected):
+    with raises(Exception) as got:
+        JobLogArchiver(mongo, store, logger, **kwargs)
+    assert_exception_correct(got.value, expected)
+
+
+@patch("execution_engine2.utils.log_archiver.time.time")
+def test_archive_job_log(time_mock):
+    mongo, store, logger = _mocks()
+    time_mock.return_value = 10000
+    mongo.get_job_log_pymongo.return_value = JOB_LOG
+    mongo.set_job_log_archived.return_value = True
+
+    archiver = JobLogArchiver(mongo, store, logger)
+    assert archiver.archive_job_log("job1") is True
+
+    mongo.get_job_log_pymongo.assert_called_once_with("job1")
+    store.put.assert_called_once_with("job1", ANY)
+    data = store.put.call_args[0][1]
+    assert [line["line"] for line in iter_archive_lines(data)] == ["a", "b"]
+    mongo.set_job_log_archived.assert_called_once_with(
+        "job1",
+        2,
+        {"store": "file", "key": "job1", "count": 2, "size": len(data), "time": 10000},
+    )
+
+
+def test_archive_job_log_store_fail():
+    mongo, store, logger = _mocks()
+    mongo.get_job_log_pymongo.return_value = JOB_LOG
+    store.put.side_effect = OSError("disk full")
+
+    with raises(Exception) as got:
+        JobLogArchiver(mongo, store, logger).archive_job_log("job1")
+    assert_exception_correct(got.value, OSError("disk full"))
+    # the lines are only removed once the archive is saved
+    mongo.set_job_log_archived.assert_not_called()
+
+
+@patch("execution_engine2.utils.log_archiver.time.time")
+def test_archive(time_mock):
+    mongo, store, logger = _mocks()
+    time_mock.return_value = 100000
+    mongo.get_job_logs_to_archive.return_value = ["job1", "job2", "job3"]
+    mongo.get_job_log_pymongo.return_value = JOB_LOG
+    # lines were added to job2's log while it was archived
+    mongo.set_job_log_archived.side_effect = [True, False, True]
+
+    archiver = JobLogArchiver(
+        mongo, store, logger, archive_after_seconds=1000, batch_size=3
+    )
+    assert archiver.archive() == 2
+
+    mongo.get_job_logs_to_archive.assert_called_once_with(
+        finished_before=99000, limit=3, after_id=None
+    )
+    assert store.put.call_args_list == [
+        call("job1", ANY),
+        call("job2", ANY),
+        call("job3", ANY),
+    ]
+    logger.debug.assert_called_once_with("Archived 2 of 3 job logs")
+
+
+def test_archive_continues_after_failure():
+    mongo, store, logger = _mocks()
+    mongo.get_job_logs_to_archive.return_value = ["job1", "job2"]
+    mongo.get_job_log_pymongo.side_effect = [ValueError("bad log"), JOB_LOG]
+    mongo.set_job_log_archived.return_value = True
+
+    assert JobLogArchiver(mongo, store, logger).archive() == 1
+
+    logger.exception.assert_called_once_with("Failed to archive the log for job job1")
+    store.put.assert_called_once_with("job2", encode_archive(JOB_LOG)[0])
+
+
+def test_archive_no_logs():
+    mongo, store, logger = _mocks()
+    mongo.get_job_logs_to_archive.return_value = []
+
+    assert JobLogArchiver(mongo, store, logger).archive() == 0
+    mongo.get_job_log_pymongo.assert_not_called()
+    logger.debug.assert_not_called()
+
+
+def test_archive_all():
+    mongo, store, logger = _mocks()
+    mongo.get_job_logs_to_archive.side_effect = [["job1", "job2"], ["job3"]]
+    mongo.get_job_log_pymongo.return_value = JOB_LOG
+    mongo.set_job_log_archived.return_value = True
+
+    archiver = JobLogArchiver(mongo, store, logger, batch_size=2)
+    assert archiver.archive_all() == 3
+
+    mongo.create_log_archive_index.assert_called_once_with()
+    assert [c[1]["after_id"] for c in mongo.get_job_logs_to_archive.call_args_list] == [
+        None,
+        "job2",
+    ]
+
+
+def test_archive_all_pages_past_failures():
+    # job1 always fails, and would otherwise be returned first by every query
+    mongo, store, logger = _mocks()
+    mongo.get_job_logs_to_archive.side_effect = [["job1", "job2"], ["job3"]]
+    mongo.get_job_log_pymongo.side_effect = [ValueError("bad log"), JOB_LOG, JOB_LOG]
+    mongo.set_job_log_archived.return_value = True
+
+    archiver = JobLogArchiver(mongo, store, logger, batch_size=2)
+    assert archiver.archive_all() == 2
+
+    assert [c[1]["after_id"] for c in mongo.get_job_logs_to_archive.call_args_list] == [
+        None,
+        "job2",
+    ]
+    logger.exception.assert_called_once_with("Failed to archive the log for job job1")
+
+
+def test_archive_all_max_batches():
+    mongo, store, logger = _mocks()
+    mongo.get_job_logs_to_archive.side_effect = [["job1", "job2"], ["job3", "job4"]]
+    mongo.get_job_log_pymongo.return_value = JOB_LOG
+    mongo.set_job_log_archived.return_value = True
+
+    archiver = JobLogArchiver(mongo, store, logger, batch_size=2)
+    assert archiver.archive_all(max_batches=2) == 4
+    assert mongo.get_job_logs_to_archive.call_count == 2
@@ -0,0 +1,137 @@
+"""
+Unit tests for the metrics module.
+"""
+
+import json
+import os
+from unittest.mock import create_autospec
+
+from execution_engine2.utils.metrics import (
+    MONGO,
+    WORKSPACE,
+    Metrics,
+    dependency_timer,
+    record_dependency,
+    timed_client,
+    track_dependencies,
+)
+from installed_clients.WorkspaceClient import Workspace
+
+
+def _lines(text, prefix):
+    return [line for line in text.split("\n") if line.startswith(prefix)]
+
+
+def test_track_dependencies():
+    # no request being served
+    record_dependency(MONGO, 1)
+    with track_dependencies() as deps:
+        record_dependency(MONGO, 0.5)
+        record_dependency(MONGO, 0.25, calls=2)
+        with dependency_timer(WORKSPACE):
+            pass
+    assert deps[MONGO] == [0.75, 3]
+    assert deps[WORKSPACE][1] == 1
+    assert 0 <= deps[WORKSPACE][0] < 1
+
+
+def test_timed_client():
+    ws = create_autospec(Workspace, spec_set=True, instance=True)
+    ws.ver.return_value = "0.14.2"
+    client = timed_client(ws, WORKSPACE)
+    with track_dependencies() as deps:
+        assert client.ver() == "0.14.2"
+    ws.ver.assert_called_once_with()
+    assert deps[WORKSPACE][1] == 1
+
+
+def test_render():
+    m = Metrics()
+    m.observe_request("run_job", 0.02, 500, 50, False, {MONGO: [0.01, 3]})
+    m.observe_request("run_job", 1.5, 2000, 300, True)
+    m.observe_request('bad"method', 0.001, 0, 0, False)
+    text = m.render()
+
+    assert "# TYPE ee2_rpc_request_seconds histogram" in text
+    assert _lines(text, 'ee2_rpc_request_seconds_bucket{method="run_job"') == [
+        'ee2_rpc_request_seconds_bucket{method="run_job",le="0.005"} 0',
+        'ee2_rpc_request_seconds_bucket{method="run_job",le="0.01"} 0',
+        'ee2_rpc_request_seconds_bucket{method="run_job",le="0.025"} 1',
+        'ee2_rpc_request_seconds_bucket{method="run_job",le="0.05"} 1',
+        'ee2_rpc_request_seconds_bucket{method="run_job",le="0.1"} 1',
+        'ee2_rpc_request_seconds_bucket{method="run_job",le="0.25"} 1',
+        'ee2_rpc_request_seconds_bucket{method="run_job",le="0.5"} 1',
+        'ee2_rpc_request_seconds_bucket{method="run_job",le="1"} 1',
+        'ee2_rpc_request_seconds_bucket{method="run_job",le="2.5"} 2',
+        'ee2_rpc_request_seconds_bucket{method="run_job",le="5"} 2',
+        'ee2_rpc_request_seconds_bucket{method="run_job",le="10"} 2',
+        'ee2_rpc_request_seconds_bucket{method="run_job",le="30"} 2',
+        'ee2_rpc_request_seconds_bucket{method="run_job",le="60"} 2',
+        'ee2_rpc_request_seconds_bucket{method="run_job",le="300"} 2',
+        'ee2_rpc_request_seconds_bucket{method="run_job",le="+Inf"} 2',
+    ]
+    assert _lines(text, "ee2_rpc_request_seconds_sum") == [
+        'ee2_rpc_request_seconds_sum{method="bad\\"method"} 0.001',
+        'ee2_rpc_request_seconds_sum{method="run_job"} 1.52',
+    ]
+    assert 'ee2_rpc_request_bytes_sum{method="run_job"} 2500' in text
+    assert 'ee2_rpc_response_bytes_count{method="run_job"} 2' in text
+    assert _lines(text, "ee2_rpc_errors_total") == [
+        'ee2_rpc_errors_total{method="bad\\"method"} 0',
+        'ee2_rpc_errors_total{method="run_job"} 1',
+    ]
+    assert _lines(text, "ee2_rpc_dependency_calls_total") == [
+        'ee2_rpc_dependency_calls_total{method="run_job",dependency="mongo"} 3'
+    ]
+    assert (
+        'ee2_rpc_dependency_seconds_count{method="run_job",dependency="mongo"} 1'
+        in text
+    )
+
+
+def test_aggregate_across_processes(tmp_path):
+    # a stale file from a previous run of the server is removed
+    stale = tmp_path / "ee2-metrics-1-2.json"
+    stale.write_text("{}")
+    # another worker of the same server
+    other = Metrics()
+    other.observe_request("check_jobs", 0.1, 10, 20, True, {MONGO: [0.05, 2]})
+    other.observe_request("check_jobs", 0.1, 10, 20, False)
+    sibling = tmp_path / f"ee2-metrics-{os.getppid()}-{os.getpid() + 1}.json"
+    sibling.write_text(json.dumps(other._snapshot()))
+
+    m = Metrics(str(tmp_path), flush_seconds=1000)
+    m.observe_request("check_jobs", 0.2, 10, 20, False, {MONGO: [0.05, 1]})
+    m.observe_request("run_job", 0.2, 10, 20, False)
+    text = m.render()
+
+    assert 'ee2_rpc_request_seconds_count{method="check_jobs"} 3' in text
+    assert 'ee2_rpc_request_seconds_sum{method="check_jobs"} 0.4' in text
+    assert 'ee2_rpc_request_seconds_count{method="run_job"} 1' in text
+    assert 'ee2_rpc_errors_total{method="check_jobs"} 1' in text
+    assert (
+        'ee2_rpc_dependency_calls_total{method="check_jobs",dependency="mongo"} 3'
+        in text
+    )
+    assert not stale.exists()
+    assert len(list(tmp_path.glob("ee2-metrics-*"))) == 2
+
+
+def test_flush_interval(tmp_path):
+    now = [0]
+    m = Metrics(str(tmp_path), flush_seconds=10, clock=lambda: now[0])
+    path = tmp_path / f"ee2-metrics-{os.getppid()}-{os.getpid()}.json"
+    m.observe_request("run_job", 0.2, 10, 20, False)
+    assert (
+        json.loads(path.read_text())["histograms"]["ee2_rpc_request_seconds"][0][3] == 1
+    )
+    now[0] = 5
+    m.observe_request("run_job", 0.2, 10, 20, False)
+    assert (
+        json.loads(path.read_text())["histograms"]["ee2_rpc_request_seconds"][0][3] == 1
+    )
+    now[0] = 10
+    m.observe_request("run_job", 0.2, 10, 20, False)
+    assert (
+        json.loads(path.read_text())["histograms"]["ee2_rpc_request_seconds"][0][3] == 3
+    )
@@ -0,0 +1,191 @@
+"""
+Unit tests for the ResourceUsageCollector and RunningJobResourceSampler.
+"""
+
+from logging import Logger
+from unittest.mock import create_autospec, call, patch
+
+from pytest import raises
+
+from execution_engine2.db.MongoUtil import FinishedJob, MongoUtil
+from execution_engine2.utils.Condor import Condor
+from execution_engine2.utils.resource_collector import (
+    ResourceUsageCollector,
+    RunningJobResourceSampler,
+)
+from utils_shared.test_utils import assert_exception_correct
+
+
+def _jobs(*ids):
+    return [FinishedJob(job_id, 5000 + i) for i, job_id in enumerate(ids)]
+
+
+def _mocks():
+    condor = create_autospec(Condor, spec_set=True, instance=True)
+    mongo = create_autospec(MongoUtil, spec_set=True, instance=True)
+    logger = create_autospec(Logger, spec_set=True, instance=True)
+    return condor, mongo, logger
+
+
+def test_init_fail():
+    condor, mongo, logger = _mocks()
+    err = "cannot be a value that evaluates to false"
+    _init_fail(None, mongo, logger, {}, ValueError(f"condor {err}"))
+    _init_fail(condor, None, logger, {}, ValueError(f"mongo_util {err}"))
+    _init_fail(condor, mongo, None, {}, ValueError(f"logger {err}"))
+    _init_fail(
+        condor,
+        mongo,
+        logger,
+        {"lookback_seconds": 60, "settle_seconds": 60},
+        ValueError("lookback_seconds must be greater than settle_seconds"),
+    )
+    _init_fail(
+        condor,
+        mongo,
+        logger,
+        {"batch_size": 0},
+        ValueError("batch_size must be at least 1"),
+    )
+
+
+def _init_fail(condor, mongo, logger, kwargs, expected):
+    with raises(Exception) as got:
+        ResourceUsageCollector(condor, mongo, logger, **kwargs)
+    assert_exception_correct(got.value, expected)
+
+
+@patch("execution_engine2.utils.resource_collector.time.time")
+def test_collect(time_mock):
+    condor, mongo, logger = _mocks()
+    time_mock.return_value = 10000
+    resources = {"job1": {"CpusUsage": 1}, "job2": {"CpusUsage": 2}}
+    mongo.get_finished_jobs_without_resources.return_value = _jobs(
+        "job1", "job2", "job3"
+    )
+    condor.get_jobs_resource_info.return_value = resources
+    mongo.update_jobs_resources.return_value = 2
+
+    rc = ResourceUsageCollector(
+        condor, mongo, logger, lookback_seconds=1000, settle_seconds=10, batch_size=3
+    )
+    assert rc.collect() == 2
+
+    mongo.get_finished_jobs_without_resources.assert_called_once_with(
+        finished_after=9000, finished_before=9990, limit=3, start_after=None
+    )
+    condor.get_jobs_resource_info.assert_called_once_with(["job1", "job2", "job3"])
+    mongo.update_jobs_resources.assert_called_once_with(resources)
+    logger.debug.assert_called_once_with(
+        "Recorded condor resource usage for 2 of 3 finished jobs"
+    )
+
+
+def test_collect_no_jobs():
+    condor, mongo, logger = _mocks()
+    mongo.get_finished_jobs_without_resources.return_value = []
+
+    assert ResourceUsageCollector(condor, mongo, logger).collect() == 0
+
+    condor.get_jobs_resource_info.assert_not_called()
+    mongo.update_jobs_resources.assert_not_called()
+
+
+def test_collect_all():
+    condor, mongo, logger = _mocks()
+    jobs = _jobs("job1", "job2", "job3", "job4", "job5")
+    mongo.get_finished_jobs_without_resources.side_effect = [
+        jobs[:2],
+        jobs[2:4],
+        jobs[4:],
+    ]
+    condor.get_jobs_resource_info.side_effect = [
+        {"job1": {}, "job2": {}},
+        {"job3": {}, "job4": {}},
+        {"job5": {}},
+    ]
+    mongo.update_jobs_resources.side_effect = [2, 2, 1]
+
+    rc = ResourceUsageCollector(condor, mongo, logger, batch_size=2)
+    assert rc.collect_all() == 5
+
+    assert [
+        c[1]["start_after"]
+        for c in mongo.get_finished_jobs_without_resources.call_args_list
+    ] == [None, jobs[1], jobs[3]]
+    condor.get_jobs_resource_info.assert_has_calls(
+        [call(["job1", "job2"]), call(["job3", "job4"]), call(["job5"])]
+    )
+
+
+def test_collect_all_pages_past_missing_jobs():
+    # condor has no history for the first batch, which would otherwise be returned forever
+    condor, mongo, logger = _mocks()
+    jobs = _jobs("job1", "job2", "job3")
+    mongo.get_finished_jobs_without_resources.side_effect = [jobs[:2], jobs[2:]]
+    condor.get_jobs_resource_info.side_effect = [{}, {"job3": {}}]
+    mongo.update_jobs_resources.side_effect = [0, 1]
+
+    rc = ResourceUsageCollector(condor, mongo, logger, batch_size=2)
+    assert rc.collect_all() == 1
+
+    assert [
+        c[1]["start_after"]
+        for c in mongo.get_finished_jobs_without_resources.call_args_list
+    ] == [None, jobs[1]]
+    condor.get_jobs_resource_info.assert_has_calls(
+        [call(["job1", "job2"]), call(["job3"])]
+    )
+
+
+def test_sampler_init_fail():
+    condor, mongo, logger = _mocks()
+    err = "cannot be a value that evaluates to false"
+    _sampler_init_fail(None, mongo, logger, {}, ValueError(f"condor {err}"))
+    _sampler_init_fail(condor, None, logger, {}, ValueError(f"mongo_util {err}"))
+    _sampler_init_fail(condor, mongo, None, {}, ValueError(f"logger {err}"))
+    _sampler_init_fail(
+        condor,
+        mongo,
+        logger,
+        {"max_samples": 0},
+        ValueError("max_samples must be at least 1"),
+    )
+
+
+def _sampler_init_fail(condor, mongo, logger, kwargs, expected):
+    with raises(Exception) as got:
+        RunningJobResourceSampler(condor, mongo, logger, **kwargs)
+    assert_exception_correct(got.value, expected)
+
+
+@patch("execution_engine2.utils.resource_collector.time.time")
+def test_sample(time_mock):
+    condor, mongo, logger = _mocks()
+    time_mock.return_value = 10000
+    usage = {
+        "job1": {"cpu": 1.5, "memory": 100, "disk": 10},
+        "job2": {"cpu": 0.5, "memory": 200, "disk": 20},
+    }
+    condor.get_running_jobs_resource_usage.return_value = usage
+    mongo.append_jobs_resource_usage.return_value = 1
+
+    sampler = RunningJobResourceSampler(condor, mongo, logger, max_samples=50)
+    assert sampler.sample() == 1
+
+    condor.get_running_jobs_resource_usage.assert_called_once_with()
+    mongo.append_jobs_resource_usage.assert_called_once_with(
+        usage, timestamp=10000, max_samples=50
+    )
+    logger.debug.assert_called_once_with(
+        "Recorded resource usage samples for 1 of 2 running jobs"
+    )
+
+
+def test_sample_no_jobs():
+    condor, mongo, logger = _mocks()
+    condor.get_running_jobs_resource_usage.return_value = {}
+
+    assert RunningJobResourceSampler(condor, mongo, logger).sample() == 0
+
+    mongo.append_jobs_resource_usage.assert_not_called()
@@ -0,0 +1,121 @@
+"""
+Unit tests for the ScheddConnection class.
+"""
+
+from logging import Logger
+from unittest.mock import create_autospec, MagicMock
+
+import htcondor
+from pytest import raises
+
+from execution_engine2.utils.schedd_connection import ScheddConnection
+from utils_shared.test_utils import assert_exception_correct
+
+
+def _conn(refresh_seconds=300):
+    htc = create_autospec(htcondor, spec_set=True)
+    htc.Schedd.side_effect = lambda: create_autospec(
+        htcondor.Schedd, spec_set=True, instance=True
+    )
+    logger = create_autospec(Logger, spec_set=True, instance=True)
+    now = [0.0]
+    conn = ScheddConnection(
+        htc, logger, refresh_seconds=refresh_seconds, clock=lambda: now[0]
+    )
+    return conn, htc, logger, now
+
+
+def test_init_fail():
+    with raises(Exception) as got:
+        ScheddConnection(MagicMock(), MagicMock(), refresh_seconds=0)
+    assert_exception_correct(
+        got.value, ValueError("refresh_seconds must be greater than 0")
+    )
+
+
+def test_reuse_and_refresh():
+    conn, htc, _, now = _conn(refresh_seconds=60)
+    schedd = conn.get()
+    now[0] = 59
+    assert conn.get() is schedd
+    assert conn.call("query", lambda s: s) is schedd
+    assert htc.Schedd.call_count == 1
+
+    now[0] = 60
+    assert conn.get() is not schedd
+    assert htc.Schedd.call_count == 2
+
+
+def test_call_reconnects_and_retries():
+    conn, htc, logger, now = _conn()
+    calls = []
+
+    def fn(schedd):
+        calls.append(schedd)
+        if len(calls) == 1:
+            now[0] += 0.5
+            raise ValueError("connection refused")
+        now[0] += 0.25
+        return "ok"
+
+    assert conn.call("act", fn) == "ok"
+
+    assert htc.Schedd.call_count == 2
+    assert calls[0] is not calls[1]
+    logger.warning.assert_called_once_with(
+        "Schedd act failed, reconnecting and retrying", exc_info=True
+    )
+    stats = conn.get_stats()
+    assert stats["act"] == {
+        "count": 2,
+        "errors": 1,
+        "p50_ms": 250.0,
+        "p95_ms": 500.0,
+        "p99_ms": 500.0,
+        "max_ms": 500.0,
+    }
+    assert stats["connect"]["count"] == 2
+
+
+def test_call_no_retry():
+    conn, htc, logger, _ = _conn()
+    fn = MagicMock(side_effect=ValueError("timed out"))
+
+    with raises(Exception) as got:
+        conn.call("submit", fn, retry=False)
+    assert_exception_correct(got.value, ValueError("timed out"))
+
+    fn.assert_called_once()
+    logger.warning.assert_not_called()
+    assert conn.get_stats()["submit"]["errors"] == 1
+    # the next call reconnects
+    conn.get()
+    assert htc.Schedd.call_count == 2
+
+
+def test_call_retry_fails():
+    conn, htc, _, _ = _conn()
+    fn = MagicMock(side_effect=ValueError("schedd down"))
+
+    with raises(Exception) as got:
+        conn.call("query", fn)
+    assert_exception_correct(got.value, ValueError("schedd down"))
+
+    assert fn.call_count == 2
+    assert conn.get_stats()["query"]["errors"] == 2
+
+
+def test_invalidate_keeps_newer_handle():
+    conn, htc, _, _ = _conn()
+    old = conn.get()
+    conn.invalidate()
+    new = conn.get()
+    # another thread failing with the old handle doesn't drop the new one
+    conn.invalidate(old)
+    assert conn.get() is new
+    assert htc.Schedd.call_count == 2
+
+
+def test_get_stats_empty():
+    conn, _, _, _ = _conn()
+    assert conn.get_stats() == {}
@@ -0,0 +1,173 @@
+"""
+Unit tests for the tracing module.
+"""
+
+import json
+import threading
+
+from pytest import raises
+
+from execution_engine2.utils import tracing
+from execution_engine2.utils.metrics import WORKSPACE, dependency_timer
+from utils_shared.test_utils import assert_exception_correct
+
+
+class _ListExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+
+def _tracer(sample_rate=1, rand=lambda: 0.5):
+    exporter = _ListExporter()
+    tracing.set_tracer(tracing.Tracer(exporter, sample_rate, rand=rand))
+    return exporter
+
+
+def teardown_function():
+    tracing.set_tracer(None)
+
+
+def _by_name(spans):
+    return {s["name"]: s for s in spans}
+
+
+def test_no_tracer():
+    with tracing.trace("execution_engine2.run_job") as root:
+        assert root is None
+        with tracing.span("stage") as s:
+            assert s is None
+        tracing.record_span("mongo.find", 0.1)
+    assert tracing.current_span() is None
+
+
+def test_not_sampled():
+    exporter = _tracer(sample_rate=0.1, rand=lambda: 0.2)
+    with tracing.trace("execution_engine2.run_job") as root:
+        assert root is None
+        with tracing.span("stage"):
+            pass
+    assert exporter.traces == []
+
+
+def test_nested_spans():
+    exporter = _tracer()
+
+    class Runner:
+        @tracing.traced()
+        def _preflight(self, x):
+            tracing.record_span("mongo.find", 0.25, collection="ee2_jobs")
+            return x * 2
+
+    with tracing.trace("execution_engine2.run_job_batch", call_id="1") as root:
+        assert tracing.current_span() is root
+        assert Runner()._preflight(2) == 4
+        with dependency_timer(WORKSPACE, "get_permissions_mass"):
+            pass
+    assert tracing.current_span() is None
+
+    assert len(exporter.traces) == 1
+    spans = _by_name(exporter.traces[0])
+    assert set(spans) == {
+        "execution_engine2.run_job_batch",
+        "test_nested_spans.<locals>.Runner._preflight",
+        "mongo.find",
+        "workspace.get_permissions_mass",
+    }
+    root = spans["execution_engine2.run_job_batch"]
+    preflight = spans["test_nested_spans.<locals>.Runner._preflight"]
+    find = spans["mongo.find"]
+    assert "parentId" not in root
+    assert root["tags"] == {"call_id": "1"}
+    assert root["localEndpoint"] == {"serviceName": "execution_engine2"}
+    assert preflight["parentId"] == root["id"]
+    assert spans["workspace.get_permissions_mass"]["parentId"] == root["id"]
+    assert find["parentId"] == preflight["id"]
+    assert find["tags"] == {"collection": "ee2_jobs"}
+    assert 240_000 <= find["duration"] <= 300_000
+    assert {s["traceId"] for s in spans.values()} == {root["traceId"]}
+    assert len(root["traceId"]) == 32
+    assert len(root["id"]) == 16
+
+
+def test_error_tagged():
+    exporter = _tracer()
+    with raises(ValueError):
+        with tracing.trace("execution_engine2.run_job"):
+            with tracing.span("stage"):
+                raise ValueError("oops")
+    spans = _by_name(exporter.traces[0])
+    assert spans["stage"]["tags"] == {"error": "ValueError"}
+    assert spans["execution_engine2.run_job"]["tags"] == {"error": "ValueError"}
+
+
+def test_background_span():
+    exporter = _tracer()
+    release = threading.Event()
+
+    def submit(job_ids):
+        release.wait(10)
+        with tracing.span("condor.submit"):
+            pass
+        return job_ids
+
+    with tracing.trace("execution_engine2.run_job_batch"):
+        t = threading.Thread(
+            target=tracing.in_background_span("submit_jobs", submit), args=(["1"],)
+        )
+        t.start()
+    # the trace isn't complete until the background work finishes
+    assert exporter.traces == []
+    release.set()
+    t.join(10)
+
+    assert len(exporter.traces) == 1
+    spans = _by_name(exporter.traces[0])
+    root = spans["execution_engine2.run_job_batch"]
+    assert spans["submit_jobs"]["parentId"] == root["id"]
+    assert spans["condor.submit"]["parentId"] == spans["submit_jobs"]["id"]
+
+
+def test_background_span_no_trace():
+    def fn():
+        pass
+
+    assert tracing.in_background_span("submit_jobs", fn) is fn
+
+
+def test_file_exporter(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracing.set_tracer(tracing.Tracer(tracing.FileExporter(str(path)), 1))
+    for i in range(2):
+        with tracing.trace(f"execution_engine2.m{i}"):
+            pass
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)[0]["name"] for line in lines] == [
+        "execution_engine2.m0",
+        "execution_engine2.m1",
+    ]
+
+
+def test_configure(tmp_path):
+    tracing.configure({"tracing-sample-rate": "0", "tracing-file": "/tmp/f"})
+    assert tracing._TRACER is None
+    tracing.configure({"tracing-sample-rate": "0.5", "tracing-file": ""})
+    assert tracing._TRACER is None
+    tracing.configure({"tracing-sample-rate": "0.5", "tracing-file": "/tmp/f"})
+    assert type(tracing._TRACER.exporter) is tracing.FileExporter
+    tracing.configure(
+        {
+            "tracing-sample-rate": "1",
+            "tracing-file": "/tmp/f",
+            "tracing-collector-url": "http://localhost:9411/api/v2/spans",
+        }
+    )
+    assert type(tracing._TRACER.exporter) is tracing.CollectorExporter
+
+    with raises(Exception) as got:
+        tracing.Tracer(_ListExporter(), 1.5)
+    assert_exception_correct(
+        got.value, ValueError("sample_rate must be between 0 and 1")
+    )